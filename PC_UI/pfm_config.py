@@ -1,3 +1,4 @@
+# AUTO-GENERATED by protocol/generate.py from protocol/pkt_schema.py, DO NOT EDIT.
 # There are 3 axis: X, Y, Z
 NUM_PFM                 = (3).to_bytes(length=1, byteorder='big')
 PFM_X                   = (0).to_bytes(length=1, byteorder='big')
@@ -1,3 +1,4 @@
+# AUTO-GENERATED by protocol/generate.py from protocol/pkt_schema.py, DO NOT EDIT.
 # start & end bytes marking the beginning and end of a packet
 START_BYTES = b'\xAA\xBB'
 END_BYTES = b'\xCC\xDD'
@@ -12,10 +13,22 @@ CMD_DISABLE_CNC         = bytes.fromhex('07') # disable_cnc(void)
 CMD_SET_DELTA_STEPS     = bytes.fromhex('08') # set_delta_steps(uint8_t this_pfm, int32_t delta_steps)
 CMD_STOP                = bytes.fromhex('09') # halts execution and resets memory
 CMD_GET_ISR_FREQ        = bytes.fromhex('0A') # uint32_t get_isr_freq(void)
+CMD_SET_TARGETS_FREQ    = bytes.fromhex('0B') # set_target_freq() of several PFMs under a single block_isr()
+CMD_SET_TARGETS_DELTA   = bytes.fromhex('0C') # set_target_delta() of several PFMs under a single block_isr()
+CMD_QUEUE_SEGMENT       = bytes.fromhex('0D') # queue_segment() appends a segment of target deltas to the motion queue, NACK if full
+CMD_GET_QUEUE_STATUS    = bytes.fromhex('0E') # get_queue_status(void)
+CMD_CLEAR_QUEUE         = bytes.fromhex('0F') # clear_queue(void) drops the queued segments (the running segment is finished)
+CMD_SUBSCRIBE_IMU       = bytes.fromhex('10') # subscribe_imu(uint16_t period_ms) pushes PKT_IMU_FRAME every period, 0 unsubscribes
+CMD_ARM_TARGETS         = bytes.fromhex('12') # arm_targets() stores target frequencies of several PFMs applied by CMD_TRIGGER
+CMD_TRIGGER             = bytes.fromhex('13') # trigger(void) applies the armed targets under a single block_isr(), NACK if nothing is armed
+CMD_PING                = bytes.fromhex('14') # ping(void) returns ACK (and REPLY_TIMESTAMP) for clock synchronisation
+CMD_SET_BAUDRATE        = bytes.fromhex('15') # set_baudrate(uint32_t baudrate) switches the serial line after the ACK, confirmed by repeating it
 # definition of response
 PKT_ACK                 = bytes.fromhex('AA') # acknowledgement sequence
 PKT_NACK                = bytes.fromhex('AB') # not-acknowledgement sequence
+# definition of packets pushed without a request
+PKT_IMU_FRAME           = bytes.fromhex('11') # Pkt_pfm::push_telemetry() every period of subscribe_imu()
 
 BYTEORDER = 'little'
 PAYLOAD_BYTE_SIZE = 1
-COMMAND_BYTE_SIZE = 1
\ No newline at end of file
+COMMAND_BYTE_SIZE = 1
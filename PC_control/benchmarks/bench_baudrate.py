@@ -0,0 +1,90 @@
+""" Round trip and command rate at the baudrates of HST.negotiate_baudrate().
+
+    The simulated turret ('hstsim://', paced at the baudrate) is opened at
+    DEFAULT_BAUDRATE and negotiated to every baudrate of BAUDRATES. The
+    round trip of cmd_get_imu_measurement() (the longest reply) and the
+    rate of pipelined commands are measured at the negotiated baudrate.
+    The negotiation over a line limited to 1 Mbaud ('max_baudrate') shows
+    the time of the fallback from the baudrates above it.
+
+    Usage:
+        python benchmarks/bench_baudrate.py [--iterations 500] [--quick]
+"""
+import os
+import sys
+import time
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('HST_LOGGER_PROFILE', 'production')
+
+from hst.interface import HST
+from hst.packet.pkt_defs import DEFAULT_BAUDRATE, BAUDRATES
+from bench_datalink_latency import percentile
+
+
+def _round_trips_us(turret:HST, iterations:int) -> list[float]:
+    """ Round trips of blocking cmd_get_imu_measurement() in microseconds. """
+    samples = []
+    for _ in range(iterations):
+        time_start = time.perf_counter()
+        turret.cmd_get_imu_measurement()
+        samples.append((time.perf_counter() - time_start)*1e6)
+    return samples
+
+
+def _commands_per_s(turret:HST, iterations:int) -> float:
+    """ Rate of pipelined cmd_get_imu_measurement(). """
+    time_start = time.perf_counter()
+    futures = [turret.cmd_get_imu_measurement(pipelined=True) for _ in range(iterations)]
+    for future in futures:
+        future.result()
+    return iterations/(time.perf_counter() - time_start)
+
+
+def run(iterations:int=500, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param iterations: Number of commands per measurement, defaults to 500
+    :type iterations: int, optional
+    :param quick: Run fewer commands, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        iterations = 100
+    results = {}
+    for baudrate in BAUDRATES:
+        turret = HST('hstsim://', DEFAULT_BAUDRATE)
+        link = turret.negotiate_baudrate([baudrate])
+        samples = _round_trips_us(turret, iterations)
+        results[f'baudrate_{baudrate}'] = {
+            'baudrate': link['baudrate'],
+            'bytes_per_s': link['bytes_per_second'],
+            'round_trip_p50_us': percentile(samples, 0.5),
+            'round_trip_p99_us': percentile(samples, 0.99),
+            'commands_per_s': _commands_per_s(turret, iterations),
+        }
+        turret.close()
+    turret = HST('hstsim://?max_baudrate=1000000', DEFAULT_BAUDRATE)
+    time_start = time.perf_counter()
+    link = turret.negotiate_baudrate()
+    results['baudrate_fallback'] = {'baudrate': link['baudrate'], 'attempts': len(link['attempts']),
+                                    'negotiation_s': time.perf_counter() - time_start}
+    turret.close()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    results = run(iterations=args.iterations, quick=args.quick)
+    fallback = results.pop('baudrate_fallback')
+    for name, result in results.items():
+        print(f"{result['baudrate']:8d} Bd {result['bytes_per_s']:9.0f} B/s  cmd_get_imu_measurement() "
+              f"p50 {result['round_trip_p50_us']:8.1f} us  p99 {result['round_trip_p99_us']:8.1f} us  "
+              f"pipelined {result['commands_per_s']:8.0f} cmd/s")
+    print(f"line limited to 1 Mbaud: negotiated {fallback['baudrate']} Bd after {fallback['attempts']} attempts "
+          f"in {fallback['negotiation_s']:.2f} s")
@@ -0,0 +1,110 @@
+""" Throughput of capturing, reading and replaying packets (hst.datalink.capture).
+
+    A synthetic capture of a telemetry session (pushed IMU frames, every
+    tenth packet a command and its reply) is written with CaptureWriter,
+    read back through mmap and replayed at maximum speed through the
+    receiver stack of a Datalink ('hstreplay://').
+
+    Usage:
+        python benchmarks/bench_capture.py [--packets 200000] [--quick]
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('HST_LOGGER_PROFILE', 'production')
+
+from hst.datalink import Datalink
+from hst.datalink.capture import CaptureWriter, CaptureReader, TX, RX
+from hst.packet import encode_request
+from hst.packet.imu import decode_imu_frames, IMU_FRAME_DTYPE
+from hst.packet.pkt_defs import *
+
+
+def _records(packets:int) -> list:
+    """ Records (time, direction, payload) of a telemetry session, 1 ms apart. """
+    frame = bytearray(IMU_FRAME_DTYPE.itemsize)
+    frame[0] = PKT_IMU_FRAME[0]
+    request = encode_request(CMD_GET_QUEUE_STATUS)
+    reply = CMD_GET_QUEUE_STATUS + bytes(4)
+    records = []
+    for index in range(packets):
+        if index % 10 == 0:
+            records.append((index*0.001, TX, request))
+        elif index % 10 == 1:
+            records.append((index*0.001, RX, reply))
+        else:
+            frame[1:3] = (index & 0xFFFF).to_bytes(2, 'little')
+            records.append((index*0.001, RX, bytes(frame)))
+    return records
+
+
+def _replay(path:str, num_rx:int) -> float:
+    """ Seconds needed to replay the RX packets of a capture through a Datalink. """
+    done = threading.Event()
+    received = [0]
+    def on_payload(payload, receive_time):
+        received[0] += 1
+        if received[0] == num_rx:
+            done.set()
+    datalink = Datalink(f'hstreplay://{path}?speed=0&trigger=1', 115200)
+    datalink.add_listener(on_payload)
+    time_start = time.perf_counter()
+    datalink.send(encode_request(CMD_GET_QUEUE_STATUS))
+    done.wait(timeout=60)
+    elapsed = time.perf_counter() - time_start
+    datalink.close()
+    return elapsed
+
+
+def run(packets:int=200000, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param packets: Number of captured packets, defaults to 200000
+    :type packets: int, optional
+    :param quick: Capture fewer packets, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        packets = 20000
+    results = {}
+    records = _records(packets)
+    num_rx = sum(1 for _, direction, _ in records if direction == RX)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.hstcap')
+        time_start = time.perf_counter()
+        with CaptureWriter(path) as writer:
+            for timestamp, direction, payload in records:
+                writer.write(direction, payload, timestamp)
+        elapsed = time.perf_counter() - time_start
+        results['capture_write'] = {'packets_per_s': packets/elapsed, 'bytes_per_packet': os.path.getsize(path)/packets}
+
+        with CaptureReader(path) as reader:
+            time_start = time.perf_counter()
+            count = sum(1 for _ in reader)
+            results['capture_iterate'] = {'packets_per_s': count/(time.perf_counter() - time_start)}
+            time_start = time.perf_counter()
+            count = len(reader)
+            results['capture_index'] = {'packets_per_s': count/(time.perf_counter() - time_start)}
+            time_start = time.perf_counter()
+            frames = decode_imu_frames(reader.payloads(RX, command=PKT_IMU_FRAME))
+            results['capture_imu_frames'] = {'packets_per_s': len(frames)/(time.perf_counter() - time_start)}
+
+        elapsed = _replay(path, num_rx)
+        results['capture_replay_datalink'] = {'packets_per_s': num_rx/elapsed}
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--packets', type=int, default=200000)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    for name, result in run(packets=args.packets, quick=args.quick).items():
+        extra = f"  ({result['bytes_per_packet']:.1f} bytes/packet)" if 'bytes_per_packet' in result else ''
+        print(f"{name:<26s} {result['packets_per_s']:14,.0f} packets/s{extra}")
@@ -0,0 +1,73 @@
+""" Accuracy of the device time mapped to the host clock (HST.sync_clock()).
+
+    The simulated firmware ('hstsim://', paced at the baudrate) runs its
+    micros() with a drift against the host clock, so the true host time of
+    every device timestamp is known. The error of the host time of a reply
+    is reported for
+
+        receive_ns      - the time the reply is read by the receiver thread
+        device_time_ns  - the device time of the reply mapped by the ClockEstimator
+
+    Usage:
+        python benchmarks/bench_clock.py [--drift 50] [--syncs 20] [--iterations 500] [--quick]
+"""
+import os
+import sys
+import time
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('HST_LOGGER_PROFILE', 'production')
+
+from hst.interface import HST
+from bench_datalink_latency import percentile
+
+
+def run(drift_ppm:float=50.0, syncs:int=20, sync_period:float=0.1, iterations:int=500, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param drift_ppm: Drift of the simulated device clock, defaults to 50.0
+    :type drift_ppm: float, optional
+    :param syncs: Number of HST.sync_clock() calls before the measurement, defaults to 20
+    :type syncs: int, optional
+    :param sync_period: Time between the syncs in seconds, defaults to 0.1
+    :type sync_period: float, optional
+    :param iterations: Number of measured replies, defaults to 500
+    :type iterations: int, optional
+    :param quick: Use fewer syncs and replies, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name, errors in microseconds.
+    :rtype: dict
+    """
+    if quick:
+        syncs, iterations = 5, 100
+    turret = HST(f'hstsim://?drift={drift_ppm}', 115200)
+    firmware = turret._datalink._serial.firmware
+    boot_ns = round(firmware._boot_time*1e9)
+    for _ in range(syncs):
+        result = turret.sync_clock()
+        time.sleep(sync_period)
+    errors = {'receive_ns': [], 'device_time_ns': []}
+    for _ in range(iterations):
+        response = turret.cmd_get_delta_steps('x')
+        # host time of the device timestamp
+        true_ns = boot_ns + response['MICROS']*1000/(1 + drift_ppm*1e-6)
+        for name in errors:
+            errors[name].append(abs(response[name] - true_ns)/1000)
+    turret.close()
+    results = {name: {'p50_us': percentile(samples, 0.5), 'p99_us': percentile(samples, 0.99)} for name, samples in errors.items()}
+    results['estimate'] = {'drift_ppm': result['drift_ppm'], 'rtt_us': result['rtt_ns']/1000}
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--drift', type=float, default=50.0)
+    parser.add_argument('--syncs', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    results = run(drift_ppm=args.drift, syncs=args.syncs, iterations=args.iterations, quick=args.quick)
+    estimate = results.pop('estimate')
+    for name, result in results.items():
+        print(f"{name:<16s} error  p50 {result['p50_us']:9.1f} us  p99 {result['p99_us']:9.1f} us")
+    print(f"estimated drift {estimate['drift_ppm']:.1f} ppm (simulated {args.drift} ppm), round trip {estimate['rtt_us']:.0f} us")
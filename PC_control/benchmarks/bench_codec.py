@@ -0,0 +1,63 @@
+""" Per-command cost of request encoding and reply decoding (hst.packet.codec).
+
+    Usage:
+        python benchmarks/bench_codec.py [--iterations 200000] [--quick]
+"""
+import os
+import sys
+import time
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hst.packet.codec import encode_request, decode_reply
+from hst.packet.pkt_defs import *
+
+# device time appended to every reply
+_MICROS = (123456789).to_bytes(4, byteorder=BYTEORDER)
+
+# (command, request values, reply payload)
+CASES = {
+    'set_target_freq':      (CMD_SET_TARGET_FREQ, (PFM_X, 6400, True), CMD_SET_TARGET_FREQ + PKT_ACK + _MICROS),
+    'set_target_delta':     (CMD_SET_TARGET_DELTA, (PFM_X, 6400, -12345), CMD_SET_TARGET_DELTA + PKT_ACK + _MICROS),
+    'get_delta_steps':      (CMD_GET_DELTA_STEPS, (PFM_X,), CMD_GET_DELTA_STEPS + (12345).to_bytes(4, byteorder=BYTEORDER) + _MICROS),
+    'get_imu_measurement':  (CMD_GET_IMU_MEASUREMENT, (), CMD_GET_IMU_MEASUREMENT + bytes(range(18)) + _MICROS),
+    'set_isr_freq':         (CMD_SET_ISR_FREQ, (6400,), CMD_SET_ISR_FREQ + PKT_ACK + _MICROS),
+    'set_delta_steps':      (CMD_SET_DELTA_STEPS, (PFM_Y, 1000), CMD_SET_DELTA_STEPS + PKT_ACK + _MICROS),
+    'set_targets_delta':    (CMD_SET_TARGETS_DELTA, ((PFM_X, 6400, 100), (PFM_Y, 6400, -100), (PFM_Z, 3200, 50)), CMD_SET_TARGETS_DELTA + PKT_ACK + _MICROS),
+}
+
+
+def run(iterations:int=200000, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param iterations: Number of encodings/decodings per command, defaults to 200000
+    :type iterations: int, optional
+    :param quick: Run fewer iterations, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        iterations = 20000
+    results = {}
+    for name, (command, values, reply) in CASES.items():
+        reply = bytearray(reply)
+        time_start = time.perf_counter()
+        for _ in range(iterations):
+            encode_request(command, *values)
+        encode_ns = (time.perf_counter() - time_start)/iterations*1e9
+        time_start = time.perf_counter()
+        for _ in range(iterations):
+            decode_reply(reply)
+        decode_ns = (time.perf_counter() - time_start)/iterations*1e9
+        results[f'codec_{name}'] = {'encode_ns': encode_ns, 'decode_ns': decode_ns}
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    for name, result in run(iterations=args.iterations, quick=args.quick).items():
+        print(f"{name:<28s} encode {result['encode_ns']:7.0f} ns  decode {result['decode_ns']:7.0f} ns")
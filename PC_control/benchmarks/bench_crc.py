@@ -0,0 +1,133 @@
+""" Cost and benefit of packets with CRC (crc=True, see packet.packet).
+
+    The encoding and decoding time per packet is measured for the replies
+    of bench_packet_decoder without and with CRC. The same stream is then
+    corrupted by random bit flips and decoded by packet.PacketDecoder: the
+    decoder without CRC accepts corrupted payloads, with CRC they are
+    rejected and the decoder resynchronises at the next START_BYTES.
+    Finally cmd_get_delta_steps() runs over the simulated turret with a
+    noisy line ('hstsim://?noise=...') and the wrong replies (corrupted
+    values accepted by the host) are counted.
+
+    Usage:
+        python benchmarks/bench_crc.py [--packets 20000] [--quick]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('HST_LOGGER_PROFILE', 'production')
+
+from hst.interface import HST
+from hst.packet import encode_packet, PacketDecoder
+from hst.packet.pkt_defs import *
+
+_PAYLOADS = [
+    CMD_SET_TARGET_FREQ + PKT_ACK + bytes(4),
+    CMD_GET_DELTA_STEPS + (123456).to_bytes(4, byteorder=BYTEORDER) + bytes(4),
+    # IMU data deliberately contain START_BYTES and END_BYTES
+    CMD_GET_IMU_MEASUREMENT + (START_BYTES + END_BYTES)*4 + PKT_ACK*2 + bytes(4),
+]
+
+
+def _encode_ns(crc:bool, packets:int) -> float:
+    """ Mean time of encode_packet() in nanoseconds. """
+    payloads = _PAYLOADS*(packets//len(_PAYLOADS))
+    time_start = time.perf_counter_ns()
+    for payload in payloads:
+        encode_packet(payload, crc)
+    return (time.perf_counter_ns() - time_start)/len(payloads)
+
+
+def _decode(stream:bytes, crc:bool, chunk_size:int=64) -> tuple[float, list]:
+    """ Decodes the stream by PacketDecoder fed by chunks, returns (seconds, payloads). """
+    decoder = PacketDecoder(crc=crc)
+    view = memoryview(stream)
+    payloads = []
+    time_start = time.perf_counter()
+    for idx in range(0, len(view), chunk_size):
+        payloads.extend(decoder.feed(view[idx:idx+chunk_size]))
+    return time.perf_counter() - time_start, payloads
+
+
+def _flip_bits(stream:bytes, bit_error_rate:float, seed:int=0) -> bytes:
+    """ Flips every bit of the stream with the probability bit_error_rate. """
+    rng = random.Random(seed)
+    corrupted = bytearray(stream)
+    position = -1
+    while True:
+        # geometric distance to the next flipped bit
+        position += 1 + int(rng.expovariate(bit_error_rate))
+        if position >= 8*len(corrupted):
+            return bytes(corrupted)
+        corrupted[position >> 3] ^= 1 << (position & 7)
+
+
+def _noisy_link(crc:bool, noise:float, commands:int) -> dict:
+    """ cmd_get_delta_steps() over a noisy simulated line, counts of the outcomes. """
+    turret = HST(f'hstsim://?noise={noise}', 115200, crc=crc)
+    turret.cmd_set_delta_steps('x', 123456)
+    correct = wrong = lost = 0
+    for _ in range(commands):
+        response = turret.cmd_get_delta_steps('x', timeout_seconds=0.05)
+        if not response.get('received'):
+            lost += 1
+        elif response.get('DELTA') == 123456:
+            correct += 1
+        else:
+            wrong += 1
+    discarded_bytes = turret._datalink.discarded_bytes
+    turret.close()
+    return {'correct': correct, 'wrong': wrong, 'lost': lost, 'discarded_bytes': discarded_bytes}
+
+
+def run(packets:int=20000, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param packets: Number of packets per measurement, defaults to 20000
+    :type packets: int, optional
+    :param quick: Run fewer packets, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        packets = 3000
+    results = {}
+    for crc in (False, True):
+        stream = b''.join(encode_packet(_PAYLOADS[idx % len(_PAYLOADS)], crc) for idx in range(packets))
+        seconds, payloads = _decode(stream, crc)
+        results[f'crc_{crc}'.lower()] = {
+            'packet_bytes': len(stream)/packets,
+            'encode_ns': min(_encode_ns(crc, packets) for _ in range(3)),
+            'decode_ns': min(seconds, _decode(stream, crc)[0])/len(payloads)*1e9,
+        }
+        for bit_error_rate in (1e-4, 1e-3):
+            seconds, payloads = _decode(_flip_bits(stream, bit_error_rate), crc)
+            corrupted = sum(payload not in _PAYLOADS for payload in payloads)
+            results[f'crc_{crc}'.lower()][f'ber_{bit_error_rate:g}'] = {
+                'decoded': len(payloads), 'corrupted': corrupted,
+                'lost': packets - len(payloads), 'decode_ns': seconds/packets*1e9,
+            }
+        results[f'crc_{crc}'.lower()]['hstsim_noise_0.001'] = _noisy_link(crc, 1e-3, packets//10)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--packets', type=int, default=20000)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    results = run(packets=args.packets, quick=args.quick)
+    for name, result in results.items():
+        print(f"{name:<10s} {result['packet_bytes']:5.1f} B/packet  encode {result['encode_ns']:7.0f} ns  "
+              f"decode {result['decode_ns']:7.0f} ns/packet")
+        for key, value in result.items():
+            if key.startswith('ber_'):
+                print(f"    bit error rate {key[4:]:<7s} decoded {value['decoded']:6d}  corrupted accepted "
+                      f"{value['corrupted']:5d}  lost {value['lost']:5d}  ({value['decode_ns']:5.0f} ns/packet)")
+        link = result['hstsim_noise_0.001']
+        print(f"    hstsim noise 0.001  cmd_get_delta_steps() correct {link['correct']}  wrong {link['wrong']}  "
+              f"lost {link['lost']}  discarded {link['discarded_bytes']} B")
@@ -0,0 +1,78 @@
+""" Round-trip latency benchmark of Datalink.send()/Datalink.receive().
+
+    The serial port is replaced by the pyserial 'loop://' stand-in, which 
+    echoes every sent packet back. The measured round trip therefore covers 
+    the host stack only: encoding, the receiver thread, decoding and 
+    waking up the caller waiting in Datalink.receive().
+
+    Usage:
+        python benchmarks/bench_datalink_latency.py [--iterations 2000] [--quick]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hst.datalink import Datalink
+from hst.packet.pkt_defs import *
+
+
+def percentile(samples:list[float], fraction:float) -> float:
+    """ Percentile of the samples (nearest rank).
+
+    :param samples: Measured values.
+    :type samples: list[float]
+    :param fraction: Percentile as a fraction, e.g. 0.99.
+    :type fraction: float
+    :return: Value at the percentile.
+    :rtype: float
+    """
+    ordered = sorted(samples)
+    return ordered[min(len(ordered)-1, int(fraction*len(ordered)))]
+
+
+def run(iterations:int=2000, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param iterations: Number of round trips, defaults to 2000
+    :type iterations: int, optional
+    :param quick: Run fewer round trips, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        iterations = 200
+    datalink = Datalink('loop://', 115200)
+    payload = bytearray(CMD_GET_IMU_MEASUREMENT)
+    latencies = []
+    timeouts = 0
+    for _ in range(iterations):
+        time_start = time.perf_counter()
+        since_time = time.time()
+        datalink.send(payload)
+        received, _ = datalink.receive(since_time=since_time, timeout_seconds=1.0)
+        if received:
+            latencies.append(time.perf_counter() - time_start)
+        else:
+            timeouts += 1
+    datalink.close()
+    return {
+        'datalink_round_trip': {
+            'p50_us': percentile(latencies, 0.50)*1e6,
+            'p99_us': percentile(latencies, 0.99)*1e6,
+            'mean_us': statistics.fmean(latencies)*1e6,
+            'timeouts': timeouts,
+        },
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    for name, result in run(iterations=args.iterations, quick=args.quick).items():
+        print(f"{name:<28s} p50 {result['p50_us']:8.1f} us  p99 {result['p99_us']:8.1f} us  mean {result['mean_us']:8.1f} us  timeouts {result['timeouts']}")
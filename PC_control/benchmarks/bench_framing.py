@@ -0,0 +1,109 @@
+""" Side-by-side decoding of the framings 'start_end' and 'cobs' (see packet.packet).
+
+    The same sequence of replies is encoded in both framings (with and
+    without CRC) and decoded by packet.PacketDecoder fed by chunks. The
+    'start_end' decoder has to check every START_BYTES candidate, so the
+    replies include IMU data made of START_BYTES and END_BYTES (the worst
+    case) besides replies without them. The 'cobs' decoder splits the
+    stream at every COBS_DELIMITER and unstuffs each packet once,
+    independently of the payload content.
+
+    The round trip of cmd_get_imu_measurement() over the unpaced simulated
+    turret ('hstsim://?pacing=0') shows the framing cost of the whole stack.
+
+    Usage:
+        python benchmarks/bench_framing.py [--packets 30000] [--quick]
+"""
+import os
+import sys
+import time
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('HST_LOGGER_PROFILE', 'production')
+
+from hst.interface import HST
+from hst.packet import encode_packet, PacketDecoder
+from hst.packet.pkt_defs import *
+
+_REPLIES = {
+    'plain': [
+        CMD_SET_TARGET_FREQ + PKT_ACK + bytes(4),
+        CMD_GET_DELTA_STEPS + (123456).to_bytes(4, byteorder=BYTEORDER) + bytes(4),
+        CMD_GET_IMU_MEASUREMENT + bytes(range(1, 19)) + bytes(4),
+    ],
+    # IMU data deliberately made of START_BYTES and END_BYTES
+    'ambiguous': [
+        CMD_SET_TARGET_FREQ + PKT_ACK + bytes(4),
+        CMD_GET_DELTA_STEPS + (123456).to_bytes(4, byteorder=BYTEORDER) + bytes(4),
+        CMD_GET_IMU_MEASUREMENT + (START_BYTES + END_BYTES)*4 + PKT_ACK*2 + bytes(4),
+    ],
+}
+
+
+def _decode_ns(stream:bytes, crc:bool, framing:str, packets:int, chunk_size:int) -> float:
+    """ Time of PacketDecoder.feed() per packet in nanoseconds, the best of 3 runs. """
+    best = None
+    for _ in range(3):
+        decoder = PacketDecoder(crc=crc, framing=framing)
+        view = memoryview(stream)
+        decoded = 0
+        time_start = time.perf_counter_ns()
+        for idx in range(0, len(view), chunk_size):
+            decoded += len(decoder.feed(view[idx:idx+chunk_size]))
+        elapsed = time.perf_counter_ns() - time_start
+        if decoded != packets:
+            raise RuntimeError(f"decoded {decoded} of {packets} packets (crc={crc}, framing={framing})")
+        best = elapsed if best is None else min(best, elapsed)
+    return best/packets
+
+
+def _round_trip_us(framing:str, iterations:int) -> float:
+    """ Mean time of a blocking cmd_get_imu_measurement() in microseconds. """
+    turret = HST('hstsim://?pacing=0', 115200, framing=framing)
+    turret.cmd_get_imu_measurement()
+    time_start = time.perf_counter()
+    for _ in range(iterations):
+        turret.cmd_get_imu_measurement()
+    round_trip_us = (time.perf_counter() - time_start)/iterations*1e6
+    turret.close()
+    return round_trip_us
+
+
+def run(packets:int=30000, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param packets: Number of packets per measurement, defaults to 30000
+    :type packets: int, optional
+    :param quick: Run fewer packets, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        packets = 3000
+    results = {}
+    for content, replies in _REPLIES.items():
+        for crc in (False, True):
+            for framing in ('start_end', 'cobs'):
+                stream = b''.join(encode_packet(replies[idx % len(replies)], crc, framing) for idx in range(packets))
+                results[f'framing_{content}_{framing}' + ('_crc' if crc else '')] = {
+                    'packet_bytes': len(stream)/packets,
+                    'decode_chunk_64_ns': _decode_ns(stream, crc, framing, packets, 64),
+                    'decode_chunk_4096_ns': _decode_ns(stream, crc, framing, packets, 4096),
+                }
+    for framing in ('start_end', 'cobs'):
+        results[f'framing_hstsim_{framing}'] = {'round_trip_us': _round_trip_us(framing, packets//10)}
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--packets', type=int, default=30000)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    for name, result in run(packets=args.packets, quick=args.quick).items():
+        if 'round_trip_us' in result:
+            print(f"{name:<36s} cmd_get_imu_measurement() round trip {result['round_trip_us']:7.1f} us")
+        else:
+            print(f"{name:<36s} {result['packet_bytes']:5.1f} B/packet  decode chunk 64 B "
+                  f"{result['decode_chunk_64_ns']:6.0f} ns/packet  chunk 4096 B {result['decode_chunk_4096_ns']:6.0f} ns/packet")
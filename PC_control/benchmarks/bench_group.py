@@ -0,0 +1,72 @@
+""" Skew of a command sent to several turrets (TurretGroup).
+
+    Every turret is a simulated firmware behind a pseudo-terminal
+    (hst.simulator.VirtualSerialPort, POSIX only) paced at the baudrate.
+    The spread of the ACKs of cmd_set_target_freq() over all turrets is
+    measured when the command is
+
+        sequential  - called for one turret after another (blocking)
+        pipelined   - called for one turret after another (pipelined=True)
+        burst       - prepared for all turrets and written in one burst
+        trigger     - armed first, then CMD_TRIGGER written in one burst
+
+    Usage:
+        python benchmarks/bench_group.py [--devices 8] [--iterations 100] [--quick]
+"""
+import os
+import sys
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('HST_LOGGER_PROFILE', 'production')
+
+from hst.interface import TurretPool
+from hst.simulator import VirtualSerialPort
+from bench_datalink_latency import percentile
+
+
+def _skew(responses:list) -> float:
+    """ Spread of the receive times of the responses. """
+    receive_times = [response['receive_time'] for response in responses]
+    return max(receive_times) - min(receive_times)
+
+
+def run(devices:int=8, iterations:int=100, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param devices: Number of simulated turrets, defaults to 8
+    :type devices: int, optional
+    :param iterations: Number of commands per case, defaults to 100
+    :type iterations: int, optional
+    :param quick: Use fewer devices and commands, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name, skews in seconds.
+    :rtype: dict
+    """
+    if quick:
+        devices, iterations = 4, 20
+    ports = [VirtualSerialPort(baudrate=115200) for _ in range(devices)]
+    pool = TurretPool([port.name for port in ports], 115200)
+    group = pool.group()
+    targets = {name: ('x', 100 + index, True) for index, name in enumerate(pool)}
+    skews = {'sequential': [], 'pipelined': [], 'burst': [], 'trigger': []}
+    for _ in range(iterations):
+        skews['sequential'].append(_skew([pool[name].cmd_set_target_freq(*args) for name, args in targets.items()]))
+        futures = [pool[name].cmd_set_target_freq(*args, pipelined=True) for name, args in targets.items()]
+        skews['pipelined'].append(_skew([future.result() for future in futures]))
+        skews['burst'].append(group.cmd_set_target_freq(targets)['ack_skew_seconds'])
+        group.arm({name: {which_pfm: (freq, direction)} for name, (which_pfm, freq, direction) in targets.items()})
+        skews['trigger'].append(group.trigger()['ack_skew_seconds'])
+    pool.close()
+    for port in ports:
+        port.close()
+    return {name: {'p50_s': percentile(samples, 0.5), 'p99_s': percentile(samples, 0.99)} for name, samples in skews.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    for name, result in run(devices=args.devices, iterations=args.iterations, quick=args.quick).items():
+        print(f"{name:<12s} ACK skew  p50 {1e6*result['p50_s']:9.1f} us  p99 {1e6*result['p99_s']:9.1f} us")
@@ -0,0 +1,79 @@
+""" Startup time and memory footprint of importing the hst package.
+
+    Every measurement runs in a fresh interpreter. The peak resident set 
+    size (ru_maxrss) and the wall time of the import are reported for 
+    the bare interpreter, for hst, and for hst together with PyQt5.QtCore 
+    (the cost every user paid while the datalink depended on QThread).
+
+    Usage:
+        python benchmarks/bench_import.py [--repeat 5] [--quick]
+"""
+import os
+import sys
+import argparse
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_MEASURE = """
+import resource, sys, time
+time_start = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - time_start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+CASES = {
+    'python': "",
+    'import_hst': "import hst.interface",
+    'import_hst_with_qt': "import hst.interface\nimport PyQt5.QtCore",
+}
+
+
+def measure(imports:str) -> tuple[float, int]:
+    """ Import modules in a fresh interpreter.
+
+    :param imports: Import statements.
+    :type imports: str
+    :return: Returns (import time in seconds, peak RSS in kB)
+    :rtype: tuple[float, int]
+    """
+    output = subprocess.run([sys.executable, '-c', _MEASURE.format(imports=imports)], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    elapsed, max_rss = output.split()
+    return float(elapsed), int(max_rss)
+
+
+def run(repeat:int=5, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param repeat: Number of interpreters started per case, defaults to 5
+    :type repeat: int, optional
+    :param quick: Start a single interpreter per case, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        repeat = 1
+    results = {}
+    for name, imports in CASES.items():
+        try:
+            samples = [measure(imports) for _ in range(repeat)]
+        except subprocess.CalledProcessError:
+            # e.g. PyQt5 not installed
+            continue
+        results[name] = {
+            'import_ms': statistics.median(elapsed for elapsed, _ in samples)*1e3,
+            'max_rss_MB': statistics.median(max_rss for _, max_rss in samples)/1024,
+        }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    for name, result in run(repeat=args.repeat, quick=args.quick).items():
+        print(f"{name:<28s} {result['import_ms']:8.1f} ms {result['max_rss_MB']:8.1f} MB")
@@ -0,0 +1,70 @@
+""" Throughput of decoding logged IMU replies, per reply (decode_reply()) vs.
+    in bulk (hst.packet.imu).
+
+    Usage:
+        python benchmarks/bench_imu_decode.py [--frames 1000000] [--quick]
+"""
+import os
+import sys
+import time
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+
+from hst.packet.codec import decode_reply
+from hst.packet.imu import decode_imu_measurements, decode_imu_frames, imu_to_physical, IMU_MEASUREMENT_DTYPE, IMU_FRAME_DTYPE
+from hst.packet.pkt_defs import *
+
+
+def _payloads(command:bytes, itemsize:int, frames:int) -> bytes:
+    """ Random payloads of a command, back to back. """
+    data = np.random.default_rng(0).integers(0, 256, size=(frames, itemsize), dtype=np.uint8)
+    data[:, 0] = command[0]
+    return data.tobytes()
+
+
+def run(frames:int=1000000, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param frames: Number of decoded IMU payloads, defaults to 1000000
+    :type frames: int, optional
+    :param quick: Decode fewer payloads, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        frames = 100000
+    results = {}
+    buffer = _payloads(CMD_GET_IMU_MEASUREMENT, IMU_MEASUREMENT_DTYPE.itemsize, frames)
+    # per reply, a tenth of the frames is enough
+    replies = [bytearray(buffer[index:index+IMU_MEASUREMENT_DTYPE.itemsize])
+               for index in range(0, len(buffer)//10, IMU_MEASUREMENT_DTYPE.itemsize)]
+    time_start = time.perf_counter()
+    for reply in replies:
+        decode_reply(reply)
+    results['imu_decode_reply'] = {'frames_per_s': len(replies)/(time.perf_counter() - time_start)}
+    time_start = time.perf_counter()
+    samples = decode_imu_measurements(buffer)
+    results['imu_decode_bulk'] = {'frames_per_s': frames/(time.perf_counter() - time_start)}
+    # the view is created lazily, copying touches every frame
+    time_start = time.perf_counter()
+    decode_imu_measurements(buffer).copy()
+    results['imu_decode_bulk_copy'] = {'frames_per_s': frames/(time.perf_counter() - time_start)}
+    time_start = time.perf_counter()
+    imu_to_physical(samples)
+    results['imu_to_physical'] = {'frames_per_s': frames/(time.perf_counter() - time_start)}
+    buffer = _payloads(PKT_IMU_FRAME, IMU_FRAME_DTYPE.itemsize, frames)
+    time_start = time.perf_counter()
+    decode_imu_frames(buffer)
+    results['imu_decode_frames_bulk'] = {'frames_per_s': frames/(time.perf_counter() - time_start)}
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=1000000)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    for name, result in run(frames=args.frames, quick=args.quick).items():
+        print(f"{name:<24s} {result['frames_per_s']:14,.0f} frames/s")
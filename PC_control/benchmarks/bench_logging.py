@@ -0,0 +1,74 @@
+""" Per-packet logging overhead for every logging profile (see hst.config).
+
+    Two paths are measured, with all log records written to os.devnull:
+        encode_packet   - packet encoding alone
+        round_trip      - HST.cmd_get_delta_steps() over the pyserial 
+                          'loop://' stand-in (encode, send, receiver thread, 
+                          decode and reply matching)
+
+    Usage:
+        python benchmarks/bench_logging.py [--iterations 2000] [--quick]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hst.config import LOGGER_PROFILES, set_logger_profile
+from hst.interface import HST
+from hst.packet import encode_packet
+from hst.packet.pkt_defs import *
+
+
+def run(iterations:int=2000, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param iterations: Number of packets per measurement, defaults to 2000
+    :type iterations: int, optional
+    :param quick: Measure fewer packets, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        iterations = 200
+    devnull = open(os.devnull, 'w')
+    handler = logging.StreamHandler(devnull)
+    hst_logger = logging.getLogger('hst')
+    hst_logger.addHandler(handler)
+    # route the console output of hst.interface to devnull as well
+    interface_handlers = logging.getLogger('hst.interface').handlers
+    streams = [interface_handler.setStream(devnull) for interface_handler in interface_handlers]
+    turret = HST('loop://', 115200)
+    payload = bytearray(CMD_GET_DELTA_STEPS + bytes([PFM_X]))
+    results = {}
+    try:
+        for profile in LOGGER_PROFILES.keys():
+            set_logger_profile(profile)
+            time_start = time.perf_counter()
+            for _ in range(iterations*10):
+                encode_packet(payload)
+            encode_us = (time.perf_counter() - time_start)/(iterations*10)*1e6
+            time_start = time.perf_counter()
+            for _ in range(iterations):
+                turret.cmd_get_delta_steps('x', timeout_seconds=1.0)
+            round_trip_us = (time.perf_counter() - time_start)/iterations*1e6
+            results[f'logging_{profile}'] = {'encode_packet_us': encode_us, 'round_trip_us': round_trip_us}
+    finally:
+        turret.close()
+        hst_logger.removeHandler(handler)
+        for interface_handler, stream in zip(interface_handlers, streams):
+            interface_handler.setStream(stream)
+        devnull.close()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    for name, result in run(iterations=args.iterations, quick=args.quick).items():
+        print(f"{name:<28s} encode_packet {result['encode_packet_us']:7.2f} us  round trip {result['round_trip_us']:8.1f} us")
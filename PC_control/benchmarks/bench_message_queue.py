@@ -0,0 +1,124 @@
+""" Throughput and losses of the queue of received messages (MessageQueue).
+
+    A producer thread puts messages as fast as possible while a consumer
+    thread takes them with get(). The former rotary buffer of the Receiver
+    (deque(maxlen=2) guarded by a Condition, notify_all() on every message)
+    is measured the same way; it drops the messages silently, the queue
+    reports them in 'dropped'.
+
+    A burst of replies is then injected into a Datalink on 'loop://' and
+    read back by Datalink.receive(), showing the counters of every policy.
+
+    Usage:
+        python benchmarks/bench_message_queue.py [--messages 200000] [--burst 1000] [--quick]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import collections
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('HST_LOGGER_PROFILE', 'production')
+
+from hst.datalink import Datalink
+from hst.datalink.receiver.message_queue import MessageQueue, OVERFLOW_POLICIES
+from hst.packet import encode_packet
+from hst.packet.pkt_defs import *
+
+
+class _RotaryBuffer():
+    """ The former message buffer of the Receiver. """
+
+    def __init__(self):
+        self._messages = collections.deque(maxlen=2)
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def put(self, message):
+        with self._condition:
+            self._messages.append(message)
+            self._condition.notify_all()
+
+    def get(self, timeout_seconds:float=None):
+        with self._condition:
+            self._condition.wait_for(lambda: self._messages or self._closed, timeout=timeout_seconds)
+            return self._messages.popleft() if self._messages else None
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+def _producer_consumer(queue, messages:int) -> tuple:
+    """ Messages per second through the queue and the number of messages received. """
+    received = [0]
+    def consume():
+        while queue.get(timeout_seconds=1.0) is not None:
+            received[0] += 1
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    time_start = time.perf_counter()
+    for index in range(messages):
+        queue.put(index)
+    queue.close()
+    consumer.join()
+    return messages/(time.perf_counter() - time_start), received[0]
+
+
+def _burst(policy:str, burst:int, capacity:int) -> dict:
+    """ Counters of a Datalink queue after a burst of replies read back by receive(). """
+    datalink = Datalink('loop://', 115200, queue_capacity=capacity, overflow=policy)
+    since_time = time.time()
+    packet = encode_packet(CMD_GET_QUEUE_STATUS + bytes(4 + 4))
+    # 'loop://' has a bounded buffer, with overflow 'block' the writes wait for receive()
+    writer = threading.Thread(target=lambda: [datalink._serial.write(packet) for _ in range(burst)])
+    writer.start()
+    received = 0
+    while datalink.receive(since_time=since_time, timeout_seconds=0.2)[0]:
+        received += 1
+    writer.join()
+    stats = datalink.queue_stats()
+    datalink.close()
+    stats['received'] = received
+    return stats
+
+
+def run(messages:int=200000, burst:int=1000, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param messages: Number of messages of the producer-consumer case, defaults to 200000
+    :type messages: int, optional
+    :param burst: Number of replies injected at once into the Datalink, defaults to 1000
+    :type burst: int, optional
+    :param quick: Use fewer messages, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        messages = 20000
+    results = {}
+    rate, received = _producer_consumer(_RotaryBuffer(), messages)
+    results['queue_rotary_buffer'] = {'messages_per_s': rate, 'received': received, 'dropped': None}
+    for policy in OVERFLOW_POLICIES:
+        queue = MessageQueue(capacity=256, overflow=policy)
+        rate, received = _producer_consumer(queue, messages)
+        results[f'queue_{policy}'] = {'messages_per_s': rate, 'received': received, 'dropped': queue.dropped}
+    for policy in OVERFLOW_POLICIES:
+        results[f'burst_{policy}'] = _burst(policy, burst, capacity=256)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--burst', type=int, default=1000)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    for name, result in run(messages=args.messages, burst=args.burst, quick=args.quick).items():
+        if 'messages_per_s' in result:
+            print(f"{name:<22s} {result['messages_per_s']:12,.0f} messages/s  received {result['received']:7d}  dropped {result['dropped']}")
+        else:
+            print(f"{name:<22s} received {result['received']:5d}  dropped {result['dropped']:5d}  high_water {result['high_water']:4d}")
@@ -0,0 +1,75 @@
+""" Cost of the per-stage latency histograms (HST.enable_metrics()) and
+    the breakdown they report.
+
+    The round trip of cmd_get_delta_steps() against the unpaced simulator
+    ('hstsim://?pacing=0', no line delay, so the host stack dominates) is
+    measured with the metrics disabled and enabled. The stage breakdown is
+    then printed for the simulator paced at 115200 Bd.
+
+    Usage:
+        python benchmarks/bench_metrics.py [--iterations 5000] [--quick]
+"""
+import os
+import sys
+import time
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('HST_LOGGER_PROFILE', 'production')
+
+from hst.interface import HST
+from hst.datalink.metrics import STAGES
+
+
+def _round_trip_us(turret:HST, iterations:int) -> float:
+    """ Mean time of a blocking cmd_get_delta_steps() in microseconds. """
+    time_start = time.perf_counter()
+    for _ in range(iterations):
+        turret.cmd_get_delta_steps('x')
+    return (time.perf_counter() - time_start)/iterations*1e6
+
+
+def run(iterations:int=5000, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param iterations: Number of commands per measurement, defaults to 5000
+    :type iterations: int, optional
+    :param quick: Run fewer commands, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        iterations = 500
+    results = {}
+    turret = HST('hstsim://?pacing=0', 115200)
+    _round_trip_us(turret, iterations//10)
+    # alternate the cases to cancel slow drifts of the machine
+    disabled, enabled = [], []
+    for _ in range(3):
+        disabled.append(_round_trip_us(turret, iterations))
+        turret.enable_metrics()
+        enabled.append(_round_trip_us(turret, iterations))
+        turret.disable_metrics()
+    results['metrics_overhead'] = {'disabled_us': min(disabled), 'enabled_us': min(enabled)}
+    turret.close()
+    paced = HST('hstsim://', 115200)
+    paced.enable_metrics()
+    _round_trip_us(paced, max(iterations//10, 50))
+    stages = paced.stats()['stages']['CMD_GET_DELTA_STEPS']
+    results['metrics_paced_stages'] = {stage: stages[stage]['p50_us'] for stage in STAGES if stage in stages}
+    paced.close()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    results = run(iterations=args.iterations, quick=args.quick)
+    overhead = results['metrics_overhead']
+    print(f"round trip  metrics disabled {overhead['disabled_us']:7.1f} us  enabled {overhead['enabled_us']:7.1f} us"
+          f"  (+{overhead['enabled_us'] - overhead['disabled_us']:.1f} us)")
+    print("paced 115200 Bd, p50 per stage:")
+    for stage, p50_us in results['metrics_paced_stages'].items():
+        print(f"    {stage:<12s} {p50_us:9.1f} us")
@@ -0,0 +1,129 @@
+""" Throughput benchmark of the packet decoding.
+
+    Synthetic captures consist of replies (ACK, delta steps and IMU 
+    measurements) interleaved with noise containing false START_BYTES and 
+    END_BYTES. The capture is decoded by packet.PacketDecoder in chunks of 
+    various sizes and by repeated calls of packet.parse_buffer().
+
+    Usage:
+        python benchmarks/bench_packet_decoder.py [--size-mb 4] [--quick]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hst.packet import encode_packet, parse_buffer, PacketDecoder
+from hst.packet.pkt_defs import *
+
+
+def make_capture(size_bytes:int, noise_ratio:float=0.05, seed:int=0) -> tuple[bytes, int]:
+    """ Generate a synthetic capture of serial traffic.
+
+    :param size_bytes: Approximate size of the capture in bytes.
+    :type size_bytes: int
+    :param noise_ratio: Probability of inserting noise in between packets, defaults to 0.05
+    :type noise_ratio: float, optional
+    :param seed: Seed of the random generator, defaults to 0
+    :type seed: int, optional
+    :return: Returns (capture, number of packets in the capture)
+    :rtype: tuple[bytes, int]
+    """
+    rng = random.Random(seed)
+    replies = [
+        encode_packet(CMD_SET_TARGET_FREQ + PKT_ACK + bytes(4)),
+        encode_packet(CMD_GET_DELTA_STEPS + (123456).to_bytes(4, byteorder=BYTEORDER) + bytes(4)),
+        # IMU data deliberately contain START_BYTES and END_BYTES
+        encode_packet(CMD_GET_IMU_MEASUREMENT + (START_BYTES + END_BYTES)*4 + PKT_ACK*2 + bytes(4)),
+    ]
+    noise = START_BYTES + b'\x05\x01' + END_BYTES + START_BYTES[:1]
+    chunks = []
+    num_packets = 0
+    total = 0
+    while total < size_bytes:
+        if rng.random() < noise_ratio:
+            chunks.append(noise)
+            total += len(noise)
+        packet = rng.choice(replies)
+        chunks.append(packet)
+        total += len(packet)
+        num_packets += 1
+    return b''.join(chunks), num_packets
+
+
+def bench_decoder(capture:bytes, chunk_size:int) -> tuple[float, int]:
+    """ Decode the capture with PacketDecoder fed by chunks of chunk_size.
+
+    :return: Returns (elapsed seconds, number of decoded payloads)
+    :rtype: tuple[float, int]
+    """
+    decoder = PacketDecoder()
+    view = memoryview(capture)
+    num_payloads = 0
+    time_start = time.perf_counter()
+    for idx in range(0, len(view), chunk_size):
+        num_payloads += len(decoder.feed(view[idx:idx+chunk_size]))
+    return time.perf_counter() - time_start, num_payloads
+
+
+def bench_parse_buffer(capture:bytes, chunk_size:int) -> tuple[float, int]:
+    """ Decode the capture with parse_buffer() the way Receiver.run() used to.
+
+    :return: Returns (elapsed seconds, number of decoded payloads)
+    :rtype: tuple[float, int]
+    """
+    buffer = bytearray()
+    num_payloads = 0
+    time_start = time.perf_counter()
+    for idx in range(0, len(capture), chunk_size):
+        buffer.extend(capture[idx:idx+chunk_size])
+        while True:
+            buffer, payload = parse_buffer(buffer)
+            if len(payload) == 0:
+                break
+            num_payloads += 1
+    return time.perf_counter() - time_start, num_payloads
+
+
+def run(size_mb:float=4.0, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param size_mb: Size of the synthetic capture in MB, defaults to 4.0
+    :type size_mb: float, optional
+    :param quick: Use a small capture, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        size_mb = 0.25
+    capture, num_packets = make_capture(int(size_mb*1024*1024))
+    results = {}
+    for chunk_size in [64, 4096, len(capture)]:
+        elapsed, num_payloads = bench_decoder(capture, chunk_size)
+        name = f"decoder_chunk_{'all' if chunk_size == len(capture) else chunk_size}"
+        results[name] = {
+            'MB_per_s': len(capture)/elapsed/1e6,
+            'packets_per_s': num_payloads/elapsed,
+            'packets': num_payloads,
+        }
+    # parse_buffer() copies the remaining buffer per packet, keep the input small
+    small_capture, _ = make_capture(min(len(capture), 256*1024))
+    elapsed, num_payloads = bench_parse_buffer(small_capture, 4096)
+    results['parse_buffer_chunk_4096'] = {
+        'MB_per_s': len(small_capture)/elapsed/1e6,
+        'packets_per_s': num_payloads/elapsed,
+        'packets': num_payloads,
+    }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=4.0)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    for name, result in run(size_mb=args.size_mb, quick=args.quick).items():
+        print(f"{name:<28s} {result['MB_per_s']:8.2f} MB/s {result['packets_per_s']:12.0f} packets/s ({result['packets']} packets)")
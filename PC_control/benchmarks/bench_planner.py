@@ -0,0 +1,61 @@
+""" Planning time of hst.planner against the path length.
+
+    Random paths of X, Y, Z waypoints are planned with S-curve (jerk
+    limited) profiles and split into segments of 10 ms.
+
+    Usage:
+        python benchmarks/bench_planner.py [--repeat 5] [--quick]
+"""
+import os
+import sys
+import time
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+
+from hst.planner import TrajectoryPlanner
+
+WAYPOINTS = (10, 100, 1000, 10000)
+
+
+def run(repeat:int=5, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param repeat: Number of plannings per path (the fastest is reported), defaults to 5
+    :type repeat: int, optional
+    :param quick: Plan shorter paths only, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    waypoints_counts = WAYPOINTS[:-1] if quick else WAYPOINTS
+    planner = TrajectoryPlanner(v_max=(3200, 3200, 1600), a_max=(6400, 6400, 3200), j_max=(64000, 64000, 32000))
+    generator = np.random.default_rng(0)
+    results = {}
+    for num_waypoints in waypoints_counts:
+        waypoints = np.cumsum(generator.integers(-3200, 3200, size=(num_waypoints, 3)), axis=0)
+        plan_seconds = []
+        for _ in range(repeat):
+            time_start = time.perf_counter()
+            trajectory = planner.plan(waypoints)
+            plan_seconds.append(time.perf_counter() - time_start)
+        time_start = time.perf_counter()
+        trajectory.to_segments()
+        segments_seconds = time.perf_counter() - time_start
+        results[f'planner_{num_waypoints}_waypoints'] = {
+            'segments': len(trajectory),
+            'plan_ms': min(plan_seconds)*1e3,
+            'plan_us_per_segment': min(plan_seconds)/len(trajectory)*1e6,
+            'to_segments_ms': segments_seconds*1e3,
+        }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    for name, result in run(repeat=args.repeat, quick=args.quick).items():
+        print(f"{name:<28s} {result['segments']:8d} segments  plan {result['plan_ms']:8.2f} ms "
+              f"({result['plan_us_per_segment']:5.2f} us/segment)  to_segments {result['to_segments_ms']:8.2f} ms")
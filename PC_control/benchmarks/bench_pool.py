@@ -0,0 +1,79 @@
+""" Several turrets served by one HST each versus one TurretPool.
+
+    Every turret is a simulated firmware behind a pseudo-terminal
+    (hst.simulator.VirtualSerialPort, POSIX only), so the TurretPool waits
+    on real file descriptors in its selector. The number of threads of the
+    host stack, the CPU time consumed by the process while the links are
+    idle and the rate of broadcasts (one command to every turret, all
+    replies awaited) are reported for both setups.
+
+    Usage:
+        python benchmarks/bench_pool.py [--devices 16] [--iterations 200] [--idle 1.0] [--quick]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('HST_LOGGER_PROFILE', 'production')
+
+from hst.interface import HST, TurretPool
+from hst.simulator import VirtualSerialPort
+
+
+def _measure(turrets:dict, threads_before:int, iterations:int, idle:float) -> dict:
+    """ Threads, idle CPU usage and broadcast rate of the turrets. """
+    threads = threading.active_count() - threads_before
+    cpu_start = time.process_time()
+    time.sleep(idle)
+    idle_cpu_percent = 100*(time.process_time() - cpu_start)/idle
+    time_start = time.perf_counter()
+    for _ in range(iterations):
+        futures = [turret.cmd_get_delta_steps('x', pipelined=True) for turret in turrets.values()]
+        assert all(future.result()['received'] for future in futures)
+    broadcasts_per_s = iterations/(time.perf_counter() - time_start)
+    return {'threads': threads, 'idle_cpu_percent': idle_cpu_percent, 'broadcasts_per_s': broadcasts_per_s}
+
+
+def run(devices:int=16, iterations:int=200, idle:float=1.0, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param devices: Number of simulated turrets, defaults to 16
+    :type devices: int, optional
+    :param iterations: Number of broadcasts, defaults to 200
+    :type iterations: int, optional
+    :param idle: Duration of the idle measurement in seconds, defaults to 1.0
+    :type idle: float, optional
+    :param quick: Use fewer devices and broadcasts, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        devices, iterations, idle = 4, 20, 0.2
+    ports = [VirtualSerialPort(baudrate=115200, pacing=False) for _ in range(devices)]
+    results = {}
+    threads_before = threading.active_count()
+    pool = TurretPool([port.name for port in ports], 115200)
+    results['turret_pool'] = _measure({name: pool[name] for name in pool}, threads_before, iterations, idle)
+    pool.close()
+    threads_before = threading.active_count()
+    turrets = {port.name: HST(port.name, 115200) for port in ports}
+    results['hst_per_device'] = _measure(turrets, threads_before, iterations, idle)
+    for turret in turrets.values():
+        turret.close()
+    for port in ports:
+        port.close()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', type=int, default=16)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--idle', type=float, default=1.0)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    for name, result in run(devices=args.devices, iterations=args.iterations, idle=args.idle, quick=args.quick).items():
+        print(f"{name:<16s} threads {result['threads']:4d}  idle CPU {result['idle_cpu_percent']:5.1f} %  {result['broadcasts_per_s']:8,.0f} broadcasts/s")
@@ -0,0 +1,101 @@
+""" CPU usage of the receiver thread.
+
+    The Datalink is opened on the pyserial 'loop://' stand-in. The CPU time 
+    consumed by the receiver thread is measured while the link is idle and 
+    while replies are injected at a fixed rate (1 kHz by default). The 
+    thread CPU time is read from /proc (Linux), elsewhere the CPU time of 
+    the whole process is reported.
+
+    Usage:
+        python benchmarks/bench_receiver_cpu.py [--duration 3] [--rate 1000] [--quick]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hst.datalink import Datalink
+from hst.packet import encode_packet
+from hst.packet.pkt_defs import *
+
+
+def thread_cpu_seconds(native_id:int) -> float:
+    """ CPU time (user + system) consumed by a thread.
+
+    :param native_id: Native id of the thread (threading.Thread.native_id).
+    :type native_id: int
+    :return: CPU time in seconds.
+    :rtype: float
+    """
+    try:
+        with open(f"/proc/self/task/{native_id}/stat") as stat_file:
+            fields = stat_file.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError):
+        return time.process_time()
+
+
+def measure(datalink:Datalink, duration:float, rate:float) -> dict:
+    """ Measure the receiver CPU usage while replies arrive at the rate.
+
+    :param datalink: Opened datalink.
+    :type datalink: Datalink
+    :param duration: Duration of the measurement in seconds.
+    :type duration: float
+    :param rate: Replies per second, 0 for idle link.
+    :type rate: float
+    :return: CPU usage in percent of one core and the number of received replies.
+    :rtype: dict
+    """
+    received = []
+    datalink.add_listener(lambda payload, receive_time: received.append(receive_time))
+    reply = encode_packet(CMD_GET_IMU_MEASUREMENT + bytes(18 + 4))
+    native_id = datalink._thread_receiver._thread.native_id
+    cpu_start = thread_cpu_seconds(native_id)
+    time_start = time.perf_counter()
+    next_send = time_start
+    while time.perf_counter() - time_start < duration:
+        if rate > 0:
+            # inject the reply directly into the serial stand-in
+            datalink._serial.write(reply)
+            next_send += 1/rate
+            time.sleep(max(0.0, next_send - time.perf_counter()))
+        else:
+            time.sleep(duration)
+    elapsed = time.perf_counter() - time_start
+    cpu = thread_cpu_seconds(native_id) - cpu_start
+    return {'cpu_percent': 100*cpu/elapsed, 'replies': len(received)}
+
+
+def run(duration:float=3.0, rate:float=1000, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param duration: Duration of each measurement in seconds, defaults to 3.0
+    :type duration: float, optional
+    :param rate: Replies per second of the loaded measurement, defaults to 1000
+    :type rate: float, optional
+    :param quick: Shorten the measurements, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        duration = 0.5
+    results = {}
+    for name, measured_rate in [('receiver_idle', 0), (f'receiver_{int(rate)}_Hz', rate)]:
+        datalink = Datalink('loop://', 115200)
+        results[name] = measure(datalink, duration, measured_rate)
+        datalink.close()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--rate', type=float, default=1000)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    for name, result in run(duration=args.duration, rate=args.rate, quick=args.quick).items():
+        print(f"{name:<28s} {result['cpu_percent']:6.1f} % CPU ({result['replies']} replies)")
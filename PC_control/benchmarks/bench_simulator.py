@@ -0,0 +1,111 @@
+""" End-to-end benchmark of HST against the simulated turret (hst.simulator).
+
+    Every command travels the whole host stack (codec, pipeline, datalink,
+    receiver thread, decoder) and the simulated firmware, which paces the
+    bytes at the baudrate. The results are compared with the line limit,
+    i.e. the time needed to transmit the request and the reply.
+
+    Usage:
+        python benchmarks/bench_simulator.py [--iterations 500] [--baudrate 115200] [--quick]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('HST_LOGGER_PROFILE', 'production')
+
+from hst.interface import HST, TrajectoryUploader, TelemetryStream
+from hst.packet import encode_packet, encode_request
+from hst.packet.pkt_defs import *
+from bench_datalink_latency import percentile
+
+
+def run(iterations:int=500, baudrate:int=115200, quick:bool=False) -> dict:
+    """ Run the benchmark.
+
+    :param iterations: Number of commands per case, defaults to 500
+    :type iterations: int, optional
+    :param baudrate: Simulated baudrate, defaults to 115200
+    :type baudrate: int, optional
+    :param quick: Run fewer commands, defaults to False
+    :type quick: bool, optional
+    :return: Results keyed by benchmark name.
+    :rtype: dict
+    """
+    if quick:
+        iterations = 50
+    # request and reply of cmd_get_delta_steps() on the line, 10 bits per byte
+    request_bytes = len(encode_packet(encode_request(CMD_GET_DELTA_STEPS, PFM_X)))
+    reply_bytes = len(encode_packet(bytearray(1 + 4 + 4)))
+    results = {}
+    for name, url in (('paced', 'hstsim://'), ('unpaced', 'hstsim://?pacing=0')):
+        turret = HST(url, baudrate)
+        latencies = []
+        for _ in range(iterations):
+            time_start = time.perf_counter()
+            turret.cmd_get_delta_steps('x')
+            latencies.append(time.perf_counter() - time_start)
+        time_start = time.perf_counter()
+        futures = [turret.cmd_get_delta_steps('x', pipelined=True) for _ in range(iterations)]
+        for future in futures:
+            future.result()
+        pipelined_seconds = time.perf_counter() - time_start
+        # coordinated move of 3 axes: one command per axis vs. one multi-record command
+        time_start = time.perf_counter()
+        for _ in range(iterations//10):
+            for which_pfm in 'xyz':
+                turret.cmd_set_target_delta(which_pfm, 6400, 0)
+        per_axis_move_us = (time.perf_counter() - time_start)/(iterations//10)*1e6
+        time_start = time.perf_counter()
+        for _ in range(iterations//10):
+            turret.cmd_set_targets_delta({'x':(6400, 0), 'y':(6400, 0), 'z':(6400, 0)})
+        batch_move_us = (time.perf_counter() - time_start)/(iterations//10)*1e6
+        # streaming of 1-step segments into the motion queue
+        turret.cmd_set_delta_steps('x', 0)
+        uploader = TrajectoryUploader(turret)
+        time_start = time.perf_counter()
+        upload_stats = uploader.upload({'x':(0, step + 1)} for step in range(iterations))
+        upload_seconds = time.perf_counter() - time_start
+        # IMU samples: request/response polling vs. frames pushed every 1 ms
+        time_start = time.perf_counter()
+        for _ in range(iterations//10):
+            turret.cmd_get_imu_measurement()
+        polled_imu_per_s = (iterations//10)/(time.perf_counter() - time_start)
+        stream = TelemetryStream(turret)
+        stream.start(period_ms=1)
+        stream.wait(1, timeout_seconds=2.0)
+        count_start, time_start = stream.count, time.perf_counter()
+        time.sleep(0.2 if quick else 1.0)
+        streamed_imu_per_s = (stream.count - count_start)/(time.perf_counter() - time_start)
+        stream.stop()
+        turret.close()
+        results[f'simulator_{name}'] = {
+            'p50_us': percentile(latencies, 0.50)*1e6,
+            'p99_us': percentile(latencies, 0.99)*1e6,
+            'mean_us': statistics.fmean(latencies)*1e6,
+            'pipelined_cmd_per_s': iterations/pipelined_seconds,
+            'move_3_axes_per_axis_us': per_axis_move_us,
+            'move_3_axes_batch_us': batch_move_us,
+            'queue_segments_per_s': upload_stats['sent']/upload_seconds,
+            'queue_underruns': upload_stats['underruns'],
+            'imu_polled_per_s': polled_imu_per_s,
+            'imu_streamed_per_s': streamed_imu_per_s,
+            'line_round_trip_us': (request_bytes + reply_bytes)*10/baudrate*1e6 if name == 'paced' else 0.0,
+        }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--baudrate', type=int, default=115200)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+    for name, result in run(iterations=args.iterations, baudrate=args.baudrate, quick=args.quick).items():
+        print(f"{name:<20s} p50 {result['p50_us']:8.1f} us  p99 {result['p99_us']:8.1f} us  "
+              f"pipelined {result['pipelined_cmd_per_s']:8.0f} cmd/s  line round trip {result['line_round_trip_us']:7.1f} us  "
+              f"3-axis move {result['move_3_axes_per_axis_us']:7.1f} us (per axis) {result['move_3_axes_batch_us']:7.1f} us (batch)  "
+              f"queue {result['queue_segments_per_s']:6.0f} segments/s ({result['queue_underruns']} underruns)  "
+              f"IMU {result['imu_polled_per_s']:6.0f}/s (polled) {result['imu_streamed_per_s']:6.0f}/s (streamed)")
@@ -0,0 +1,238 @@
+""" Runs the benchmarks (bench_*.py), writes machine-readable results and
+    compares them with a stored baseline.
+
+    Every benchmark module runs in a fresh interpreter, so threads and
+    ports left behind by one benchmark do not disturb the next one. The
+    transports are local stand-ins for the firmware: 'loop://', the
+    simulated turret 'hstsim://' and pseudo-terminals (VirtualSerialPort,
+    POSIX only, benchmarks that cannot run are reported as errors).
+
+    The results of run() of every module are stored as JSON together with
+    the machine, the interpreter and the git commit:
+
+        {"meta": {...}, "results": {"bench_codec": {"codec_set_target_freq": {"encode_ns": 512.3, ...}}},
+         "errors": {"bench_pool": "..."}}
+
+    A metric is compared with the baseline by the suffix of its name,
+    lower is better for durations and footprints (_ns, _us, _ms, _s,
+    _percent, _MB), higher is better for rates (_per_s), other metrics
+    (counts, settings) are reported but not compared. With --repeat the
+    best value of the runs is kept, which filters out the noise of the
+    machine better than the mean.
+
+    Typical use, the baseline is specific to the machine it was recorded on:
+
+        python benchmarks/run_benchmarks.py --quick --output baseline.json
+        ... change hst.packet or hst.datalink ...
+        python benchmarks/run_benchmarks.py --quick --baseline baseline.json
+
+    The exit code is 1 if a metric regressed by more than the tolerance.
+
+    Usage:
+        python benchmarks/run_benchmarks.py [--quick] [--repeat 1] [--only codec,packet_decoder]
+                                            [--output results.json] [--baseline baseline.json] [--tolerance 0.15]
+"""
+import os
+import sys
+import json
+import time
+import glob
+import platform
+import argparse
+import subprocess
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+# marks the line of the output holding the results of a benchmark
+_RESULT_MARKER = '@@results@@ '
+_RUN = """
+import json, sys
+import {module} as benchmark
+print({marker!r} + json.dumps(benchmark.run(quick={quick})))
+"""
+LOWER_IS_BETTER = ('_ns', '_us', '_ms', '_s', '_seconds', '_percent', '_mb')
+HIGHER_IS_BETTER = ('_per_s',)
+
+
+def benchmark_modules() -> list[str]:
+    """ Names of the benchmark modules.
+
+    :return: Module names (bench_*), sorted.
+    :rtype: list[str]
+    """
+    return sorted(os.path.splitext(os.path.basename(path))[0] for path in glob.glob(os.path.join(BENCHMARKS, 'bench_*.py')))
+
+
+def run_module(module:str, quick:bool=False, timeout_seconds:float=1800) -> dict:
+    """ Runs a benchmark module in a fresh interpreter.
+
+    :param module: Name of the module, e.g. 'bench_codec'.
+    :type module: str
+    :param quick: Run the quick variant, defaults to False
+    :type quick: bool, optional
+    :param timeout_seconds: Longest time the benchmark may run, defaults to 1800
+    :type timeout_seconds: float, optional
+    :raises RuntimeError: If the benchmark fails or produces no results.
+    :return: The results of run() of the module.
+    :rtype: dict
+    """
+    environment = dict(os.environ)
+    environment.setdefault('HST_LOGGER_PROFILE', 'production')
+    try:
+        completed = subprocess.run([sys.executable, '-c', _RUN.format(module=module, marker=_RESULT_MARKER, quick=quick)],
+                                   cwd=BENCHMARKS, env=environment, capture_output=True, text=True, timeout=timeout_seconds)
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"timeout after {timeout_seconds} s")
+    for line in completed.stdout.splitlines():
+        if line.startswith(_RESULT_MARKER):
+            return json.loads(line[len(_RESULT_MARKER):])
+    error = completed.stderr.strip().splitlines()
+    raise RuntimeError(error[-1] if error else f"exit code {completed.returncode}, no results")
+
+
+def direction(metric:str) -> int:
+    """ Direction of improvement of a metric, derived from the suffix of its name.
+
+    :param metric: Name of the metric, e.g. 'decode_ns'.
+    :type metric: str
+    :return: -1 if lower is better, +1 if higher is better, 0 if the metric is not compared.
+    :rtype: int
+    """
+    metric = metric.lower()
+    if metric.endswith(HIGHER_IS_BETTER):
+        return 1
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def flatten(results:dict, prefix:str='') -> dict:
+    """ Numeric leaves of nested results keyed by their path, e.g. 'bench_codec/codec_set_target_freq/encode_ns'.
+
+    :param results: Nested results.
+    :type results: dict
+    :param prefix: Path of the results, defaults to ''
+    :type prefix: str, optional
+    :return: Values keyed by path.
+    :rtype: dict
+    """
+    values = {}
+    for key, value in results.items():
+        path = f'{prefix}/{key}' if prefix else str(key)
+        if isinstance(value, dict):
+            values.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+
+def _best(runs:list[dict]) -> dict:
+    """ Merges repeated results of a module, keeps the best value of every compared metric. """
+    merged = runs[-1]
+    def merge(target:dict, others:list[dict]):
+        for key, value in target.items():
+            if isinstance(value, dict):
+                merge(value, [other.get(key, {}) for other in others])
+            elif direction(str(key)) and isinstance(value, (int, float)) and not isinstance(value, bool):
+                candidates = [value] + [other[key] for other in others if isinstance(other.get(key), (int, float))]
+                target[key] = max(candidates) if direction(str(key)) > 0 else min(candidates)
+    merge(merged, runs[:-1])
+    return merged
+
+
+def _meta() -> dict:
+    """ Machine, interpreter and git commit of the results. """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARKS, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run(modules:list[str]=None, quick:bool=False, repeat:int=1) -> dict:
+    """ Run the benchmarks.
+
+    :param modules: Names of the benchmark modules, defaults to all bench_*.py
+    :type modules: list[str], optional
+    :param quick: Run the quick variants, defaults to False
+    :type quick: bool, optional
+    :param repeat: Number of runs of every module, the best value is kept, defaults to 1
+    :type repeat: int, optional
+    :return: {'meta': {...}, 'results': {module: results}, 'errors': {module: message}}
+    :rtype: dict
+    """
+    modules = benchmark_modules() if modules is None else modules
+    report = {'meta': dict(_meta(), quick=quick, repeat=repeat), 'results': {}, 'errors': {}}
+    for module in modules:
+        time_start = time.perf_counter()
+        try:
+            report['results'][module] = _best([run_module(module, quick=quick) for _ in range(repeat)])
+            status = 'ok'
+        except RuntimeError as error:
+            report['errors'][module] = str(error)
+            status = f'ERROR {error}'
+        print(f"{module:<28s} {time.perf_counter() - time_start:6.1f} s  {status}", file=sys.stderr)
+    return report
+
+
+def compare(results:dict, baseline:dict, tolerance:float=0.15) -> list[dict]:
+    """ Compares the results with a baseline.
+
+    :param results: Report of run().
+    :type results: dict
+    :param baseline: Report of run() stored before.
+    :type baseline: dict
+    :param tolerance: Relative change not considered a regression, defaults to 0.15
+    :type tolerance: float, optional
+    :return: Comparisons of the metrics present in both, {'metric', 'baseline', 'value', 'change', 'status'},
+        change is relative (> 0 better), status 'regression', 'improvement' or 'ok'.
+    :rtype: list[dict]
+    """
+    current, previous = flatten(results['results']), flatten(baseline['results'])
+    comparisons = []
+    for metric, value in current.items():
+        sign = direction(metric.rsplit('/', 1)[-1])
+        if sign == 0 or metric not in previous or previous[metric] == 0:
+            continue
+        change = sign*(value - previous[metric])/abs(previous[metric])
+        status = 'regression' if change < -tolerance else 'improvement' if change > tolerance else 'ok'
+        comparisons.append({'metric': metric, 'baseline': previous[metric], 'value': value, 'change': change, 'status': status})
+    return comparisons
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--only', type=str, default=None, help="comma separated benchmarks, e.g. 'codec,packet_decoder'")
+    parser.add_argument('--output', type=str, default=None, help="path of the JSON results, printed if not given")
+    parser.add_argument('--baseline', type=str, default=None, help="path of the JSON results to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+    modules = None if args.only is None else [name if name.startswith('bench_') else 'bench_' + name for name in args.only.split(',')]
+    report = run(modules=modules, quick=args.quick, repeat=args.repeat)
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        comparisons = compare(report, baseline, tolerance=args.tolerance)
+        for comparison in comparisons:
+            if comparison['status'] != 'ok':
+                print(f"{comparison['status']:<12s} {comparison['metric']:<72s} {comparison['baseline']:14.2f} -> "
+                      f"{comparison['value']:14.2f}  ({100*comparison['change']:+.1f} %)")
+        regressions = sum(comparison['status'] == 'regression' for comparison in comparisons)
+        print(f"{len(comparisons)} metrics compared with {args.baseline} (commit {baseline['meta'].get('commit')}), "
+              f"{regressions} regressions, tolerance {100*args.tolerance:.0f} %")
+        sys.exit(1 if regressions else 0)
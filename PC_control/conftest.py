@@ -0,0 +1,11 @@
+import os
+""" pytest configuration of PC_control.
+
+    The directory of this file is put on sys.path by pytest, so the tests
+    import the hst package the same way the benchmarks do. The tests log
+    only timeouts and errors unless HST_LOGGER_PROFILE is set.
+
+    Usage (from PC_control):
+        python -m pytest -q tests
+"""
+os.environ.setdefault('HST_LOGGER_PROFILE', 'production')
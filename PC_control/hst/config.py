@@ -1,2 +1,38 @@
+import os
 import logging
-LOGGER_LEVEL = logging.DEBUG
\ No newline at end of file
+# logging profiles (level of the hst loggers)
+#   debug       - every packet is logged
+#   development - every command is logged
+#   production  - only timeouts and errors are logged
+LOGGER_PROFILES = {
+    'debug':        logging.DEBUG,
+    'development':  logging.INFO,
+    'production':   logging.WARNING,
+}
+# the profile can be selected by the environment variable HST_LOGGER_PROFILE
+LOGGER_PROFILE = os.environ.get('HST_LOGGER_PROFILE', 'debug')
+if LOGGER_PROFILE not in LOGGER_PROFILES.keys():
+    raise ValueError(f"HST_LOGGER_PROFILE={LOGGER_PROFILE} is not valid, valid values {list(LOGGER_PROFILES.keys())}.")
+LOGGER_LEVEL = LOGGER_PROFILES[LOGGER_PROFILE]
+
+
+def set_logger_profile(profile:str):
+    """
+    Sets the level of all hst loggers according to a logging profile.
+
+    Messages below the level are discarded before they are formatted, 
+    hence a disabled level costs a single (cached) level check.
+
+    :param profile: The logging profile, valid values ['debug', 'development', 'production'].
+    :type profile: str
+    :raises ValueError: If the profile is not valid.
+    """
+    if profile not in LOGGER_PROFILES.keys():
+        raise ValueError(f"profile={profile} is not valid, valid values {list(LOGGER_PROFILES.keys())}.")
+    level = LOGGER_PROFILES[profile]
+    logging.getLogger('hst').setLevel(level)
+    for name in list(logging.root.manager.loggerDict.keys()):
+        if name.startswith('hst.'):
+            logger = logging.getLogger(name)
+            if logger.level != logging.NOTSET:
+                logger.setLevel(level)
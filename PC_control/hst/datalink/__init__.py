@@ -1,2 +1,11 @@
 from .datalink import Datalink
+from .multiplexer import Multiplexer
+from .metrics import Metrics
 
+
+def __getattr__(name):
+    # asyncio is imported only by applications using AsyncDatalink
+    if name == 'AsyncDatalink':
+        from .async_datalink import AsyncDatalink
+        return AsyncDatalink
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
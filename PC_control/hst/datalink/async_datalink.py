@@ -0,0 +1,227 @@
+import asyncio
+import collections
+import time
+import logging
+from ..packet.packet import encode_packet, PacketDecoder
+
+
+class AsyncDatalink(asyncio.Protocol):
+    """
+    AsyncDatalink is the asyncio counterpart of Datalink. Instead of a
+    receiver thread, the event loop calls data_received() whenever the
+    serial transport has data, and the payloads decoded by PacketDecoder
+    complete the awaiting requests. For packet definition and terminology
+    refer to packet.packet.
+
+    Requests are matched to replies by the command byte, in order of
+    submission (see interface.pipeline.Pipeline).
+
+    Use open_async_datalink() to connect to a serial port.
+    """
+
+    def __init__(self, max_in_flight:int=8, crc:bool=False, framing:str='start_end'):
+        """
+        Initializes the AsyncDatalink protocol.
+
+        :param max_in_flight: Maximal number of requests awaiting reply, defaults to 8.
+        :type max_in_flight: int, optional
+        :param crc: Send and receive packets with CRC (see packet.packet), defaults to False.
+        :type crc: bool, optional
+        :param framing: Framing of the packets, 'start_end' or 'cobs' (see packet.packet), defaults to 'start_end'.
+        :type framing: str, optional
+        :raises ValueError: If the framing is not valid.
+        """
+        self._logger = logging.getLogger(__name__)
+        self._transport = None
+        self._crc = crc
+        self._framing = framing
+        self._decoder = PacketDecoder(crc=crc, framing=framing)
+        self._in_flight = collections.defaultdict(collections.deque)
+        self._window = asyncio.Semaphore(max_in_flight)
+        self._listeners = []
+
+
+    def connection_made(self, transport):
+        """
+        Called by the event loop when the serial port is opened.
+
+        :param transport: The serial transport.
+        :type transport: asyncio.Transport
+        """
+        self._logger.info("AsyncDatalink.connection_made()")
+        self._transport = transport
+
+
+    def connection_lost(self, exc):
+        """
+        Called by the event loop when the serial port is closed,
+        resolves all in-flight requests as not received.
+
+        :param exc: The exception causing the loss of connection, None on regular close.
+        :type exc: Exception
+        """
+        self._logger.info("AsyncDatalink.connection_lost(exc=%s)", exc)
+        self._transport = None
+        for requests in self._in_flight.values():
+            for future in requests:
+                if not future.done():
+                    future.set_result(None)
+        self._in_flight.clear()
+
+
+    def data_received(self, data:bytes):
+        """
+        Called by the event loop with received data, completes the
+        oldest in-flight request with the command of each decoded payload.
+
+        :param data: Received data.
+        :type data: bytes
+        """
+        receive_time = time.time()
+        for payload in self._decoder.feed(data):
+            self._logger.debug("AsyncDatalink.data_received() payload: '%s'", payload)
+            for callback in self._listeners:
+                try:
+                    callback(payload, receive_time)
+                except Exception:
+                    # a failing listener must not break the transport
+                    self._logger.exception("AsyncDatalink.data_received() -> listener %s failed, payload='%s'", callback, payload)
+            requests = self._in_flight.get(payload[0])
+            if not requests:
+                self._logger.debug("AsyncDatalink.data_received() -> no request in flight for payload='%s'", payload)
+                continue
+            future = requests.popleft()
+            if not future.done():
+                future.set_result(payload)
+
+
+    def add_listener(self, callback):
+        """
+        Registers a callback executed for every received payload.
+
+        :param callback: Function called as callback(payload, receive_time).
+        :type callback: callable
+        """
+        self._listeners.append(callback)
+
+
+    def check_connection(self) -> bool:
+        """
+        Checks the status of the serial connection.
+
+        :return: True if the serial connection is open, False otherwise.
+        :rtype: bool
+        """
+        return self._transport is not None and not self._transport.is_closing()
+
+
+    def send(self, message):
+        """
+        Sends a message over the serial connection (does not block).
+
+        :param message: The message to be sent.
+        :type message: bytearray
+        """
+        packet = encode_packet(message, self._crc, self._framing)
+        self._logger.info("AsyncDatalink.send(message: '%s') -> packet: '%s'", message, packet)
+        self._transport.write(packet)
+
+
+    async def submit(self, message:bytearray, timeout_seconds:float=2.0) -> asyncio.Future:
+        """
+        Sends a message and registers it as a request awaiting reply.
+
+        Waits only while the window of in-flight requests is full.
+
+        :param message: The message to be sent, the first byte is the command.
+        :type message: bytearray
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :return: Future resolving to the reply payload, or to None on timeout.
+        :rtype: asyncio.Future
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        try:
+            await asyncio.wait_for(self._window.acquire(), timeout=timeout_seconds)
+        except asyncio.TimeoutError:
+            self._logger.warning("AsyncDatalink.submit() -> window full, TIMEOUT")
+            future.set_result(None)
+            return future
+        future.add_done_callback(lambda _: self._window.release())
+        self._in_flight[message[0]].append(future)
+        loop.call_later(timeout_seconds, self._expire_request, message[0], future)
+        self.send(message)
+        return future
+
+
+    async def receive(self, message:bytearray, timeout_seconds:float=2.0) -> tuple:
+        """
+        Sends a message and awaits its reply.
+
+        :param message: The message to be sent, the first byte is the command.
+        :type message: bytearray
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :return: A tuple containing a boolean indicating whether a message was received and the received message.
+        :rtype: tuple
+        """
+        payload = await (await self.submit(message, timeout_seconds=timeout_seconds))
+        if payload is None:
+            self._logger.info("AsyncDatalink.receive(...) -> False, None")
+            return False, None
+        self._logger.info("AsyncDatalink.receive(...) -> True, '%s'", payload)
+        return True, payload
+
+
+    def close(self):
+        """
+        Closes the serial connection.
+        """
+        if self._transport is not None:
+            self._transport.close()
+
+
+    def _expire_request(self, command:int, future:asyncio.Future):
+        """
+        Resolves a request exceeding its timeout.
+
+        :param command: The command byte of the request.
+        :type command: int
+        :param future: The future of the request.
+        :type future: asyncio.Future
+        """
+        if future.done():
+            return
+        self._logger.warning("AsyncDatalink._expire_request() -> TIMEOUT")
+        self._in_flight[command].remove(future)
+        future.set_result(None)
+
+
+async def open_async_datalink(port:str, baudrate:int, max_in_flight:int=8, crc:bool=False, framing:str='start_end') -> AsyncDatalink:
+    """
+    Opens a serial port on the running event loop.
+
+    Requires the optional pyserial-asyncio package.
+
+    :param port: The port to be used for the serial connection.
+    :type port: str
+    :param baudrate: The baudrate to be used for the serial connection.
+    :type baudrate: int
+    :param max_in_flight: Maximal number of requests awaiting reply, defaults to 8.
+    :type max_in_flight: int, optional
+    :param crc: Send and receive packets with CRC, defaults to False.
+    :type crc: bool, optional
+    :param framing: Framing of the packets, 'start_end' or 'cobs', defaults to 'start_end'.
+    :type framing: str, optional
+    :raises ImportError: If pyserial-asyncio is not installed.
+    :return: The connected AsyncDatalink.
+    :rtype: AsyncDatalink
+    """
+    try:
+        import serial_asyncio
+    except ImportError as error:
+        raise ImportError("AsyncDatalink requires pyserial-asyncio (pip install pyserial-asyncio).") from error
+    loop = asyncio.get_running_loop()
+    _, datalink = await serial_asyncio.create_serial_connection(loop, lambda: AsyncDatalink(max_in_flight=max_in_flight, crc=crc, framing=framing), port, baudrate=baudrate)
+    return datalink
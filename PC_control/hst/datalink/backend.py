@@ -0,0 +1,159 @@
+import threading
+from concurrent.futures import Executor
+""" Backends executing the Receiver.run() loop.
+
+    A backend only has to implement start(target) and join(timeout_seconds).
+
+        ThreadBackend   - plain threading.Thread (default, no dependencies)
+        ExecutorBackend - task of a concurrent.futures.Executor
+        QtBackend       - PyQt5 QThread (imported only when used)
+
+Public functions:
+    get_backend()
+"""
+
+
+class ThreadBackend():
+    """
+    Runs the receiver loop in a daemon threading.Thread.
+    """
+    def __init__(self, name:str='hst-receiver'):
+        """
+        Initializes the ThreadBackend.
+
+        :param name: Name of the thread, defaults to 'hst-receiver'.
+        :type name: str, optional
+        """
+        self._name = name
+        self._thread = None
+
+
+    def start(self, target):
+        """
+        Starts the target in a new thread.
+
+        :param target: Function to be executed.
+        :type target: callable
+        """
+        self._thread = threading.Thread(target=target, name=self._name, daemon=True)
+        self._thread.start()
+
+
+    def join(self, timeout_seconds:float=None):
+        """
+        Waits for the target to return.
+
+        :param timeout_seconds: The timeout period in seconds, defaults to None (wait forever).
+        :type timeout_seconds: float, optional
+        """
+        if self._thread is not None:
+            self._thread.join(timeout_seconds)
+
+
+class ExecutorBackend():
+    """
+    Runs the receiver loop as a task of a concurrent.futures.Executor.
+    The task occupies one worker of the executor until the Datalink is deleted.
+    """
+    def __init__(self, executor:Executor):
+        """
+        Initializes the ExecutorBackend.
+
+        :param executor: The executor running the receiver loop.
+        :type executor: concurrent.futures.Executor
+        """
+        self._executor = executor
+        self._future = None
+
+
+    def start(self, target):
+        """
+        Submits the target to the executor.
+
+        :param target: Function to be executed.
+        :type target: callable
+        """
+        self._future = self._executor.submit(target)
+
+
+    def join(self, timeout_seconds:float=None):
+        """
+        Waits for the target to return.
+
+        :param timeout_seconds: The timeout period in seconds, defaults to None (wait forever).
+        :type timeout_seconds: float, optional
+        """
+        if self._future is not None:
+            self._future.result(timeout_seconds)
+
+
+class QtBackend():
+    """
+    Runs the receiver loop in a PyQt5 QThread, for applications already
+    running a Qt event loop (e.g. hst_app_v3.py).
+    """
+    def __init__(self):
+        """
+        Initializes the QtBackend, imports PyQt5.
+        """
+        from PyQt5.QtCore import QThread
+
+        class _TargetThread(QThread):
+            """ QThread executing a target function in its run() method. """
+            def __init__(self, target):
+                super().__init__()
+                self._target = target
+
+            def run(self):
+                self._target()
+
+        self._thread_class = _TargetThread
+        self._thread = None
+
+
+    def start(self, target):
+        """
+        Starts the target in a new QThread.
+
+        :param target: Function to be executed.
+        :type target: callable
+        """
+        self._thread = self._thread_class(target)
+        self._thread.start()
+
+
+    def join(self, timeout_seconds:float=None):
+        """
+        Waits for the target to return.
+
+        :param timeout_seconds: The timeout period in seconds, defaults to None (wait forever).
+        :type timeout_seconds: float, optional
+        """
+        if self._thread is None:
+            return
+        if timeout_seconds is None:
+            self._thread.wait()
+        else:
+            self._thread.wait(int(timeout_seconds*1000))
+
+
+def get_backend(backend='thread'):
+    """
+    Resolves the backend specification into a backend object.
+
+    :param backend: 'thread', 'qt', a concurrent.futures.Executor or an object
+        implementing start(target) and join(timeout_seconds), defaults to 'thread'.
+    :type backend: str or object, optional
+    :raises ValueError: If the backend is not valid.
+    :return: The backend object.
+    :rtype: object
+    """
+    if backend == 'thread':
+        return ThreadBackend()
+    if backend == 'qt':
+        return QtBackend()
+    if isinstance(backend, Executor):
+        return ExecutorBackend(backend)
+    if hasattr(backend, 'start') and hasattr(backend, 'join'):
+        return backend
+    raise ValueError(f"backend={backend} is not valid, valid values ['thread', 'qt', Executor, object with start() and join()].")
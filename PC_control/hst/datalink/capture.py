@@ -0,0 +1,298 @@
+import os
+import mmap
+import array
+import struct
+import threading
+import logging
+import serial
+""" Binary capture of the packets passing a Datalink.
+
+    Datalink(..., capture='session.hstcap') appends every sent and received
+    payload to the file, the capture can be read back without loading it
+    into memory and replayed through the whole receiver stack:
+
+        with CaptureReader('session.hstcap') as reader:
+            for timestamp, direction, payload in reader:
+                ...
+            frames = decode_imu_frames(reader.payloads(RX, command=PKT_IMU_FRAME))
+
+        Datalink('hstreplay://session.hstcap?speed=0', 115200)
+
+    File layout (little-endian), append-only:
+
+        | MAGIC | VERSION |                                   header, 8 bytes
+        | TIME | DIRECTION | SIZE | PAYLOAD |                 record, 10 bytes + SIZE
+
+        TIME        - float64, time.time() of sending or receiving the packet
+        DIRECTION   - uint8, TX (host -> turret) or RX (turret -> host)
+        SIZE        - uint8, size of the payload (PAYLOAD_BYTE_SIZE of the packet)
+        PAYLOAD     - the payload (command followed by data), the packet framing is not stored
+
+    Importing the module registers the 'hstreplay://' URL handler
+    (protocol_hstreplay.py) with pyserial.
+
+Public classes:
+    CaptureWriter
+    CaptureReader
+"""
+
+TX = 0
+RX = 1
+
+_MAGIC = b'HSTCAP'
+_VERSION = 1
+_HEADER = struct.Struct('<6sH')
+_RECORD = struct.Struct('<dBB')
+
+# register the 'hstreplay://' URL handler (protocol_hstreplay.py) with pyserial
+if __package__ not in serial.protocol_handler_packages:
+    serial.protocol_handler_packages.append(__package__)
+
+
+class CaptureWriter():
+    """ Appends packets to a capture file.
+
+        write() is called from the sending threads and the receiver thread,
+        records are serialized by a lock. The file is unbuffered and every
+        record is a single write, i.e. the records are in the file as soon
+        as write() returns (a reader or a crash of the host sees complete
+        records). The cost is one system call per packet, a fraction of the
+        transmission time of the packet.
+
+        Public methods:
+
+            write()                     - append a record
+            close()                     - close the file
+
+        Public attributes:
+
+            path                        - path of the capture file
+            count                       - number of records written by this writer
+    """
+    def __init__(self, path:str):
+        """
+        Opens the capture file for appending, a new file starts with the header.
+
+        :param path: Path of the capture file.
+        :type path: str
+        :raises ValueError: If an existing file is not a capture.
+        """
+        self._logger = logging.getLogger(__name__)
+        self.path = os.fspath(path)
+        self._file = open(self.path, 'ab', buffering=0)
+        if self._file.tell() == 0:
+            self._file.write(_HEADER.pack(_MAGIC, _VERSION))
+        else:
+            with open(self.path, 'rb') as file:
+                _check_header(self.path, file.read(_HEADER.size))
+        self._lock = threading.Lock()
+        self.count = 0
+        self._logger.info("CaptureWriter.__init__(path=%s)", self.path)
+
+
+    def __del__(self):
+        self.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def write(self, direction:int, payload, timestamp:float):
+        """
+        Appends a record.
+
+        :param direction: TX or RX.
+        :type direction: int
+        :param payload: The payload (command followed by data).
+        :type payload: bytes or bytearray
+        :param timestamp: Time of sending or receiving the packet (time.time()).
+        :type timestamp: float
+        """
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(_RECORD.pack(timestamp, direction, len(payload)) + payload)
+            self.count += 1
+
+
+    def close(self):
+        """
+        Closes the file, later writes are ignored.
+        """
+        if not hasattr(self, '_lock'):
+            return
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+                self._logger.info("CaptureWriter.close() -> count=%d", self.count)
+
+
+class CaptureReader():
+    """ Reads a capture file through mmap.
+
+        Iteration decodes the records sequentially, indexing builds an
+        index of record offsets on the first use (a scan of the record
+        headers, the payloads are not touched). Records appended after
+        opening the reader are not visible.
+
+        Public methods:
+
+            close()                     - unmap and close the file
+            payloads()                  - payloads of selected records, back to back
+            times()                     - times of selected records
+
+        Public attributes:
+
+            path                        - path of the capture file
+    """
+    def __init__(self, path:str):
+        """
+        Maps the capture file.
+
+        :param path: Path of the capture file.
+        :type path: str
+        :raises ValueError: If the file is not a capture.
+        """
+        self.path = os.fspath(path)
+        self._file = open(self.path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        _check_header(self.path, self._file.read(_HEADER.size))
+        # mmap() of an empty region is not possible, a capture without records is mapped as empty bytes
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size > _HEADER.size else b''
+        self._offsets = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def close(self):
+        """
+        Unmaps and closes the file.
+        """
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+
+    def _scan(self):
+        """
+        Yields the offset, time, direction and size of every complete record.
+        """
+        data, offset = self._map, _HEADER.size
+        end = len(data) - _RECORD.size
+        while offset <= end:
+            timestamp, direction, size = _RECORD.unpack_from(data, offset)
+            if offset + _RECORD.size + size > len(data):
+                # the last record is truncated (e.g. the writer is still running)
+                return
+            yield offset, timestamp, direction, size
+            offset += _RECORD.size + size
+
+
+    def _index(self) -> array.array:
+        """ Offsets of the records, built on the first use. """
+        if self._offsets is None:
+            self._offsets = array.array('q', (offset for offset, *_ in self._scan()))
+        return self._offsets
+
+
+    def __len__(self) -> int:
+        return len(self._index())
+
+
+    def __getitem__(self, index:int) -> tuple:
+        """
+        Returns the record at index.
+
+        :param index: Index of the record, negative values count from the end.
+        :type index: int
+        :raises IndexError: If the index is out of range.
+        :return: Time, direction and payload of the record.
+        :rtype: tuple[float, int, bytes]
+        """
+        offset = self._index()[index]
+        timestamp, direction, size = _RECORD.unpack_from(self._map, offset)
+        start = offset + _RECORD.size
+        return timestamp, direction, self._map[start:start+size]
+
+
+    def __iter__(self):
+        """
+        Iterates over the records in order of writing.
+
+        :return: Iterator of (time, direction, payload) tuples.
+        :rtype: iterator
+        """
+        data, record_size = self._map, _RECORD.size
+        for offset, timestamp, direction, size in self._scan():
+            yield timestamp, direction, data[offset+record_size:offset+record_size+size]
+
+
+    def _select(self, direction:int, command:bytes, size:int):
+        """ Offsets and sizes of the records matching the direction, the command byte and the payload size. """
+        data, record_size = self._map, _RECORD.size
+        command_byte = None if command is None else command[0]
+        for offset, timestamp, record_direction, record_payload_size in self._scan():
+            if direction is not None and record_direction != direction:
+                continue
+            if size is not None and record_payload_size != size:
+                continue
+            if command_byte is not None and (record_payload_size == 0 or data[offset+record_size] != command_byte):
+                continue
+            yield offset, timestamp, record_payload_size
+
+
+    def payloads(self, direction:int=None, command:bytes=None, size:int=None) -> bytes:
+        """
+        Concatenates the payloads of the selected records, e.g. as input
+        of hst.packet.imu.decode_imu_frames().
+
+        :param direction: TX or RX, None selects both, defaults to None.
+        :type direction: int, optional
+        :param command: Command byte of the payloads (e.g. PKT_IMU_FRAME), None selects all, defaults to None.
+        :type command: bytes, optional
+        :param size: Size of the payloads (e.g. to skip NACK replies), None selects all, defaults to None.
+        :type size: int, optional
+        :return: The payloads, back to back.
+        :rtype: bytes
+        """
+        data, record_size = self._map, _RECORD.size
+        return b''.join(data[offset+record_size:offset+record_size+payload_size]
+                        for offset, _, payload_size in self._select(direction, command, size))
+
+
+    def times(self, direction:int=None, command:bytes=None, size:int=None) -> array.array:
+        """
+        Times of the selected records, in the order of payloads().
+
+        :param direction: TX or RX, None selects both, defaults to None.
+        :type direction: int, optional
+        :param command: Command byte of the payloads, None selects all, defaults to None.
+        :type command: bytes, optional
+        :param size: Size of the payloads, None selects all, defaults to None.
+        :type size: int, optional
+        :return: Times of the records (time.time()).
+        :rtype: array.array
+        """
+        return array.array('d', (timestamp for _, timestamp, _ in self._select(direction, command, size)))
+
+
+def _check_header(path:str, header:bytes):
+    """ Raises ValueError if the header is not a capture header of a supported version. """
+    if len(header) != _HEADER.size:
+        raise ValueError(f"path={path} is not valid, the file is not a capture.")
+    magic, version = _HEADER.unpack(header)
+    if magic != _MAGIC:
+        raise ValueError(f"path={path} is not valid, the file is not a capture.")
+    if version != _VERSION:
+        raise ValueError(f"version={version} is not valid, valid values [{_VERSION}].")
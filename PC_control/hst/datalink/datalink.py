@@ -1,9 +1,14 @@
 
-import serial
 import time
-from PyQt5.QtCore import QThread
+import functools
+import threading
+import serial
 from .receiver.receiver import Receiver
-from ..packet.packet import encode_packet
+from .backend import get_backend
+# registers the 'hstreplay://' URL handler
+from .capture import CaptureWriter, TX, RX
+from ..packet.packet import encode_packet, FRAMINGS
+from .metrics import Metrics
 import logging
 
 
@@ -13,58 +18,218 @@ class Datalink():
     and terminology refer to packet.packet.
     """     
     
-    def __init__(self, port, baudrate):
+    def __init__(self, port, baudrate, backend='thread', read_timeout_seconds:float=0.1, capture:str=None,
+                 queue_capacity:int=256, overflow:str='drop_oldest', crc:bool=False, framing:str='start_end'):
         """
         Initializes the Datalink object.
 
-        :param port: The port to be used for the serial connection.
+        :param port: The port to be used for the serial connection, 
+            any URL accepted by serial.serial_for_url() (e.g. 'loop://') or 
+            'hstsim://' (simulated turret, see hst.simulator) or 
+            'hstreplay://<path>' (replay of a capture, see datalink.capture) is valid.
         :type port: str
         :param baudrate: The baudrate to be used for the serial connection.
         :type baudrate: int
+        :param backend: Backend running the receiver loop, 'thread', 'qt', 
+            a concurrent.futures.Executor or a custom backend (see datalink.backend), defaults to 'thread'.
+        :type backend: str or object, optional
+        :param read_timeout_seconds: Longest time the receiver thread blocks in a read, 
+            bounds the time needed to stop the thread, defaults to 0.1.
+        :type read_timeout_seconds: float, optional
+        :param capture: Path of a capture file the sent and received payloads are appended to 
+            (see datalink.capture), None disables the capture, defaults to None.
+        :type capture: str, optional
+        :param queue_capacity: Maximal number of received messages waiting for receive() (payloads 
+            consumed by a listener are not queued, see add_listener()), defaults to 256.
+        :type queue_capacity: int, optional
+        :param overflow: Policy applied when a message arrives to a full queue, 'block' (the receiver 
+            thread waits, listeners included), 'drop_oldest' or 'drop_newest' (see 
+            datalink.receiver.message_queue), defaults to 'drop_oldest'.
+        :type overflow: str, optional
+        :param crc: Send and receive packets with CRC (see packet.packet), corrupted packets 
+            are discarded, defaults to False.
+        :type crc: bool, optional
+        :param framing: Framing of the packets, 'start_end' (START_BYTES and END_BYTES) or 'cobs' 
+            (COBS byte stuffing terminated by COBS_DELIMITER, see packet.packet), defaults to 'start_end'.
+        :type framing: str, optional
+        :raises ValueError: If the framing is not valid.
         """
         self._logger = logging.getLogger(__name__)
-        self._logger.info(f"DataLink.__init__(port={port}, baudrate={baudrate})")
-        self._serial = serial.Serial(port, baudrate)
-        self._receiver = Receiver(self._serial)
+        self._logger.info("DataLink.__init__(port=%s, baudrate=%s, capture=%s, crc=%s, framing=%s)", port, baudrate, capture, crc, framing)
+        self._read_timeout_seconds = read_timeout_seconds
+        self._open(port, baudrate, read_timeout_seconds, capture, queue_capacity, overflow, crc, framing)
         
-        # more serial_receiver to separate thread
-        self._thread_receiver = QThread()
-        self._receiver.moveToThread(self._thread_receiver)
-        self._thread_receiver.started.connect(self._receiver.run)
-        self._receiver._interthread_signal.connect(self._update_list_messages)
-        self._thread_receiver.start()
-        self._logger.info(f"DataLink.__init__()._thread_receiver.isRunning -> {self._thread_receiver.isRunning()}")
+        # move serial_receiver to separate thread
+        self._thread_receiver = get_backend(backend)
+        self._thread_receiver.start(self._receiver.run)
+        self._logger.info("DataLink.__init__()._thread_receiver -> %s", type(self._thread_receiver).__name__)
         
         
+    def _open(self, port, baudrate:int, read_timeout_seconds:float, capture:str, queue_capacity:int, overflow:str, 
+              crc:bool=False, framing:str='start_end'):
+        """
+        Opens the serial connection, the capture file and creates the Receiver 
+        (the receiver loop is not started). See __init__() for the parameters.
+        """
+        if framing not in FRAMINGS:
+            raise ValueError(f"framing={framing} is not valid, valid values are {FRAMINGS}.")
+        if str(port).startswith('hstsim://'):
+            # registers the URL handler of the simulated turret
+            from .. import simulator
+        self._capture = None if capture is None else CaptureWriter(capture)
+        # packets held back by hold() until release()
+        self._held = None
+        self._held_lock = threading.Lock()
+        # stage timing (see datalink.metrics), None while disabled
+        self._metrics = None
+        self._crc = crc
+        self._framing = framing
+        self._serial = serial.serial_for_url(port, baudrate, timeout=read_timeout_seconds)
+        self._receiver = Receiver(self._serial, queue_capacity=queue_capacity, overflow=overflow, crc=crc, framing=framing)
+        if self._capture is not None:
+            self._receiver.add_callback(functools.partial(self._capture.write, RX))
+
+
     def __del__(self):
         """
         Deletes the Datalink object, closing the serial connection and 
         stopping the receiver thread.
         """
-        self._logger.info(f"DataLink.__del__()")
+        self._logger.info("DataLink.__del__()")
+        self.close()
+
+
+    def close(self):
+        """
+        Stops and joins the receiver thread, closes the serial connection and the capture file.
+
+        The receiver thread keeps the listeners (and the objects they belong to) 
+        alive, so the port is released only by close(). Calling it again has no effect.
+        """
         if hasattr(self, '_thread_receiver'):
-            self._thread_receiver.quit()
+            self._receiver.stop()
+            self._thread_receiver.join(timeout_seconds=10*self._read_timeout_seconds)
             del self._thread_receiver
-            self._logger.debug(f"Receiver.__del__ -> del self._thread_receiver")
+            self._logger.debug("DataLink.close() -> del self._thread_receiver")
         if hasattr(self, '_serial'):
             self._serial.close()
             del self._serial
-            self._logger.debug(f"Receiver.__del__ -> del self._serial")
+            self._logger.debug("DataLink.close() -> del self._serial")
+        if getattr(self, '_capture', None) is not None:
+            self._capture.close()
+            self._capture = None
         
     
-    def _update_list_messages(self, message):
+    def add_listener(self, callback):
         """
-        Updates the list of messages with the received message.
+        Registers a callback executed for every received payload. 
+        
+        The callback is executed in the receiver thread, it must not block. 
+        A callback returning True consumes the payload, it is then not 
+        returned by receive() (see interface.pipeline.Pipeline).
 
-        :param message: The received message.
-        :type message: str
+        :param callback: Function called as callback(payload, receive_time).
+        :type callback: callable
+        """
+        self._receiver.add_callback(callback)
+
+
+    @property
+    def baudrate(self) -> int:
+        """ The baudrate of the serial connection. """
+        return self._serial.baudrate
+
+
+    @property
+    def bytes_per_second(self) -> float:
+        """ Effective rate of data bytes of the serial line, i.e. the baudrate divided by the 
+        bits of one character (start bit, data bits, parity bit, stop bits), 11520 at 115200 Bd 8N1. """
+        bits = 1 + self._serial.bytesize + (self._serial.parity != serial.PARITY_NONE) + self._serial.stopbits
+        return self._serial.baudrate/bits
+
+
+    @property
+    def crc(self) -> bool:
+        """ True if the packets are sent and received with CRC. """
+        return self._crc
+
+
+    def set_crc(self, crc:bool):
+        """
+        Switches between packets with and without CRC.
+
+        The firmware replies in the frame of the request, so the switch needs no 
+        command, but replies of requests in flight are lost.
+
+        :param crc: Send and receive packets with CRC.
+        :type crc: bool
+        """
+        self._logger.info("DataLink.set_crc(crc=%s)", crc)
+        self._crc = crc
+        self._receiver.set_crc(crc)
+
+
+    @property
+    def framing(self) -> str:
+        """ Framing of the packets, 'start_end' or 'cobs'. """
+        return self._framing
+
+
+    def set_framing(self, framing:str):
+        """
+        Switches the framing of the packets.
+
+        The firmware replies in the framing of the request, so the switch needs 
+        no command, but replies of requests in flight are lost.
+
+        :param framing: Framing of the packets, 'start_end' or 'cobs'.
+        :type framing: str
+        :raises ValueError: If the framing is not valid.
+        """
+        self._logger.info("DataLink.set_framing(framing=%s)", framing)
+        self._receiver.set_framing(framing)
+        self._framing = framing
+
+
+    @property
+    def discarded_bytes(self) -> int:
+        """ Number of received bytes not decoded into packets (framing errors, corrupted packets). """
+        return self._receiver.discarded_bytes
+
+
+    def set_baudrate(self, baudrate:int):
+        """
+        Changes the baudrate of the serial connection.
+
+        The received data not decoded yet are discarded. Only the host side is 
+        changed, see HST.negotiate_baudrate() for changing the baudrate of the device.
+
+        :param baudrate: The new baudrate.
+        :type baudrate: int
+        """
+        self._logger.info("DataLink.set_baudrate(baudrate=%s)", baudrate)
+        self._serial.baudrate = baudrate
+        self._serial.reset_input_buffer()
+        self._receiver.reset()
+        if self._metrics is not None:
+            self._metrics.baudrate = baudrate
+
+
+    @property
+    def receive_ns(self) -> int:
+        """ time.monotonic_ns() of the read of the payload passed to the listeners, 
+        valid only inside a listener (it is executed in the receiver thread). """
+        return self._receiver.receive_ns
+
+
+    def queue_stats(self) -> dict:
+        """
+        Returns the counters of the queue of received messages.
+
+        :return: {'capacity', 'overflow', 'queued', 'put', 'dropped', 'high_water'}.
+        :rtype: dict
         """
-        receive_time = time.time()
-        self.list_messages.append({
-            "time":receive_time, 
-            "message":message, 
-        })
-        self._logger.debug(f"DataLink._update_list_messages() -> self.list_messages[-1]={self.list_messages[-1]}")
+        return self._receiver.messages.stats()
 
 
     def check_connection(self):
@@ -74,10 +239,23 @@ class Datalink():
         :return: True if the serial connection is open, False otherwise.
         :rtype: bool
         """
-        self._logger.debug(f"DataLink.check_connection() -> self._serial.is_open={self._serial.is_open}")
+        self._logger.debug("DataLink.check_connection() -> self._serial.is_open=%s", self._serial.is_open)
         return self._serial.is_open
 
 
+    def set_metrics(self, metrics:Metrics):
+        """
+        Enables the stage timing and counters of the sent and received packets.
+
+        :param metrics: The metrics recorded to, None disables the recording.
+        :type metrics: hst.datalink.metrics.Metrics
+        """
+        if metrics is not None and metrics.baudrate is None:
+            metrics.baudrate = self._serial.baudrate
+        self._metrics = metrics
+        self._receiver.set_metrics(metrics)
+
+
     def send(self, message):
         """
         Sends a message over the serial connection.
@@ -85,38 +263,92 @@ class Datalink():
         :param message: The message to be sent.
         :type message: str
         """
-        packet = encode_packet(message)
-        self._logger.info(f"DataLink.send(message: '{message}') -> packet: '{packet}'")
+        metrics = self._metrics
+        if metrics is not None:
+            start_ns = time.monotonic_ns()
+        packet = encode_packet(message, self._crc, self._framing)
+        if metrics is not None:
+            encoded_ns = time.monotonic_ns()
+            metrics.record('encode', message[0], encoded_ns - start_ns)
+            metrics.count_packets('tx', 1, len(packet))
+        self._logger.info("DataLink.send(message: '%s') -> packet: '%s'", message, packet)
+        if self._capture is not None:
+            self._capture.write(TX, message, time.time())
+        if self._held is not None:
+            with self._held_lock:
+                if self._held is not None:
+                    self._held += packet
+                    return
         self._serial.write(packet)
+        if metrics is not None:
+            metrics.record('write', message[0], time.monotonic_ns() - encoded_ns)
+
+
+    def hold(self):
+        """
+        Holds back the packets of the following send() calls until release() or discard().
+
+        Used to prepare the packets of several devices first and write them 
+        in a single burst (see interface.group.TurretGroup).
+        """
+        with self._held_lock:
+            if self._held is None:
+                self._held = bytearray()
+
+
+    def release(self) -> float:
+        """
+        Writes the packets held back since hold() in a single write.
+
+        :return: The time when the write returned, None if no packet was held back.
+        :rtype: float
+        """
+        with self._held_lock:
+            packets, self._held = self._held, None
+        if not packets:
+            return None
+        self._serial.write(packets)
+        return time.time()
+
+
+    def discard(self) -> int:
+        """
+        Drops the packets held back since hold() without writing them.
+
+        :return: The number of dropped bytes.
+        :rtype: int
+        """
+        with self._held_lock:
+            packets, self._held = self._held, None
+        if packets:
+            self._logger.info("DataLink.discard() -> %d bytes of held packets dropped", len(packets))
+        return len(packets) if packets else 0
         
         
     def receive(self, since_time:float, timeout_seconds:float=1.0, polling_period:float=0.001):
         """
         Receives a message over the serial connection.
 
+        The call blocks until the receiver thread decodes a message newer 
+        than since_time (or until timeout), there is no polling involved. 
+        Every message is returned once, queued messages older than 
+        since_time are discarded. Packets pushed by the firmware (e.g. 
+        PKT_IMU_FRAME) are not replies, they are delivered only to the 
+        listeners (see add_listener()).
+
         :param since_time: The time since the received message is considered as new.
         :type since_time: float
         :param timeout_seconds: The timeout period in seconds, defaults to 1.0.
         :type timeout_seconds: float, optional
-        :param polling_period: The polling period in seconds, defaults to 0.001.
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
         :type polling_period: float, optional
         :return: A tuple containing a boolean indicating whether a message was received and the received message.
         :rtype: tuple
         """
-        time_start = time.time()
-        time_elapsed=0
-        while time_elapsed < timeout_seconds:
-            time_now = time.time()
-            try:
-                if self._receiver.list_messages[-1]['time'] > since_time:
-                    self._logger.debug(f"DataLink.receive(since_time={since_time}, timeout_seconds={timeout_seconds}, polling_period={polling_period})")
-                    self._logger.info(f"DataLink.receive(...) -> True, '{self._receiver.list_messages[-1]['payload']}'")
-                    payload = self._receiver.list_messages[-1]['payload']
-                    return True, payload
-            except IndexError:
-                pass
-            
-            time_elapsed = time_now - time_start
-            time.sleep(polling_period)
-        self._logger.info(f"DataLink.receive(...) -> False, None")
-        return False, None
\ No newline at end of file
+        message = self._receiver.wait_for_message(since_time=since_time, timeout_seconds=timeout_seconds)
+        if message is not None:
+            self._logger.debug("DataLink.receive(since_time=%s, timeout_seconds=%s)", since_time, timeout_seconds)
+            self._logger.info("DataLink.receive(...) -> True, '%s'", message['payload'])
+            return True, message['payload']
+        self._logger.info("DataLink.receive(...) -> False, None")
+        return False, None
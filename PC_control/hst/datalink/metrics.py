@@ -0,0 +1,354 @@
+import json
+import time
+import threading
+from ..packet.pkt_formats import REPLY_FORMATS, PUSH_FORMATS
+""" Per-stage latency histograms and throughput counters of the command pipeline.
+
+    The stages of a command are timed with time.monotonic_ns() where they
+    happen (see HST.enable_metrics()):
+
+        window      - Pipeline.submit() waiting for a free slot of the window (link saturation)
+        encode      - encode_packet() in Datalink.send()
+        write       - serial write in Datalink.send()
+        round_trip  - submission (window acquired) to the read of the reply
+                      (encode, write, serial line, firmware, USB latency)
+        decode      - read of the data to the decoded payload (PacketDecoder)
+        reply       - read of the reply to the resolved future (decode, listeners, decode_reply())
+        total       - Pipeline.submit() to the resolved future
+        call        - blocking cmd_*() from the submission to the caller noticing the reply
+
+    Every (stage, command) pair has a Histogram with log-linear buckets
+    (HDR-style): every power of two is split into 2**(significant_bits-1)
+    buckets, a value is kept with a relative error below 2**-significant_bits
+    (3 % by default) over the whole range from nanoseconds to hours, in
+    constant memory and without knowing the range in advance.
+
+    The components hold None instead of a Metrics while disabled, so a
+    disabled stage costs one attribute check.
+
+        turret.enable_metrics()
+        ...
+        turret.stats()['stages']['CMD_GET_DELTA_STEPS']['round_trip']['p99_us']
+        print(turret.metrics.to_prometheus(labels={'turret': 'left'}))
+
+Public classes:
+    Histogram
+    Metrics
+
+Public functions:
+    to_prometheus()             - metrics of several connections
+"""
+
+# names of the command bytes (replies and pushed packets)
+_COMMAND_NAMES = {command: name for command, (name, _, _) in {**REPLY_FORMATS, **PUSH_FORMATS}.items()}
+STAGES = ('window', 'encode', 'write', 'round_trip', 'decode', 'reply', 'total', 'call')
+COUNTERS = ('tx_packets', 'tx_bytes', 'rx_packets', 'rx_bytes', 'timeouts')
+# upper bounds of the Prometheus histogram buckets in seconds
+PROMETHEUS_BOUNDS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+                     1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram():
+    """ Histogram of durations in nanoseconds with log-linear buckets.
+
+        Not thread-safe, Metrics serializes the access.
+
+        Public methods:
+
+            record()
+            percentile()
+            cumulative_count()          - number of values <= a bound
+            summary()
+
+        Public attributes:
+
+            count, sum, min, max
+    """
+    __slots__ = ('_bits', '_buckets', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, significant_bits:int=5):
+        """
+        Initializes an empty histogram.
+
+        :param significant_bits: Bits of a value kept exactly, defaults to 5 (relative error < 3.1 %).
+        :type significant_bits: int, optional
+        :raises ValueError: If significant_bits is not in [1..16].
+        """
+        if not 1 <= significant_bits <= 16:
+            raise ValueError(f"significant_bits={significant_bits} is not valid, valid values [1..16].")
+        self._bits = significant_bits
+        # bucket index -> count, sparse
+        self._buckets = {}
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+
+    def record(self, value:int):
+        """
+        Adds a value, negative values are recorded as 0.
+
+        :param value: Duration in nanoseconds.
+        :type value: int
+        """
+        if value < 0:
+            value = 0
+        shift = value.bit_length() - self._bits
+        index = value if shift <= 0 else (shift << self._bits) + (value >> shift)
+        buckets = self._buckets
+        buckets[index] = buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+
+    def _bucket_range(self, index:int) -> tuple:
+        """ Lowest and highest value of a bucket. """
+        shift, mantissa = index >> self._bits, index & ((1 << self._bits) - 1)
+        if shift == 0:
+            return index, index
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+    def percentile(self, fraction:float) -> int:
+        """
+        Returns the value below which the fraction of the values lies.
+
+        :param fraction: The fraction, e.g. 0.99.
+        :type fraction: float
+        :return: Midpoint of the bucket holding the percentile (clipped to min and max), None if empty.
+        :rtype: int
+        """
+        if self.count == 0:
+            return None
+        rank = max(1, round(fraction*self.count))
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                low, high = self._bucket_range(index)
+                return min(max((low + high)//2, self.min), self.max)
+        return self.max
+
+
+    def cumulative_count(self, bound:int) -> int:
+        """
+        Returns the number of values <= bound (bucket resolution).
+
+        :param bound: The bound in nanoseconds.
+        :type bound: int
+        :return: The number of values whose bucket ends at or below the bound.
+        :rtype: int
+        """
+        return sum(count for index, count in self._buckets.items() if self._bucket_range(index)[1] <= bound)
+
+
+    def summary(self) -> dict:
+        """
+        Returns the summary of the histogram in microseconds.
+
+        :return: {'count', 'mean_us', 'min_us', 'p50_us', 'p90_us', 'p99_us', 'p999_us', 'max_us'}.
+        :rtype: dict
+        """
+        if self.count == 0:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_us': self.sum/self.count/1000,
+            'min_us': self.min/1000,
+            'p50_us': self.percentile(0.5)/1000,
+            'p90_us': self.percentile(0.9)/1000,
+            'p99_us': self.percentile(0.99)/1000,
+            'p999_us': self.percentile(0.999)/1000,
+            'max_us': self.max/1000,
+        }
+
+
+class Metrics():
+    """ Stage histograms per command and throughput counters of one connection.
+
+        Public methods:
+
+            record()                    - duration of a stage of a command
+            count()                     - increment a counter
+            count_packets()             - increment the packet and byte counters
+            reset()
+            stats()                     - snapshot as a dictionary
+            to_json()
+            to_prometheus()             - Prometheus text exposition format
+
+        Public attributes:
+
+            baudrate                    - baudrate of the line (utilisation of the line), None if unknown
+    """
+    def __init__(self, baudrate:int=None, significant_bits:int=5):
+        """
+        Initializes empty metrics.
+
+        :param baudrate: Baudrate of the line, defaults to None.
+        :type baudrate: int, optional
+        :param significant_bits: Resolution of the histograms (see Histogram), defaults to 5.
+        :type significant_bits: int, optional
+        """
+        self.baudrate = baudrate
+        self._significant_bits = significant_bits
+        self._lock = threading.Lock()
+        self.reset()
+
+
+    def reset(self):
+        """
+        Clears all histograms and counters.
+        """
+        with self._lock:
+            # (stage, command byte) -> Histogram
+            self._histograms = {}
+            self._counters = dict.fromkeys(COUNTERS, 0)
+            self._start_ns = time.monotonic_ns()
+
+
+    def record(self, stage:str, command:int, duration_ns:int):
+        """
+        Records the duration of a stage (executed by the instrumented components).
+
+        :param stage: The stage, one of STAGES.
+        :type stage: str
+        :param command: The command byte.
+        :type command: int
+        :param duration_ns: The duration in nanoseconds.
+        :type duration_ns: int
+        """
+        key = (stage, command)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self._significant_bits)
+            histogram.record(duration_ns)
+
+
+    def count(self, counter:str, value:int=1):
+        """
+        Increments a counter (executed by the instrumented components).
+
+        :param counter: The counter, one of COUNTERS.
+        :type counter: str
+        :param value: The increment, defaults to 1.
+        :type value: int, optional
+        """
+        with self._lock:
+            self._counters[counter] += value
+
+
+    def count_packets(self, direction:str, packets:int, num_bytes:int):
+        """
+        Increments the packet and byte counters of a direction at once.
+
+        :param direction: 'tx' or 'rx'.
+        :type direction: str
+        :param packets: Number of packets.
+        :type packets: int
+        :param num_bytes: Number of bytes on the line.
+        :type num_bytes: int
+        """
+        with self._lock:
+            self._counters[direction + '_packets'] += packets
+            self._counters[direction + '_bytes'] += num_bytes
+
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the metrics.
+
+        :return: {'elapsed_s', 'counters': {...}, 'throughput': {'tx_bytes_per_s', 'rx_bytes_per_s',
+            'tx_packets_per_s', 'rx_packets_per_s', 'tx_line_utilisation', 'rx_line_utilisation'},
+            'stages': {command name: {stage: Histogram.summary()}}}, the utilisation (0..1, 10 bits
+            per byte) is None without baudrate.
+        :rtype: dict
+        """
+        with self._lock:
+            elapsed = max(time.monotonic_ns() - self._start_ns, 1)/1e9
+            counters = dict(self._counters)
+            stages = {}
+            for (stage, command), histogram in sorted(self._histograms.items(), key=lambda item: (item[0][1], STAGES.index(item[0][0]))):
+                stages.setdefault(_COMMAND_NAMES.get(command, f'0x{command:02X}'), {})[stage] = histogram.summary()
+        throughput = {}
+        for direction in ('tx', 'rx'):
+            throughput[f'{direction}_bytes_per_s'] = counters[f'{direction}_bytes']/elapsed
+            throughput[f'{direction}_packets_per_s'] = counters[f'{direction}_packets']/elapsed
+            throughput[f'{direction}_line_utilisation'] = None if not self.baudrate else counters[f'{direction}_bytes']*10/self.baudrate/elapsed
+        return {'elapsed_s': elapsed, 'counters': counters, 'throughput': throughput, 'stages': stages}
+
+
+    def to_json(self, **kwargs) -> str:
+        """
+        Returns the snapshot of stats() as JSON.
+
+        :param kwargs: Arguments of json.dumps(), e.g. indent=2.
+        :return: The JSON document.
+        :rtype: str
+        """
+        return json.dumps(self.stats(), **kwargs)
+
+
+    def to_prometheus(self, prefix:str='hst', labels:dict=None) -> str:
+        """
+        Returns the metrics in the Prometheus text exposition format.
+
+        The stages are exposed as the histogram <prefix>_stage_seconds with the
+        labels command and stage, the counters as <prefix>_<counter>_total.
+
+        :param prefix: Prefix of the metric names, defaults to 'hst'.
+        :type prefix: str, optional
+        :param labels: Labels added to every sample, e.g. {'turret': 'left'}, defaults to None.
+        :type labels: dict, optional
+        :return: The exposition text.
+        :rtype: str
+        """
+        return to_prometheus([(self, labels)], prefix=prefix)
+
+
+    def _prometheus_samples(self, prefix:str, labels:dict) -> dict:
+        """ Sample lines keyed by (name, type) of the metric family. """
+        base = ''.join(f',{name}="{value}"' for name, value in (labels or {}).items())
+        families = {}
+        with self._lock:
+            for counter in COUNTERS:
+                sample_labels = f'{{{base[1:]}}}' if base else ''
+                families[(f'{prefix}_{counter}_total', 'counter')] = [f'{prefix}_{counter}_total{sample_labels} {self._counters[counter]}']
+            samples = families[(f'{prefix}_stage_seconds', 'histogram')] = []
+            for (stage, command), histogram in sorted(self._histograms.items(), key=lambda item: (item[0][1], STAGES.index(item[0][0]))):
+                sample_labels = f'command="{_COMMAND_NAMES.get(command, f"0x{command:02X}")}",stage="{stage}"{base}'
+                for bound in PROMETHEUS_BOUNDS:
+                    samples.append(f'{prefix}_stage_seconds_bucket{{{sample_labels},le="{bound}"}} {histogram.cumulative_count(round(bound*1e9))}')
+                samples.append(f'{prefix}_stage_seconds_bucket{{{sample_labels},le="+Inf"}} {histogram.count}')
+                samples.append(f'{prefix}_stage_seconds_sum{{{sample_labels}}} {histogram.sum/1e9}')
+                samples.append(f'{prefix}_stage_seconds_count{{{sample_labels}}} {histogram.count}')
+        return families
+
+
+def to_prometheus(metrics_labels:list, prefix:str='hst') -> str:
+    """
+    Returns the metrics of several connections in the Prometheus text exposition format.
+
+    The samples of every metric family are grouped under a single TYPE line.
+
+    :param metrics_labels: (Metrics, labels) pairs, labels distinguish the connections, e.g. {'turret': 'left'}.
+    :type metrics_labels: list
+    :param prefix: Prefix of the metric names, defaults to 'hst'.
+    :type prefix: str, optional
+    :return: The exposition text.
+    :rtype: str
+    """
+    families = {}
+    for metrics, labels in metrics_labels:
+        for family, samples in metrics._prometheus_samples(prefix, labels).items():
+            families.setdefault(family, []).extend(samples)
+    lines = []
+    for (name, kind), samples in families.items():
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+    return '\n'.join(lines) + '\n'
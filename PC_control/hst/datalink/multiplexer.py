@@ -0,0 +1,282 @@
+import time
+import socket
+import selectors
+import threading
+import logging
+import serial
+from .datalink import Datalink
+from .backend import get_backend
+""" Single I/O loop serving the serial connections of many devices.
+
+    Every Datalink runs its own receiver loop, a rig of N turrets therefore
+    runs N receiver threads. The Multiplexer runs one loop waiting in a
+    selector (select/epoll) on the file descriptors of all its ports, the
+    received data are decoded by the Receiver of the port (see
+    Receiver.feed()), so the messages, listeners and receive() of a
+    MultiplexedDatalink behave exactly as those of a Datalink.
+
+    Ports without a file descriptor (e.g. 'loop://', 'hstsim://' or serial
+    ports on Windows) cannot be waited on, the loop checks their in_waiting
+    every poll_period_seconds instead.
+
+    The listeners of all ports are executed by the single loop thread,
+    a slow listener (or a full queue with overflow 'block') delays every port.
+
+Public classes:
+    Multiplexer
+    MultiplexedDatalink
+"""
+
+
+class MultiplexedDatalink(Datalink):
+    """
+    Datalink whose received data are read by a Multiplexer instead of
+    its own receiver loop. Created by Multiplexer.open().
+    """
+
+    def __init__(self, multiplexer, port, baudrate, capture:str=None, queue_capacity:int=256, overflow:str='drop_oldest', crc:bool=False, framing:str='start_end'):
+        """
+        Initializes the MultiplexedDatalink and registers it with the multiplexer.
+
+        :param multiplexer: The multiplexer reading the port.
+        :type multiplexer: Multiplexer
+        :param port: The port to be used for the serial connection (see Datalink).
+        :type port: str
+        :param baudrate: The baudrate to be used for the serial connection.
+        :type baudrate: int
+        :param capture: Path of a capture file (see datalink.capture), defaults to None.
+        :type capture: str, optional
+        :param queue_capacity: Maximal number of received messages waiting for receive(), defaults to 256.
+        :type queue_capacity: int, optional
+        :param overflow: Overflow policy of the queue (see Datalink), defaults to 'drop_oldest'.
+        :type overflow: str, optional
+        :param crc: Send and receive packets with CRC (see Datalink), defaults to False.
+        :type crc: bool, optional
+        :param framing: Framing of the packets, 'start_end' or 'cobs' (see Datalink), defaults to 'start_end'.
+        :type framing: str, optional
+        """
+        self._logger = logging.getLogger(__name__)
+        self._logger.info("MultiplexedDatalink.__init__(port=%s, baudrate=%s, capture=%s)", port, baudrate, capture)
+        self._read_timeout_seconds = 0.0
+        self._multiplexer = multiplexer
+        # reads must not block the loop serving the other ports
+        self._open(port, baudrate, 0.0, capture, queue_capacity, overflow, crc, framing)
+        try:
+            self._fileno = self._serial.fileno()
+        except (AttributeError, OSError, ValueError):
+            # io.UnsupportedOperation is an OSError and a ValueError
+            self._fileno = None
+        self._multiplexer._register(self)
+
+
+    def __del__(self):
+        """
+        Deletes the MultiplexedDatalink, closing the serial connection.
+        """
+        self.close()
+
+
+    @property
+    def fileno(self) -> int:
+        """ The file descriptor the multiplexer waits on, None if the port is polled. """
+        return self._fileno
+
+
+    def close(self):
+        """
+        Unregisters the port from the multiplexer and closes the serial connection.
+        """
+        if getattr(self, '_multiplexer', None) is None:
+            return
+        self._multiplexer._unregister(self)
+        self._multiplexer = None
+        self._receiver.stop()
+        Datalink.close(self)
+
+
+    def _read(self):
+        """
+        Reads the available data without blocking and passes them to the Receiver
+        (executed by the multiplexer loop).
+        """
+        in_waiting = self._serial.in_waiting
+        if in_waiting == 0 and self._fileno is None:
+            # polled port without data
+            return
+        # a selected port reporting no data has to be read to detect a disconnection
+        data = self._serial.read(in_waiting or 1)
+        if data:
+            self._receiver.feed(data, time.time(), time.monotonic_ns())
+
+
+class Multiplexer():
+    """
+    Runs one I/O loop reading the serial connections of many MultiplexedDatalinks.
+
+    Public methods:
+        open()          - open a port served by the loop
+        num_ports()
+        close()         - close all ports and stop the loop
+    """
+
+    def __init__(self, backend='thread', poll_period_seconds:float=0.005):
+        """
+        Initializes the Multiplexer and starts its loop.
+
+        :param backend: Backend running the loop, 'thread', 'qt', a concurrent.futures.Executor
+            or a custom backend (see datalink.backend), defaults to 'thread'.
+        :type backend: str or object, optional
+        :param poll_period_seconds: Period of checking the ports without a file descriptor, defaults to 0.005.
+        :type poll_period_seconds: float, optional
+        :raises ValueError: If the poll_period_seconds is not positive.
+        """
+        if poll_period_seconds <= 0:
+            raise ValueError(f"poll_period_seconds={poll_period_seconds} is not valid, valid values are > 0.")
+        self._logger = logging.getLogger(__name__)
+        self._poll_period_seconds = poll_period_seconds
+        self._selector = selectors.DefaultSelector()
+        # held by the loop while reading, register/unregister wait for the read to finish
+        self._lock = threading.Lock()
+        self._datalinks = []
+        self._polled = []
+        self._running = True
+        # a write to the wakeup socket interrupts the wait in the selector
+        self._wakeup_receive, self._wakeup_send = socket.socketpair()
+        self._wakeup_receive.setblocking(False)
+        self._selector.register(self._wakeup_receive, selectors.EVENT_READ, None)
+        self._thread_loop = get_backend(backend)
+        self._thread_loop.start(self.run)
+        self._logger.info("Multiplexer.__init__()._thread_loop -> %s", type(self._thread_loop).__name__)
+
+
+    def __del__(self):
+        """
+        Deletes the Multiplexer, closing all ports.
+        """
+        self.close()
+
+
+    def open(self, port, baudrate:int, capture:str=None, queue_capacity:int=256, overflow:str='drop_oldest', crc:bool=False, 
+             framing:str='start_end') -> MultiplexedDatalink:
+        """
+        Opens a serial connection served by the loop.
+
+        :param port: The port to be used for the serial connection (see Datalink).
+        :type port: str
+        :param baudrate: The baudrate to be used for the serial connection.
+        :type baudrate: int
+        :param capture: Path of a capture file (see datalink.capture), defaults to None.
+        :type capture: str, optional
+        :param queue_capacity: Maximal number of received messages waiting for receive(), defaults to 256.
+        :type queue_capacity: int, optional
+        :param overflow: Overflow policy of the queue (see Datalink), defaults to 'drop_oldest'.
+        :type overflow: str, optional
+        :param crc: Send and receive packets with CRC (see Datalink), defaults to False.
+        :type crc: bool, optional
+        :param framing: Framing of the packets, 'start_end' or 'cobs' (see Datalink), defaults to 'start_end'.
+        :type framing: str, optional
+        :raises RuntimeError: If the multiplexer is closed.
+        :return: The datalink of the port.
+        :rtype: MultiplexedDatalink
+        """
+        if not self._running:
+            raise RuntimeError("Multiplexer is closed.")
+        return MultiplexedDatalink(self, port, baudrate, capture=capture, queue_capacity=queue_capacity, overflow=overflow, crc=crc, framing=framing)
+
+
+    def num_ports(self) -> int:
+        """
+        Returns the number of open ports.
+
+        :return: The number of ports served by the loop.
+        :rtype: int
+        """
+        return len(self._datalinks)
+
+
+    def close(self):
+        """
+        Closes all ports and stops the loop.
+        """
+        if not getattr(self, '_running', False):
+            return
+        for datalink in list(self._datalinks):
+            datalink.close()
+        self._running = False
+        self._wakeup()
+        self._thread_loop.join(timeout_seconds=1.0)
+        self._selector.close()
+        self._wakeup_receive.close()
+        self._wakeup_send.close()
+        self._logger.info("Multiplexer.close()")
+
+
+    def _wakeup(self):
+        """ Interrupts the wait of the loop in the selector. """
+        try:
+            self._wakeup_send.send(b'\x00')
+        except (BlockingIOError, OSError):
+            # the loop is woken up already
+            pass
+
+
+    def _register(self, datalink:MultiplexedDatalink):
+        """ Adds the port of the datalink to the loop. """
+        with self._lock:
+            self._datalinks.append(datalink)
+            if datalink.fileno is None:
+                self._polled.append(datalink)
+            else:
+                self._selector.register(datalink.fileno, selectors.EVENT_READ, datalink)
+        # the loop may need to start polling
+        self._wakeup()
+        self._logger.info("Multiplexer._register(port=%s) -> %s", datalink._serial.name, 'polled' if datalink.fileno is None else 'selected')
+
+
+    def _unregister(self, datalink:MultiplexedDatalink):
+        """ Removes the port of the datalink from the loop, the port is not read afterwards. """
+        with self._lock:
+            if datalink not in self._datalinks:
+                return
+            self._datalinks.remove(datalink)
+            if datalink.fileno is None:
+                self._polled.remove(datalink)
+            else:
+                self._selector.unregister(datalink.fileno)
+        self._wakeup()
+
+
+    def _read(self, datalink:MultiplexedDatalink):
+        """ Reads a port, a failing port is unregistered (lock must be held). """
+        try:
+            datalink._read()
+        except (serial.SerialException, OSError) as error:
+            self._logger.error("Multiplexer._read(port=%s) -> %s, port unregistered", datalink._serial.name, error)
+            self._datalinks.remove(datalink)
+            if datalink.fileno is None:
+                self._polled.remove(datalink)
+            else:
+                self._selector.unregister(datalink.fileno)
+
+
+    def run(self):
+        """ Runs in a separate thread, reads the incoming data of all ports.
+
+        The thread sleeps in the selector until a port has data,
+        it wakes up every poll_period_seconds only if a port has to be polled.
+        """
+        self._logger.info("Multiplexer.run() executed")
+        while self._running:
+            events = self._selector.select(self._poll_period_seconds if self._polled else None)
+            with self._lock:
+                for key, _ in events:
+                    if key.data is None:
+                        try:
+                            self._wakeup_receive.recv(4096)
+                        except BlockingIOError:
+                            pass
+                    elif key.data in self._datalinks:
+                        self._read(key.data)
+                for datalink in list(self._polled):
+                    self._read(datalink)
+        self._logger.info("Multiplexer.run() finished")
@@ -0,0 +1,243 @@
+import numbers
+import time
+import threading
+import urllib.parse as urlparse
+from serial.serialutil import SerialBase, SerialException, PortNotOpenError
+from .capture import CaptureReader, RX
+from ..packet.packet import encode_packet, FRAMINGS
+""" pyserial URL handler replaying a capture (see capture.py).
+
+    Registered by importing hst.datalink.capture. The port returns the
+    packets received in the capture (RX records), encoded again into
+    packets, hence a Datalink or a bare PacketDecoder on top of the port
+    decodes them exactly as they arrived from the turret:
+
+        Datalink('hstreplay://session.hstcap', 115200)
+        Datalink('hstreplay:///abs/path/session.hstcap?speed=0', 115200)
+
+    Written data are discarded, i.e. the replay does not react to commands.
+    The receiver thread of a Datalink reads as soon as the port is open,
+    with trigger=1 the replay waits for the first write instead, so that
+    listeners can be registered before the first packet:
+
+        datalink = Datalink('hstreplay://session.hstcap?speed=0&trigger=1', 115200)
+        datalink.add_listener(callback)
+        datalink.send(encode_request(CMD_GET_QUEUE_STATUS))   # starts the replay
+
+    URL options:
+        speed       - 1 replays at the recorded times, 2 twice as fast, 0 as fast as possible (default 1)
+        trigger     - 1/0, start the replay at the first write instead of opening the port (default 0)
+        crc         - 1/0, encode the packets with CRC, as for Datalink(crc=True) (default 0)
+        framing     - 'start_end' or 'cobs', framing of the packets, as for Datalink(framing=...) (default 'start_end')
+
+    The attribute 'finished' of the port becomes True when all packets were read.
+"""
+
+# largest number of bytes encoded ahead of the reads
+_CHUNK_SIZE = 65536
+
+
+class Serial(SerialBase):
+    """ Serial port replaying the received packets of a capture. """
+
+    def __init__(self, *args, **kwargs):
+        self._reader = None
+        self._next_record = None
+        self._speed = 1.0
+        self._trigger = False
+        self._crc = False
+        self._framing = 'start_end'
+        self._pending = bytearray()
+        self._data_available = threading.Condition()
+        self._cancelled = False
+        super().__init__(*args, **kwargs)
+
+
+    @property
+    def finished(self) -> bool:
+        """ True if all packets of the capture were read. """
+        return self._next_record is None and not self._pending
+
+
+    def open(self):
+        if self.is_open:
+            raise SerialException("Port is already open.")
+        if self._port is None:
+            raise SerialException("Port must be configured before it can be used.")
+        path = self.from_url(self._port)
+        try:
+            self._reader = CaptureReader(path)
+        except (OSError, ValueError) as error:
+            raise SerialException(f"url={self._port} is not valid: {error}")
+        self._records = (record for record in self._reader if record[1] == RX)
+        self._next_record = next(self._records, None)
+        self._first_time = None if self._next_record is None else self._next_record[0]
+        self._start_time = None if self._trigger else time.monotonic()
+        self._pending.clear()
+        self.is_open = True
+
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            self.cancel_read()
+            self._records.close()
+            self._reader.close()
+        super().close()
+
+
+    def from_url(self, url:str) -> str:
+        """ Parses the URL options, returns the path of the capture. """
+        parts = urlparse.urlsplit(url)
+        if parts.scheme != 'hstreplay':
+            raise SerialException(f"url={url} is not valid, expected 'hstreplay://<path>[?speed=1&trigger=0&crc=0&framing=start_end]'.")
+        path = urlparse.unquote(parts.netloc + parts.path)
+        if not path:
+            raise SerialException(f"url={url} is not valid, the path of the capture is missing.")
+        try:
+            for option, values in urlparse.parse_qs(parts.query, True).items():
+                if option == 'speed':
+                    self._speed = float(values[0])
+                    if self._speed < 0:
+                        raise ValueError(f"speed={self._speed} is not valid, valid values are >= 0.")
+                elif option == 'trigger':
+                    self._trigger = bool(int(values[0]))
+                elif option == 'crc':
+                    self._crc = bool(int(values[0]))
+                elif option == 'framing':
+                    self._framing = values[0]
+                    if self._framing not in FRAMINGS:
+                        raise ValueError(f"framing={self._framing} is not valid, valid values are {FRAMINGS}.")
+                else:
+                    raise ValueError(f"option={option} is not valid, valid values ['speed', 'trigger', 'crc', 'framing'].")
+        except ValueError as error:
+            raise SerialException(f"url={url} is not valid: {error}")
+        return path
+
+
+    def _due_time(self, record_time:float) -> float:
+        """ time.monotonic() at which a record is replayed. """
+        if self._speed == 0:
+            return self._start_time
+        return self._start_time + (record_time - self._first_time)/self._speed
+
+
+    def _fill(self) -> float:
+        """
+        Encodes the records due into the pending bytes.
+
+        :return: Due time of the next record, None if there is none or the replay is not triggered.
+        :rtype: float
+        """
+        if self._start_time is None:
+            return None
+        now = time.monotonic()
+        pending = self._pending
+        while self._next_record is not None and len(pending) < _CHUNK_SIZE:
+            due_time = self._due_time(self._next_record[0])
+            if due_time > now:
+                return due_time
+            pending += encode_packet(self._next_record[2], self._crc, self._framing)
+            self._next_record = next(self._records, None)
+        return None if self._next_record is None else now
+
+
+    def _reconfigure_port(self):
+        if not isinstance(self._baudrate, numbers.Integral) or not 0 < self._baudrate < 2**32:
+            raise ValueError(f"baudrate={self._baudrate} is not valid.")
+
+
+    @property
+    def in_waiting(self) -> int:
+        if not self.is_open:
+            raise PortNotOpenError()
+        self._fill()
+        return len(self._pending)
+
+
+    def read(self, size:int=1) -> bytes:
+        if not self.is_open:
+            raise PortNotOpenError()
+        deadline = None if self._timeout is None else time.monotonic() + self._timeout
+        data = bytearray()
+        with self._data_available:
+            self._cancelled = False
+            while len(data) < size and self.is_open and not self._cancelled:
+                due_time = self._fill()
+                if self._pending:
+                    chunk = self._pending[:size - len(data)]
+                    del self._pending[:len(chunk)]
+                    data += chunk
+                    continue
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    break
+                # sleep until the next record is due, the timeout or cancel_read()
+                timeouts = [wait_until - now for wait_until in (due_time, deadline) if wait_until is not None]
+                self._data_available.wait(min(timeouts) if timeouts else None)
+        return bytes(data)
+
+
+    def write(self, data:bytes) -> int:
+        if not self.is_open:
+            raise PortNotOpenError()
+        if self._start_time is None and len(data) > 0:
+            with self._data_available:
+                self._start_time = time.monotonic()
+                self._data_available.notify_all()
+        return len(data)
+
+
+    def cancel_read(self):
+        with self._data_available:
+            self._cancelled = True
+            self._data_available.notify_all()
+
+
+    def reset_input_buffer(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        with self._data_available:
+            self._pending.clear()
+
+
+    def reset_output_buffer(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+
+
+    @property
+    def out_waiting(self) -> int:
+        return 0
+
+
+    def _update_break_state(self):
+        pass
+
+
+    def _update_rts_state(self):
+        pass
+
+
+    def _update_dtr_state(self):
+        pass
+
+
+    @property
+    def cts(self) -> bool:
+        return True
+
+
+    @property
+    def dsr(self) -> bool:
+        return True
+
+
+    @property
+    def ri(self) -> bool:
+        return False
+
+
+    @property
+    def cd(self) -> bool:
+        return True
@@ -0,0 +1,217 @@
+import time
+import threading
+import logging
+""" Bounded queue of received messages between the receiver thread and consumers.
+
+    The receiver thread is the only producer. put() and get() do not take a
+    lock on their fast path: the ring is a preallocated list, the producer
+    writes a slot and then publishes it by incrementing the tail, the
+    consumer reads a slot and then releases it by incrementing the head
+    (both are single assignments of an int, atomic in CPython). A Condition
+    is entered only to sleep, i.e. by a consumer waiting on an empty queue
+    or by the producer waiting on a full queue (overflow 'block').
+
+    Consumers are serialized by a lock, so several threads may consume,
+    but only one thread may put().
+
+    Overflow policies, when a message arrives to a full queue:
+        'block'         - the producer waits for a free slot (back-pressure on the serial port)
+        'drop_oldest'   - the oldest unread message is overwritten
+        'drop_newest'   - the arriving message is discarded
+
+Public classes:
+    MessageQueue
+"""
+
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+
+class MessageQueue():
+    """ Bounded single-producer queue with explicit overflow policies.
+
+        Every slot holds (sequence number, message); with 'drop_oldest'
+        the producer may overwrite a slot being read, the consumer detects
+        it by the sequence number and skips to the oldest message still
+        present.
+
+        Public methods:
+
+            put()                       - append a message (producer only)
+            get()                       - remove the oldest message, optionally waiting
+            get_nowait()                - remove the oldest message without waiting
+            close()                     - wake up and release all waiting threads
+            stats()                     - counters as a dictionary
+
+        Public attributes:
+
+            capacity                    - maximal number of queued messages
+            overflow                    - the overflow policy
+            dropped                     - number of messages lost by overflow
+            high_water                  - largest number of queued messages
+            put_count                   - number of messages offered by the producer
+    """
+    def __init__(self, capacity:int=256, overflow:str='drop_oldest'):
+        """
+        Initializes an empty MessageQueue.
+
+        :param capacity: Maximal number of queued messages, defaults to 256.
+        :type capacity: int, optional
+        :param overflow: Overflow policy, 'block', 'drop_oldest' or 'drop_newest', defaults to 'drop_oldest'.
+        :type overflow: str, optional
+        :raises ValueError: If the capacity or the overflow policy is not valid.
+        """
+        if capacity < 1:
+            raise ValueError(f"capacity={capacity} is not valid, valid values are >= 1.")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow={overflow} is not valid, valid values {list(OVERFLOW_POLICIES)}.")
+        self._logger = logging.getLogger(__name__)
+        self.capacity = capacity
+        self.overflow = overflow
+        self._slots = [None]*capacity
+        # monotonic counters, the slot of a message is its counter modulo the capacity
+        self._head = 0
+        self._tail = 0
+        self._consumer_lock = threading.Lock()
+        self._not_empty = threading.Condition()
+        self._not_full = threading.Condition()
+        self._consumers_waiting = 0
+        self._producer_waiting = False
+        self._closed = False
+        self._overflowing = False
+        # 'drop_newest' drops are counted by the producer, 'drop_oldest' drops by the consumer (skipped messages)
+        self._dropped = 0
+        self._skipped = 0
+        self.high_water = 0
+        self.put_count = 0
+
+
+    @property
+    def dropped(self) -> int:
+        """ Number of messages lost by overflow, including overwritten messages not yet skipped by a consumer. """
+        return self._dropped + self._skipped + max(0, self._tail - self._head - self.capacity)
+
+
+    def __len__(self) -> int:
+        return min(self._tail - self._head, self.capacity)
+
+
+    def put(self, message) -> bool:
+        """
+        Appends a message, applying the overflow policy if the queue is full.
+
+        Must be called from a single thread (the receiver thread).
+
+        :param message: The message.
+        :type message: object
+        :return: True if the message was queued, False if it was dropped ('drop_newest') or the queue is closed.
+        :rtype: bool
+        """
+        self.put_count += 1
+        tail = self._tail
+        if tail - self._head >= self.capacity:
+            if self.overflow == 'block':
+                with self._not_full:
+                    self._producer_waiting = True
+                    self._not_full.wait_for(lambda: self._tail - self._head < self.capacity or self._closed)
+                    self._producer_waiting = False
+            elif self.overflow == 'drop_newest':
+                self._dropped += 1
+                self._on_overflow()
+                return False
+            else:
+                # the slot of the oldest message is overwritten
+                self._on_overflow()
+        if self._closed:
+            return False
+        self._slots[tail % self.capacity] = (tail, message)
+        self._tail = tail + 1
+        self.high_water = max(self.high_water, min(tail + 1 - self._head, self.capacity))
+        if self._consumers_waiting:
+            with self._not_empty:
+                self._not_empty.notify()
+        return True
+
+
+    def _on_overflow(self):
+        """ Logs the start of an overflow. """
+        if not self._overflowing:
+            self._overflowing = True
+            self._logger.info("MessageQueue.put() -> full (capacity=%d, overflow=%s)", self.capacity, self.overflow)
+
+
+    def get_nowait(self):
+        """
+        Removes the oldest message without waiting.
+
+        :return: The message, None if the queue is empty.
+        :rtype: object
+        """
+        with self._consumer_lock:
+            while True:
+                head, tail = self._head, self._tail
+                if head == tail:
+                    return None
+                if tail - head > self.capacity:
+                    # 'drop_oldest' overwrote the messages since head
+                    self._skipped += tail - self.capacity - head
+                    head = tail - self.capacity
+                sequence, message = self._slots[head % self.capacity]
+                if sequence != head:
+                    # overwritten while being read, retry from the new oldest message
+                    self._skipped += 1
+                    self._head = head + 1
+                    continue
+                # the slot is not cleared, with 'drop_oldest' the producer may already reuse it
+                self._head = head + 1
+                self._overflowing = False
+                if self._producer_waiting:
+                    with self._not_full:
+                        self._not_full.notify()
+                return message
+
+
+    def get(self, timeout_seconds:float=None):
+        """
+        Removes the oldest message, waiting for one if the queue is empty.
+
+        :param timeout_seconds: The timeout period in seconds, None blocks until a message or close(), defaults to None.
+        :type timeout_seconds: float, optional
+        :return: The message, None on timeout or if the queue is closed.
+        :rtype: object
+        """
+        deadline = None if timeout_seconds is None else time.monotonic() + timeout_seconds
+        while True:
+            message = self.get_nowait()
+            if message is not None or self._closed:
+                return message
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            with self._not_empty:
+                self._consumers_waiting += 1
+                try:
+                    self._not_empty.wait_for(lambda: self._tail != self._head or self._closed, timeout=remaining)
+                finally:
+                    self._consumers_waiting -= 1
+
+
+    def close(self):
+        """
+        Closes the queue, wakes up the waiting consumers and the producer.
+        Later put() calls are ignored, queued messages can still be read.
+        """
+        self._closed = True
+        for condition in (self._not_empty, self._not_full):
+            with condition:
+                condition.notify_all()
+
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the queue.
+
+        :return: {'capacity', 'overflow', 'queued', 'put', 'dropped', 'high_water'}.
+        :rtype: dict
+        """
+        return {'capacity':self.capacity, 'overflow':self.overflow, 'queued':len(self),
+                'put':self.put_count, 'dropped':self.dropped, 'high_water':self.high_water}
@@ -1,69 +1,217 @@
 
-import collections 
 import time
-from PyQt5.QtCore import QObject, pyqtSignal
-from ...packet.packet import parse_buffer
+from ...packet.packet import PacketDecoder
+from ...packet.pkt_formats import PUSH_FORMATS
+from .message_queue import MessageQueue
 
 import logging
 
-class Receiver(QObject):
+# commands of the packets pushed by the firmware without a request (e.g. PKT_IMU_FRAME)
+_PUSH_COMMANDS = frozenset(PUSH_FORMATS)
+
+class Receiver():
     """
     This object represetns a separated thread independently listening to 
-    incoming serial communication. The incoming data are stored in rotary buffer
-    self.list_messages (the last message is the latest message).
+    incoming serial communication (the thread is provided by the Datalink 
+    backend, see datalink.backend). The decoded payloads are passed to the 
+    callbacks, a reply no callback consumed (returned True for) is stored in 
+    the bounded queue self.messages (see receiver.message_queue), a message is 
+    lost only by the overflow policy of the queue and is counted in 
+    self.messages.dropped. Threads waiting in wait_for_message() are woken up 
+    as soon as a payload is queued. Packets pushed by the firmware (e.g. 
+    PKT_IMU_FRAME) are delivered only to the callbacks.
+
+    The data are timestamped right after the read returns, before they are 
+    decoded, so the receive times do not include the decoding (self.receive_ns 
+    holds the time.monotonic_ns() of the payload being delivered).
 
     :return: _description_
     :rtype: _type_
     """
-    _interthread_signal = pyqtSignal(bytearray)
-    _counter=0
-    def __init__(self, serial):
+    def __init__(self, serial, queue_capacity:int=256, overflow:str='drop_oldest', crc:bool=False, framing:str='start_end'):
         """
         Initializes the Receiver class with a instantiated serial connection obejct.
 
         :param serial: Instantiated setial connection object.
         :type serial: serial.Serial
+        :param queue_capacity: Maximal number of messages waiting for wait_for_message(), defaults to 256.
+        :type queue_capacity: int, optional
+        :param overflow: Overflow policy of the queue, 'block', 'drop_oldest' or 'drop_newest', defaults to 'drop_oldest'.
+        :type overflow: str, optional
+        :param crc: Decode packets with CRC (see packet.PacketDecoder), defaults to False.
+        :type crc: bool, optional
+        :param framing: Framing of the packets, 'start_end' or 'cobs' (see packet.PacketDecoder), defaults to 'start_end'.
+        :type framing: str, optional
         """
-        super().__init__()
         self._logger = logging.getLogger(__name__)
-        self._logger.info(f"Receiver.__init__(serial={serial.name})")
+        self._logger.info("Receiver.__init__(serial=%s)", serial.name)
         self._serial = serial
-        self._buffer = bytearray()
-        self.list_messages=collections.deque(maxlen=2)
-        for i in range(2):
-            self.list_messages.append({'time':time.time(), 'message':''})
+        self._decoder = PacketDecoder(crc=crc, framing=framing)
+        self.messages = MessageQueue(capacity=queue_capacity, overflow=overflow)
+        self._running = True
+        self._callbacks = []
+        # time.monotonic_ns() of the read of the payload passed to the callbacks
+        self.receive_ns = None
+        # stage timing (see datalink.metrics), None while disabled
+        self._metrics = None
             
 
     def __del__(self):
         """
         Destructor for the Receiver class.
         """
-        self._logger.info(f"Receiver.__del__()")
+        self._logger.info("Receiver.__del__()")
+
+
+    def wait_for_message(self, since_time:float, timeout_seconds:float) -> dict:
+        """
+        Blocks until a message newer than since_time is received.
+
+        Queued messages received before since_time are discarded (they are 
+        replies nobody waited for).
+
+        :param since_time: The time since the received message is considered as new.
+        :type since_time: float
+        :param timeout_seconds: The timeout period in seconds.
+        :type timeout_seconds: float
+        :return: The oldest new message, None on timeout.
+        :rtype: dict
+        """
+        deadline = time.monotonic() + timeout_seconds
+        while True:
+            message = self.messages.get(timeout_seconds=max(0.0, deadline - time.monotonic()))
+            if message is None or message['time'] > since_time:
+                return message
+
+
+    def add_callback(self, callback):
+        """
+        Registers a callback executed (in the receiver thread) for every decoded payload.
+
+        A callback returning True consumes the payload, it is not queued for 
+        wait_for_message() (e.g. a reply matched to a pipelined request).
+
+        :param callback: Function called as callback(payload, receive_time).
+        :type callback: callable
+        """
+        self._callbacks.append(callback)
+
+
+    def set_metrics(self, metrics):
+        """
+        Enables the timing of the decoding and the counters of received packets.
+
+        :param metrics: The metrics recorded to, None disables the recording.
+        :type metrics: hst.datalink.metrics.Metrics
+        """
+        self._metrics = metrics
+
+
+    @property
+    def discarded_bytes(self) -> int:
+        """ Number of received bytes not decoded into packets (see PacketDecoder). """
+        return self._decoder.discarded_bytes
+
+
+    def reset(self):
+        """
+        Discards the buffered incomplete packet, e.g. after the baudrate is changed.
+        """
+        self._decoder.reset()
+
+
+    def set_crc(self, crc:bool):
+        """
+        Switches between packets with and without CRC (see packet.PacketDecoder).
+
+        :param crc: Decode packets with CRC.
+        :type crc: bool
+        """
+        self._decoder.set_crc(crc)
+
+
+    def set_framing(self, framing:str):
+        """
+        Switches the framing of the packets (see packet.PacketDecoder).
+
+        :param framing: Framing of the packets, 'start_end' or 'cobs'.
+        :type framing: str
+        """
+        self._decoder.set_framing(framing)
+
+
+    def stop(self):
+        """
+        Requests the run() loop to exit, interrupts a pending blocking read.
+        """
+        self._running = False
+        # releases the thread blocked on a full queue (overflow 'block')
+        self.messages.close()
+        if hasattr(self._serial, 'cancel_read'):
+            self._serial.cancel_read()
 
 
     def run(self):
         """ Runs in a separate thread, reads the incomming serial communication.
         
-        It is responsible for detecting the packets and managing the buffer 
-        storing raw incoming serial communication.
+        It is responsible for detecting the packets in the raw incoming 
+        serial communication (see packet.PacketDecoder).
+
+        The thread sleeps in a blocking read until data arrive. The read 
+        returns at the latest after the serial timeout, so that stop() 
+        is noticed even if the read cannot be cancelled.
         
         """
-        self._logger.info(f"Receiver.run() executed")
-        while True:
-            if self._serial.inWaiting() > 0:
-                # Read the data and append it to the raw_data buffer
-                data = bytearray(self._serial.read(self._serial.in_waiting))
-                self._buffer.extend(data)
-                # Detect all packets present in the buffer
-                packet_detected = True
-                while packet_detected:
-                    # Detect packet
-                    self._buffer, payload = parse_buffer(self._buffer)
-                    self._logger.debug(f"Receiver.run() payload: '{payload}'")
-                    # Parse packet
-                    if len(payload) > 0:
-                        packet_detected = True
-                        self.list_messages.append({'time':time.time(), 'payload':payload})
-                        self._logger.debug(f"Receiver.run()->self.list_messages.append({self.list_messages[-1]})")
-                    else:
-                        packet_detected = False
\ No newline at end of file
+        self._logger.info("Receiver.run() executed")
+        while self._running:
+            # Block until the first byte arrives (or timeout), then take all available data
+            data = self._serial.read(1)
+            if len(data) == 0:
+                continue
+            if self._serial.in_waiting > 0:
+                data += self._serial.read(self._serial.in_waiting)
+            self.feed(data, time.time(), time.monotonic_ns())
+        self._logger.info("Receiver.run() finished")
+
+
+    def feed(self, data:bytes, receive_time:float=None, receive_ns:int=None):
+        """ Detects all packets present in the received data and delivers them.
+
+        The callbacks are executed and the messages queued in the calling 
+        thread, run() calls it for every read, an external I/O loop 
+        (see datalink.multiplexer) calls it instead of run().
+
+        :param data: Received data.
+        :type data: bytes
+        :param receive_time: time.time() of the read, defaults to the time of the call.
+        :type receive_time: float, optional
+        :param receive_ns: time.monotonic_ns() of the read, defaults to the time of the call.
+        :type receive_ns: int, optional
+        """
+        if receive_time is None:
+            receive_time = time.time()
+        self.receive_ns = time.monotonic_ns() if receive_ns is None else receive_ns
+        debug = self._logger.isEnabledFor(logging.DEBUG)
+        payloads = self._decoder.feed(data)
+        metrics = self._metrics
+        if metrics is not None:
+            decode_ns = time.monotonic_ns() - self.receive_ns
+            metrics.count_packets('rx', len(payloads), len(data))
+            for payload in payloads:
+                metrics.record('decode', payload[0], decode_ns)
+        for payload in payloads:
+            message = {'time':receive_time, 'payload':payload}
+            if debug:
+                self._logger.debug("Receiver.feed()->self.messages.put(%s)", message)
+            consumed = False
+            for callback in self._callbacks:
+                try:
+                    if callback(payload, message['time']) is True:
+                        consumed = True
+                except Exception:
+                    # a failing callback must not stop the receiver thread
+                    self._logger.exception("Receiver.feed() -> callback %s failed, payload='%s'", callback, payload)
+            # only replies nobody consumed wait for receive(), pushes are not replies,
+            # after the callbacks, with overflow 'block' a full queue stalls the thread
+            if not consumed and payload[0] not in _PUSH_COMMANDS:
+                self.messages.put(message)
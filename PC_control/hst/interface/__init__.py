@@ -1,6 +1,9 @@
 import logging
 from ..config import LOGGER_LEVEL
 from .interface import HST
+from .trajectory import TrajectoryUploader
+from .pool import TurretPool
+from .group import TurretGroup
 
 # Initialize logger with class name
 logger = logging.getLogger(__name__)
@@ -13,4 +16,16 @@ console_handler.setFormatter(formatter)
 # Add console handler to logger
 logger.addHandler(console_handler)
 # Set debugging level
-logger.setLevel(LOGGER_LEVEL)
\ No newline at end of file
+logger.setLevel(LOGGER_LEVEL)
+
+
+def __getattr__(name):
+    # asyncio is imported only by applications using AsyncHST
+    if name == 'AsyncHST':
+        from .async_interface import AsyncHST
+        return AsyncHST
+    # numpy is imported only by applications using TelemetryStream
+    if name == 'TelemetryStream':
+        from .telemetry import TelemetryStream
+        return TelemetryStream
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
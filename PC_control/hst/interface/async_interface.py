@@ -0,0 +1,144 @@
+import logging
+from ..datalink.async_datalink import open_async_datalink
+from .interface import HST
+
+
+class AsyncHST(HST):
+    """ asyncio API HST class
+        This is the asyncio variant of HST, every cmd_*() method returns
+        an awaitable resolving to the same dictionary as HST.
+
+        The class reuses the encoding and decoding of HST, only the
+        transport differs: AsyncDatalink is driven by the event loop,
+        hence a single loop can serve several turrets without a thread
+        per serial port. Commands awaited concurrently (e.g. asyncio.gather())
+        are pipelined.
+
+        Public methods:
+
+            create()                    - constructor (coroutine)
+            close()
+            cmd_*()                     - see HST
+
+        The blocking helpers of HST built on a series of commands (sync_clock(),
+        check_link(), negotiate_baudrate()) and the metrics (enable_metrics(),
+        disable_metrics()) are not supported and raise RuntimeError.
+
+        Example:
+
+            turret = await AsyncHST.create("/dev/ttyACM0", 115200)
+            response = await turret.cmd_enable_cnc()
+    """
+    def __init__(self, datalink):
+        """
+        Initializes the AsyncHST API class with a connected AsyncDatalink,
+        use AsyncHST.create() instead.
+
+        :param datalink: Connected asyncio datalink.
+        :type datalink: hst.datalink.async_datalink.AsyncDatalink
+        """
+        self._logger = logging.getLogger(__name__)
+        self._datalink = datalink
+        self._init_state()
+
+
+    @classmethod
+    async def create(cls, port:str, baudrate:int, max_in_flight:int=8, crc:bool=False, framing:str='start_end'):
+        """
+        Opens the serial port on the running event loop and creates the AsyncHST.
+
+        :param port: The port to be used for the serial connection.
+        :type port: str
+        :param baudrate: The baudrate for the serial connection.
+        :type baudrate: int
+        :param max_in_flight: Maximal number of commands awaiting reply, defaults to 8.
+        :type max_in_flight: int, optional
+        :param crc: Send and receive packets with CRC, defaults to False.
+        :type crc: bool, optional
+        :param framing: Framing of the packets, 'start_end' or 'cobs', defaults to 'start_end'.
+        :type framing: str, optional
+        :return: Connected AsyncHST.
+        :rtype: AsyncHST
+        """
+        datalink = await open_async_datalink(port, baudrate, max_in_flight=max_in_flight, crc=crc, framing=framing)
+        return cls(datalink)
+
+
+    def close(self):
+        """
+        Closes the serial connection.
+        """
+        self._datalink.close()
+
+
+    def sync_clock(self, *args, **kwargs):
+        """
+        Not supported on AsyncHST, the replies carry no host timestamps.
+
+        :raises RuntimeError: Always.
+        """
+        raise RuntimeError("sync_clock() is not supported on AsyncHST, use HST.")
+
+
+    def check_link(self, *args, **kwargs):
+        """
+        Not supported on AsyncHST, the replies carry no host timestamps.
+
+        :raises RuntimeError: Always.
+        """
+        raise RuntimeError("check_link() is not supported on AsyncHST, use HST.")
+
+
+    def negotiate_baudrate(self, *args, **kwargs):
+        """
+        Not supported on AsyncHST, the baudrate of the asyncio transport is not switched.
+
+        :raises RuntimeError: Always.
+        """
+        raise RuntimeError("negotiate_baudrate() is not supported on AsyncHST, use HST.")
+
+
+    def enable_metrics(self, *args, **kwargs):
+        """
+        Not supported on AsyncHST, AsyncDatalink records no stage timing.
+
+        :raises RuntimeError: Always.
+        """
+        raise RuntimeError("enable_metrics() is not supported on AsyncHST, use HST.")
+
+
+    def disable_metrics(self, *args, **kwargs):
+        """
+        Not supported on AsyncHST, see enable_metrics().
+
+        :raises RuntimeError: Always.
+        """
+        raise RuntimeError("disable_metrics() is not supported on AsyncHST, use HST.")
+
+
+    async def _send_and_receive_message(self, payload:bytearray, wait_for_response:bool=True, timeout_seconds:float=2.0, pipelined:bool=False) -> dict:
+        """
+        Sends a payload and awaits a response.
+
+        :param payload: The payload to be sent.
+        :type payload: bytearray
+        :param wait_for_response: Whether to wait for a response, defaults to True.
+        :type wait_for_response: bool, optional
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :param pipelined: Ignored, concurrently awaited commands are always pipelined, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data.
+        :rtype: dict
+        """
+        # the request is tracked even if the response is not awaited,
+        # so that its reply is not mistaken for a reply of a later request
+        future = await self._datalink.submit(payload, timeout_seconds=timeout_seconds)
+        if not wait_for_response:
+            self._logger .info("_send_and_receive_message() -> response not requested")
+            return {'received':False}
+        payload = await future
+        if payload is None:
+            self._logger .warning("_send_and_receive_message() -> TIMEOUT")
+            return {'received':False}
+        return self._decode_response(payload)
@@ -0,0 +1,188 @@
+import collections
+import threading
+import logging
+""" Mapping of the device time to the host clock.
+
+    Every reply and pushed packet carries micros() of the firmware at its
+    transmission ('MICROS', see packet.codec). The device clock runs from
+    its own crystal, it is offset from the host clock and drifts by tens
+    of ppm. The ClockEstimator maps the device time onto time.monotonic_ns()
+    of the host from NTP-style exchanges (see HST.sync_clock()):
+
+        send_ns   - time.monotonic_ns() when the request is sent
+        micros    - device time in the reply
+        receive_ns - time.monotonic_ns() when the reply is read
+
+    The device time is assumed at the midpoint of the round trip, corrected
+    by the difference of the transmission times of the reply and of the
+    request (the reply is longer), the error is bounded by half of the
+    round trip. The samples of one sync are
+    filtered to the one with the shortest round trip (the least delayed by
+    the host scheduler and the serial driver), and a line (offset + drift)
+    is fitted by least squares through the filtered samples of the last
+    syncs. The drift is resolved only by syncs spread over time, call
+    HST.sync_clock() periodically (e.g. every few seconds) to track it.
+
+    micros() wraps around every 2**32 us (71.6 minutes), device times are
+    unwrapped against the latest filtered sample, i.e. they are mapped
+    correctly within 35 minutes of the last sync.
+
+        turret.sync_clock()
+        turret.clock.to_host_ns(response['MICROS'])
+
+Public classes:
+    ClockEstimator
+"""
+
+_MICROS_MODULO = 1 << 32
+_MICROS_HALF = 1 << 31
+
+
+class ClockEstimator():
+    """ Offset and drift of the device clock against time.monotonic_ns().
+
+        Public methods:
+
+            add_sample()                - one ping exchange
+            update()                    - filter the samples added since the last update and refit
+            reset()
+            to_host_ns()                - device time (micros) to time.monotonic_ns()
+
+        Public attributes (read-only properties):
+
+            synchronised                - True after the first update()
+            offset_ns                   - host time minus device time at the latest sync
+            drift_ppm                   - rate of the device clock against the host clock, > 0 if it runs fast
+            rtt_ns                      - round trip of the latest filtered sample
+    """
+    def __init__(self, history:int=16):
+        """
+        Initializes the ClockEstimator.
+
+        :param history: Number of filtered samples the line is fitted through, defaults to 16.
+        :type history: int, optional
+        :raises ValueError: If the history is smaller than 1.
+        """
+        if history < 1:
+            raise ValueError(f"history={history} is not valid, valid values are >= 1.")
+        self._logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._history = history
+        self.reset()
+
+
+    def reset(self):
+        """
+        Discards all samples, the estimator is not synchronised afterwards.
+        """
+        with self._lock:
+            self._pending = []
+            # filtered samples (unwrapped micros, midpoint ns, round trip ns)
+            self._points = collections.deque(maxlen=self._history)
+            # reference of unwrapping: (raw micros, unwrapped micros)
+            self._reference = None
+            # fitted line host_ns = host_mean + slope*(micros - micros_mean) and the reference,
+            # replaced as a whole so that to_host_ns() needs no lock
+            self._fit = None
+
+
+    @property
+    def synchronised(self) -> bool:
+        return self._fit is not None
+
+
+    @property
+    def offset_ns(self) -> int:
+        return None if self._fit is None else self.to_host_ns(self._fit[3]) - 1000*self._fit[3]
+
+
+    @property
+    def drift_ppm(self) -> float:
+        return None if self._fit is None else (1000.0/self._fit[2] - 1.0)*1e6
+
+
+    @property
+    def rtt_ns(self) -> int:
+        return None if not self._points else self._points[-1][2]
+
+
+    def add_sample(self, send_ns:int, micros:int, receive_ns:int, asymmetry_ns:int=0):
+        """
+        Adds one ping exchange, used by the next update().
+
+        :param send_ns: time.monotonic_ns() when the request was sent.
+        :type send_ns: int
+        :param micros: Device time in the reply.
+        :type micros: int
+        :param receive_ns: time.monotonic_ns() when the reply was read.
+        :type receive_ns: int
+        :param asymmetry_ns: Transmission time of the reply minus that of the request, defaults to 0.
+        :type asymmetry_ns: int, optional
+        :raises ValueError: If the reply was received before the request was sent.
+        """
+        if receive_ns < send_ns:
+            raise ValueError(f"receive_ns={receive_ns} is not valid, valid values are >= send_ns={send_ns}.")
+        with self._lock:
+            self._pending.append((send_ns, micros, receive_ns, asymmetry_ns))
+
+
+    def update(self) -> bool:
+        """
+        Keeps the sample with the shortest round trip of those added since
+        the last update and refits the offset and drift.
+
+        :return: True if a sample was added since the last update.
+        :rtype: bool
+        """
+        with self._lock:
+            if not self._pending:
+                return False
+            send_ns, micros, receive_ns, asymmetry_ns = min(self._pending, key=lambda sample: sample[2] - sample[0])
+            self._pending = []
+            unwrapped = micros if self._reference is None else self._unwrap(micros)
+            self._reference = (micros, unwrapped)
+            self._points.append((unwrapped, (send_ns + receive_ns - asymmetry_ns)//2, receive_ns - send_ns))
+            self._fit = self._fit_line() + self._reference
+        self._logger.info("ClockEstimator.update() -> drift %.2f ppm, round trip %d ns, %d samples",
+                          self.drift_ppm, receive_ns - send_ns, len(self._points))
+        return True
+
+
+    def _unwrap(self, micros):
+        """ Unwraps a device time against the reference, within +-2**31 us. """
+        raw, unwrapped = self._reference
+        return unwrapped + ((micros - raw + _MICROS_HALF) % _MICROS_MODULO - _MICROS_HALF)
+
+
+    def _fit_line(self) -> tuple:
+        """ Least squares line through the filtered samples: (micros_mean, host_mean, ns per us). """
+        micros_mean = sum(point[0] for point in self._points)//len(self._points)
+        host_mean = sum(point[1] for point in self._points)//len(self._points)
+        if len(self._points) < 2 or self._points[-1][0] == self._points[0][0]:
+            # offset only, the device clock is assumed to run at the host rate
+            return micros_mean, host_mean, 1000.0
+        sum_xy = sum((point[0] - micros_mean)*(point[1] - host_mean) for point in self._points)
+        sum_xx = sum((point[0] - micros_mean)**2 for point in self._points)
+        return micros_mean, host_mean, sum_xy/sum_xx
+
+
+    def to_host_ns(self, micros):
+        """
+        Maps device times onto the host clock.
+
+        :param micros: Device time (MICROS of a reply) or an array of them.
+        :type micros: int or np.ndarray
+        :raises RuntimeError: If the estimator is not synchronised.
+        :return: time.monotonic_ns() of the host, int64 array for an array.
+        :rtype: int or np.ndarray
+        """
+        fit = self._fit
+        if fit is None:
+            raise RuntimeError("ClockEstimator is not synchronised, call HST.sync_clock() first.")
+        micros_mean, host_mean, slope, raw, unwrapped = fit
+        if hasattr(micros, 'astype'):
+            # np.ndarray, numpy is imported only by applications using it
+            delta = (micros.astype('int64') - raw + _MICROS_HALF) % _MICROS_MODULO - _MICROS_HALF + (unwrapped - micros_mean)
+            return host_mean + (slope*delta).round().astype('int64')
+        delta = (int(micros) - raw + _MICROS_HALF) % _MICROS_MODULO - _MICROS_HALF + (unwrapped - micros_mean)
+        return host_mean + round(slope*delta)
@@ -0,0 +1,156 @@
+import logging
+from .interface import HST
+
+
+class TurretGroup():
+    """ Commands executed by several turrets at the same time.
+
+        Calling HST.cmd_*() of one turret after another spreads the requests
+        by the time Python needs to validate, encode and write every one of
+        them. A burst prepares the packets of all turrets first (the
+        datalinks hold them back, see Datalink.hold()) and then writes them
+        in a tight loop, one write per turret. The replies are awaited
+        afterwards and the spread of the writes and of the ACKs is reported.
+
+        The skew left by the burst (the transmission and parsing of the
+        packets) is reduced by the two-phase commands: arm() stores the
+        targets in every turret, trigger() bursts the shortest packet of
+        the protocol (CMD_TRIGGER), which applies them as soon as it is
+        parsed, so the motion starts within one ISR tick of its arrival.
+
+            group = TurretGroup({'left': hst_left, 'right': hst_right})
+            group.arm({'left': {'x': (100, True)}, 'right': {'x': (100, False)}})
+            report = group.trigger()
+            report['ack_skew_seconds']
+
+        Public methods:
+
+            TurretGroup()               - constructor
+            burst()                     - a command per turret written in a single burst
+            cmd_set_target_freq()       - burst of HST.cmd_set_target_freq()
+            arm()                       - HST.cmd_arm_targets() of every turret
+            trigger()                   - burst of HST.cmd_trigger()
+    """
+    def __init__(self, turrets:dict):
+        """
+        Initializes the group.
+
+        :param turrets: HST handles keyed by the name of the turret (e.g. a TurretPool).
+        :type turrets: dict
+        :raises ValueError: If no turret is given.
+        """
+        self._logger = logging.getLogger(__name__)
+        self._turrets = {name: turrets[name] for name in turrets}
+        if not self._turrets:
+            raise ValueError(f"turrets={turrets} is not valid, at least one turret is required.")
+
+
+    def _arguments(self, arguments:dict) -> dict:
+        """ Positional arguments keyed by the name of the turret, every turret without arguments if None. """
+        if arguments is None:
+            return {name: () for name in self._turrets}
+        for name in arguments:
+            if name not in self._turrets:
+                raise ValueError(f"name={name} is not valid, valid values {list(self._turrets)}.")
+        return {name: args if isinstance(args, tuple) else (args,) for name, args in arguments.items()}
+
+
+    def burst(self, command:str, arguments:dict=None, timeout_seconds:float=2.0) -> dict:
+        """
+        Sends a command to several turrets in a single burst and waits for all replies.
+
+        The arguments of every turret are validated and encoded before
+        the first packet is written, no turret receives the command if
+        an argument is not valid.
+
+        :param command: Name of the HST method, e.g. 'cmd_set_target_freq'.
+        :type command: str
+        :param arguments: Positional arguments of the command keyed by the name of the turret,
+            only the turrets present receive the command, None sends the command
+            without arguments to every turret, defaults to None.
+        :type arguments: dict, optional
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :raises ValueError: If the command is not a cmd_*() method of HST or a name is not valid.
+        :return: {'responses': {name: response}, 'write_time': {name: time}, 'ack_time': {name: time},
+            'write_skew_seconds', 'ack_skew_seconds'}, the times are time.time() of the host,
+            a turret without reply has no 'ack_time', the skew is None without replies.
+        :rtype: dict
+        """
+        if not command.startswith('cmd_') or not hasattr(HST, command):
+            raise ValueError(f"command={command} is not valid, valid values are the cmd_*() methods of HST.")
+        arguments = self._arguments(arguments)
+        datalinks = {name: self._turrets[name]._datalink for name in arguments}
+        futures = {}
+        try:
+            for datalink in datalinks.values():
+                datalink.hold()
+            for name, args in arguments.items():
+                futures[name] = getattr(self._turrets[name], command)(*args, timeout_seconds=timeout_seconds, pipelined=True)
+        except BaseException:
+            # no turret receives the command if an argument is not valid
+            for datalink in datalinks.values():
+                datalink.discard()
+            for name, future in futures.items():
+                self._turrets[name]._pipeline.cancel(future)
+            raise
+        # the burst
+        write_time = {name: datalink.release() for name, datalink in datalinks.items()}
+        responses = {name: future.result() for name, future in futures.items()}
+        ack_time = {name: response['receive_time'] for name, response in responses.items() if response['received']}
+        for name, response in responses.items():
+            if not response['received']:
+                self._logger.warning("TurretGroup.burst(command=%s) -> '%s' TIMEOUT", command, name)
+        report = {
+            'responses': responses,
+            'write_time': write_time,
+            'ack_time': ack_time,
+            'write_skew_seconds': max(write_time.values()) - min(write_time.values()),
+            'ack_skew_seconds': max(ack_time.values()) - min(ack_time.values()) if ack_time else None,
+        }
+        self._logger.info("TurretGroup.burst(command=%s) -> write skew %s s, ACK skew %s s", command, report['write_skew_seconds'], report['ack_skew_seconds'])
+        return report
+
+
+    def cmd_set_target_freq(self, targets:dict, timeout_seconds:float=2.0) -> dict:
+        """
+        Sets the target frequency of a PFM of several turrets in a single burst.
+
+        :param targets: (which_pfm, freq, direction) keyed by the name of the turret.
+        :type targets: dict
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :return: The report of burst().
+        :rtype: dict
+        """
+        return self.burst('cmd_set_target_freq', targets, timeout_seconds=timeout_seconds)
+
+
+    def arm(self, targets:dict, timeout_seconds:float=2.0) -> dict:
+        """
+        Arms the target frequencies of several turrets (HST.cmd_arm_targets()).
+
+        :param targets: Targets of HST.cmd_arm_targets() keyed by the name of the turret,
+            e.g. {'left': {'x': (freq, direction)}, 'right': {'x': (freq, direction)}}.
+        :type targets: dict
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :return: The report of burst().
+        :rtype: dict
+        """
+        return self.burst('cmd_arm_targets', targets, timeout_seconds=timeout_seconds)
+
+
+    def trigger(self, names:list=None, timeout_seconds:float=2.0) -> dict:
+        """
+        Applies the armed targets of several turrets (HST.cmd_trigger()) in a single burst.
+
+        :param names: Names of the triggered turrets, defaults to all turrets.
+        :type names: list, optional
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :return: The report of burst(), 'ACK':False for turrets with nothing armed.
+        :rtype: dict
+        """
+        names = list(self._turrets) if names is None else names
+        return self.burst('cmd_trigger', {name: () for name in names}, timeout_seconds=timeout_seconds)
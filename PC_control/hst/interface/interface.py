@@ -2,8 +2,12 @@
 import time
 import logging
 from ..datalink.datalink import Datalink
+from ..datalink.metrics import Metrics
 from ..packet.pkt_defs import *
-from ..packet.packet import parse_message
+from ..packet.codec import encode_request, decode_reply, REPLY_TIMESTAMP_STRUCT
+from ..packet.packet import encode_packet
+from .pipeline import Pipeline
+from .clock import ClockEstimator
 
 class HST():
     """ API HST class
@@ -24,10 +28,37 @@ class HST():
             cmd_disable_cnc()
             cmd_set_delta_steps()
             cmd_get_isr_freq()
+            cmd_set_targets()           - target frequency of several PFMs in one command
+            cmd_set_targets_delta()     - target delta of several PFMs in one command
+            cmd_queue_segment()         - append a segment to the motion queue
+            cmd_get_queue_status()
+            cmd_clear_queue()
+            cmd_subscribe_imu()         - IMU frames pushed by the firmware
+            cmd_arm_targets()           - target frequencies applied by cmd_trigger()
+            cmd_trigger()
+            cmd_ping()                  - round trip with the device time
+            sync_clock()                - estimate the device clock (self.clock) from pings
+            cmd_set_baudrate()          - baudrate of the device (see negotiate_baudrate())
+            check_link()                - quality of the serial line measured by pings
+            negotiate_baudrate()        - move both ends to the highest working baudrate
+            add_listener()              - callback for every received payload
+            close()                     - stop the threads and close the serial connection
+            enable_metrics()            - per-stage latency histograms (self.metrics)
+            disable_metrics()
+            stats()                     - snapshot of the metrics
 
+        Every cmd_*() method either blocks until the reply is received, or 
+        (pipelined=True) returns immediately with a concurrent.futures.Future 
+        resolving to the reply. Up to max_in_flight pipelined commands are 
+        sent before the first reply is received.
+
+        Every response carries the device time of the reply 'MICROS', once 
+        the clock is synchronised (sync_clock()) it is mapped to 
+        time.monotonic_ns() of the host as 'device_time_ns'.
     
     """
-    def __init__(self, port:str, baudrate:int):
+    def __init__(self, port:str, baudrate:int, max_in_flight:int=8, backend='thread', capture:str=None, datalink:Datalink=None, crc:bool=False, 
+                 framing:str='start_end'):
         """
         Initializes the HST API class with a specified port and baudrate.
 
@@ -35,17 +66,59 @@ class HST():
         :type port: str
         :param baudrate: The baudrate for the serial connection.
         :type baudrate: int
+        :param max_in_flight: Maximal number of commands awaiting reply, defaults to 8.
+        :type max_in_flight: int, optional
+        :param backend: Backend running the receiver loop, 'thread' or 'qt' (see datalink.backend), defaults to 'thread'.
+        :type backend: str or object, optional
+        :param capture: Path of a capture file recording the sent and received payloads (see datalink.capture), defaults to None.
+        :type capture: str, optional
+        :param datalink: Already opened datalink (e.g. of a TurretPool), port, baudrate, backend, 
+            capture, crc and framing are then ignored, defaults to None.
+        :type datalink: hst.datalink.Datalink, optional
+        :param crc: Send and receive packets with CRC, corrupted replies are discarded 
+            (see datalink.Datalink), defaults to False.
+        :type crc: bool, optional
+        :param framing: Framing of the packets, 'start_end' or 'cobs' (see datalink.Datalink), defaults to 'start_end'.
+        :type framing: str, optional
         """
         self._logger = logging.getLogger(__name__)
-        self._datalink = Datalink(port, baudrate)
-        self._pfm_to_int={'x':PFM_X, 'y':PFM_Y, 'z':PFM_Z, 'a':PFM_A}
+        if datalink is None:
+            datalink = Datalink(port, baudrate, backend=backend, capture=capture, crc=crc, framing=framing)
+        self._datalink = datalink
+        self._pipeline = Pipeline(self._datalink, decode=self._decode_response, window=max_in_flight)
+        self._init_state()
+
+
+    def _init_state(self):
+        """
+        Initializes the state shared by HST and its transport variants (see interface.async_interface).
+        """
+        self._pfm_to_int={'x':PFM_X, 'y':PFM_Y, 'z':PFM_Z}
+        self.clock = ClockEstimator()
+        # per-stage latency histograms, None while disabled (see enable_metrics())
+        self.metrics = None
         
         
     def __del__(self):
         """
         Destructor for the HST API class, cleans up the datalink object.
         """
+        if hasattr(self, '_pipeline'):
+            self._pipeline.close()
         del self._datalink
+
+
+    def close(self):
+        """
+        Resolves the commands in flight as not received, stops the receiver and 
+        timeout threads and closes the serial connection.
+
+        The threads hold references to the HST, so deleting it does not release 
+        the port, call close() when done. Calling it again has no effect.
+        """
+        self._logger.info("close()")
+        self._pipeline.close()
+        self._datalink.close()
        
        
     def _which_pfm_to_int(self, which_pfm:str) -> int:
@@ -59,7 +132,7 @@ class HST():
         :rtype: int
         """
         if which_pfm not in self._pfm_to_int.keys():
-            raise ValueError(f"which_pfm={which_pfm} is not valid, valid values ['x', 'y', 'z', 'a'].")
+            raise ValueError(f"which_pfm={which_pfm} is not valid, valid values ['x', 'y', 'z'].")
         return self._pfm_to_int[which_pfm]
     
     
@@ -107,96 +180,119 @@ class HST():
         return False
 
 
-    def _payload_to_dict(self, command:int, data:bytearray) -> dict:
+    def add_listener(self, callback):
         """
-        Converts a payload command and data into a dictionary.
+        Registers a callback executed for every received payload, 
+        including packets pushed by the firmware (e.g. PKT_IMU_FRAME).
+
+        The callback is executed in the receiver thread, it must not block.
+
+        :param callback: Function called as callback(payload, receive_time).
+        :type callback: callable
+        """
+        self._datalink.add_listener(callback)
+
 
-        :param command: The command from the payload.
-        :type command: int
-        :param data: The data from the payload.
-        :type data: bytearray
-        :raises ValueError: If the command is not recognized.
-        :return: A dictionary representation of the payload.
+    def enable_metrics(self, metrics:Metrics=None) -> Metrics:
+        """
+        Enables the per-stage latency histograms and throughput counters (see datalink.metrics).
+
+        :param metrics: The metrics recorded to (e.g. shared by several turrets), defaults to new Metrics.
+        :type metrics: hst.datalink.metrics.Metrics, optional
+        :return: The enabled metrics (self.metrics).
+        :rtype: hst.datalink.metrics.Metrics
+        """
+        self.metrics = Metrics() if metrics is None else metrics
+        self._datalink.set_metrics(self.metrics)
+        self._pipeline.set_metrics(self.metrics)
+        return self.metrics
+
+
+    def disable_metrics(self) -> Metrics:
+        """
+        Disables the per-stage latency histograms.
+
+        :return: The metrics recorded so far, None if they were not enabled.
+        :rtype: hst.datalink.metrics.Metrics
+        """
+        metrics, self.metrics = self.metrics, None
+        self._datalink.set_metrics(None)
+        self._pipeline.set_metrics(None)
+        return metrics
+
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the metrics and of the queue of received messages.
+
+        :raises RuntimeError: If the metrics were never enabled.
+        :return: Metrics.stats() with 'queue' (Datalink.queue_stats()).
         :rtype: dict
         """
-        info = dict()
-        if command == CMD_SET_TARGET_FREQ:
-            info['CMD'] = 'CMD_SET_TARGET_FREQ'
-            info['ACK'] = True if int(data[0])==int.from_bytes(PKT_ACK, byteorder=BYTEORDER) else False
-        elif command == CMD_SET_TARGET_DELTA:
-            info['CMD'] = 'CMD_SET_TARGET_DELTA'
-            info['ACK'] = True if int(data[0])==int.from_bytes(PKT_ACK, byteorder=BYTEORDER) else False
-        elif command == CMD_GET_DELTA_STEPS:
-            info['CMD'] = 'CMD_GET_DELTA_STEPS'
-            if len(data) > 1:
-                info['DELTA'] = int.from_bytes(data[0:4], byteorder=BYTEORDER)
-            else:
-                info['ACK'] = False if int(data[0])==int.from_bytes(PKT_NACK, byteorder=BYTEORDER) else 'ERROR'
-        elif command == CMD_GET_IMU_MEASUREMENT:
-            info['CMD'] = 'CMD_GET_IMU_MEASUREMENT'
-            if len(data) > 1:
-                for idx, value_type in enumerate(['AX', 'AY', 'AZ', 'GX', 'GY', 'GZ', 'MX', 'MY', 'MZ']):
-                    val_start = idx*2
-                    val_end = val_start+2
-                    info[value_type] = int.from_bytes(data[val_start:val_end], byteorder=BYTEORDER)
-            else:
-                info['ACK'] = False if int(data[0])==int.from_bytes(PKT_NACK, byteorder=BYTEORDER) else 'ERROR'
-        elif command == CMD_SET_ISR_FREQ:
-            info['CMD'] = 'CMD_SET_ISR_FREQ'
-            info['ACK'] = True if int(data[0])==int.from_bytes(PKT_ACK, byteorder=BYTEORDER) else False
-        elif command == CMD_ENABLE_CNC:
-            info['CMD'] = 'CMD_ENABLE_CNC'
-            info['ACK'] = True if int(data[0])==int.from_bytes(PKT_ACK, byteorder=BYTEORDER) else False
-        elif command == CMD_DISABLE_CNC:
-            info['CMD'] = 'CMD_DISABLE_CNC'
-            info['ACK'] = True if int(data[0])==int.from_bytes(PKT_ACK, byteorder=BYTEORDER) else False
-        elif command == CMD_SET_DELTA_STEPS:
-            info['CMD'] = 'CMD_SET_DELTA_STEPS'
-            info['ACK'] = True if int(data[0])==int.from_bytes(PKT_ACK, byteorder=BYTEORDER) else False
-        else:
-            raise ValueError(f"command={command}, invalid value.")
-        return info
+        if self.metrics is None:
+            raise RuntimeError("metrics are not enabled, call enable_metrics() first.")
+        stats = self.metrics.stats()
+        stats['queue'] = self._datalink.queue_stats()
+        return stats
 
 
-    def _send_and_receive_message(self, payload:bytearray, since_time:float, wait_for_response:bool=True, timeout_seconds:float=2.0, polling_period:float=0.001) -> dict:
+    def _decode_response(self, payload:bytearray) -> dict:
+        """
+        Decodes a received payload into a response dictionary.
+
+        :param payload: The received payload.
+        :type payload: bytearray
+        :return: A dictionary containing the response status and data.
+        :rtype: dict
+        """
+        self._logger .info("_decode_response() -> payload='%s'", payload)
+        response = decode_reply(payload)
+        response['received'] = True
+        if self.clock.synchronised and 'MICROS' in response:
+            response['device_time_ns'] = self.clock.to_host_ns(response['MICROS'])
+        return response
+
+
+    def _send_and_receive_message(self, payload:bytearray, wait_for_response:bool=True, timeout_seconds:float=2.0, pipelined:bool=False) -> dict:
         """
         Sends a payload and waits for a response.
 
         :param payload: The payload to be sent.
         :type payload: bytearray
-        :param since_time: The time since the payload was sent.
-        :type since_time: float
         :param wait_for_response: Whether to wait for a response, defaults to True.
         :type wait_for_response: bool, optional
         :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
         :type timeout_seconds: float, optional
-        :param polling_period: The polling period in seconds, defaults to 0.001.
-        :type polling_period: float, optional
-        :return: A dictionary containing the response status and data.
+        :param pipelined: Whether to return a future instead of waiting, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
         :rtype: dict
         """
-        self._datalink.send(payload)
+        # the request is tracked even if the response is not awaited, 
+        # so that its reply is not mistaken for a reply of a later request
+        metrics = self.metrics
+        if metrics is not None:
+            call_ns = time.monotonic_ns()
+        future = self._pipeline.submit(payload, timeout_seconds=timeout_seconds)
+        if pipelined:
+            return future
         if wait_for_response:
-            received, payload = self._datalink.receive(since_time=since_time, timeout_seconds=timeout_seconds, polling_period=polling_period)
-            if received:
-                self._logger .info(f"_send_and_receive_message() -> payload='{payload}'")
-                command, data = parse_message(payload)
-                response = self._payload_to_dict(command, data)
-                response['received'] = True
-                return response
-            else:
-                self._logger .warning(f"_send_and_receive_message() -> TIMEOUT")
-                return {'received':False}
+            response = future.result()
+            if metrics is not None and response['received']:
+                metrics.record('call', payload[0], time.monotonic_ns() - call_ns)
+            if not response['received']:
+                self._logger .warning("_send_and_receive_message() -> TIMEOUT")
+            return response
         else:
-            self._logger .info(f"_send_and_receive_message() -> response not requested")
+            self._logger .info("_send_and_receive_message() -> response not requested")
             return {'received':False}
 
 
-    def cmd_set_target_freq(self, which_pfm:str, freq:int, direction:bool, timeout_seconds:float=2.0,  wait_for_answer:bool=True, polling_period:float=0.001) -> dict:
+    def cmd_set_target_freq(self, which_pfm:str, freq:int, direction:bool, timeout_seconds:float=2.0,  wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
         """
         Sends a command to set the target frequency.
 
-        :param which_pfm: The pulse-frequency-modulator, valid values ['x', 'y', 'z', 'a'].
+        :param which_pfm: The pulse-frequency-modulator, valid values ['x', 'y', 'z'].
         :type which_pfm: str
         :param freq: The target frequency.
         :type freq: int
@@ -206,28 +302,24 @@ class HST():
         :type timeout_seconds: float, optional
         :param wait_for_answer: Whether to wait for a response, defaults to True.
         :type wait_for_answer: bool, optional
-        :param polling_period: The polling period in seconds, defaults to 0.001.
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
         :type polling_period: float, optional
-        :return: A dictionary containing the response status and data.
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
         :rtype: dict
         """
         self._check_integer(integer=freq, bits=16, signed=False, raise_error=True)
-        payload = bytearray([
-                int.from_bytes(CMD_SET_TARGET_FREQ, byteorder=BYTEORDER), # command
-                self._which_pfm_to_int(which_pfm), # payload: which pfm
-                freq.to_bytes(2, byteorder=BYTEORDER)[1], # payload: freq upper
-                freq.to_bytes(2, byteorder=BYTEORDER)[0], # payload: freq lower
-                direction.to_bytes(1, byteorder=BYTEORDER)[0], # payload: direction
-            ])
-        response = self._send_and_receive_message(payload=payload, since_time=time.time(), wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, polling_period=polling_period)
+        payload = encode_request(CMD_SET_TARGET_FREQ, self._which_pfm_to_int(which_pfm), freq, direction)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
         return response
         
         
-    def cmd_set_target_delta(self, which_pfm:str, freq:int, delta:int, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001) -> dict:
+    def cmd_set_target_delta(self, which_pfm:str, freq:int, delta:int, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
         """
         Sends a command to set the target delta.
 
-        :param which_pfm: The pulse-frequency-modulator, valid values ['x', 'y', 'z', 'a'].
+        :param which_pfm: The pulse-frequency-modulator, valid values ['x', 'y', 'z'].
         :type which_pfm: str
         :param freq: The target frequency.
         :type freq: int
@@ -237,51 +329,43 @@ class HST():
         :type timeout_seconds: float, optional
         :param wait_for_answer: Whether to wait for a response, defaults to True.
         :type wait_for_answer: bool, optional
-        :param polling_period: The polling period in seconds, defaults to 0.001.
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
         :type polling_period: float, optional
-        :return: A dictionary containing the response status and data.
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
         :rtype: dict
         """
         self._check_integer(integer=freq, bits=16, signed=False, raise_error=True)
-        self._check_integer(integer=delta, bits=32, signed=False, raise_error=True)
-        payload = bytearray([
-                int.from_bytes(CMD_SET_TARGET_DELTA, byteorder=BYTEORDER), # command
-                self._which_pfm_to_int(which_pfm), # payload: which pfm
-                freq.to_bytes(2, byteorder=BYTEORDER)[1], # payload: freq upper
-                freq.to_bytes(2, byteorder=BYTEORDER)[0], # payload: freq lower
-                freq.to_bytes(4, byteorder=BYTEORDER)[3], # payload: delta upper
-                freq.to_bytes(4, byteorder=BYTEORDER)[2], # payload: delta  |
-                freq.to_bytes(4, byteorder=BYTEORDER)[1], # payload: delta  |
-                freq.to_bytes(4, byteorder=BYTEORDER)[0], # payload: delta lower
-            ])
-        response = self._send_and_receive_message(payload=payload, since_time=time.time(), wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, polling_period=polling_period)
+        self._check_integer(integer=delta, bits=32, signed=True, raise_error=True)
+        payload = encode_request(CMD_SET_TARGET_DELTA, self._which_pfm_to_int(which_pfm), freq, delta)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
         return response
     
         
-    def cmd_get_delta_steps(self, which_pfm:str, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001) -> dict:
+    def cmd_get_delta_steps(self, which_pfm:str, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
         """
         Sends a command to get the delta steps.
 
-        :param which_pfm: The pulse-frequency-modulator, valid values ['x', 'y', 'z', 'a'].
+        :param which_pfm: The pulse-frequency-modulator, valid values ['x', 'y', 'z'].
         :type which_pfm: str
         :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
         :type timeout_seconds: float, optional
         :param wait_for_answer: Whether to wait for a response, defaults to True.
         :type wait_for_answer: bool, optional
-        :param polling_period: The polling period in seconds, defaults to 0.001.
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
         :type polling_period: float, optional
-        :return: A dictionary containing the response status and data.
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
         :rtype: dict
         """
-        payload = bytearray([
-                int.from_bytes(CMD_GET_DELTA_STEPS, byteorder=BYTEORDER), # command
-                self._which_pfm_to_int(which_pfm), # payload: which pfm
-            ])
-        response = self._send_and_receive_message(payload=payload, since_time=time.time(), wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, polling_period=polling_period)
+        payload = encode_request(CMD_GET_DELTA_STEPS, self._which_pfm_to_int(which_pfm))
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
         return response
     
     
-    def cmd_get_imu_measurement(self, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001) -> dict:
+    def cmd_get_imu_measurement(self, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
         """
         Get the Inertial Measurement Uunit measurement.
 
@@ -289,19 +373,19 @@ class HST():
         :type timeout_seconds: float, optional
         :param wait_for_answer: Whether to wait for a response, defaults to True.
         :type wait_for_answer: bool, optional
-        :param polling_period: The polling period in seconds, defaults to 0.001.
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
         :type polling_period: float, optional
-        :return: A dictionary containing the response status and data.
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
         :rtype: dict
         """
-        payload = bytearray([
-                int.from_bytes(CMD_GET_IMU_MEASUREMENT, byteorder=BYTEORDER), # command
-            ])
-        response = self._send_and_receive_message(payload=payload, since_time=time.time(), wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, polling_period=polling_period)
+        payload = encode_request(CMD_GET_IMU_MEASUREMENT)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
         return response
     
         
-    def cmd_set_isr_freq(self, isr_freq:int, timeout_seconds:float=2.0,  wait_for_answer:bool=True, polling_period:float=0.001) -> dict:
+    def cmd_set_isr_freq(self, isr_freq:int, timeout_seconds:float=2.0,  wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
         """
         Set the Iterrupt Service Routine frequency.
 
@@ -311,22 +395,20 @@ class HST():
         :type timeout_seconds: float, optional
         :param wait_for_answer: Whether to wait for a response, defaults to True.
         :type wait_for_answer: bool, optional
-        :param polling_period: The polling period in seconds, defaults to 0.001.
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
         :type polling_period: float, optional
-        :return: A dictionary containing the response status and data.
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
         :rtype: dict
         """
         self._check_integer(integer=isr_freq, bits=16, signed=False, raise_error=True)
-        payload = bytearray([
-                int.from_bytes(CMD_SET_ISR_FREQ, byteorder=BYTEORDER), # command
-                isr_freq.to_bytes(2, byteorder=BYTEORDER)[1], # payload: freq upper
-                isr_freq.to_bytes(2, byteorder=BYTEORDER)[0], # payload: freq lower
-            ])
-        response = self._send_and_receive_message(payload=payload, since_time=time.time(), wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, polling_period=polling_period)
+        payload = encode_request(CMD_SET_ISR_FREQ, isr_freq)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
         return response
     
 
-    def cmd_enable_cnc(self, timeout_seconds:float=2.0,  wait_for_answer:bool=True, polling_period:float=0.001) -> dict:
+    def cmd_enable_cnc(self, timeout_seconds:float=2.0,  wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
         """
         Enable the Computerized Numerical Control module (includes all PFMs).
 
@@ -334,19 +416,19 @@ class HST():
         :type timeout_seconds: float, optional
         :param wait_for_answer: Whether to wait for a response, defaults to True.
         :type wait_for_answer: bool, optional
-        :param polling_period: The polling period in seconds, defaults to 0.001.
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
         :type polling_period: float, optional
-        :return: A dictionary containing the response status and data.
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
         :rtype: dict
         """
-        payload = bytearray([
-                int.from_bytes(CMD_ENABLE_CNC, byteorder=BYTEORDER), # command
-            ])
-        response = self._send_and_receive_message(payload=payload, since_time=time.time(), wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, polling_period=polling_period)
+        payload = encode_request(CMD_ENABLE_CNC)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
         return response
     
 
-    def cmd_disable_cnc(self, timeout_seconds:float=2.0,  wait_for_answer:bool=True, polling_period:float=0.001) -> dict:
+    def cmd_disable_cnc(self, timeout_seconds:float=2.0,  wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
         """
         Disable the Computerized Numerical Control module (includes all PFMs).
 
@@ -354,23 +436,23 @@ class HST():
         :type timeout_seconds: float, optional
         :param wait_for_answer: Whether to wait for a response, defaults to True.
         :type wait_for_answer: bool, optional
-        :param polling_period: The polling period in seconds, defaults to 0.001.
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
         :type polling_period: float, optional
-        :return: A dictionary containing the response status and data.
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
         :rtype: dict
         """
-        payload = bytearray([
-                int.from_bytes(CMD_DISABLE_CNC, byteorder=BYTEORDER), # command
-            ])
-        response = self._send_and_receive_message(payload=payload, since_time=time.time(), wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, polling_period=polling_period)
+        payload = encode_request(CMD_DISABLE_CNC)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
         return response
     
 
-    def cmd_set_delta_steps(self, which_pfm:str, delta_steps:int, timeout_seconds:float=2.0,  wait_for_answer:bool=True, polling_period:float=0.001) -> dict:
+    def cmd_set_delta_steps(self, which_pfm:str, delta_steps:int, timeout_seconds:float=2.0,  wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
         """
         Sends a command to set the delta steps.
 
-        :param which_pfm: The pulse-frequency-modulator, valid values ['x', 'y', 'z', 'a'].
+        :param which_pfm: The pulse-frequency-modulator, valid values ['x', 'y', 'z'].
         :type which_pfm: str
         :param delta_steps: The target delta steps.
         :type delta_steps: int
@@ -378,25 +460,20 @@ class HST():
         :type timeout_seconds: float, optional
         :param wait_for_answer: Whether to wait for a response, defaults to True.
         :type wait_for_answer: bool, optional
-        :param polling_period: The polling period in seconds, defaults to 0.001.
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
         :type polling_period: float, optional
-        :return: A dictionary containing the response status and data.
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
         :rtype: dict
         """
-        self._check_integer(integer=delta_steps, bits=16, signed=False, raise_error=True)
-        payload = bytearray([
-                int.from_bytes(CMD_SET_DELTA_STEPS, byteorder=BYTEORDER), # command
-                self._which_pfm_to_int(which_pfm), # payload: which pfm
-                delta_steps.to_bytes(4, byteorder=BYTEORDER)[3], # payload: freq upper
-                delta_steps.to_bytes(4, byteorder=BYTEORDER)[2], # payload: freq  |
-                delta_steps.to_bytes(4, byteorder=BYTEORDER)[1], # payload: freq  |
-                delta_steps.to_bytes(4, byteorder=BYTEORDER)[0], # payload: freq lower
-            ])
-        response = self._send_and_receive_message(payload=payload, since_time=time.time(), wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, polling_period=polling_period)
+        self._check_integer(integer=delta_steps, bits=32, signed=True, raise_error=True)
+        payload = encode_request(CMD_SET_DELTA_STEPS, self._which_pfm_to_int(which_pfm), delta_steps)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
         return response
     
 
-    def cmd_get_isr_freq(self, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001) -> dict:
+    def cmd_get_isr_freq(self, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
         """
         Get the Iterrupt Service Routine frequency.
 
@@ -404,13 +481,417 @@ class HST():
         :type timeout_seconds: float, optional
         :param wait_for_answer: Whether to wait for a response, defaults to True.
         :type wait_for_answer: bool, optional
-        :param polling_period: The polling period in seconds, defaults to 0.001.
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
         :type polling_period: float, optional
-        :return: A dictionary containing the response status and data.
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
+        :rtype: dict
+        """
+        payload = encode_request(CMD_GET_ISR_FREQ)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
+        return response
+    
+
+    def _targets_to_records(self, targets:dict, bits:int, signed:bool) -> list[tuple]:
+        """
+        Converts targets of several PFMs into records of a multi-record command.
+
+        :param targets: Targets keyed by the pulse-frequency-modulator, {which_pfm: (freq, value)}.
+        :type targets: dict
+        :param bits: The number of bits of the value.
+        :type bits: int
+        :param signed: Whether the value is signed or not.
+        :type signed: bool
+        :raises ValueError: If no target is given.
+        :return: Records (which_pfm bit flag, freq, value).
+        :rtype: list[tuple]
+        """
+        if not targets:
+            raise ValueError(f"targets={targets} is not valid, at least one of ['x', 'y', 'z'] is required.")
+        records = []
+        for which_pfm, (freq, value) in targets.items():
+            self._check_integer(integer=freq, bits=16, signed=False, raise_error=True)
+            self._check_integer(integer=int(value), bits=bits, signed=signed, raise_error=True)
+            records.append((self._which_pfm_to_int(which_pfm), freq, value))
+        return records
+
+
+    def cmd_set_targets(self, targets:dict, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
+        """
+        Sends a single command setting the target frequency of several PFMs.
+
+        The firmware applies all targets in one ISR-free window and restarts 
+        the ISR counters of the targeted PFMs, so the PFMs start in phase.
+
+        :param targets: Target frequency and direction keyed by the pulse-frequency-modulator, 
+            e.g. {'x': (freq, direction), 'y': (freq, direction)}.
+        :type targets: dict
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :param wait_for_answer: Whether to wait for a response, defaults to True.
+        :type wait_for_answer: bool, optional
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
+        :type polling_period: float, optional
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
+        :rtype: dict
+        """
+        records = self._targets_to_records(targets, bits=8, signed=False)
+        payload = encode_request(CMD_SET_TARGETS_FREQ, *records)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
+        return response
+
+
+    def cmd_set_targets_delta(self, targets:dict, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
+        """
+        Sends a single command setting the target delta of several PFMs.
+
+        The firmware applies all targets in one ISR-free window, so the 
+        PFMs start moving in the same ISR tick.
+
+        :param targets: Target frequency and delta keyed by the pulse-frequency-modulator, 
+            e.g. {'x': (freq, delta), 'z': (freq, delta)}.
+        :type targets: dict
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :param wait_for_answer: Whether to wait for a response, defaults to True.
+        :type wait_for_answer: bool, optional
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
+        :type polling_period: float, optional
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
         :rtype: dict
         """
-        payload = bytearray([
-                int.from_bytes(CMD_GET_ISR_FREQ, byteorder=BYTEORDER), # command
-            ])
-        response = self._send_and_receive_message(payload=payload, since_time=time.time(), wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, polling_period=polling_period)
+        records = self._targets_to_records(targets, bits=32, signed=True)
+        payload = encode_request(CMD_SET_TARGETS_DELTA, *records)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
         return response
+
+
+    def cmd_queue_segment(self, targets:dict, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
+        """
+        Appends a segment to the motion queue of the firmware.
+
+        The ISR starts the segment once every PFM of the previous segment 
+        reached its target delta. The reply reports the status of the queue 
+        (FREE_SLOTS, ACTIVE, EXECUTED), 'ACK':False is returned if the queue is full.
+
+        :param targets: Target frequency and delta keyed by the pulse-frequency-modulator, 
+            e.g. {'x': (freq, delta), 'y': (freq, delta)}.
+        :type targets: dict
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :param wait_for_answer: Whether to wait for a response, defaults to True.
+        :type wait_for_answer: bool, optional
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
+        :type polling_period: float, optional
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
+        :rtype: dict
+        """
+        records = self._targets_to_records(targets, bits=32, signed=True)
+        payload = encode_request(CMD_QUEUE_SEGMENT, *records)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
+        return response
+
+
+    def cmd_get_queue_status(self, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
+        """
+        Get the status of the motion queue (FREE_SLOTS, ACTIVE, EXECUTED).
+
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :param wait_for_answer: Whether to wait for a response, defaults to True.
+        :type wait_for_answer: bool, optional
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
+        :type polling_period: float, optional
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
+        :rtype: dict
+        """
+        payload = encode_request(CMD_GET_QUEUE_STATUS)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
+        return response
+
+
+    def cmd_clear_queue(self, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
+        """
+        Drop the segments waiting in the motion queue (the running segment is finished).
+
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :param wait_for_answer: Whether to wait for a response, defaults to True.
+        :type wait_for_answer: bool, optional
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
+        :type polling_period: float, optional
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
+        :rtype: dict
+        """
+        payload = encode_request(CMD_CLEAR_QUEUE)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
+        return response
+
+
+    def cmd_subscribe_imu(self, period_ms:int, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
+        """
+        Subscribes IMU measurements pushed by the firmware (PKT_IMU_FRAME) every period_ms.
+
+        The pushed frames are delivered to the listeners (see add_listener() and TelemetryStream).
+
+        :param period_ms: The period of pushed frames in milliseconds, 0 unsubscribes.
+        :type period_ms: int
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :param wait_for_answer: Whether to wait for a response, defaults to True.
+        :type wait_for_answer: bool, optional
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
+        :type polling_period: float, optional
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
+        :rtype: dict
+        """
+        self._check_integer(period_ms, bits=16, signed=False)
+        payload = encode_request(CMD_SUBSCRIBE_IMU, period_ms)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
+        return response
+
+
+    def cmd_arm_targets(self, targets:dict, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
+        """
+        Stores the target frequency of several PFMs, the PFMs are not changed until cmd_trigger().
+
+        Arming replaces the targets armed before.
+
+        :param targets: Target frequency and direction keyed by the pulse-frequency-modulator, 
+            e.g. {'x': (freq, direction), 'y': (freq, direction)}.
+        :type targets: dict
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :param wait_for_answer: Whether to wait for a response, defaults to True.
+        :type wait_for_answer: bool, optional
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
+        :type polling_period: float, optional
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
+        :rtype: dict
+        """
+        records = self._targets_to_records(targets, bits=8, signed=False)
+        payload = encode_request(CMD_ARM_TARGETS, *records)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
+        return response
+
+
+    def cmd_trigger(self, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
+        """
+        Applies the targets of cmd_arm_targets() in one ISR-free window, 'ACK':False is returned if nothing is armed.
+
+        The request is the shortest packet of the protocol, see TurretGroup.trigger() 
+        for triggering several turrets at once.
+
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :param wait_for_answer: Whether to wait for a response, defaults to True.
+        :type wait_for_answer: bool, optional
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
+        :type polling_period: float, optional
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
+        :rtype: dict
+        """
+        payload = encode_request(CMD_TRIGGER)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
+        return response
+
+
+    def cmd_ping(self, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
+        """
+        Sends a command returning only ACK and the device time, used to measure the round trip.
+
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :param wait_for_answer: Whether to wait for a response, defaults to True.
+        :type wait_for_answer: bool, optional
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
+        :type polling_period: float, optional
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :return: A dictionary containing the response status, 'MICROS', 'send_ns' and 'receive_ns' 
+            (a future resolving to it if pipelined).
+        :rtype: dict
+        """
+        payload = encode_request(CMD_PING)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
+        return response
+
+
+    def sync_clock(self, pings:int=8, timeout_seconds:float=2.0) -> dict:
+        """
+        Estimates the offset and drift of the device clock (self.clock) from a series of pings.
+
+        The pings are sent one after another, the one with the shortest round 
+        trip is kept (see interface.clock). Call it periodically to track the drift.
+
+        :param pings: Number of pings, defaults to 8.
+        :type pings: int, optional
+        :param timeout_seconds: The timeout period of every ping in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :raises ValueError: If pings is smaller than 1.
+        :return: {'synchronised', 'offset_ns', 'drift_ppm', 'rtt_ns', 'pings'}, 'pings' is 
+            the number of replies received.
+        :rtype: dict
+        """
+        if pings < 1:
+            raise ValueError(f"pings={pings} is not valid, valid values are >= 1.")
+        # the reply (| COMMAND | ACK | MICROS |) is longer than the request
+        request_size = len(encode_packet(encode_request(CMD_PING), self._datalink.crc, self._datalink.framing))
+        reply_size = request_size + len(PKT_ACK) + REPLY_TIMESTAMP_STRUCT.size
+        asymmetry_ns = round((reply_size - request_size)*1e9/self._datalink.bytes_per_second)
+        received = 0
+        for _ in range(pings):
+            response = self.cmd_ping(timeout_seconds=timeout_seconds)
+            if response['received'] and response['ACK'] is True:
+                self.clock.add_sample(response['send_ns'], response['MICROS'], response['receive_ns'], asymmetry_ns)
+                received += 1
+        if not self.clock.update():
+            self._logger.warning("sync_clock() -> no reply")
+        return {'synchronised':self.clock.synchronised, 'offset_ns':self.clock.offset_ns, 
+                'drift_ppm':self.clock.drift_ppm, 'rtt_ns':self.clock.rtt_ns, 'pings':received}
+
+
+    def cmd_set_baudrate(self, baudrate:int, timeout_seconds:float=2.0, wait_for_answer:bool=True, polling_period:float=0.001, pipelined:bool=False) -> dict:
+        """
+        Switches the device to a baudrate after the ACK (sent at the current baudrate).
+
+        The device falls back to the previous baudrate unless the command is 
+        repeated at the new baudrate within BAUDRATE_CONFIRM_MS. The baudrate 
+        of the host is not changed, use negotiate_baudrate().
+
+        :param baudrate: The baudrate, one of BAUDRATES.
+        :type baudrate: int
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :param wait_for_answer: Whether to wait for a response, defaults to True.
+        :type wait_for_answer: bool, optional
+        :param polling_period: Unused, kept for backward compatibility, defaults to 0.001.
+        :type polling_period: float, optional
+        :param pipelined: Whether to return a future instead of waiting for the response, defaults to False.
+        :type pipelined: bool, optional
+        :raises ValueError: If the baudrate is not valid.
+        :return: A dictionary containing the response status and data (a future resolving to it if pipelined).
+        :rtype: dict
+        """
+        if baudrate not in BAUDRATES:
+            raise ValueError(f"baudrate={baudrate} is not valid, valid values {list(BAUDRATES)}.")
+        payload = encode_request(CMD_SET_BAUDRATE, baudrate)
+        response = self._send_and_receive_message(payload=payload, wait_for_response=wait_for_answer, timeout_seconds=timeout_seconds, pipelined=pipelined)
+        return response
+
+
+    def check_link(self, pings:int=20, timeout_seconds:float=0.1) -> dict:
+        """
+        Measures the quality of the serial line by a series of pings.
+
+        :param pings: Number of pings, defaults to 20.
+        :type pings: int, optional
+        :param timeout_seconds: The timeout period of every ping in seconds, defaults to 0.1.
+        :type timeout_seconds: float, optional
+        :raises ValueError: If pings is smaller than 1.
+        :return: {'pings', 'received', 'discarded_bytes', 'rtt_ns', 'ok'}, 'received' is the number 
+            of ACKs, 'discarded_bytes' the number of received bytes which were not a packet 
+            (framing errors), 'rtt_ns' the shortest round trip (None if nothing was received), 
+            'ok' is True if every ping was answered without a discarded byte.
+        :rtype: dict
+        """
+        if pings < 1:
+            raise ValueError(f"pings={pings} is not valid, valid values are >= 1.")
+        discarded_bytes = self._datalink.discarded_bytes
+        received = 0
+        rtt_ns = None
+        for _ in range(pings):
+            response = self.cmd_ping(timeout_seconds=timeout_seconds)
+            if response['received'] and response['ACK'] is True:
+                received += 1
+                rtt = response['receive_ns'] - response['send_ns']
+                rtt_ns = rtt if rtt_ns is None else min(rtt_ns, rtt)
+        discarded_bytes = self._datalink.discarded_bytes - discarded_bytes
+        return {'pings':pings, 'received':received, 'discarded_bytes':discarded_bytes, 'rtt_ns':rtt_ns, 
+                'ok':received == pings and discarded_bytes == 0}
+
+
+    def negotiate_baudrate(self, baudrates:list=None, pings:int=20, timeout_seconds:float=0.1) -> dict:
+        """
+        Moves the device and the host to the highest baudrate passing check_link().
+
+        The baudrates higher than the current one are tried from the highest. 
+        The device is switched by cmd_set_baudrate(), the host follows and checks 
+        the line; the new baudrate is confirmed only if every ping is answered 
+        without a framing error, otherwise both fall back to the previous baudrate 
+        (the device after BAUDRATE_CONFIRM_MS) and the next lower baudrate is tried.
+
+        No other command may be in flight during the negotiation (the pushed 
+        telemetry is lost while the baudrates differ).
+
+        :param baudrates: Candidate baudrates, defaults to BAUDRATES.
+        :type baudrates: list, optional
+        :param pings: Number of pings of check_link(), defaults to 20.
+        :type pings: int, optional
+        :param timeout_seconds: The timeout period of every command in seconds, defaults to 0.1.
+        :type timeout_seconds: float, optional
+        :raises ValueError: If a baudrate is not valid.
+        :raises RuntimeError: If the communication at the previous baudrate cannot be restored.
+        :return: {'baudrate', 'bytes_per_second', 'attempts'}, 'attempts' is the check_link() 
+            of every baudrate tried (None if the device refused it).
+        :rtype: dict
+        """
+        baudrates = BAUDRATES if baudrates is None else baudrates
+        for baudrate in baudrates:
+            if baudrate not in BAUDRATES:
+                raise ValueError(f"baudrate={baudrate} is not valid, valid values {list(BAUDRATES)}.")
+        previous = self._datalink.baudrate
+        attempts = {}
+        for baudrate in sorted(set(baudrates), reverse=True):
+            if baudrate <= previous:
+                break
+            if self.cmd_set_baudrate(baudrate, timeout_seconds=timeout_seconds).get('ACK') is not True:
+                attempts[baudrate] = None
+                continue
+            self._datalink.set_baudrate(baudrate)
+            attempts[baudrate] = self.check_link(pings=pings, timeout_seconds=timeout_seconds)
+            if attempts[baudrate]['ok'] and self.cmd_set_baudrate(baudrate, timeout_seconds=timeout_seconds).get('ACK') is True:
+                self._logger.info("negotiate_baudrate() -> %d Bd, %s", baudrate, attempts[baudrate])
+                break
+            self._logger.warning("negotiate_baudrate() -> %d Bd failed %s, back to %d Bd", baudrate, attempts[baudrate], previous)
+            self._fall_back_baudrate(previous, baudrate, timeout_seconds)
+        return {'baudrate':self._datalink.baudrate, 'bytes_per_second':self._datalink.bytes_per_second, 'attempts':attempts}
+
+
+    def _fall_back_baudrate(self, previous:int, baudrate:int, timeout_seconds:float):
+        """
+        Restores the communication at the previous baudrate after a failed switch to baudrate.
+
+        :raises RuntimeError: If the device answers at neither baudrate.
+        """
+        self._datalink.set_baudrate(previous)
+        # the device falls back once BAUDRATE_CONFIRM_MS elapsed since the switch
+        deadline = time.monotonic() + 2*BAUDRATE_CONFIRM_MS/1000
+        while time.monotonic() < deadline:
+            if self.cmd_ping(timeout_seconds=timeout_seconds)['received']:
+                self._datalink.set_baudrate(previous)
+                return
+        # the confirmation reached the device but its ACK was lost, switch back explicitly
+        self._datalink.set_baudrate(baudrate)
+        if self.cmd_set_baudrate(previous, timeout_seconds=timeout_seconds).get('ACK') is True:
+            self._datalink.set_baudrate(previous)
+            if self.cmd_set_baudrate(previous, timeout_seconds=timeout_seconds).get('ACK') is True:
+                return
+        raise RuntimeError(f"baudrate={previous} could not be restored, the device does not answer.")
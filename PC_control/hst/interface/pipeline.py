@@ -0,0 +1,224 @@
+import collections
+import functools
+import threading
+import time
+import logging
+from concurrent.futures import Future
+
+
+class Pipeline():
+    """ In-flight request tracking for pipelined command submission.
+
+    The firmware processes commands strictly in order of arrival and every
+    reply repeats the command byte of the request (see packet.parse_message).
+    Requests are therefore kept in one FIFO per command byte and each reply
+    completes the oldest in-flight request with the same command.
+    Consequently several requests can be in flight at the same time,
+    the number of in-flight requests is limited by a window.
+
+    The protocol carries no sequence number. A reply arriving after its
+    request has timed out is matched to the next in-flight request with
+    the same command.
+
+    Public methods:
+        submit()
+        num_in_flight()
+        cancel()
+        close()
+    """
+    def __init__(self, datalink, decode, window:int=1):
+        """
+        Initializes the Pipeline on top of a Datalink.
+
+        :param datalink: Datalink used for sending and receiving payloads.
+        :type datalink: hst.datalink.Datalink
+        :param decode: Function decoding a received payload into a response dictionary.
+        :type decode: callable
+        :param window: Maximal number of requests in flight, defaults to 1.
+        :type window: int, optional
+        :raises ValueError: If the window is smaller than 1.
+        """
+        if window < 1:
+            raise ValueError(f"window={window} is not valid, valid values are >= 1.")
+        self._logger = logging.getLogger(__name__)
+        self._datalink = datalink
+        self._decode = decode
+        self._window = threading.BoundedSemaphore(window)
+        self._lock = threading.Condition()
+        self._in_flight = collections.defaultdict(collections.deque)
+        self._running = True
+        # stage timing (see datalink.metrics), None while disabled
+        self._metrics = None
+        self._datalink.add_listener(self._on_payload)
+        self._thread_timeout = threading.Thread(target=self._expire_requests, name='hst-pipeline-timeout', daemon=True)
+        self._thread_timeout.start()
+
+
+    def submit(self, payload:bytearray, timeout_seconds:float=2.0) -> Future:
+        """
+        Sends a payload without waiting for the reply.
+
+        Blocks only while the window is full. The returned future resolves
+        to the response dictionary (with the 'receive_time' of the reply and 
+        the time.monotonic_ns() of the submission 'send_ns' and of the reply 
+        'receive_ns'), or to {'received':False} when no reply arrives within 
+        timeout_seconds (measured from the submission).
+
+        :param payload: The payload to be sent, the first byte is the command.
+        :type payload: bytearray
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :return: Future resolving to the response dictionary.
+        :rtype: concurrent.futures.Future
+        """
+        metrics = self._metrics
+        if metrics is not None:
+            submit_ns = time.monotonic_ns()
+        future = Future()
+        deadline = time.monotonic() + timeout_seconds
+        if not self._window.acquire(timeout=timeout_seconds):
+            self._logger.warning("Pipeline.submit() -> window full, TIMEOUT")
+            if metrics is not None:
+                metrics.count('timeouts')
+            future.set_result({'received':False})
+            return future
+        send_ns = time.monotonic_ns()
+        if metrics is not None:
+            metrics.record('window', payload[0], send_ns - submit_ns)
+            future.add_done_callback(functools.partial(self._record_total, metrics, payload[0], submit_ns))
+        with self._lock:
+            self._in_flight[payload[0]].append((deadline, future, send_ns))
+            # wake up the timeout thread, the new deadline may be the nearest
+            self._lock.notify()
+        self._datalink.send(payload)
+        return future
+
+
+    def num_in_flight(self) -> int:
+        """
+        Returns the number of requests waiting for a reply.
+
+        :return: The number of in-flight requests.
+        :rtype: int
+        """
+        with self._lock:
+            return sum(len(requests) for requests in self._in_flight.values())
+
+
+    def cancel(self, future:Future) -> bool:
+        """
+        Resolves an in-flight request as not received, e.g. when its payload was never written.
+
+        :param future: The future returned by submit().
+        :type future: concurrent.futures.Future
+        :return: True if the request was in flight.
+        :rtype: bool
+        """
+        with self._lock:
+            for requests in self._in_flight.values():
+                request = next((request for request in requests if request[1] is future), None)
+                if request is not None:
+                    requests.remove(request)
+                    break
+            else:
+                return False
+        self._window.release()
+        future.set_result({'received':False})
+        return True
+
+
+    def set_metrics(self, metrics):
+        """
+        Enables the timing of the window, the round trip and the reply of every request.
+
+        :param metrics: The metrics recorded to, None disables the recording.
+        :type metrics: hst.datalink.metrics.Metrics
+        """
+        self._metrics = metrics
+
+
+    def close(self):
+        """
+        Stops and joins the timeout thread and resolves all in-flight requests as not received.
+        """
+        with self._lock:
+            self._running = False
+            requests = [request for command_requests in self._in_flight.values() for request in command_requests]
+            self._in_flight.clear()
+            self._lock.notify()
+        if threading.current_thread() is not self._thread_timeout:
+            self._thread_timeout.join()
+        for _, future, _ in requests:
+            self._window.release()
+            future.set_result({'received':False})
+
+
+    def _on_payload(self, payload:bytearray, receive_time:float) -> bool:
+        """
+        Completes the oldest in-flight request with the command of the payload.
+
+        :param payload: The received payload.
+        :type payload: bytearray
+        :param receive_time: The time of reception.
+        :type receive_time: float
+        :return: True if the payload completed a request (it is not queued for Datalink.receive()).
+        :rtype: bool
+        """
+        with self._lock:
+            requests = self._in_flight.get(payload[0])
+            if not requests:
+                self._logger.debug("Pipeline._on_payload() -> no request in flight for payload='%s'", payload)
+                return False
+            _, future, send_ns = requests.popleft()
+        self._window.release()
+        try:
+            response = self._decode(payload)
+        except Exception as exception:
+            future.set_exception(exception)
+            return True
+        response['receive_time'] = receive_time
+        response['send_ns'] = send_ns
+        response['receive_ns'] = receive_ns = self._datalink.receive_ns
+        metrics = self._metrics
+        if metrics is not None:
+            metrics.record('round_trip', payload[0], receive_ns - send_ns)
+            metrics.record('reply', payload[0], time.monotonic_ns() - receive_ns)
+        future.set_result(response)
+        return True
+
+
+    @staticmethod
+    def _record_total(metrics, command:int, submit_ns:int, future:Future):
+        """ Records the time from the submission to the reply, timeouts are only counted. """
+        if future.exception() is None and future.result()['received']:
+            metrics.record('total', command, time.monotonic_ns() - submit_ns)
+
+
+    def _expire_requests(self):
+        """ Runs in a separate thread, resolves requests exceeding their timeout.
+        """
+        while True:
+            with self._lock:
+                if not self._running:
+                    return
+                time_now = time.monotonic()
+                nearest_deadline = None
+                expired = []
+                for requests in self._in_flight.values():
+                    for request in list(requests):
+                        deadline, _, _ = request
+                        if deadline <= time_now:
+                            requests.remove(request)
+                            expired.append(request)
+                        elif nearest_deadline is None or deadline < nearest_deadline:
+                            nearest_deadline = deadline
+                if not expired:
+                    self._lock.wait(None if nearest_deadline is None else nearest_deadline - time_now)
+                    continue
+            # the callbacks of the futures run without the lock (they may submit the next request)
+            for _, future, _ in expired:
+                self._logger.warning("Pipeline._expire_requests() -> TIMEOUT")
+                if self._metrics is not None:
+                    self._metrics.count('timeouts')
+                self._window.release()
+                future.set_result({'received':False})
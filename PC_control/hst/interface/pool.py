@@ -0,0 +1,207 @@
+import logging
+from ..datalink.multiplexer import Multiplexer
+from ..datalink.metrics import to_prometheus
+from .interface import HST
+from .group import TurretGroup
+
+
+class TurretPool():
+    """ Connections to several turrets served by a single I/O thread.
+
+        Every turret is reached through its own HST handle, the received
+        data of all turrets are read by one Multiplexer loop (see
+        datalink.multiplexer) instead of one receiver thread per turret.
+
+            pool = TurretPool({'left': '/dev/ttyUSB0', 'right': '/dev/ttyUSB1'}, 115200)
+            pool['left'].cmd_set_target_freq('x', 1000, True)
+            pool.cmd_enable_cnc()
+
+        Public methods:
+
+            TurretPool()                - constructor
+            names()
+            broadcast()                 - the same command to every turret
+            group()                     - TurretGroup of the turrets (synchronised commands)
+            cmd_enable_cnc()            - broadcast of HST.cmd_enable_cnc()
+            cmd_disable_cnc()           - broadcast of HST.cmd_disable_cnc()
+            enable_metrics()            - HST.enable_metrics() of every turret
+            stats()                     - HST.stats() of every turret
+            to_prometheus()             - metrics of all turrets labelled by the name
+            close()
+    """
+    def __init__(self, ports, baudrate:int, max_in_flight:int=8, backend='thread', poll_period_seconds:float=0.005, crc:bool=False, 
+                 framing:str='start_end'):
+        """
+        Opens the ports of all turrets.
+
+        :param ports: Ports keyed by the name of the turret, or a list of ports (the port is the name).
+        :type ports: dict or list
+        :param baudrate: The baudrate for the serial connections.
+        :type baudrate: int
+        :param max_in_flight: Maximal number of commands awaiting reply per turret, defaults to 8.
+        :type max_in_flight: int, optional
+        :param backend: Backend running the I/O loop (see datalink.backend), defaults to 'thread'.
+        :type backend: str or object, optional
+        :param poll_period_seconds: Period of checking the ports without a file descriptor
+            (see datalink.multiplexer), defaults to 0.005.
+        :type poll_period_seconds: float, optional
+        :param crc: Send and receive packets with CRC (see datalink.Datalink), defaults to False.
+        :type crc: bool, optional
+        :param framing: Framing of the packets, 'start_end' or 'cobs' (see datalink.Datalink), defaults to 'start_end'.
+        :type framing: str, optional
+        :raises ValueError: If no port is given.
+        """
+        self._logger = logging.getLogger(__name__)
+        if not isinstance(ports, dict):
+            ports = {port: port for port in ports}
+        if not ports:
+            raise ValueError(f"ports={ports} is not valid, at least one port is required.")
+        self._multiplexer = Multiplexer(backend=backend, poll_period_seconds=poll_period_seconds)
+        self._turrets = {}
+        try:
+            for name, port in ports.items():
+                datalink = self._multiplexer.open(port, baudrate, crc=crc, framing=framing)
+                self._turrets[name] = HST(port, baudrate, max_in_flight=max_in_flight, datalink=datalink)
+        except Exception:
+            self.close()
+            raise
+        self._logger.info("TurretPool.__init__(ports=%s)", ports)
+
+
+    def __del__(self):
+        """
+        Closes the ports of all turrets.
+        """
+        self.close()
+
+
+    def __getitem__(self, name) -> HST:
+        return self._turrets[name]
+
+
+    def __iter__(self):
+        return iter(self._turrets)
+
+
+    def __len__(self) -> int:
+        return len(self._turrets)
+
+
+    def names(self) -> list:
+        """
+        Returns the names of the turrets.
+
+        :return: The names of the turrets in order of the ports.
+        :rtype: list
+        """
+        return list(self._turrets)
+
+
+    def group(self, names:list=None) -> TurretGroup:
+        """
+        Returns a TurretGroup sending synchronised commands to the turrets.
+
+        :param names: Names of the turrets in the group, defaults to all turrets.
+        :type names: list, optional
+        :return: The group of turrets.
+        :rtype: TurretGroup
+        """
+        names = self.names() if names is None else names
+        return TurretGroup({name: self._turrets[name] for name in names})
+
+
+    def close(self):
+        """
+        Resolves the commands in flight as not received and closes the ports of all turrets.
+        """
+        if getattr(self, '_multiplexer', None) is None:
+            return
+        for turret in self._turrets.values():
+            turret.close()
+        self._multiplexer.close()
+        self._multiplexer = None
+
+
+    def broadcast(self, command:str, *args, timeout_seconds:float=2.0, **kwargs) -> dict:
+        """
+        Sends the same command to every turret and waits for all replies.
+
+        The command is sent to all turrets before the first reply is awaited,
+        so the replies are awaited concurrently.
+
+        :param command: Name of the HST method, e.g. 'cmd_enable_cnc'.
+        :type command: str
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :raises ValueError: If the command is not a cmd_*() method of HST.
+        :return: Responses keyed by the name of the turret.
+        :rtype: dict
+        """
+        if not command.startswith('cmd_') or not hasattr(HST, command):
+            raise ValueError(f"command={command} is not valid, valid values are the cmd_*() methods of HST.")
+        futures = {name: getattr(turret, command)(*args, timeout_seconds=timeout_seconds, pipelined=True, **kwargs)
+                   for name, turret in self._turrets.items()}
+        responses = {name: future.result() for name, future in futures.items()}
+        for name, response in responses.items():
+            if not response['received']:
+                self._logger.warning("TurretPool.broadcast(command=%s) -> '%s' TIMEOUT", command, name)
+        return responses
+
+
+    def cmd_enable_cnc(self, timeout_seconds:float=2.0) -> dict:
+        """
+        Enable the Computerized Numerical Control module of every turret.
+
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :return: Responses keyed by the name of the turret.
+        :rtype: dict
+        """
+        return self.broadcast('cmd_enable_cnc', timeout_seconds=timeout_seconds)
+
+
+    def cmd_disable_cnc(self, timeout_seconds:float=2.0) -> dict:
+        """
+        Disable the Computerized Numerical Control module of every turret.
+
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :return: Responses keyed by the name of the turret.
+        :rtype: dict
+        """
+        return self.broadcast('cmd_disable_cnc', timeout_seconds=timeout_seconds)
+
+
+    def enable_metrics(self):
+        """
+        Enables the per-stage latency histograms of every turret (see HST.enable_metrics()).
+        """
+        for turret in self._turrets.values():
+            turret.enable_metrics()
+
+
+    def stats(self) -> dict:
+        """
+        Returns the snapshots of the metrics of every turret.
+
+        :raises RuntimeError: If the metrics are not enabled.
+        :return: HST.stats() keyed by the name of the turret.
+        :rtype: dict
+        """
+        return {name: turret.stats() for name, turret in self._turrets.items()}
+
+
+    def to_prometheus(self, prefix:str='hst') -> str:
+        """
+        Returns the metrics of all turrets in the Prometheus text exposition format.
+
+        :param prefix: Prefix of the metric names, defaults to 'hst'.
+        :type prefix: str, optional
+        :raises RuntimeError: If the metrics are not enabled.
+        :return: The exposition text, every sample labelled turret="<name>".
+        :rtype: str
+        """
+        for turret in self._turrets.values():
+            if turret.metrics is None:
+                raise RuntimeError("metrics are not enabled, call enable_metrics() first.")
+        return to_prometheus([(turret.metrics, {'turret': name}) for name, turret in self._turrets.items()], prefix=prefix)
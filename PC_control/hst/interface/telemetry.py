@@ -0,0 +1,221 @@
+import struct
+import threading
+import logging
+import numpy as np
+from ..packet.pkt_defs import PKT_IMU_FRAME, COMMAND_BYTE_SIZE
+from ..packet.pkt_formats import PUSH_FORMATS
+""" Continuous IMU telemetry pushed by the firmware.
+
+    After CMD_SUBSCRIBE_IMU the firmware pushes PKT_IMU_FRAME every period
+    without a request, the sample rate is then bounded by the serial line
+    instead of the round trip of cmd_get_imu_measurement():
+
+        stream = TelemetryStream(turret, capacity=4096)
+        stream.start(period_ms=5)
+        ...
+        samples = stream.latest(200)        # (200, 9) int16 view, AX..MZ
+        micros = stream.latest_micros(200)  # (200,) uint32 view, device time
+
+Public classes:
+    TelemetryStream
+"""
+
+_PKT_IMU_FRAME = PKT_IMU_FRAME[0]
+_, _IMU_FRAME_FORMAT, _IMU_FRAME_NAMES = PUSH_FORMATS[_PKT_IMU_FRAME]
+# payload of PKT_IMU_FRAME: | COMMAND | SEQUENCE | AX ... MZ | MICROS |
+_IMU_FRAME_SIZE = COMMAND_BYTE_SIZE + struct.calcsize(_IMU_FRAME_FORMAT)
+_SEQUENCE_STRUCT = struct.Struct(_IMU_FRAME_FORMAT[0] + 'H')
+_MICROS_STRUCT = struct.Struct(_IMU_FRAME_FORMAT[0] + 'I')
+_SAMPLE_OFFSET = COMMAND_BYTE_SIZE + _SEQUENCE_STRUCT.size
+_SAMPLE_DTYPE = np.dtype(_IMU_FRAME_FORMAT[0] + 'i2')
+
+# names of the sample columns
+IMU_FIELDS = _IMU_FRAME_NAMES[1:-1]
+_MICROS_OFFSET = _SAMPLE_OFFSET + len(IMU_FIELDS)*_SAMPLE_DTYPE.itemsize
+
+
+class TelemetryStream():
+    """ Ring buffer of IMU frames pushed by the firmware.
+
+        Frames are decoded in the receiver thread into a preallocated
+        buffer of 2*capacity rows. Every sample is written twice (at index
+        and index+capacity), so the latest n samples are always a contiguous
+        slice and latest() returns a view without copying.
+
+        A view shows the buffer, i.e. its rows are overwritten after
+        capacity-n further frames. Copy the view to keep the samples.
+
+        Public methods:
+
+            start()                     - subscribe the frames
+            stop()                      - unsubscribe the frames
+            latest()                    - view of the latest samples
+            latest_times()              - view of the receive times of the latest samples
+            latest_micros()             - view of the device times of the latest samples
+            latest_device_times()       - device times of the latest samples mapped to the host clock
+            wait()                      - wait for a number of frames
+
+        Public attributes:
+
+            capacity                    - maximal number of samples kept
+            count                       - number of received frames
+            lost                        - number of frames lost (gaps in SEQUENCE)
+    """
+    def __init__(self, turret, capacity:int=4096):
+        """
+        Initializes the TelemetryStream and registers it as a listener of the turret.
+
+        :param turret: The turret pushing the frames.
+        :type turret: hst.interface.HST
+        :param capacity: Maximal number of samples kept, defaults to 4096.
+        :type capacity: int, optional
+        :raises ValueError: If the capacity is smaller than 1.
+        """
+        if capacity < 1:
+            raise ValueError(f"capacity={capacity} is not valid, valid values are >= 1.")
+        self._logger = logging.getLogger(__name__)
+        self._turret = turret
+        self.capacity = capacity
+        self._samples = np.zeros((2*capacity, len(IMU_FIELDS)), dtype=np.int16)
+        self._times = np.zeros(2*capacity, dtype=np.float64)
+        self._micros = np.zeros(2*capacity, dtype=np.uint32)
+        self._index = 0
+        self._sequence = None
+        self._frame_received = threading.Condition()
+        self.count = 0
+        self.lost = 0
+        turret.add_listener(self._on_payload)
+
+
+    def _on_payload(self, payload:bytearray, receive_time:float):
+        """
+        Writes a pushed frame into the ring buffer (executed in the receiver thread).
+
+        :param payload: The received payload.
+        :type payload: bytearray
+        :param receive_time: The time of reception.
+        :type receive_time: float
+        """
+        if payload[0] != _PKT_IMU_FRAME or len(payload) != _IMU_FRAME_SIZE:
+            return
+        sequence, = _SEQUENCE_STRUCT.unpack_from(payload, COMMAND_BYTE_SIZE)
+        # SEQUENCE restarts from 0 with every subscription
+        if self._sequence is not None and sequence != 0:
+            self.lost += (sequence - self._sequence - 1) & 0xFFFF
+        self._sequence = sequence
+        sample = np.frombuffer(payload, dtype=_SAMPLE_DTYPE, count=len(IMU_FIELDS), offset=_SAMPLE_OFFSET)
+        index = self._index
+        self._samples[index] = sample
+        self._samples[index + self.capacity] = sample
+        self._times[index] = receive_time
+        self._times[index + self.capacity] = receive_time
+        micros, = _MICROS_STRUCT.unpack_from(payload, _MICROS_OFFSET)
+        self._micros[index] = micros
+        self._micros[index + self.capacity] = micros
+        self._index = index + 1 if index + 1 < self.capacity else 0
+        with self._frame_received:
+            self.count += 1
+            self._frame_received.notify_all()
+
+
+    def start(self, period_ms:int, timeout_seconds:float=2.0) -> dict:
+        """
+        Subscribes the frames, the firmware pushes a frame every period_ms.
+
+        :param period_ms: The period of frames in milliseconds.
+        :type period_ms: int
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :raises ValueError: If the period is 0 (use stop()).
+        :return: The response of cmd_subscribe_imu().
+        :rtype: dict
+        """
+        if period_ms == 0:
+            raise ValueError(f"period_ms={period_ms} is not valid, valid values [1..65535].")
+        return self._turret.cmd_subscribe_imu(period_ms, timeout_seconds=timeout_seconds)
+
+
+    def stop(self, timeout_seconds:float=2.0) -> dict:
+        """
+        Unsubscribes the frames.
+
+        :param timeout_seconds: The timeout period in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :return: The response of cmd_subscribe_imu().
+        :rtype: dict
+        """
+        return self._turret.cmd_subscribe_imu(0, timeout_seconds=timeout_seconds)
+
+
+    def _latest_slice(self, n:int) -> slice:
+        """ Slice of the 2*capacity rows holding the latest n samples. """
+        n = min(n, self.count, self.capacity)
+        end = self._index + self.capacity
+        return slice(end - n, end)
+
+
+    def latest(self, n:int) -> np.ndarray:
+        """
+        View of the latest samples (oldest first), fewer if less were received.
+
+        :param n: Number of samples, at most capacity.
+        :type n: int
+        :return: Samples of shape (n, 9), columns AX, AY, AZ, GX, GY, GZ, MX, MY, MZ (IMU_FIELDS).
+        :rtype: np.ndarray
+        """
+        return self._samples[self._latest_slice(n)]
+
+
+    def latest_times(self, n:int) -> np.ndarray:
+        """
+        View of the receive times of the latest samples (oldest first).
+
+        :param n: Number of samples, at most capacity.
+        :type n: int
+        :return: Receive times of shape (n,) in seconds since the epoch (time.time()).
+        :rtype: np.ndarray
+        """
+        return self._times[self._latest_slice(n)]
+
+
+    def latest_micros(self, n:int) -> np.ndarray:
+        """
+        View of the device times of the latest samples (oldest first).
+
+        The device time is sampled by the firmware when the frame is sent,
+        it is free of the jitter of the serial line and of the receiver thread.
+
+        :param n: Number of samples, at most capacity.
+        :type n: int
+        :return: micros() of the firmware of shape (n,), wrapping around after 2**32 us.
+        :rtype: np.ndarray
+        """
+        return self._micros[self._latest_slice(n)]
+
+
+    def latest_device_times(self, n:int) -> np.ndarray:
+        """
+        Device times of the latest samples (oldest first) mapped to the host clock.
+
+        :param n: Number of samples, at most capacity.
+        :type n: int
+        :raises RuntimeError: If the clock of the turret is not synchronised (see HST.sync_clock()).
+        :return: time.monotonic_ns() of the host of shape (n,), int64.
+        :rtype: np.ndarray
+        """
+        return self._turret.clock.to_host_ns(self.latest_micros(n))
+
+
+    def wait(self, count:int, timeout_seconds:float=None) -> bool:
+        """
+        Waits until count frames were received since the creation of the stream.
+
+        :param count: The number of frames.
+        :type count: int
+        :param timeout_seconds: The timeout period in seconds, None blocks forever, defaults to None.
+        :type timeout_seconds: float, optional
+        :return: True if count frames were received, False on timeout.
+        :rtype: bool
+        """
+        with self._frame_received:
+            return self._frame_received.wait_for(lambda: self.count >= count, timeout_seconds)
@@ -0,0 +1,178 @@
+import collections
+import threading
+import time
+import logging
+from ..packet.pkt_defs import PFM_QUEUE_SIZE
+""" Streaming of trajectories into the motion queue of the firmware.
+
+    A trajectory is a sequence of segments, every segment sets the target
+    frequency and target delta of one or more PFMs, e.g.
+
+        segments = [{'x': (6400, 200), 'y': (3200, 100)},
+                    {'x': (6400, 400)},
+                    ...]
+
+    The firmware executes the segments back-to-back from its queue, the
+    host keeps the queue filled without waiting for every reply.
+
+Public classes:
+    TrajectoryUploader
+"""
+
+
+class TrajectoryUploader():
+    """ Credit based streaming of segments into the motion queue.
+
+        The number of free slots of the queue (credit) is known from the
+        status carried by every reply of CMD_QUEUE_SEGMENT. Segments are
+        pipelined while the credit is positive, the credit is decreased for
+        every segment on the way and refreshed from the oldest reply. When
+        no credit is left, the status is polled every polling_period until
+        the ISR frees a slot.
+
+        The credit is never overestimated (the firmware only frees slots
+        while segments are on the way), hence a segment is never refused
+        by a full queue unless another client fills the queue.
+
+        Public methods:
+
+            upload()                    - stream segments, block until all are queued
+            start()                     - stream segments from a thread
+            wait()                      - wait for start() to finish
+            stop()                      - stop streaming after the segment on the way
+
+        Public attributes:
+
+            stats                       - {'sent':int, 'polls':int, 'underruns':int, 'executed':int}
+    """
+    def __init__(self, turret, timeout_seconds:float=2.0, polling_period:float=0.005):
+        """
+        Initializes the TrajectoryUploader.
+
+        :param turret: The turret receiving the segments.
+        :type turret: hst.interface.HST
+        :param timeout_seconds: The timeout period of every command in seconds, defaults to 2.0.
+        :type timeout_seconds: float, optional
+        :param polling_period: Period of polling the queue status while the queue is full, defaults to 0.005.
+        :type polling_period: float, optional
+        """
+        self._logger = logging.getLogger(__name__)
+        self._turret = turret
+        self._timeout_seconds = timeout_seconds
+        self._polling_period = polling_period
+        self._thread = None
+        self._error = None
+        self._stopped = threading.Event()
+        self.stats = {'sent':0, 'polls':0, 'underruns':0, 'executed':0}
+
+
+    def _check_response(self, response:dict) -> dict:
+        """ Raises an error for a missing or refused reply, returns the reply otherwise. """
+        if not response['received']:
+            raise TimeoutError(f"{response.get('CMD', 'reply')} was not received within {self._timeout_seconds} seconds.")
+        if 'FREE_SLOTS' not in response:
+            raise RuntimeError(f"response={response} is not valid, the segment was refused by the firmware.")
+        return response
+
+
+    def _check_reply(self, index:int, future) -> dict:
+        """ Waits for the reply of the segment with the index, counts queue underruns. """
+        status = self._check_response(future.result())
+        if index > 0 and not status['ACTIVE'] and status['FREE_SLOTS'] == PFM_QUEUE_SIZE - 1:
+            # the segment found the queue empty, the motion stopped before it arrived
+            self.stats['underruns'] += 1
+            self._logger.debug("upload() -> queue underrun before segment %d", index)
+        return status
+
+
+    def upload(self, segments) -> dict:
+        """
+        Streams the segments into the motion queue, blocks until all segments are queued.
+
+        The function returns as soon as the last segment is accepted,
+        the firmware may still be executing the queue.
+
+        :param segments: Segments, dictionaries {which_pfm: (freq, delta)}.
+        :type segments: iterable
+        :raises TimeoutError: If a reply is not received.
+        :raises RuntimeError: If a segment is refused by the firmware.
+        :return: The statistics of the upload, see the attribute stats.
+        :rtype: dict
+        """
+        self._stopped.clear()
+        self.stats = {'sent':0, 'polls':0, 'underruns':0, 'executed':0}
+        status = self._check_response(self._turret.cmd_get_queue_status(timeout_seconds=self._timeout_seconds))
+        credit = status['FREE_SLOTS']
+        in_flight = collections.deque()
+        for segment in segments:
+            if self._stopped.is_set():
+                break
+            while credit <= 0:
+                if in_flight:
+                    # the oldest reply knows the free slots, the later segments on the way are not included
+                    status = self._check_reply(*in_flight.popleft())
+                    credit = status['FREE_SLOTS'] - len(in_flight)
+                else:
+                    time.sleep(self._polling_period)
+                    status = self._check_response(self._turret.cmd_get_queue_status(timeout_seconds=self._timeout_seconds))
+                    credit = status['FREE_SLOTS']
+                    self.stats['polls'] += 1
+            in_flight.append((self.stats['sent'], self._turret.cmd_queue_segment(segment, timeout_seconds=self._timeout_seconds, pipelined=True)))
+            credit -= 1
+            self.stats['sent'] += 1
+        while in_flight:
+            status = self._check_reply(*in_flight.popleft())
+        self.stats['executed'] = status['EXECUTED']
+        self._logger.info("upload() -> stats=%s", self.stats)
+        return self.stats
+
+
+    def _upload_thread(self, segments):
+        """ Runs upload() and keeps the raised error for wait(). """
+        try:
+            self.upload(segments)
+        except Exception as error:
+            self._error = error
+
+
+    def start(self, segments):
+        """
+        Streams the segments from a thread, see upload().
+
+        :param segments: Segments, dictionaries {which_pfm: (freq, delta)}.
+        :type segments: iterable
+        :raises RuntimeError: If an upload is already running.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            raise RuntimeError("upload is already running, call wait() first.")
+        self._error = None
+        self._thread = threading.Thread(target=self._upload_thread, args=(segments,), name='hst-trajectory-upload', daemon=True)
+        self._thread.start()
+
+
+    def wait(self, timeout_seconds:float=None) -> dict:
+        """
+        Waits for the upload started by start().
+
+        :param timeout_seconds: The timeout period in seconds, None blocks until finished, defaults to None.
+        :type timeout_seconds: float, optional
+        :raises TimeoutError: If the upload does not finish within timeout_seconds.
+        :return: The statistics of the upload, see the attribute stats.
+        :rtype: dict
+        """
+        if self._thread is not None:
+            self._thread.join(timeout_seconds)
+            if self._thread.is_alive():
+                raise TimeoutError(f"upload did not finish within {timeout_seconds} seconds.")
+            self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        return self.stats
+
+
+    def stop(self):
+        """
+        Stops streaming, the queued segments are executed (see HST.cmd_clear_queue()).
+        """
+        self._stopped.set()
@@ -1,5 +1,8 @@
 from .packet import parse_buffer
 from .packet import encode_packet
 from .packet import parse_message
+from .packet import PacketDecoder
+from .codec import encode_request
+from .codec import decode_reply
 
 from .pkt_defs import *
@@ -0,0 +1,101 @@
+import itertools
+import struct
+from .pkt_defs import *
+from .pkt_formats import REQUEST_FORMATS, RECORD_FORMATS, REPLY_FORMATS, PUSH_FORMATS, REPLY_TIMESTAMP_FORMAT, REPLY_TIMESTAMP_NAME
+""" Table-driven encoding of requests and decoding of replies.
+
+    Every command has one precompiled struct.Struct for the request payload
+    and (if the reply carries data) one for the reply data. Dispatch is a
+    dictionary lookup on the command byte.
+
+    Byte order follows pkt_process_cmd.cpp:
+        requests - multi-byte values are sent from the high to the low byte
+                   (the firmware reassembles them with arr_to_uint*_t(),
+                   i.e. big-endian)
+        replies  - multi-byte values are copied from the AVR memory by
+                   uint*_t_to_arr() (little-endian, BYTEORDER)
+
+    Every reply and pushed packet ends with the device time of its
+    transmission (micros() of the firmware, REPLY_TIMESTAMP_FORMAT), it is
+    decoded as 'MICROS' (see interface.clock).
+
+Public functions:
+    encode_request()
+    decode_reply()
+"""
+
+_PKT_ACK = PKT_ACK[0]
+_PKT_NACK = PKT_NACK[0]
+
+# request payload layout: | COMMAND | DATA | (formats generated from protocol/pkt_schema.py)
+REQUEST_STRUCTS = {command: struct.Struct(fmt) for command, fmt in REQUEST_FORMATS.items()}
+
+# request payload layout of commands with repeated records: | COMMAND | RECORD | ... |,
+# one struct per number of records (index 0 - one record)
+RECORD_STRUCTS = {command: [struct.Struct(fmt[0] + 'B' + fmt[1:]*num_records) for num_records in range(1, max_records+1)]
+                  for command, (fmt, max_records) in RECORD_FORMATS.items()}
+
+# reply data layout: (name, struct of DATA or None if only ACK/NACK is returned, names of values),
+# packets pushed by the firmware (e.g. PKT_IMU_FRAME) are decoded like replies
+REPLY_STRUCTS = {command: (name, None if fmt is None else struct.Struct(fmt), value_names)
+                 for command, (name, fmt, value_names) in {**REPLY_FORMATS, **PUSH_FORMATS}.items()}
+
+# device time appended to every reply, the only data of replies without DATA: | COMMAND | ACK | MICROS |
+REPLY_TIMESTAMP_STRUCT = struct.Struct(REPLY_TIMESTAMP_FORMAT)
+_ACK_REPLY_SIZE = COMMAND_BYTE_SIZE + 1 + REPLY_TIMESTAMP_STRUCT.size
+
+
+def encode_request(command:bytes, *values) -> bytes:
+    """ Encode a request payload.
+
+    :param command: The command, e.g. CMD_SET_TARGET_FREQ.
+    :type command: bytes
+    :param values: Values of the request data in order of REQUEST_STRUCTS,
+        or tuples of record values for commands of RECORD_STRUCTS.
+    :raises ValueError: If the command is not recognized or the number of records is not valid.
+    :raises struct.error: If the values do not fit the request layout.
+    :return: The payload (command followed by data).
+    :rtype: bytes
+    """
+    command_byte = command[0]
+    request_struct = REQUEST_STRUCTS.get(command_byte)
+    if request_struct is not None:
+        return request_struct.pack(command_byte, *values)
+    record_structs = RECORD_STRUCTS.get(command_byte)
+    if record_structs is None:
+        raise ValueError(f"command={command}, invalid value.")
+    if not 0 < len(values) <= len(record_structs):
+        raise ValueError(f"len(values)={len(values)} is not valid, valid values [1..{len(record_structs)}].")
+    return record_structs[len(values)-1].pack(command_byte, *itertools.chain.from_iterable(values))
+
+
+def decode_reply(payload:bytearray) -> dict:
+    """ Decode a reply payload into a dictionary.
+
+    Commands returning only ACK/NACK are decoded as {'CMD':..., 'ACK':bool, 'MICROS':...}.
+    Commands returning data are decoded as {'CMD':..., <values>, 'MICROS':...}, or
+    {'CMD':..., 'ACK':False, 'MICROS':...} if NACK is returned instead of the data
+    ('ACK':'ERROR' for any other payload). 'MICROS' is missing in replies
+    of unexpected size.
+
+    :param payload: The reply payload (command followed by data and the device time).
+    :type payload: bytearray
+    :raises ValueError: If the command is not recognized.
+    :return: A dictionary representation of the payload.
+    :rtype: dict
+    """
+    try:
+        name, reply_struct, value_names = REPLY_STRUCTS[payload[0]]
+    except KeyError:
+        raise ValueError(f"command={bytes(payload[0:COMMAND_BYTE_SIZE])}, invalid value.")
+    if reply_struct is not None and len(payload) == COMMAND_BYTE_SIZE + reply_struct.size:
+        info = {'CMD':name}
+        info.update(zip(value_names, reply_struct.unpack_from(payload, COMMAND_BYTE_SIZE)))
+        return info
+    if reply_struct is None:
+        info = {'CMD':name, 'ACK':payload[COMMAND_BYTE_SIZE] == _PKT_ACK}
+    else:
+        info = {'CMD':name, 'ACK':False if payload[COMMAND_BYTE_SIZE] == _PKT_NACK else 'ERROR'}
+    if len(payload) == _ACK_REPLY_SIZE:
+        info[REPLY_TIMESTAMP_NAME] = REPLY_TIMESTAMP_STRUCT.unpack_from(payload, COMMAND_BYTE_SIZE + 1)[0]
+    return info
@@ -0,0 +1,131 @@
+import struct
+import numpy as np
+from .pkt_defs import CMD_GET_IMU_MEASUREMENT, PKT_IMU_FRAME, COMMAND_BYTE_SIZE
+from .pkt_formats import REPLY_FORMATS, PUSH_FORMATS
+""" Vectorized decoding of IMU payloads.
+
+    decode_reply() builds a dictionary per reply, which dominates the time
+    of replaying millions of logged frames. The functions below decode a
+    contiguous buffer of equally sized payloads at once, np.frombuffer()
+    maps the buffer onto a structured dtype without copying:
+
+        payloads = b''.join(logged_payloads)      # | CMD | AX | ... | MZ | MICROS | ...
+        samples = decode_imu_measurements(payloads)
+        samples['az']                             # int16 array
+        imu_to_physical(samples)['az']            # float64 array in g
+
+    The IMU registers of the firmware (imu_regs) are int16.
+
+Public functions:
+    decode_imu_measurements()
+    decode_imu_frames()
+    imu_to_physical()
+"""
+
+# MPU9250 after MPU9250::initialize() of I2Cdev: +-2 g, +-250 deg/s, AK8963 14-bit output
+ACCEL_LSB_PER_G = 16384.0
+GYRO_LSB_PER_DPS = 131.0
+MAG_UT_PER_LSB = 0.6
+
+
+def _codes(fmt:str) -> list:
+    """ Expands a struct format into single codes, e.g. '<H2h' -> ['H', 'h', 'h']. """
+    codes, count = [], ''
+    for char in fmt[1:]:
+        if char.isdigit():
+            count += char
+            continue
+        codes += [char]*int(count or 1)
+        count = ''
+    return codes
+
+
+def _payload_dtype(fmt:str, value_names:tuple) -> np.dtype:
+    """ Structured dtype of a payload | COMMAND | DATA |, the command byte is skipped. """
+    names, formats, offsets = [], [], []
+    offset = COMMAND_BYTE_SIZE
+    for value_name, code in zip(value_names, _codes(fmt)):
+        names.append(value_name.lower())
+        formats.append(np.dtype(fmt[0] + code))
+        offsets.append(offset)
+        offset += struct.calcsize(code)
+    return np.dtype({'names':names, 'formats':formats, 'offsets':offsets, 'itemsize':offset})
+
+
+# reply of CMD_GET_IMU_MEASUREMENT: | COMMAND | AX AY AZ GX GY GZ MX MY MZ | MICROS |
+IMU_MEASUREMENT_DTYPE = _payload_dtype(*REPLY_FORMATS[CMD_GET_IMU_MEASUREMENT[0]][1:])
+# pushed PKT_IMU_FRAME: | COMMAND | SEQUENCE | AX AY AZ GX GY GZ MX MY MZ | MICROS |
+IMU_FRAME_DTYPE = _payload_dtype(*PUSH_FORMATS[PKT_IMU_FRAME[0]][1:])
+
+_ACCEL_FIELDS = ('ax', 'ay', 'az')
+_GYRO_FIELDS = ('gx', 'gy', 'gz')
+_MAG_FIELDS = ('mx', 'my', 'mz')
+
+
+def _decode(buffer, dtype:np.dtype, command:bytes, check_command:bool) -> np.ndarray:
+    """ Maps a buffer of payloads onto the dtype, optionally checks the command bytes. """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    if data.size % dtype.itemsize:
+        raise ValueError(f"len(buffer)={data.size} is not valid, valid values are multiples of {dtype.itemsize}.")
+    if check_command and not np.all(data[::dtype.itemsize] == command[0]):
+        index = int(np.argmax(data[::dtype.itemsize] != command[0]))
+        raise ValueError(f"payload={index} is not valid, the command byte is not {command}.")
+    return data.view(dtype)
+
+
+def decode_imu_measurements(buffer, check_command:bool=True) -> np.ndarray:
+    """
+    Decodes a contiguous buffer of CMD_GET_IMU_MEASUREMENT reply payloads.
+
+    The result is a view of the buffer (read-only if the buffer is bytes),
+    copy it to modify the values.
+
+    :param buffer: Payloads (command byte followed by the data) of equal size, back to back.
+    :type buffer: bytes, bytearray, memoryview or np.ndarray
+    :param check_command: Check the command byte of every payload, defaults to True.
+    :type check_command: bool, optional
+    :raises ValueError: If the size of the buffer or a command byte is not valid.
+    :return: Structured array with int16 fields 'ax', 'ay', 'az', 'gx', 'gy', 'gz', 'mx', 'my', 'mz'
+        and the uint32 field 'micros' (device time, see interface.clock).
+    :rtype: np.ndarray
+    """
+    return _decode(buffer, IMU_MEASUREMENT_DTYPE, CMD_GET_IMU_MEASUREMENT, check_command)
+
+
+def decode_imu_frames(buffer, check_command:bool=True) -> np.ndarray:
+    """
+    Decodes a contiguous buffer of pushed PKT_IMU_FRAME payloads.
+
+    :param buffer: Payloads (command byte followed by the data) of equal size, back to back.
+    :type buffer: bytes, bytearray, memoryview or np.ndarray
+    :param check_command: Check the command byte of every payload, defaults to True.
+    :type check_command: bool, optional
+    :raises ValueError: If the size of the buffer or a command byte is not valid.
+    :return: Structured array with the uint16 field 'sequence', int16 fields 'ax' ... 'mz'
+        and the uint32 field 'micros'.
+    :rtype: np.ndarray
+    """
+    return _decode(buffer, IMU_FRAME_DTYPE, PKT_IMU_FRAME, check_command)
+
+
+def imu_to_physical(samples:np.ndarray, accel_lsb_per_g:float=ACCEL_LSB_PER_G, gyro_lsb_per_dps:float=GYRO_LSB_PER_DPS,
+                    mag_ut_per_lsb:float=MAG_UT_PER_LSB) -> np.ndarray:
+    """
+    Scales raw IMU samples to physical units.
+
+    :param samples: Structured array of decode_imu_measurements() or decode_imu_frames().
+    :type samples: np.ndarray
+    :param accel_lsb_per_g: Sensitivity of the accelerometer, defaults to ACCEL_LSB_PER_G (+-2 g).
+    :type accel_lsb_per_g: float, optional
+    :param gyro_lsb_per_dps: Sensitivity of the gyroscope, defaults to GYRO_LSB_PER_DPS (+-250 deg/s).
+    :type gyro_lsb_per_dps: float, optional
+    :param mag_ut_per_lsb: Resolution of the magnetometer, defaults to MAG_UT_PER_LSB (14-bit).
+    :type mag_ut_per_lsb: float, optional
+    :return: Structured float64 array with fields 'ax' ... 'az' in g, 'gx' ... 'gz' in deg/s and 'mx' ... 'mz' in uT.
+    :rtype: np.ndarray
+    """
+    physical = np.empty(samples.shape, dtype=[(name, np.float64) for name in _ACCEL_FIELDS + _GYRO_FIELDS + _MAG_FIELDS])
+    for fields, scale in ((_ACCEL_FIELDS, 1/accel_lsb_per_g), (_GYRO_FIELDS, 1/gyro_lsb_per_dps), (_MAG_FIELDS, mag_ut_per_lsb)):
+        for name in fields:
+            np.multiply(samples[name], scale, out=physical[name])
+    return physical
@@ -1,3 +1,4 @@
+import binascii
 import logging
 logger = logging.getLogger(__name__)
 
@@ -16,7 +17,7 @@ from .pkt_defs import *
         - holds structure representing single exchange of data (e.g. reply)
     Message
         - represents stripped-down version of packet without START_BYTES and END_BYTES
-        - used only check_packet_complete()
+        - used only to check the packet is complete (see _find_packet())
     Payload
         - Message without PAYLOAD_SIZE
         - contains the Command and the Data
@@ -26,63 +27,176 @@ from .pkt_defs import *
           since this is purely Master-Worker relation (Worker never initiates communication) 
     Data
         - Data carried by the packet (e.g. ACK, NACK, IMU data)
+
+    Packet with CRC (crc=True):
+                  | START_BYTES | PAYLOAD_SIZE | COMMAND | DATA | CRC | END_BYTES |
+        - FRAME_CRC_FLAG is set in PAYLOAD_SIZE
+        - CRC is CRC-16/CCITT-FALSE of PAYLOAD_SIZE and the Payload (high byte first),
+          a corrupted packet is rejected and the search continues at the next START_BYTES
+
+    Packet with COBS framing (framing='cobs'):
+                  | COBS(PAYLOAD_SIZE | COMMAND | DATA [| CRC]) | COBS_DELIMITER |
+        - the Message (and the CRC) is byte-stuffed by COBS, which removes every 
+          COBS_DELIMITER from it, START_BYTES and END_BYTES are not used
+        - the packet ends at the next COBS_DELIMITER, found by a single bytes.find(), 
+          so no position has to be tried as a candidate START_BYTES
         
 Public functions:
     parse_message()
     encode_packet()
     parse_buffer()
+
+Public classes:
+    PacketDecoder
 """
 
-def parse_message(packet:bytearray) -> tuple(bytearray, bytearray):
+def parse_message(packet:bytearray) -> tuple[bytearray, bytearray]:
     """ Break the packet into Command and Payload
 
     :param packet: Complete packet, including START_BYTES and END_BYTES
     :type packet: bytearray
     :return: Returns (Command, Payload_content) 
-    :rtype: tuple(bytearray, bytearray)
+    :rtype: tuple[bytearray, bytearray]
     """
     command = packet[0:COMMAND_BYTE_SIZE]
     data = packet[COMMAND_BYTE_SIZE:]
     return command, data
 
 
-def encode_packet(payload) -> bytearray:
+# framings of packets, see the definitions above
+FRAMINGS = ('start_end', 'cobs')
+# longest Message (the largest PAYLOAD_SIZE, with CRC it is shorter) and its COBS encoding, 
+# a code byte starts the data and follows every run of 254 bytes
+_MAX_MESSAGE_SIZE = PAYLOAD_BYTE_SIZE + (1 << 8*PAYLOAD_BYTE_SIZE) - 1
+_COBS_MAX_ENCODED_SIZE = _MAX_MESSAGE_SIZE + 1 + _MAX_MESSAGE_SIZE//0xFE
+
+
+def encode_packet(payload, crc:bool=False, framing:str='start_end') -> bytearray:
     """
     Encodes a payload into a packet.
 
     :param payload: The payload to be encoded into a packet.
     :type payload: bytearray
+    :param crc: Append the CRC of the payload, defaults to False.
+    :type crc: bool, optional
+    :param framing: Framing of the packet, 'start_end' or 'cobs', defaults to 'start_end'.
+    :type framing: str, optional
+    :raises ValueError: If the payload is too long for a packet with CRC or the framing is not valid.
     :return: The encoded packet.
     :rtype: bytearray
     """
     # Payload size (2 bytes, little-endian)
     payload_size = len(payload)
-    size_bytes = payload_size.to_bytes(PAYLOAD_BYTE_SIZE, byteorder=BYTEORDER)
     # Payload
     payload_bytes = bytes(payload)
-    # Combine all bytes into a single message
-    message = START_BYTES + size_bytes + payload_bytes + END_BYTES
-    logger.debug(f"packet.encode_packet(payload={payload}) -> {message}")
-    return message
+    if crc:
+        if payload_size & FRAME_CRC_FLAG:
+            raise ValueError(f"len(payload)={payload_size} is not valid, valid values are < {FRAME_CRC_FLAG} with crc.")
+        message = (payload_size | FRAME_CRC_FLAG).to_bytes(PAYLOAD_BYTE_SIZE, byteorder=BYTEORDER) + payload_bytes
+        message += binascii.crc_hqx(message, CRC_INIT).to_bytes(CRC_SIZE, byteorder='big')
+    else:
+        message = payload_size.to_bytes(PAYLOAD_BYTE_SIZE, byteorder=BYTEORDER) + payload_bytes
+    if framing == 'start_end':
+        # Combine all bytes into a single packet
+        packet = START_BYTES + message + END_BYTES
+    elif framing == 'cobs':
+        packet = _cobs_encode(message) + COBS_DELIMITER
+    else:
+        raise ValueError(f"framing={framing} is not valid, valid values are {FRAMINGS}.")
+    logger.debug("packet.encode_packet(payload=%s) -> %s", payload, packet)
+    return packet
 
 
-def _find_bytes(byte_array:bytearray, bytes:bytearray) -> list(int):
-    """ Locate all indices of bytes-pattern within byte_array.
+def _cobs_encode(data:bytes) -> bytes:
+    """ Byte-stuffs the data by COBS, the result contains no COBS_DELIMITER.
 
-    :param byte_array: Array of bytes to be searched for a bytes-patter.
-    :type byte_array: bytearray
-    :param bytes: Patter of bytes to be searched for within byte_array.
-    :type bytes: bytearray
-    :return: List of indices, if no indices found returns [-1]
-    :rtype: list
+    Every run of up to 254 bytes other than COBS_DELIMITER is preceded by 
+    a code byte, its length + 1. A code below 0xFF stands for a COBS_DELIMITER 
+    following the run (except after the last run).
+
+    :param data: Data to be encoded.
+    :type data: bytes
+    :return: The encoded data (without the terminating COBS_DELIMITER).
+    :rtype: bytes
     """
-    indices = []
-    for i in range(len(byte_array)-1):
-        if byte_array[i:i+len(bytes)] == bytes:
-            indices.append(i)
-    if len(indices) == 0:
-        indices.append(-1)
-    return indices
+    encoded = bytearray()
+    for run in bytes(data).split(COBS_DELIMITER):
+        while len(run) >= 0xFE:
+            encoded.append(0xFF)
+            encoded += run[:0xFE]
+            run = run[0xFE:]
+        encoded.append(len(run) + 1)
+        encoded += run
+    return bytes(encoded)
+
+
+def _cobs_decode(encoded:bytes) -> bytearray:
+    """ Reverts _cobs_encode().
+
+    The data are unstuffed in place: the code byte at the beginning is 
+    removed, every other code byte is replaced by COBS_DELIMITER (or removed 
+    if it follows a run of 254 bytes), so the loop runs once per code byte 
+    and the runs are not copied.
+
+    :param encoded: Encoded data without the terminating COBS_DELIMITER.
+    :type encoded: bytes
+    :return: The decoded data, None if the encoded data are not valid 
+        (a code byte points beyond the end or a COBS_DELIMITER is present).
+    :rtype: bytearray
+    """
+    decoded = bytearray(encoded)
+    encoded_size = len(decoded)
+    # code bytes following a run of 254 bytes (code 0xFF) stand for no COBS_DELIMITER
+    removed = []
+    delimiter = COBS_DELIMITER[0]
+    code_idx = 0
+    code = 0
+    while code_idx < encoded_size:
+        previous_code = code
+        code = decoded[code_idx]
+        if code == delimiter:
+            return None
+        if code_idx:
+            if previous_code == 0xFF:
+                removed.append(code_idx)
+            else:
+                decoded[code_idx] = delimiter
+        code_idx += code
+    if code_idx != encoded_size:
+        return None
+    for idx in reversed(removed):
+        del decoded[idx]
+    del decoded[:1]
+    return decoded
+
+
+def _decode_cobs_packet(encoded:bytes, crc:bool=False) -> bytearray:
+    """ Decodes a COBS packet (without the terminating COBS_DELIMITER) into its payload.
+
+    The PAYLOAD_SIZE has to match the decoded size and, with crc, the 
+    packet has to carry FRAME_CRC_FLAG and a valid CRC. A packet with 
+    an empty payload carries no command and is not valid.
+
+    :param encoded: The packet without COBS_DELIMITER.
+    :type encoded: bytes
+    :param crc: Accept only packets with a valid CRC, defaults to False
+    :type crc: bool, optional
+    :return: The payload, None if the packet is not valid.
+    :rtype: bytearray
+    """
+    message = _cobs_decode(encoded)
+    if not message:
+        return None
+    payload_size = message[0]
+    if crc:
+        if (payload_size == FRAME_CRC_FLAG or not payload_size & FRAME_CRC_FLAG or 
+                len(message) != PAYLOAD_BYTE_SIZE + (payload_size & ~FRAME_CRC_FLAG) + CRC_SIZE or 
+                binascii.crc_hqx(message, CRC_INIT) != 0):
+            return None
+        return message[PAYLOAD_BYTE_SIZE:-CRC_SIZE]
+    if payload_size == 0 or len(message) != PAYLOAD_BYTE_SIZE + payload_size:
+        return None
+    return message[PAYLOAD_BYTE_SIZE:]
 
 
 def _bytearray_to_int(bytearray_int:bytearray, byteorder:str=BYTEORDER) -> int:
@@ -98,26 +212,96 @@ def _bytearray_to_int(bytearray_int:bytearray, byteorder:str=BYTEORDER) -> int:
     return int.from_bytes(bytearray_int, byteorder)
 
 
-def _check_packet_complete(expected_packet:bytearray) -> tuple(bool, bytearray):
+def _find_packet(buffer:bytearray, start:int=0) -> tuple[int, int, int]:
+    """ Locate the first consistent packet within the buffer.
+
+    Every START_BYTES occurrence is a candidate. The PAYLOAD_SIZE following 
+    the candidate determines the only position where END_BYTES may appear, 
+    so each candidate is accepted or rejected in O(1). This is equivalent 
+    to checking the PAYLOAD_SIZE of all START_BYTES/END_BYTES pairs, 
+    but every byte is inspected (roughly) once.
+
+    :param buffer: Array of received data.
+    :type buffer: bytearray
+    :param start: Index where the search begins, defaults to 0
+    :type start: int, optional
+    :return: Returns (packet_start_idx, payload_end_idx, pending_idx), 
+        where packet_start_idx is -1 if no packet is found and pending_idx 
+        is the first START_BYTES index whose packet may still be completed 
+        by more data (-1 if there is none).
+    :rtype: tuple[int, int, int]
     """
-    Checks whether a packet is complete according to its payload size.
+    header_size = len(START_BYTES) + PAYLOAD_BYTE_SIZE
+    buffer_size = len(buffer)
+    pending_idx = -1
+    packet_start_idx = buffer.find(START_BYTES, start)
+    while packet_start_idx != -1:
+        payload_start_idx = packet_start_idx + header_size
+        if payload_start_idx > buffer_size:
+            # PAYLOAD_SIZE not received yet
+            if pending_idx == -1:
+                pending_idx = packet_start_idx
+            break
+        payload_size = _bytearray_to_int(bytearray_int=buffer[packet_start_idx+len(START_BYTES):payload_start_idx])
+        payload_end_idx = payload_start_idx + payload_size
+        if payload_end_idx + len(END_BYTES) > buffer_size:
+            # packet not received completely yet
+            if pending_idx == -1:
+                pending_idx = packet_start_idx
+        elif buffer[payload_end_idx:payload_end_idx+len(END_BYTES)] == END_BYTES:
+            return packet_start_idx, payload_end_idx, pending_idx
+        # false start of packet, continue the search
+        packet_start_idx = buffer.find(START_BYTES, packet_start_idx+1)
+    return -1, -1, pending_idx
+
 
-    :param expected_packet: The packet to be checked.
-    :type expected_packet: bytearray
-    :return: A tuple containing a boolean indicating whether the packet is complete and the packet's payload.
-    :rtype: tuple
+def _find_crc_packet(buffer:bytearray, start:int=0) -> tuple[int, int, int]:
+    """ Locate the first consistent packet with CRC within the buffer.
+
+    Like _find_packet(), the PAYLOAD_SIZE following a START_BYTES candidate 
+    determines the only position of the CRC and END_BYTES. A candidate 
+    without FRAME_CRC_FLAG, without END_BYTES or with a wrong CRC is 
+    rejected in O(1) (the CRC of at most 127 bytes) and the search resumes 
+    at the next START_BYTES, so a corrupted packet costs no more than a 
+    valid one.
+
+    :param buffer: Array of received data.
+    :type buffer: bytearray
+    :param start: Index where the search begins, defaults to 0
+    :type start: int, optional
+    :return: Returns (packet_start_idx, payload_end_idx, pending_idx) as _find_packet(), 
+        the CRC follows payload_end_idx.
+    :rtype: tuple[int, int, int]
     """
-    payload_size_bytes = expected_packet[len(START_BYTES):len(START_BYTES)+PAYLOAD_BYTE_SIZE]
-    message_size = _bytearray_to_int(bytearray_int=payload_size_bytes) + PAYLOAD_BYTE_SIZE
-    if message_size == len(expected_packet)-len(START_BYTES)-len(END_BYTES):
-        payload = expected_packet[len(START_BYTES)+PAYLOAD_BYTE_SIZE:len(START_BYTES)+message_size]
-        return True, payload
-    else:
-        # false start and/or end of packet
-        return False, bytearray()
-        
+    header_size = len(START_BYTES) + PAYLOAD_BYTE_SIZE
+    trailer_size = CRC_SIZE + len(END_BYTES)
+    buffer_size = len(buffer)
+    pending_idx = -1
+    packet_start_idx = buffer.find(START_BYTES, start)
+    while packet_start_idx != -1:
+        payload_start_idx = packet_start_idx + header_size
+        if payload_start_idx > buffer_size:
+            # PAYLOAD_SIZE not received yet
+            if pending_idx == -1:
+                pending_idx = packet_start_idx
+            break
+        payload_size = _bytearray_to_int(bytearray_int=buffer[packet_start_idx+len(START_BYTES):payload_start_idx])
+        if payload_size & FRAME_CRC_FLAG:
+            payload_end_idx = payload_start_idx + (payload_size & ~FRAME_CRC_FLAG)
+            if payload_end_idx + trailer_size > buffer_size:
+                # packet not received completely yet
+                if pending_idx == -1:
+                    pending_idx = packet_start_idx
+            elif (buffer[payload_end_idx+CRC_SIZE:payload_end_idx+trailer_size] == END_BYTES and 
+                  binascii.crc_hqx(buffer[packet_start_idx+len(START_BYTES):payload_end_idx+CRC_SIZE], CRC_INIT) == 0):
+                # the CRC of the message followed by its CRC is 0
+                return packet_start_idx, payload_end_idx, pending_idx
+        # false start of packet or corrupted packet, continue the search
+        packet_start_idx = buffer.find(START_BYTES, packet_start_idx+1)
+    return -1, -1, pending_idx
+
 
-def parse_buffer(buffer:bytearray) -> tuple(bytearray, bytearray):
+def parse_buffer(buffer:bytearray, crc:bool=False, framing:str='start_end') -> tuple[bytearray, bytearray]:
     """ Searches for a first complete packet within the buffer.
     
     Function searches the first consistent packet between all valid 
@@ -127,34 +311,212 @@ def parse_buffer(buffer:bytearray) -> tuple(bytearray, bytearray):
     an emptyarray representing the packet is returned.  
     
     Since only the first packet is returned, 
-    this function can be called continuously.
+    this function can be called continuously. For continuous reception 
+    prefer PacketDecoder, which does not rescan the buffer.
     
     :param buffer: Array of all received data.
     :type buffer: bytearray
+    :param crc: Accept only packets with a valid CRC, defaults to False
+    :type crc: bool, optional
+    :param framing: Framing of the packets, 'start_end' or 'cobs', defaults to 'start_end'
+    :type framing: str, optional
     :return: Returns (updated buffer, packet - empty if no packet is detected)
-    :rtype: tuple(bytearray, bytearray)
+    :rtype: tuple[bytearray, bytearray]
     """
-    # detect all START_BYTES
-    packet_start_idxs = _find_bytes(byte_array=buffer, bytes=START_BYTES)
-    if packet_start_idxs[0] == -1:
+    if framing == 'cobs':
+        packet_end_idx = buffer.find(COBS_DELIMITER)
+        while packet_end_idx != -1:
+            payload = _decode_cobs_packet(buffer[:packet_end_idx], crc)
+            buffer = buffer[packet_end_idx+1:]
+            if payload is not None:
+                return buffer, payload
+            # corrupted packet, continue with the next one
+            packet_end_idx = buffer.find(COBS_DELIMITER)
+        return buffer, bytearray()
+    if buffer.find(START_BYTES) == -1:
         # no START_BYTES found, dump the buffer
         return bytearray(), bytearray()
-    # detect all END_BYTES
-    packet_end_idxs = _find_bytes(byte_array=buffer, bytes=END_BYTES)
-    # no END_BYTES found, return buffer to append more data
-    if packet_end_idxs[0] == -1:
+    packet_start_idx, payload_end_idx, _ = _find_crc_packet(buffer) if crc else _find_packet(buffer)
+    if packet_start_idx == -1:
+        # return buffer to append more data
         return buffer, bytearray()
-        
-    # search for every start of the packet, until a packet of found
-    for packet_start_idx in packet_start_idxs:
-        for packet_end_idx in packet_end_idxs:
-            expected_packet = buffer[packet_start_idx:packet_end_idx+len(END_BYTES)]
-            packet_detected, payload = _check_packet_complete(expected_packet)
-            if packet_detected:
-                # remove the packet from the buffer
-                buffer = buffer[packet_end_idx+len(END_BYTES):]
-                return buffer, payload
-            else:
-                # continue the search
-                pass
-    return buffer, bytearray()
\ No newline at end of file
+    payload = buffer[packet_start_idx+len(START_BYTES)+PAYLOAD_BYTE_SIZE:payload_end_idx]
+    # remove the packet from the buffer
+    buffer = buffer[payload_end_idx+(CRC_SIZE if crc else 0)+len(END_BYTES):]
+    return buffer, payload
+
+
+class PacketDecoder():
+    """ Incremental decoder of a stream of packets.
+
+    The decoder keeps the unparsed tail of the stream between calls of 
+    feed(), so the incoming data can be passed in chunks of arbitrary size 
+    (e.g. as returned by serial.read()). Packets are accepted under the same 
+    rules as parse_buffer(), but the buffer is never rescanned from its 
+    beginning, which keeps the decoding cost linear in the amount of 
+    received data.
+
+    Bytes which are not part of any packet (framing errors of the serial 
+    line, corrupted packets) are counted in discarded_bytes, the measure 
+    of the link quality. Packets with an empty payload carry no command, 
+    they are never delivered and their bytes are counted as discarded.
+
+    With crc=True only packets with a valid CRC are accepted, corrupted 
+    packets are discarded instead of being delivered. With framing='cobs' 
+    the stream is split at every COBS_DELIMITER, each byte is inspected 
+    once by bytes.find() and once by the COBS decoding. An unterminated 
+    tail longer than any COBS packet is discarded up to the next 
+    COBS_DELIMITER.
+    
+    Public methods:
+        feed()
+        reset()
+        set_crc()
+        set_framing()
+
+    Public attributes:
+        crc                     - packets with CRC are decoded (read-only property)
+        framing                 - framing of the packets, 'start_end' or 'cobs' (read-only property)
+        received_bytes          - number of bytes fed
+        discarded_bytes         - number of bytes fed and not decoded into packets (read-only property)
+    """
+    def __init__(self, crc:bool=False, framing:str='start_end'):
+        """
+        Initializes the PacketDecoder with an empty buffer.
+
+        :param crc: Decode packets with CRC, defaults to False.
+        :type crc: bool, optional
+        :param framing: Framing of the packets, 'start_end' or 'cobs', defaults to 'start_end'.
+        :type framing: str, optional
+        :raises ValueError: If the framing is not valid.
+        """
+        self._buffer = bytearray()
+        self.received_bytes = 0
+        self._packet_bytes = 0
+        # COBS: the buffer holds no COBS_DELIMITER before _scan_idx, 
+        # _skip_packet discards the bytes up to the next COBS_DELIMITER
+        self._scan_idx = 0
+        self._skip_packet = False
+        self._framing = 'start_end'
+        self.set_framing(framing)
+        self.set_crc(crc)
+
+
+    @property
+    def crc(self) -> bool:
+        return self._crc
+
+
+    @property
+    def framing(self) -> str:
+        return self._framing
+
+
+    @property
+    def discarded_bytes(self) -> int:
+        return self.received_bytes - self._packet_bytes - len(self._buffer)
+
+
+    def reset(self):
+        """
+        Discards all buffered (incomplete) data.
+        """
+        self._buffer.clear()
+        self._scan_idx = 0
+        self._skip_packet = False
+
+
+    def set_crc(self, crc:bool):
+        """
+        Switches between packets with and without CRC, discards all buffered (incomplete) data.
+
+        :param crc: Decode packets with CRC.
+        :type crc: bool
+        """
+        self._crc = crc
+        self._find_packet = _find_crc_packet if crc else _find_packet
+        # bytes following the payload
+        self._trailer_size = (CRC_SIZE if crc else 0) + len(END_BYTES)
+        self._framing_size = len(START_BYTES) + PAYLOAD_BYTE_SIZE + self._trailer_size
+        self.reset()
+
+
+    def set_framing(self, framing:str):
+        """
+        Switches the framing of the packets, discards all buffered (incomplete) data.
+
+        :param framing: Framing of the packets, 'start_end' or 'cobs'.
+        :type framing: str
+        :raises ValueError: If the framing is not valid.
+        """
+        if framing not in FRAMINGS:
+            raise ValueError(f"framing={framing} is not valid, valid values are {FRAMINGS}.")
+        self._framing = framing
+        self.reset()
+
+
+    def feed(self, chunk:bytes) -> list[bytearray]:
+        """ Append a chunk of received data and decode all complete packets.
+
+        :param chunk: Newly received data.
+        :type chunk: bytes
+        :return: List of payloads (in order of arrival), empty if no packet is complete.
+        :rtype: list[bytearray]
+        """
+        buffer = self._buffer
+        buffer.extend(chunk)
+        self.received_bytes += len(chunk)
+        if self._framing == 'cobs':
+            return self._feed_cobs()
+        payloads = []
+        search_idx = 0
+        find_packet = self._find_packet
+        while True:
+            packet_start_idx, payload_end_idx, pending_idx = find_packet(buffer, search_idx)
+            if packet_start_idx == -1:
+                break
+            payload_start_idx = packet_start_idx + len(START_BYTES) + PAYLOAD_BYTE_SIZE
+            if payload_end_idx > payload_start_idx:
+                payloads.append(buffer[payload_start_idx:payload_end_idx])
+            search_idx = payload_end_idx + self._trailer_size
+        if payloads:
+            self._packet_bytes += sum(map(len, payloads)) + self._framing_size*len(payloads)
+        # keep only data which may still become a packet
+        if pending_idx != -1:
+            del buffer[:pending_idx]
+        elif len(buffer) > search_idx and buffer[-1] == START_BYTES[0]:
+            # START_BYTES may be split between chunks
+            del buffer[:-1]
+        else:
+            buffer.clear()
+        return payloads
+
+
+    def _feed_cobs(self) -> list[bytearray]:
+        """ Decodes all COBS packets terminated within the buffer, keeps the unterminated tail. 
+
+        The search resumes where the previous feed() stopped, so the tail is not rescanned. 
+        """
+        buffer = self._buffer
+        payloads = []
+        packet_start_idx = 0
+        packet_end_idx = buffer.find(COBS_DELIMITER, self._scan_idx)
+        if self._skip_packet and packet_end_idx != -1:
+            # end of an overlong packet, discarded
+            self._skip_packet = False
+            packet_start_idx = packet_end_idx + len(COBS_DELIMITER)
+            packet_end_idx = buffer.find(COBS_DELIMITER, packet_start_idx)
+        while packet_end_idx != -1:
+            payload = _decode_cobs_packet(buffer[packet_start_idx:packet_end_idx], self._crc)
+            if payload is not None:
+                payloads.append(payload)
+                self._packet_bytes += packet_end_idx - packet_start_idx + len(COBS_DELIMITER)
+            packet_start_idx = packet_end_idx + len(COBS_DELIMITER)
+            packet_end_idx = buffer.find(COBS_DELIMITER, packet_start_idx)
+        del buffer[:packet_start_idx]
+        if self._skip_packet or len(buffer) > _COBS_MAX_ENCODED_SIZE:
+            # no valid packet can end at the next COBS_DELIMITER, the bytes are counted as discarded
+            buffer.clear()
+            self._skip_packet = True
+        self._scan_idx = len(buffer)
+        return payloads
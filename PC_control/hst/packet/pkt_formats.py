@@ -0,0 +1,63 @@
+# AUTO-GENERATED by protocol/generate.py from protocol/pkt_schema.py, DO NOT EDIT.
+""" Struct formats of request payloads and reply data, keyed by the command byte.
+    Requests are big-endian, replies are little-endian.
+"""
+
+# request payload format: | COMMAND | DATA |
+REQUEST_FORMATS = {
+    0x01: '>BBHB',   # CMD_SET_TARGET_FREQ: command, which_pfm, freq, direction
+    0x02: '>BBHi',   # CMD_SET_TARGET_DELTA: command, which_pfm, freq, delta
+    0x03: '>BB',     # CMD_GET_DELTA_STEPS: command, which_pfm
+    0x04: '>B',      # CMD_GET_IMU_MEASUREMENT: command
+    0x05: '>BH',     # CMD_SET_ISR_FREQ: command, isr_freq
+    0x06: '>B',      # CMD_ENABLE_CNC: command
+    0x07: '>B',      # CMD_DISABLE_CNC: command
+    0x08: '>BBi',    # CMD_SET_DELTA_STEPS: command, which_pfm, delta_steps
+    0x0A: '>B',      # CMD_GET_ISR_FREQ: command
+    0x0E: '>B',      # CMD_GET_QUEUE_STATUS: command
+    0x0F: '>B',      # CMD_CLEAR_QUEUE: command
+    0x10: '>BH',     # CMD_SUBSCRIBE_IMU: command, period_ms
+    0x13: '>B',      # CMD_TRIGGER: command
+    0x14: '>B',      # CMD_PING: command
+    0x15: '>BI',     # CMD_SET_BAUDRATE: command, baudrate
+}
+
+# request record format: (format of one record, maximal number of records), payload: | COMMAND | RECORD | RECORD | ... |
+RECORD_FORMATS = {
+    0x0B: ('>BHB',  3), # CMD_SET_TARGETS_FREQ: which_pfm, freq, direction
+    0x0C: ('>BHi',  3), # CMD_SET_TARGETS_DELTA: which_pfm, freq, delta
+    0x0D: ('>BHi',  3), # CMD_QUEUE_SEGMENT: which_pfm, freq, delta
+    0x12: ('>BHB',  3), # CMD_ARM_TARGETS: which_pfm, freq, direction
+}
+
+# reply timestamp appended to every reply and pushed packet: (format, name)
+REPLY_TIMESTAMP_FORMAT = '<I'
+REPLY_TIMESTAMP_NAME = 'MICROS'
+
+# reply DATA format including the timestamp: (name, format or None if only ACK/NACK is returned, names of values)
+REPLY_FORMATS = {
+    0x01: ('CMD_SET_TARGET_FREQ',     None, ()),
+    0x02: ('CMD_SET_TARGET_DELTA',    None, ()),
+    0x03: ('CMD_GET_DELTA_STEPS',     '<iI', ('DELTA', 'MICROS')),
+    0x04: ('CMD_GET_IMU_MEASUREMENT', '<9hI', ('AX', 'AY', 'AZ', 'GX', 'GY', 'GZ', 'MX', 'MY', 'MZ', 'MICROS')),
+    0x05: ('CMD_SET_ISR_FREQ',        None, ()),
+    0x06: ('CMD_ENABLE_CNC',          None, ()),
+    0x07: ('CMD_DISABLE_CNC',         None, ()),
+    0x08: ('CMD_SET_DELTA_STEPS',     None, ()),
+    0x0A: ('CMD_GET_ISR_FREQ',        '<II', ('ISR_FREQ', 'MICROS')),
+    0x0B: ('CMD_SET_TARGETS_FREQ',    None, ()),
+    0x0C: ('CMD_SET_TARGETS_DELTA',   None, ()),
+    0x0D: ('CMD_QUEUE_SEGMENT',       '<BBHI', ('FREE_SLOTS', 'ACTIVE', 'EXECUTED', 'MICROS')),
+    0x0E: ('CMD_GET_QUEUE_STATUS',    '<BBHI', ('FREE_SLOTS', 'ACTIVE', 'EXECUTED', 'MICROS')),
+    0x0F: ('CMD_CLEAR_QUEUE',         None, ()),
+    0x10: ('CMD_SUBSCRIBE_IMU',       None, ()),
+    0x12: ('CMD_ARM_TARGETS',         None, ()),
+    0x13: ('CMD_TRIGGER',             None, ()),
+    0x14: ('CMD_PING',                None, ()),
+    0x15: ('CMD_SET_BAUDRATE',        None, ()),
+}
+
+# pushed packet DATA format including the timestamp: (name, format, names of values)
+PUSH_FORMATS = {
+    0x11: ('PKT_IMU_FRAME',           '<H9hI', ('SEQUENCE', 'AX', 'AY', 'AZ', 'GX', 'GY', 'GZ', 'MX', 'MY', 'MZ', 'MICROS')),
+}
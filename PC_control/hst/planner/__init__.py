@@ -0,0 +1,2 @@
+from .planner import TrajectoryPlanner
+from .planner import Trajectory
@@ -0,0 +1,216 @@
+import logging
+import numpy as np
+from ..packet.pkt_defs import BYTEORDER, INACTIVE_FREQ, DEFAULT_PFM_FREQ
+""" Acceleration and jerk limited trajectory planning for the PFMs.
+
+    The ISR of the firmware produces a step every (pfm_target_freq + 1)
+    ISR periods, it has no ramping. The planner turns a path of waypoints
+    (absolute step positions of X, Y, Z) into short segments of constant
+    step rate, each segment being a pfm_target_freq and an absolute
+    pfm_target_delta per axis, i.e. the arguments of cmd_set_target_delta(),
+    cmd_set_targets_delta() and cmd_queue_segment().
+
+    Every move between two waypoints is a straight line starting and ending
+    at rest. The path parameter follows a symmetric S-curve (jerk, constant
+    acceleration, jerk, cruise and the mirrored deceleration), the limits of
+    every axis are scaled by the length of the move along that axis. Without
+    a jerk limit the profile is trapezoidal. All moves are planned at once
+    with NumPy, there is no Python loop over moves or segments.
+
+Public classes:
+    TrajectoryPlanner
+    Trajectory
+"""
+
+AXES = ('x', 'y', 'z')
+
+_INACTIVE_FREQ = int.from_bytes(INACTIVE_FREQ, byteorder=BYTEORDER)
+_DEFAULT_PFM_FREQ = int.from_bytes(DEFAULT_PFM_FREQ, byteorder=BYTEORDER)
+
+
+class Trajectory():
+    """ Planned trajectory, one row per segment.
+
+        Public methods:
+
+            to_segments()               - segment dictionaries {which_pfm: (freq, delta)}
+
+        Public attributes:
+
+            freq                        - (M, 3) uint16, pfm_target_freq of X, Y, Z (INACTIVE_FREQ if the axis does not move)
+            delta                       - (M, 3) int32, absolute pfm_target_delta at the end of the segment
+            steps                       - (M, 3) int32, steps made in the segment
+            duration                    - (M,) float, planned duration of the segment in seconds
+            quantized_duration          - (M,) float, duration after rounding the step periods to ISR periods
+            isr_freq                    - isr_freq of the firmware used for planning
+    """
+    def __init__(self, freq:np.ndarray, delta:np.ndarray, steps:np.ndarray, duration:np.ndarray, quantized_duration:np.ndarray, isr_freq:int):
+        self.freq = freq
+        self.delta = delta
+        self.steps = steps
+        self.duration = duration
+        self.quantized_duration = quantized_duration
+        self.isr_freq = isr_freq
+
+
+    def __len__(self) -> int:
+        return len(self.duration)
+
+
+    def to_segments(self) -> list[dict]:
+        """
+        Converts the trajectory into segments accepted by HST.cmd_set_targets_delta(),
+        HST.cmd_queue_segment() and TrajectoryUploader.
+
+        Axes not moving in a segment are omitted from the segment.
+
+        :return: Segments, e.g. [{'x': (freq, delta), 'z': (freq, delta)}, ...].
+        :rtype: list[dict]
+        """
+        moving = (self.steps != 0).tolist()
+        return [{which_pfm: (f, d) for which_pfm, f, d, m in zip(AXES, freq, delta, move) if m}
+                for freq, delta, move in zip(self.freq.tolist(), self.delta.tolist(), moving)]
+
+
+class TrajectoryPlanner():
+    """ Plans acceleration (and jerk) limited moves through waypoints.
+
+        Example:
+
+            planner = TrajectoryPlanner(v_max=(3200, 3200, 1600), a_max=(6400, 6400, 3200), j_max=(64000, 64000, 32000))
+            trajectory = planner.plan([(0, 0, 0), (6400, 3200, 0), (0, 0, 800)])
+            TrajectoryUploader(turret).upload(trajectory.to_segments())
+
+        Public methods:
+
+            plan()
+    """
+    def __init__(self, v_max, a_max, j_max=None, isr_freq:int=_DEFAULT_PFM_FREQ, segment_seconds:float=0.01):
+        """
+        Initializes the TrajectoryPlanner.
+
+        :param v_max: Velocity limit of X, Y, Z in steps/s (a scalar applies to all axes).
+        :type v_max: float or sequence
+        :param a_max: Acceleration limit of X, Y, Z in steps/s^2 (a scalar applies to all axes).
+        :type a_max: float or sequence
+        :param j_max: Jerk limit of X, Y, Z in steps/s^3, None plans trapezoidal profiles, defaults to None.
+        :type j_max: float or sequence, optional
+        :param isr_freq: The isr_freq of the firmware (see HST.cmd_set_isr_freq()), defaults to DEFAULT_PFM_FREQ.
+        :type isr_freq: int, optional
+        :param segment_seconds: Longest duration of a segment, defaults to 0.01.
+        :type segment_seconds: float, optional
+        :raises ValueError: If a limit is not positive.
+        """
+        self._logger = logging.getLogger(__name__)
+        self._v_max = self._check_limit('v_max', v_max)
+        self._a_max = self._check_limit('a_max', a_max)
+        self._j_max = np.full(len(AXES), np.inf) if j_max is None else self._check_limit('j_max', j_max)
+        if isr_freq <= 0:
+            raise ValueError(f"isr_freq={isr_freq} is not valid, valid values are > 0.")
+        if segment_seconds <= 0:
+            raise ValueError(f"segment_seconds={segment_seconds} is not valid, valid values are > 0.")
+        self._isr_freq = isr_freq
+        # OCR1A = F_CPU/2/isr_freq with prescaler 1:1, the ISR runs at twice the isr_freq
+        self._isr_rate = 2*isr_freq
+        self._segment_seconds = segment_seconds
+
+
+    def _check_limit(self, name:str, limit) -> np.ndarray:
+        """ Broadcasts a limit to the axes and checks it is positive. """
+        limit = np.broadcast_to(np.asarray(limit, dtype=np.float64), (len(AXES),)).copy()
+        if not np.all(limit > 0):
+            raise ValueError(f"{name}={limit.tolist()} is not valid, valid values are > 0.")
+        return limit
+
+
+    def _profiles(self, moves:np.ndarray) -> tuple[np.ndarray, ...]:
+        """
+        S-curve parameters of the normalized path parameter u in [0, 1] of every move.
+
+        :param moves: (N, 3) steps of every move.
+        :type moves: np.ndarray
+        :return: Peak velocity, peak acceleration, jerk time, acceleration time and duration of every move.
+        :rtype: tuple[np.ndarray, ...]
+        """
+        length = np.abs(moves)
+        with np.errstate(divide='ignore'):
+            # the most constrained axis limits the path parameter
+            v = np.min(self._v_max/length, axis=1)
+            a = np.min(self._a_max/length, axis=1)
+            j = np.min(self._j_max/length, axis=1)
+            # the peak velocity reaching u=1 without cruising, when the acceleration limit is reached ...
+            v_reach = a/2*(np.sqrt((a/j)**2 + 4/a) - a/j)
+            # ... or when it is not (a triangular acceleration)
+            v_reach = np.where(v_reach <= a*a/j, np.cbrt(np.sqrt(j)/2)**2, v_reach)
+        v = np.minimum(v, v_reach)
+        a = np.minimum(a, np.sqrt(v*j))
+        t_jerk = a/j
+        t_acc = t_jerk + v/a
+        t_cruise = np.maximum(1/v - t_acc, 0.0)
+        return v, a, t_jerk, t_acc, 2*t_acc + t_cruise
+
+
+    @staticmethod
+    def _accelerate(t:np.ndarray, v:np.ndarray, a:np.ndarray, t_jerk:np.ndarray, t_acc:np.ndarray) -> np.ndarray:
+        """ Path parameter during the acceleration from rest to v, 0 <= t <= t_acc. """
+        j = np.divide(a, t_jerk, out=np.zeros_like(a), where=t_jerk > 0)
+        # jerk phase
+        u_jerk = j*t**3/6
+        # constant acceleration phase
+        t_const = t - t_jerk
+        u_const = j*t_jerk**3/6 + a*t_jerk/2*t_const + a*t_const**2/2
+        # the velocity is point-symmetric around t_acc/2, v(t) = v - v(t_acc - t)
+        t_back = t_acc - t
+        u_back = v*t - v*t_acc/2 + j*t_back**3/6
+        return np.where(t < t_jerk, u_jerk, np.where(t <= t_acc - t_jerk, u_const, u_back))
+
+
+    def plan(self, waypoints, start=None) -> Trajectory:
+        """
+        Plans the moves through the waypoints.
+
+        :param waypoints: (N, 3) absolute step positions of X, Y, Z.
+        :type waypoints: array_like
+        :param start: Position of X, Y, Z before the first waypoint, defaults to the first waypoint.
+        :type start: array_like, optional
+        :raises ValueError: If the waypoints are not of shape (N, 3).
+        :return: The planned trajectory.
+        :rtype: Trajectory
+        """
+        waypoints = np.asarray(waypoints, dtype=np.int64)
+        if waypoints.ndim != 2 or waypoints.shape[1] != len(AXES):
+            raise ValueError(f"waypoints.shape={waypoints.shape} is not valid, valid values are (N, {len(AXES)}).")
+        if start is not None:
+            waypoints = np.vstack((np.asarray(start, dtype=np.int64).reshape(1, len(AXES)), waypoints))
+        moves = np.diff(waypoints, axis=0)
+        keep = np.any(moves != 0, axis=1)
+        origins, moves = waypoints[:-1][keep], moves[keep]
+        if len(moves) == 0:
+            empty = np.zeros((0, len(AXES)))
+            return Trajectory(empty.astype(np.uint16), empty.astype(np.int32), empty.astype(np.int32), np.zeros(0), np.zeros(0), self._isr_freq)
+        v, a, t_jerk, t_acc, t_move = self._profiles(moves)
+        # every move is split into segments of equal duration, the moves start at the end of the previous move
+        num_segments = np.ceil(t_move/self._segment_seconds).astype(np.int64)
+        move_index = np.repeat(np.arange(len(moves)), num_segments)
+        segment_index = np.arange(len(move_index)) - np.repeat(np.cumsum(num_segments) - num_segments, num_segments)
+        t_end = (segment_index + 1)*np.repeat(t_move/num_segments, num_segments)
+        v, a, t_jerk, t_acc, t_move = (x[move_index] for x in (v, a, t_jerk, t_acc, t_move))
+        # deceleration mirrors the acceleration: u(t) = 1 - u(t_move - t)
+        t_mirror = t_move - t_end
+        u = np.where(t_end <= t_acc, self._accelerate(np.minimum(t_end, t_acc), v, a, t_jerk, t_acc),
+            np.where(t_mirror <= t_acc, 1 - self._accelerate(np.clip(t_mirror, 0.0, None), v, a, t_jerk, t_acc),
+                     self._accelerate(t_acc, v, a, t_jerk, t_acc) + v*(t_end - t_acc)))
+        u[np.cumsum(num_segments) - 1] = 1.0
+        delta = np.rint(origins[move_index] + moves[move_index]*u[:, None]).astype(np.int64)
+        # segments without a step are merged into the next segment
+        steps = np.diff(delta, axis=0, prepend=waypoints[:1])
+        moving = np.any(steps != 0, axis=1)
+        t_global = (np.cumsum(np.concatenate(([0.0], t_move[np.cumsum(num_segments) - 1])))[move_index] + t_end)[moving]
+        delta, steps = delta[moving], steps[moving]
+        duration = np.diff(t_global, prepend=0.0)
+        # a step every (freq + 1) ISR periods
+        periods = np.divide(duration[:, None]*self._isr_rate, np.abs(steps), out=np.full(steps.shape, np.inf), where=steps != 0)
+        freq = np.where(steps != 0, np.clip(np.rint(periods) - 1, 0, _INACTIVE_FREQ - 1), _INACTIVE_FREQ)
+        quantized_duration = np.max(np.abs(steps)*np.where(steps != 0, freq + 1, 0), axis=1)/self._isr_rate
+        self._logger.info("plan() -> moves=%d, segments=%d, duration=%.3f s", len(moves), len(duration), t_global[-1])
+        return Trajectory(freq.astype(np.uint16), delta.astype(np.int32), steps.astype(np.int32), duration, quantized_duration, self._isr_freq)
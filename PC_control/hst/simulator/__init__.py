@@ -0,0 +1,8 @@
+import serial
+from .firmware import Firmware
+from .link import SimulatedLink
+from .virtual_port import VirtualSerialPort
+
+# register the 'hstsim://' URL handler (protocol_hstsim.py) with pyserial
+if __name__ not in serial.protocol_handler_packages:
+    serial.protocol_handler_packages.append(__name__)
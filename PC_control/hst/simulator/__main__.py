@@ -0,0 +1,25 @@
+import argparse
+import time
+from .virtual_port import VirtualSerialPort
+""" Runs a simulated turret behind a pseudo-terminal until interrupted.
+
+    Usage:
+        python -m hst.simulator [--baudrate 115200] [--latency 0.0] [--loop-period 0.0] [--no-pacing]
+"""
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulated turret behind a pseudo-terminal")
+    parser.add_argument('--baudrate', type=int, default=115200)
+    parser.add_argument('--latency', type=float, default=0.0, help="latency added to every reply in seconds")
+    parser.add_argument('--loop-period', type=float, default=0.0, help="shortest time of the firmware main loop per byte in seconds")
+    parser.add_argument('--no-pacing', action='store_true', help="do not delay bytes by their transmission time")
+    args = parser.parse_args()
+
+    port = VirtualSerialPort(baudrate=args.baudrate, pacing=not args.no_pacing,
+                             latency_seconds=args.latency, loop_period_seconds=args.loop_period)
+    print(port.name, flush=True)
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        port.close()
@@ -0,0 +1,819 @@
+import binascii
+import collections
+import math
+import struct
+import time
+import logging
+from ..packet.pkt_defs import *
+from ..packet.pkt_formats import REQUEST_FORMATS, RECORD_FORMATS
+""" Python model of the turret firmware (Turret4.ino, pkt_process_cmd.cpp,
+    pfm_cnc.cpp, pfm_isr.h and imu.cpp).
+
+    The model is lazy: instead of running the ISR on a timer, the number of
+    ISR ticks elapsed since the last update is computed whenever the state
+    is observed or changed (advance()), and the steps of every PFM are
+    derived in closed form. The result is equal to executing the ISR tick
+    by tick, including the quirks of the firmware:
+
+        - a step is produced when the ISR counter exceeds pfm_target_freq,
+          i.e. every pfm_target_freq+1 ticks; INACTIVE_FREQ never steps
+        - target-delta control stops the PFM (INACTIVE_FREQ) on reaching
+          the target
+        - cmd_disable_cnc() blocks the ISR until any command releasing
+          block_isr() (cmd_enable_cnc(), cmd_set_target_freq(), ...)
+        - the ISR runs at F_CPU/(OCR1A+1) while get_isr_freq() reports
+          F_CPU/2/OCR1A
+        - the motion queue is drained at the end of the ISR once no PFM
+          is controlled by target delta
+        - IMU measurements are averaged over a window of WINDOW_SIZE
+          samples by an arithmetic shift
+        - the main loop parses one byte at a time into a 128 byte buffer
+          and replies with command echo + data or ACK/NACK, bytes which
+          cannot start a packet any more are dropped from the buffer
+        - packets with FRAME_CRC_FLAG are checked by their CRC, COBS packets
+          are decoded at every COBS_DELIMITER, replies and pushed frames use
+          the framing (CRC, COBS) of the last request
+        - subscribed IMU frames are pushed by the main loop at the
+          subscribed period, a late frame shifts the following ones
+        - every reply and pushed frame ends with micros() of the device,
+          which wraps around after 2**32 us and drifts from the host clock
+          by clock_drift_ppm
+        - the baudrate of cmd_set_baudrate() is applied by loop() after
+          the ACK and falls back unless it is confirmed within
+          BAUDRATE_CONFIRM_MS (the serial line is modelled by SimulatedLink,
+          which reads the baudrate from baudrate_switch())
+
+Public classes:
+    Firmware
+"""
+
+# clock of ATmega328P
+F_CPU = 16000000
+# imu_config.h
+LOG2_WINDOW_SIZE = 5
+WINDOW_SIZE = 1 << LOG2_WINDOW_SIZE
+# Turret4.ino
+SERIAL_BUFFER_SIZE = 128
+
+_PFM_FLAGS = (PFM_X, PFM_Y, PFM_Z)
+_INACTIVE_FREQ = int.from_bytes(INACTIVE_FREQ, BYTEORDER)
+_DEFAULT_PFM_FREQ = int.from_bytes(DEFAULT_PFM_FREQ, BYTEORDER)
+# size of request DATA (payload without the command byte), CMD_*_SIZE of pkt_cmd_defs.h
+_REQUEST_SIZES = {command: struct.calcsize(fmt) - COMMAND_BYTE_SIZE for command, fmt in REQUEST_FORMATS.items()}
+# size of a record and maximal number of records, CMD_*_RECORD_SIZE and CMD_*_MAX_RECORDS of pkt_cmd_defs.h
+_RECORD_SIZES = {command: (struct.calcsize(fmt), max_records) for command, (fmt, max_records) in RECORD_FORMATS.items()}
+
+
+def _int32(value:int) -> int:
+    """ Wraps the value into int32_t. """
+    return (value + 0x80000000) % 0x100000000 - 0x80000000
+
+
+def _stationary_imu_sample(time_seconds:float) -> tuple:
+    """ IMU sample of a turret at rest (1 g along Z at the +-2 g range). """
+    return (0, 0, 16384, 0, 0, 0, 0, 0, 0)
+
+
+class _PfmRegs():
+    """ Registers of a single PFM (pfm_regs of pfm_registers.h). """
+    __slots__ = ('isr_pfm_counter', 'bit_flag', 'control_target_delta', 'target_freq',
+                 'target_delta', 'direction', 'delta_steps')
+
+    def __init__(self, bit_flag:int, delta_steps:int=0):
+        self.isr_pfm_counter = 0
+        self.bit_flag = bit_flag
+        self.control_target_delta = False
+        self.target_freq = _INACTIVE_FREQ
+        self.target_delta = 0
+        self.direction = True
+        self.delta_steps = delta_steps
+
+
+class Firmware():
+    """ Model of the turret firmware.
+
+        Bytes received over the serial line are passed to receive(), which
+        returns the reply packets. The state of the PFMs is advanced to the
+        time of every received byte, so the time must not go backwards.
+
+        Public methods:
+
+            receive()                   - main loop, returns replies to received bytes
+            process_command()           - Pkt_pfm::process_command()
+            advance()                   - runs the ISR up to a point in time
+            next_push_time()            - time when the next pushed packet is due
+            push_telemetry()            - Pkt_pfm::push_telemetry(), returns a pushed packet
+            micros()                    - device time of the last update
+            baudrate_switch()           - Pkt_pfm::baudrate_switch(), the baudrate loop() restarts Serial with
+            get_delta_steps()
+            get_target_freq()
+            get_isr_freq()
+
+        Public attributes:
+
+            cnc_enabled                 - state of the CNC shield enable pin
+            baudrate                    - baudrate of the serial line
+    """
+    def __init__(self, clock=time.monotonic, imu_sample=None, imu_rate_hz:float=1000.0, clock_drift_ppm:float=0.0,
+                 baudrate:int=DEFAULT_BAUDRATE):
+        """
+        Initializes the firmware as after setup().
+
+        :param clock: Function returning the current time in seconds, defaults to time.monotonic.
+        :type clock: callable, optional
+        :param imu_sample: Function returning a raw IMU sample (ax, ay, az, gx, gy, gz, mx, my, mz)
+            at a given time, defaults to a turret at rest.
+        :type imu_sample: callable, optional
+        :param imu_rate_hz: Rate of IMU measurements of the main loop, defaults to 1000.0.
+        :type imu_rate_hz: float, optional
+        :param clock_drift_ppm: Rate error of the device clock (micros()) against the clock, 
+            > 0 runs fast, defaults to 0.0.
+        :type clock_drift_ppm: float, optional
+        :param baudrate: Baudrate of Serial.begin() in setup(), defaults to DEFAULT_BAUDRATE.
+        :type baudrate: int, optional
+        """
+        self._logger = logging.getLogger(__name__)
+        self._clock = clock
+        self._imu_sample = _stationary_imu_sample if imu_sample is None else imu_sample
+        self._imu_period = 1.0/imu_rate_hz
+        self._time = clock()
+        # micros() counts from the power-up
+        self._boot_time = self._time
+        self._micros_rate = 1e6*(1.0 + clock_drift_ppm*1e-6)
+        # Pfm_cnc::init()
+        self._pfm = [_PfmRegs(bit_flag) for bit_flag in _PFM_FLAGS]
+        self._isr_pfm_busy = False
+        self._ocr1a = (F_CPU//2//_DEFAULT_PFM_FREQ) & 0xFFFF
+        self._isr_phase = 0.0
+        self.cnc_enabled = False
+        # motion queue of segments {this_pfm: (pfm_target_freq, pfm_target_delta)}
+        self._queue = collections.deque()
+        self._queue_active = False
+        self._queue_executed = 0
+        # Imu
+        self._imu_mem = [(0,)*9]*WINDOW_SIZE
+        self._imu_mem_ptr = 0
+        self._imu_time = self._time
+        # subscribe_imu(), period in seconds (0 - not subscribed) and time of the last push
+        self._imu_push_period = 0.0
+        self._imu_push_time = self._time
+        self._imu_sequence = 0
+        # arm_targets(), targets {this_pfm: (pfm_target_freq, pfm_direction)} applied by trigger()
+        self._armed = {}
+        # main loop
+        self._serial_buffer = bytearray(SERIAL_BUFFER_SIZE)
+        self._serial_buffer_length = 0
+        # framing of the last request (packet_crc and packet_cobs of Turret4.ino)
+        self._crc = False
+        self._cobs = False
+        self._output = bytearray(SERIAL_BUFFER_SIZE)
+        # set_baudrate(), baudrate applied by the next baudrate_switch() (None - no change), baudrate
+        # restored unless the switch is confirmed and the time of the switch (None - confirmed)
+        self.baudrate = baudrate
+        self._next_baudrate = None
+        self._fallback_baudrate = baudrate
+        self._baudrate_switch_time = None
+        # dispatch of Pkt_pfm::process_command()
+        self._commands = {
+            CMD_SET_TARGET_FREQ[0]:     self._cmd_set_target_freq,
+            CMD_SET_TARGET_DELTA[0]:    self._cmd_set_target_delta,
+            CMD_GET_DELTA_STEPS[0]:     self._cmd_get_delta_steps,
+            CMD_GET_IMU_MEASUREMENT[0]: self._cmd_get_imu_measurement,
+            CMD_SET_ISR_FREQ[0]:        self._cmd_set_isr_freq,
+            CMD_ENABLE_CNC[0]:          self._cmd_enable_cnc,
+            CMD_DISABLE_CNC[0]:         self._cmd_disable_cnc,
+            CMD_SET_DELTA_STEPS[0]:     self._cmd_set_delta_steps,
+            CMD_GET_ISR_FREQ[0]:        self._cmd_get_isr_freq,
+            CMD_SET_TARGETS_FREQ[0]:    self._cmd_set_targets_freq,
+            CMD_SET_TARGETS_DELTA[0]:   self._cmd_set_targets_delta,
+            CMD_QUEUE_SEGMENT[0]:       self._cmd_queue_segment,
+            CMD_GET_QUEUE_STATUS[0]:    self._cmd_get_queue_status,
+            CMD_CLEAR_QUEUE[0]:         self._cmd_clear_queue,
+            CMD_SUBSCRIBE_IMU[0]:       self._cmd_subscribe_imu,
+            CMD_ARM_TARGETS[0]:         self._cmd_arm_targets,
+            CMD_TRIGGER[0]:             self._cmd_trigger,
+            CMD_PING[0]:                self._cmd_ping,
+            CMD_SET_BAUDRATE[0]:        self._cmd_set_baudrate,
+        }
+
+
+    #########################################################################
+    #                              MAIN LOOP                                #
+    #########################################################################
+    def receive(self, data:bytes, at_time:float=None) -> list[bytes]:
+        """
+        Processes received bytes the way loop() of Turret4.ino does.
+
+        :param data: Received bytes.
+        :type data: bytes
+        :param at_time: Time when the bytes are processed, defaults to the current time of the clock.
+        :type at_time: float, optional
+        :return: Reply packets (framed), in order.
+        :rtype: list[bytes]
+        """
+        self.advance(at_time)
+        replies = []
+        buffer = self._serial_buffer
+        for byte in data:
+            length = self._serial_buffer_length
+            if length < SERIAL_BUFFER_SIZE:
+                buffer[length] = byte
+                length += 1
+            else:
+                # when overflow, reset pointer to buffer
+                length = 0
+            self._serial_buffer_length = length
+            # look for the end of a packet
+            if byte == COBS_DELIMITER[0]:
+                packet_in, crc = self._cobs_decode_message(buffer, length)
+                cobs = True
+                if packet_in is None:
+                    if not self._cobs:
+                        continue
+                    # corrupted COBS packet or COBS_DELIMITER within a START_BYTES/END_BYTES packet, 
+                    # drop only the bytes which cannot start a START_BYTES/END_BYTES packet
+                    packet_in, crc, pending_index = self._decode_message(buffer, length)
+                    if packet_in is None:
+                        buffer[:length-pending_index] = buffer[pending_index:length]
+                        self._serial_buffer_length = length - pending_index
+                        continue
+                    cobs = False
+            elif length >= 2 and buffer[length-2] == END_BYTES[0] and buffer[length-1] == END_BYTES[1]:
+                packet_in, crc, pending_index = self._decode_message(buffer, length)
+                if packet_in is None:
+                    if not self._cobs:
+                        # FALSE packet end or corrupted packet, drop the bytes which cannot start a packet
+                        # (END_BYTES within a COBS packet are not an error, its bytes are kept)
+                        pending_index = min(pending_index, self._cobs_pending_index(buffer, length))
+                        buffer[:length-pending_index] = buffer[pending_index:length]
+                        self._serial_buffer_length = length - pending_index
+                    continue
+                cobs = False
+            else:
+                continue
+            self._crc, self._cobs = crc, cobs
+            replies.append(self._encode_message(self._process_packet(packet_in), crc, cobs))
+            # when command processed, reset pointer to buffer
+            self._serial_buffer_length = 0
+        return replies
+
+
+    def next_push_time(self) -> float:
+        """
+        Time when the next pushed packet is due.
+
+        :return: The time, None if nothing is subscribed.
+        :rtype: float
+        """
+        if not self._imu_push_period:
+            return None
+        return self._imu_push_time + self._imu_push_period
+
+
+    def push_telemetry(self, at_time:float) -> bytes:
+        """
+        Pushes subscribed telemetry from loop() (Pkt_pfm::push_telemetry()).
+
+        :param at_time: Time of the loop() iteration.
+        :type at_time: float
+        :return: The pushed packet (framed), None if no packet is due.
+        :rtype: bytes
+        """
+        if not self._imu_push_period or at_time < self.next_push_time():
+            return None
+        # keep the period, frames delayed by a long loop() are not accumulated
+        self._imu_push_time += self._imu_push_period
+        if at_time - self._imu_push_time >= self._imu_push_period:
+            self._imu_push_time = at_time
+        self.advance(at_time)
+        data = struct.pack('<H', self._imu_sequence) + self._imu_measurement()
+        self._imu_sequence = (self._imu_sequence + 1) & 0xFFFF
+        return self._encode_message(PKT_IMU_FRAME + data + self._micros_bytes(), self._crc, self._cobs)
+
+
+    def baudrate_switch(self, at_time:float) -> int:
+        """
+        Applies the baudrate of cmd_set_baudrate() once its ACK is sent, falls back 
+        to the previous baudrate if it is not confirmed within BAUDRATE_CONFIRM_MS
+        (Pkt_pfm::baudrate_switch() called by loop()).
+
+        :param at_time: Time of the loop() iteration.
+        :type at_time: float
+        :return: The new baudrate (self.baudrate), None if unchanged.
+        :rtype: int
+        """
+        if self._next_baudrate is not None:
+            self.baudrate, self._next_baudrate = self._next_baudrate, None
+            self._baudrate_switch_time = at_time
+            # bytes received during the switch are garbage
+            self._serial_buffer_length = 0
+            return self.baudrate
+        if self._baudrate_switch_time is not None and at_time - self._baudrate_switch_time >= BAUDRATE_CONFIRM_MS/1000:
+            self._logger.info("Firmware.baudrate_switch() -> %d not confirmed, back to %d", self.baudrate, self._fallback_baudrate)
+            self.baudrate, self._baudrate_switch_time = self._fallback_baudrate, None
+            self._serial_buffer_length = 0
+            return self.baudrate
+        return None
+
+
+    @staticmethod
+    def _decode_message(data:bytearray, data_length:int) -> tuple[bytes, bool, int]:
+        """ decode_message() of Turret4.ino, returns (payload, crc, pending_index), 
+            the payload is None if no valid message is found. """
+        pending_index = data_length
+        start_index = data.find(START_BYTES, 0, data_length)
+        while start_index >= 0:
+            if start_index+3 > data_length:
+                # payload size not received yet
+                pending_index = min(pending_index, start_index)
+                break
+            crc = bool(data[start_index+2] & FRAME_CRC_FLAG)
+            payload_size = data[start_index+2] & ~FRAME_CRC_FLAG if crc else data[start_index+2]
+            end_index = start_index+3+payload_size+(CRC_SIZE if crc else 0)
+            if end_index+2 > data_length:
+                # message not received completely yet
+                pending_index = min(pending_index, start_index)
+            elif (data[end_index:end_index+2] == END_BYTES and 
+                  not (crc and binascii.crc_hqx(data[start_index+2:end_index], CRC_INIT))):
+                return bytes(data[start_index+3:start_index+3+payload_size]), crc, pending_index
+            start_index = data.find(START_BYTES, start_index+1, data_length)
+        # keep a trailing first start byte, its message may follow
+        if pending_index == data_length and data_length > 0 and data[data_length-1] == START_BYTES[0]:
+            pending_index = data_length-1
+        return None, False, pending_index
+
+
+    @staticmethod
+    def _cobs_decode_message(data:bytearray, data_length:int) -> tuple[bytes, bool]:
+        """ cobs_decode_message() of Turret4.ino, decodes the COBS packet terminated by 
+            the last byte of the data, returns (payload, crc), the payload is None if the packet is invalid. """
+        start_index = data.rfind(COBS_DELIMITER, 0, data_length-1) + 1
+        message = bytearray()
+        code_index = start_index
+        while code_index < data_length-1:
+            code = data[code_index]
+            if code == 0 or code_index + code > data_length-1:
+                return None, False
+            message += data[code_index+1:code_index+code]
+            code_index += code
+            if code < 0xFF and code_index < data_length-1:
+                message += COBS_DELIMITER
+        if not message:
+            return None, False
+        crc = bool(message[0] & FRAME_CRC_FLAG)
+        payload_size = message[0] & ~FRAME_CRC_FLAG if crc else message[0]
+        if len(message) != 1+payload_size+(CRC_SIZE if crc else 0) or (crc and binascii.crc_hqx(message, CRC_INIT)):
+            return None, False
+        return bytes(message[1:1+payload_size]), crc
+
+
+    @staticmethod
+    def _cobs_pending_index(data:bytearray, data_length:int) -> int:
+        """ cobs_pending_index() of Turret4.ino, the start of the COBS packet after the last 
+            COBS_DELIMITER if it may still be completed, data_length if there is none. """
+        start_index = data.rfind(COBS_DELIMITER, 0, data_length) + 1
+        if start_index+2 > data_length:
+            # payload size not received yet
+            return start_index
+        if data[start_index] < 2:
+            # payload size 0 (replaced by the code byte)
+            return data_length
+        crc = bool(data[start_index+1] & FRAME_CRC_FLAG)
+        payload_size = data[start_index+1] & ~FRAME_CRC_FLAG if crc else data[start_index+1]
+        # a message of less than 254 bytes is encoded with a single additional code byte
+        if data_length-start_index > 1+1+payload_size+(CRC_SIZE if crc else 0):
+            return data_length
+        return start_index
+
+
+    @staticmethod
+    def _encode_message(payload:bytes, crc:bool=False, cobs:bool=False) -> bytes:
+        """ encode_message() and cobs_encode_message() of Turret4.ino """
+        message = bytes([len(payload) | FRAME_CRC_FLAG if crc else len(payload)]) + payload
+        if crc:
+            message += binascii.crc_hqx(message, CRC_INIT).to_bytes(CRC_SIZE, 'big')
+        if cobs:
+            encoded = bytearray()
+            for run in message.split(COBS_DELIMITER):
+                while len(run) >= 0xFE:
+                    encoded += b'\xFF' + run[:0xFE]
+                    run = run[0xFE:]
+                encoded += bytes([len(run)+1]) + run
+            return bytes(encoded) + COBS_DELIMITER
+        return START_BYTES + message + END_BYTES
+
+
+    def micros(self) -> int:
+        """
+        Device time (micros() of the firmware) of the last update of the state.
+
+        :return: Microseconds since the power-up, wrapped into uint32_t.
+        :rtype: int
+        """
+        return int((self._time - self._boot_time)*self._micros_rate) & 0xFFFFFFFF
+
+
+    def _micros_bytes(self) -> bytes:
+        """ REPLY_TIMESTAMP appended to every reply and pushed packet. """
+        return struct.pack('<I', self.micros())
+
+
+    def _process_packet(self, packet_in:bytes) -> bytes:
+        """ Executes the command of a packet and builds the reply payload. """
+        command_type = packet_in[0]
+        success, data = self.process_command(command_type, packet_in[1:])
+        if not success:
+            # NACK is returned
+            return bytes([command_type]) + PKT_NACK + self._micros_bytes()
+        if data:
+            # response is returned
+            return bytes([command_type]) + data + self._micros_bytes()
+        # ACK is returned
+        return bytes([command_type]) + PKT_ACK + self._micros_bytes()
+
+
+    def process_command(self, command:int, payload:bytes) -> tuple[bool, bytes]:
+        """
+        Executes a command (Pkt_pfm::process_command()).
+
+        :param command: The command byte.
+        :type command: int
+        :param payload: DATA of the request (without the command byte).
+        :type payload: bytes
+        :return: A tuple containing a boolean indicating success and the returned data (empty if only ACK is returned).
+        :rtype: tuple[bool, bytes]
+        """
+        handler = self._commands.get(command)
+        if handler is None or not self._valid_payload_size(command, len(payload)):
+            return False, b''
+        self.advance()
+        return handler(payload)
+
+
+    @staticmethod
+    def _valid_payload_size(command:int, payload_size:int) -> bool:
+        """ Checks the size of request DATA the way the cmd_*() functions do. """
+        if command in _RECORD_SIZES:
+            record_size, max_records = _RECORD_SIZES[command]
+            return payload_size % record_size == 0 and 0 < payload_size//record_size <= max_records
+        return payload_size == _REQUEST_SIZES.get(command)
+
+
+    #########################################################################
+    #                                 ISR                                   #
+    #########################################################################
+    def advance(self, at_time:float=None):
+        """
+        Runs the ISR (and the IMU measurements of the main loop) up to a point in time.
+
+        :param at_time: The point in time, defaults to the current time of the clock.
+        :type at_time: float, optional
+        """
+        at_time = self._clock() if at_time is None else at_time
+        elapsed = at_time - self._time
+        if elapsed <= 0:
+            return
+        self._time = at_time
+        self._measure_imu(at_time)
+        if self._isr_pfm_busy:
+            return
+        # ISR ticks elapsed (the fractional tick is carried over)
+        ticks = elapsed*self.get_isr_rate() + self._isr_phase
+        num_ticks = int(ticks)
+        self._isr_phase = ticks - num_ticks
+        if num_ticks > 0:
+            self._run_ticks(num_ticks)
+
+
+    def _run_ticks(self, num_ticks:int):
+        """ Executes the ISR num_ticks times, including the motion queue. """
+        while num_ticks > 0:
+            if not self._queue_active and not self._queue:
+                for pfm in self._pfm:
+                    self._run_isr(pfm, num_ticks)
+                return
+            # the segment is finished (and the next one started) at the end of the tick
+            # in which the last PFM leaves the target-delta control
+            ticks_to_finish = max(self._ticks_to_finish(pfm) for pfm in self._pfm)
+            if ticks_to_finish > num_ticks:
+                for pfm in self._pfm:
+                    self._run_isr(pfm, num_ticks)
+                return
+            for pfm in self._pfm:
+                self._run_isr(pfm, ticks_to_finish)
+            num_ticks -= ticks_to_finish
+            if self._queue_active:
+                self._queue_active = False
+                self._queue_executed = (self._queue_executed + 1) & 0xFFFF
+            if self._queue:
+                for this_pfm, (pfm_target_freq, pfm_target_delta) in self._queue.popleft().items():
+                    self._set_target_delta(self._pfm[this_pfm], pfm_target_freq, pfm_target_delta)
+                self._queue_active = True
+
+
+    @staticmethod
+    def _ticks_to_finish(pfm:_PfmRegs) -> float:
+        """ Number of ISR ticks until the PFM leaves the target-delta control (at least 1, inf if never). """
+        if not pfm.control_target_delta:
+            return 1
+        if pfm.target_freq >= _INACTIVE_FREQ:
+            return 1 if pfm.delta_steps == pfm.target_delta else math.inf
+        period = pfm.target_freq + 1
+        counter = 0 if pfm.isr_pfm_counter == _INACTIVE_FREQ else pfm.isr_pfm_counter
+        ticks_to_step = max(1, period - counter)
+        steps_to_target = pfm.target_delta - pfm.delta_steps if pfm.direction else pfm.delta_steps - pfm.target_delta
+        if steps_to_target == 0 and ticks_to_step > 1:
+            return 1
+        if steps_to_target > 0:
+            return ticks_to_step + (steps_to_target - 1)*period
+        return math.inf
+
+
+    @staticmethod
+    def _run_isr(pfm:_PfmRegs, num_ticks:int):
+        """ Executes ISR(TIMER1_COMPA_vect) num_ticks times for a single PFM. """
+        while num_ticks > 0:
+            if pfm.target_freq >= _INACTIVE_FREQ:
+                # counter runs 1..INACTIVE_FREQ without producing a step
+                if pfm.control_target_delta and pfm.delta_steps == pfm.target_delta:
+                    pfm.control_target_delta = False
+                pfm.isr_pfm_counter = (pfm.isr_pfm_counter + num_ticks - 1) % _INACTIVE_FREQ + 1
+                return
+            period = pfm.target_freq + 1
+            counter = 0 if pfm.isr_pfm_counter == _INACTIVE_FREQ else pfm.isr_pfm_counter
+            # ticks until the next step (counter exceeds target_freq)
+            ticks_to_step = max(1, period - counter)
+            steps = 0 if num_ticks < ticks_to_step else 1 + (num_ticks - ticks_to_step)//period
+            if pfm.control_target_delta:
+                # steps left to the target in the direction of movement (negative if moving away)
+                steps_to_target = pfm.target_delta - pfm.delta_steps if pfm.direction else pfm.delta_steps - pfm.target_delta
+                if steps_to_target == 0 and ticks_to_step > 1:
+                    # already at the target (set_delta_steps()), stopped by the next tick
+                    num_ticks -= 1
+                    pfm.isr_pfm_counter = counter + 1
+                    pfm.target_freq = _INACTIVE_FREQ
+                    pfm.control_target_delta = False
+                    continue
+                if 0 < steps_to_target <= steps:
+                    # target reached, the PFM stops and the remaining ticks run idle
+                    num_ticks -= ticks_to_step + (steps_to_target - 1)*period
+                    pfm.delta_steps = pfm.target_delta
+                    pfm.isr_pfm_counter = 0
+                    pfm.target_freq = _INACTIVE_FREQ
+                    pfm.control_target_delta = False
+                    continue
+            if steps == 0:
+                pfm.isr_pfm_counter = counter + num_ticks
+            else:
+                pfm.isr_pfm_counter = (num_ticks - ticks_to_step) % period
+            pfm.delta_steps = _int32(pfm.delta_steps + (steps if pfm.direction else -steps))
+            return
+
+
+    def _measure_imu(self, at_time:float):
+        """ Imu::perform_measurement() at the rate of the main loop. """
+        num_samples = int((at_time - self._imu_time)/self._imu_period)
+        if num_samples <= 0:
+            return
+        self._imu_time += num_samples*self._imu_period
+        # only the last WINDOW_SIZE samples are kept
+        for index in range(max(0, num_samples-WINDOW_SIZE), num_samples):
+            self._imu_mem_ptr = (self._imu_mem_ptr + 1) % WINDOW_SIZE
+            self._imu_mem[self._imu_mem_ptr] = self._imu_sample(self._imu_time - (num_samples-1-index)*self._imu_period)
+
+
+    #########################################################################
+    #                               STATE                                   #
+    #########################################################################
+    def get_delta_steps(self, this_pfm:int) -> int:
+        """
+        Number of steps of a PFM from the default position.
+
+        :param this_pfm: Index of the PFM (0 - X, 1 - Y, 2 - Z).
+        :type this_pfm: int
+        :return: The delta steps.
+        :rtype: int
+        """
+        self.advance()
+        return self._pfm[this_pfm].delta_steps
+
+
+    def get_target_freq(self, this_pfm:int) -> int:
+        """
+        Target frequency (ISR ticks per step - 1) of a PFM.
+
+        :param this_pfm: Index of the PFM (0 - X, 1 - Y, 2 - Z).
+        :type this_pfm: int
+        :return: The target frequency, INACTIVE_FREQ if the PFM is stopped.
+        :rtype: int
+        """
+        self.advance()
+        return self._pfm[this_pfm].target_freq
+
+
+    def get_isr_freq(self) -> int:
+        """
+        ISR frequency as reported by Pfm_cnc::get_isr_freq().
+
+        :return: The ISR frequency.
+        :rtype: int
+        """
+        return (F_CPU//2//self._ocr1a if self._ocr1a else 0xFFFF) & 0xFFFF
+
+
+    def get_isr_rate(self) -> float:
+        """
+        Rate at which the timer executes the ISR in CTC mode.
+
+        :return: The ISR rate in Hz.
+        :rtype: float
+        """
+        return F_CPU/(self._ocr1a + 1)
+
+
+    #########################################################################
+    #                              COMMANDS                                 #
+    #########################################################################
+    def _targeted_pfms(self, bit_flags_target_pfm:int) -> list[_PfmRegs]:
+        """ PFMs selected by the bit flags. """
+        return [pfm for pfm in self._pfm if bit_flags_target_pfm & pfm.bit_flag]
+
+
+    def _cmd_set_target_freq(self, payload:bytes) -> tuple[bool, bytes]:
+        bit_flags_target_pfm, pfm_target_freq, pfm_direction = struct.unpack('>BHB', payload)
+        for pfm in self._targeted_pfms(bit_flags_target_pfm):
+            # Pfm_cnc::set_target_freq()
+            pfm.control_target_delta = False
+            pfm.target_freq = pfm_target_freq
+            pfm.direction = bool(pfm_direction)
+        self._isr_pfm_busy = False
+        return True, b''
+
+
+    def _cmd_set_target_delta(self, payload:bytes) -> tuple[bool, bytes]:
+        bit_flags_target_pfm, pfm_target_freq, pfm_target_delta = struct.unpack('>BHi', payload)
+        for pfm in self._targeted_pfms(bit_flags_target_pfm):
+            self._set_target_delta(pfm, pfm_target_freq, pfm_target_delta)
+        self._isr_pfm_busy = False
+        return True, b''
+
+
+    @staticmethod
+    def _set_target_delta(pfm:_PfmRegs, pfm_target_freq:int, pfm_target_delta:int):
+        """ Pfm_cnc::set_target_delta() """
+        if pfm.delta_steps == pfm_target_delta:
+            pfm.target_freq = _INACTIVE_FREQ
+            pfm.control_target_delta = False
+            return
+        pfm.control_target_delta = True
+        pfm.target_delta = pfm_target_delta
+        pfm.target_freq = pfm_target_freq
+        pfm.direction = pfm.delta_steps < pfm_target_delta
+        pfm.isr_pfm_counter = 0
+
+
+    def _cmd_get_delta_steps(self, payload:bytes) -> tuple[bool, bytes]:
+        # the delta steps of the last targeted PFM are returned,
+        # the output buffer is left as is if no PFM is targeted
+        for pfm in self._targeted_pfms(payload[0]):
+            self._output[0:4] = struct.pack('<i', pfm.delta_steps)
+        return True, bytes(self._output[0:4])
+
+
+    def _imu_measurement(self) -> bytes:
+        """ Imu::get_measured_data(), division by shifting """
+        mean = [sum(axis) >> LOG2_WINDOW_SIZE for axis in zip(*self._imu_mem)]
+        return struct.pack('<9h', *[(value + 0x8000) % 0x10000 - 0x8000 for value in mean])
+
+
+    def _cmd_get_imu_measurement(self, payload:bytes) -> tuple[bool, bytes]:
+        return True, self._imu_measurement()
+
+
+    def _cmd_set_isr_freq(self, payload:bytes) -> tuple[bool, bytes]:
+        frequency, = struct.unpack('>H', payload)
+        # division by zero yields all ones on AVR
+        self._ocr1a = (F_CPU//2//frequency if frequency else 0xFFFFFFFF) & 0xFFFF
+        return True, b''
+
+
+    def _cmd_enable_cnc(self, payload:bytes) -> tuple[bool, bytes]:
+        self.cnc_enabled = True
+        self._isr_pfm_busy = False
+        return True, b''
+
+
+    def _cmd_disable_cnc(self, payload:bytes) -> tuple[bool, bytes]:
+        self._isr_pfm_busy = True
+        self.cnc_enabled = False
+        return True, b''
+
+
+    def _cmd_set_delta_steps(self, payload:bytes) -> tuple[bool, bytes]:
+        bit_flags_target_pfm, pfm_delta_steps = struct.unpack('>Bi', payload)
+        for pfm in self._targeted_pfms(bit_flags_target_pfm):
+            pfm.delta_steps = pfm_delta_steps
+        self._isr_pfm_busy = False
+        return True, b''
+
+
+    def _cmd_get_isr_freq(self, payload:bytes) -> tuple[bool, bytes]:
+        self._output[0:4] = struct.pack('<I', self.get_isr_freq())
+        return True, bytes(self._output[0:4])
+
+
+    def _cmd_set_targets_freq(self, payload:bytes) -> tuple[bool, bytes]:
+        for bit_flags_target_pfm, pfm_target_freq, pfm_direction in struct.iter_unpack('>BHB', payload):
+            for pfm in self._targeted_pfms(bit_flags_target_pfm):
+                pfm.control_target_delta = False
+                pfm.target_freq = pfm_target_freq
+                pfm.direction = bool(pfm_direction)
+                # Pfm_cnc::restart_counter()
+                pfm.isr_pfm_counter = 0
+        self._isr_pfm_busy = False
+        return True, b''
+
+
+    def _cmd_set_targets_delta(self, payload:bytes) -> tuple[bool, bytes]:
+        for bit_flags_target_pfm, pfm_target_freq, pfm_target_delta in struct.iter_unpack('>BHi', payload):
+            for pfm in self._targeted_pfms(bit_flags_target_pfm):
+                self._set_target_delta(pfm, pfm_target_freq, pfm_target_delta)
+        self._isr_pfm_busy = False
+        return True, b''
+
+
+    def _queue_status(self) -> bytes:
+        """ FREE_SLOTS, ACTIVE, EXECUTED of the motion queue. """
+        return struct.pack('<BBH', PFM_QUEUE_SIZE - len(self._queue), self._queue_active, self._queue_executed)
+
+
+    def _cmd_queue_segment(self, payload:bytes) -> tuple[bool, bytes]:
+        segment = {}
+        for bit_flags_target_pfm, pfm_target_freq, pfm_target_delta in struct.iter_unpack('>BHi', payload):
+            for this_pfm, pfm in enumerate(self._pfm):
+                if bit_flags_target_pfm & pfm.bit_flag:
+                    segment[this_pfm] = (pfm_target_freq, pfm_target_delta)
+        if len(self._queue) >= PFM_QUEUE_SIZE:
+            return False, b''
+        self._queue.append(segment)
+        return True, self._queue_status()
+
+
+    def _cmd_get_queue_status(self, payload:bytes) -> tuple[bool, bytes]:
+        return True, self._queue_status()
+
+
+    def _cmd_clear_queue(self, payload:bytes) -> tuple[bool, bytes]:
+        self._queue.clear()
+        return True, b''
+
+
+    def _cmd_subscribe_imu(self, payload:bytes) -> tuple[bool, bytes]:
+        period_ms, = struct.unpack('>H', payload)
+        self._imu_push_period = period_ms/1000
+        # the first frame is pushed in the next loop()
+        self._imu_push_time = self._time - self._imu_push_period
+        self._imu_sequence = 0
+        return True, b''
+
+
+    def _cmd_arm_targets(self, payload:bytes) -> tuple[bool, bytes]:
+        self._armed = {}
+        for bit_flags_target_pfm, pfm_target_freq, pfm_direction in struct.iter_unpack('>BHB', payload):
+            for this_pfm, pfm in enumerate(self._pfm):
+                if bit_flags_target_pfm & pfm.bit_flag:
+                    self._armed[this_pfm] = (pfm_target_freq, bool(pfm_direction))
+        return True, b''
+
+
+    def _cmd_trigger(self, payload:bytes) -> tuple[bool, bytes]:
+        if not self._armed:
+            return False, b''
+        for this_pfm, (pfm_target_freq, pfm_direction) in self._armed.items():
+            pfm = self._pfm[this_pfm]
+            pfm.control_target_delta = False
+            pfm.target_freq = pfm_target_freq
+            pfm.direction = pfm_direction
+            # Pfm_cnc::restart_counter()
+            pfm.isr_pfm_counter = 0
+        self._armed = {}
+        self._isr_pfm_busy = False
+        return True, b''
+
+
+    def _cmd_ping(self, payload:bytes) -> tuple[bool, bytes]:
+        return True, b''
+
+
+    def _cmd_set_baudrate(self, payload:bytes) -> tuple[bool, bytes]:
+        baudrate, = struct.unpack('>I', payload)
+        if baudrate not in BAUDRATES:
+            return False, b''
+        if baudrate == self.baudrate:
+            # repeated at the new baudrate, the host received its replies, keep it
+            self._baudrate_switch_time = None
+            return True, b''
+        if self._baudrate_switch_time is None:
+            self._fallback_baudrate = self.baudrate
+        self._next_baudrate = baudrate
+        return True, b''
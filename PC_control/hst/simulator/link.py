@@ -0,0 +1,262 @@
+import collections
+import threading
+import random
+import time
+from .firmware import Firmware
+""" Timing of the serial line between the host and the simulated firmware.
+
+    Every byte occupies the line for 10/baudrate seconds (start bit, 8 data
+    bits, stop bit) when pacing is enabled, and the main loop of the
+    firmware takes at least loop_period_seconds per received byte. Replies
+    become readable after the injected latency and their transmission time.
+    Packets pushed by the firmware (subscribed telemetry) are generated
+    as time passes, the main loop is blocked while the TX buffer of the
+    AVR is full.
+
+    The host and the firmware have their own baudrate (set_baudrate() and
+    Firmware.baudrate_switch()), bytes sent at a baudrate the receiver is
+    not set to are read with framing errors, i.e. as random bytes. The same
+    happens to every byte above max_baudrate (e.g. a long cable or a slow
+    USB-serial bridge), and to single bytes with the probability
+    noise (a bit of the byte is flipped).
+
+Public classes:
+    SimulatedLink
+"""
+
+# size of the serial TX buffer of the ATmega328P (HardwareSerial), Serial.write() blocks when full
+TX_BUFFER_SIZE = 64
+
+
+class SimulatedLink():
+    """ Serial line connected to a simulated firmware.
+
+        write() delivers bytes to the firmware, read() returns the replies
+        once they have arrived. Both can be called from different threads.
+
+        Public methods:
+
+            write()
+            read()
+            in_waiting()
+            cancel_read()
+            reset_input_buffer()
+
+        Public attributes:
+
+            firmware                    - the simulated Firmware
+    """
+    def __init__(self, baudrate:int=115200, pacing:bool=True, latency_seconds:float=0.0, loop_period_seconds:float=0.0, firmware:Firmware=None,
+                 max_baudrate:int=None, noise:float=0.0, seed:int=0):
+        """
+        Initializes the SimulatedLink.
+
+        :param baudrate: The baudrate of the line, defaults to 115200.
+        :type baudrate: int, optional
+        :param pacing: Delay bytes by their transmission time at the baudrate, defaults to True.
+        :type pacing: bool, optional
+        :param latency_seconds: Latency added to every reply (e.g. USB polling), defaults to 0.0.
+        :type latency_seconds: float, optional
+        :param loop_period_seconds: Shortest time the firmware main loop spends on a received byte, defaults to 0.0.
+        :type loop_period_seconds: float, optional
+        :param firmware: The simulated firmware, defaults to a new Firmware at the baudrate.
+        :type firmware: Firmware, optional
+        :param max_baudrate: Highest baudrate the line transmits without errors, None if unlimited, defaults to None.
+        :type max_baudrate: int, optional
+        :param noise: Probability of an error in a byte, defaults to 0.0.
+        :type noise: float, optional
+        :param seed: Seed of the errors, defaults to 0.
+        :type seed: int, optional
+        """
+        self.firmware = Firmware(baudrate=baudrate) if firmware is None else firmware
+        self._max_baudrate = max_baudrate
+        self._noise = noise
+        self._random = random.Random(seed)
+        self._latency_seconds = latency_seconds
+        self._loop_period_seconds = loop_period_seconds
+        self._lock = threading.Lock()
+        self._data_available = threading.Condition(self._lock)
+        # (time of arrival, data) of replies on the way to the host
+        self._replies = collections.deque()
+        self._read_cancelled = False
+        self._tx_free_time = 0.0
+        self._rx_free_time = 0.0
+        self._pacing = pacing
+        self.set_baudrate(baudrate, pacing)
+
+
+    def set_baudrate(self, baudrate:int, pacing:bool=True):
+        """
+        Changes the baudrate of the host side of the line.
+
+        :param baudrate: The baudrate of the host.
+        :type baudrate: int
+        :param pacing: Delay bytes by their transmission time at the baudrate, defaults to True.
+        :type pacing: bool, optional
+        """
+        with self._lock:
+            self._pacing = pacing
+            self._baudrate = baudrate
+            self._tx_byte_seconds = 10.0/baudrate if pacing else 0.0
+            self._update_firmware_baudrate()
+
+
+    def _update_firmware_baudrate(self):
+        """ Takes over the baudrate of the firmware (lock must be held). """
+        device_baudrate = self.firmware.baudrate
+        self._byte_seconds = 10.0/device_baudrate if self._pacing else 0.0
+        self._clean_to_device = self._is_clean(self._baudrate, device_baudrate)
+        self._clean_to_host = self._is_clean(device_baudrate, self._baudrate)
+
+
+    def _is_clean(self, send_baudrate:int, receive_baudrate:int) -> bool:
+        """ True if bytes from the sender are received without errors. """
+        return (send_baudrate == receive_baudrate and not self._noise 
+                and (self._max_baudrate is None or send_baudrate <= self._max_baudrate))
+
+
+    def _transmit(self, data:bytes, send_baudrate:int, receive_baudrate:int) -> bytes:
+        """ Bytes read by the receiver, with the errors of the line (lock must be held). """
+        if send_baudrate != receive_baudrate or (self._max_baudrate is not None and send_baudrate > self._max_baudrate):
+            # framing errors
+            return bytes(self._random.getrandbits(8) for _ in data)
+        data = bytearray(data)
+        for index in range(len(data)):
+            if self._random.random() < self._noise:
+                data[index] ^= 1 << self._random.randrange(8)
+        return bytes(data)
+
+
+    def _baudrate_switch(self, at_time:float):
+        """ Lets loop() of the firmware switch its baudrate (lock must be held). """
+        if self.firmware.baudrate_switch(at_time) is not None:
+            self._update_firmware_baudrate()
+
+
+    def write(self, data:bytes) -> int:
+        """
+        Sends bytes to the firmware, does not block.
+
+        :param data: The bytes to be sent.
+        :type data: bytes
+        :return: Number of bytes written.
+        :rtype: int
+        """
+        with self._lock:
+            byte_time = max(self._tx_byte_seconds, self._loop_period_seconds)
+            arrival_time = max(time.monotonic(), self._tx_free_time)
+            for byte in data:
+                arrival_time += byte_time
+                self._push(arrival_time)
+                byte = bytes((byte,))
+                if not self._clean_to_device:
+                    byte = self._transmit(byte, self._baudrate, self.firmware.baudrate)
+                for reply in self.firmware.receive(byte, at_time=arrival_time):
+                    self._send_reply(reply, arrival_time)
+                self._baudrate_switch(arrival_time)
+            self._tx_free_time = arrival_time
+            self._data_available.notify_all()
+        return len(data)
+
+
+    def _send_reply(self, reply:bytes, send_time:float):
+        """ Queues a packet sent by the firmware at send_time (lock must be held). """
+        reply_time = max(send_time + self._latency_seconds, self._rx_free_time) + len(reply)*self._byte_seconds
+        self._rx_free_time = reply_time
+        if not self._clean_to_host:
+            reply = self._transmit(reply, self.firmware.baudrate, self._baudrate)
+        self._replies.append((reply_time, reply))
+
+
+    def _next_push_time(self) -> float:
+        """ Time of the loop() pushing the next packet, None if nothing is subscribed (lock must be held). """
+        push_time = self.firmware.next_push_time()
+        if push_time is None:
+            return None
+        # Serial.write() blocks loop() until the TX buffer has room
+        return max(push_time, self._rx_free_time - TX_BUFFER_SIZE*self._byte_seconds)
+
+
+    def _push(self, until:float):
+        """ Queues the packets pushed by the firmware up to a point in time (lock must be held). """
+        self._baudrate_switch(until)
+        push_time = self._next_push_time()
+        while push_time is not None and push_time <= until:
+            packet = self.firmware.push_telemetry(at_time=push_time)
+            if packet is None:
+                break
+            self._send_reply(packet, push_time)
+            push_time = self._next_push_time()
+
+
+    def read(self, size:int=1, timeout_seconds:float=None) -> bytes:
+        """
+        Reads arrived bytes, blocks until at least one byte arrives.
+
+        :param size: Maximal number of bytes to be read, defaults to 1.
+        :type size: int, optional
+        :param timeout_seconds: The timeout period in seconds, None blocks forever, defaults to None.
+        :type timeout_seconds: float, optional
+        :return: Read bytes, empty on timeout or cancel_read().
+        :rtype: bytes
+        """
+        deadline = None if timeout_seconds is None else time.monotonic() + timeout_seconds
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._push(now)
+                if self._replies and self._replies[0][0] <= now:
+                    return self._pop(size, now)
+                if self._read_cancelled:
+                    self._read_cancelled = False
+                    return b''
+                wait_seconds = None if deadline is None else deadline - now
+                next_arrival = self._replies[0][0] if self._replies else self._next_push_time()
+                if next_arrival is not None:
+                    next_arrival -= now
+                    wait_seconds = next_arrival if wait_seconds is None else min(wait_seconds, next_arrival)
+                if wait_seconds is not None and wait_seconds <= 0:
+                    return b''
+                self._data_available.wait(wait_seconds)
+
+
+    def _pop(self, size:int, now:float) -> bytes:
+        """ Removes up to size arrived bytes (lock must be held). """
+        data = bytearray()
+        while self._replies and self._replies[0][0] <= now and len(data) < size:
+            arrival_time, reply = self._replies.popleft()
+            taken = size - len(data)
+            data += reply[:taken]
+            if taken < len(reply):
+                self._replies.appendleft((arrival_time, reply[taken:]))
+        return bytes(data)
+
+
+    def in_waiting(self) -> int:
+        """
+        Number of arrived bytes.
+
+        :return: Number of bytes ready to be read.
+        :rtype: int
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._push(now)
+            return sum(len(reply) for arrival_time, reply in self._replies if arrival_time <= now)
+
+
+    def cancel_read(self):
+        """
+        Wakes up a blocked read(), which returns no data.
+        """
+        with self._lock:
+            self._read_cancelled = True
+            self._data_available.notify_all()
+
+
+    def reset_input_buffer(self):
+        """
+        Discards the replies on the way to the host.
+        """
+        with self._lock:
+            self._replies.clear()
@@ -0,0 +1,174 @@
+import numbers
+import time
+import urllib.parse as urlparse
+from serial.serialutil import SerialBase, SerialException, PortNotOpenError, to_bytes
+from .link import SimulatedLink
+from .firmware import Firmware
+""" pyserial URL handler of the simulated turret.
+
+    Registered by importing hst.simulator, the port is then opened like
+    any other serial port:
+
+        serial.serial_for_url('hstsim://', 115200)
+        Datalink('hstsim://?latency=0.001', 115200)
+
+    URL options:
+        pacing      - 1/0, delay bytes by their transmission time at the baudrate (default 1)
+        latency     - latency added to every reply in seconds (default 0)
+        loop_period - shortest time the firmware main loop spends on a byte in seconds (default 0)
+        drift       - rate error of the device clock (micros()) in ppm (default 0)
+        max_baudrate - highest baudrate the line transmits without errors (default unlimited)
+        noise       - probability of an error in a byte (default 0)
+
+    The simulated firmware is accessible as the attribute 'firmware' of the port.
+"""
+
+
+class Serial(SerialBase):
+    """ Serial port connected to a simulated turret firmware. """
+
+    def __init__(self, *args, **kwargs):
+        self._link = None
+        self._link_options = {}
+        super().__init__(*args, **kwargs)
+
+
+    @property
+    def firmware(self):
+        """ The simulated firmware (hst.simulator.firmware.Firmware). """
+        return self._link.firmware
+
+
+    def open(self):
+        if self.is_open:
+            raise SerialException("Port is already open.")
+        if self._port is None:
+            raise SerialException("Port must be configured before it can be used.")
+        self.from_url(self._port)
+        options = dict(self._link_options)
+        drift_ppm = options.pop('clock_drift_ppm', 0.0)
+        firmware = Firmware(clock_drift_ppm=drift_ppm, baudrate=self._baudrate)
+        self._link = SimulatedLink(baudrate=self._baudrate, firmware=firmware, **options)
+        self.is_open = True
+
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            self._link.cancel_read()
+        super().close()
+
+
+    def from_url(self, url:str):
+        """ Parses the URL options. """
+        parts = urlparse.urlsplit(url)
+        if parts.scheme != 'hstsim':
+            raise SerialException(f"url={url} is not valid, expected 'hstsim://[?pacing=1&latency=0&loop_period=0&drift=0&max_baudrate=1000000&noise=0]'.")
+        self._link_options = {}
+        try:
+            for option, values in urlparse.parse_qs(parts.query, True).items():
+                if option == 'pacing':
+                    self._link_options['pacing'] = bool(int(values[0]))
+                elif option == 'latency':
+                    self._link_options['latency_seconds'] = float(values[0])
+                elif option == 'loop_period':
+                    self._link_options['loop_period_seconds'] = float(values[0])
+                elif option == 'drift':
+                    self._link_options['clock_drift_ppm'] = float(values[0])
+                elif option == 'max_baudrate':
+                    self._link_options['max_baudrate'] = int(values[0])
+                elif option == 'noise':
+                    self._link_options['noise'] = float(values[0])
+                else:
+                    raise ValueError(f"option={option} is not valid, valid values ['pacing', 'latency', 'loop_period', 'drift', "
+                                     "'max_baudrate', 'noise'].")
+        except ValueError as error:
+            raise SerialException(f"url={url} is not valid: {error}")
+
+
+    def _reconfigure_port(self):
+        if not isinstance(self._baudrate, numbers.Integral) or not 0 < self._baudrate < 2**32:
+            raise ValueError(f"baudrate={self._baudrate} is not valid.")
+        if self._link is not None:
+            self._link.set_baudrate(self._baudrate, self._link_options.get('pacing', True))
+
+
+    @property
+    def in_waiting(self) -> int:
+        if not self.is_open:
+            raise PortNotOpenError()
+        return self._link.in_waiting()
+
+
+    def read(self, size:int=1) -> bytes:
+        if not self.is_open:
+            raise PortNotOpenError()
+        deadline = None if self._timeout is None else time.monotonic() + self._timeout
+        data = bytearray()
+        while len(data) < size:
+            timeout_seconds = None if deadline is None else max(0.0, deadline - time.monotonic())
+            chunk = self._link.read(size - len(data), timeout_seconds=timeout_seconds)
+            if not chunk:
+                # timeout or cancel_read()
+                break
+            data += chunk
+        return bytes(data)
+
+
+    def write(self, data:bytes) -> int:
+        if not self.is_open:
+            raise PortNotOpenError()
+        return self._link.write(to_bytes(data))
+
+
+    def cancel_read(self):
+        if self._link is not None:
+            self._link.cancel_read()
+
+
+    def reset_input_buffer(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        self._link.reset_input_buffer()
+
+
+    def reset_output_buffer(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+
+
+    @property
+    def out_waiting(self) -> int:
+        return 0
+
+
+    def _update_break_state(self):
+        pass
+
+
+    def _update_rts_state(self):
+        pass
+
+
+    def _update_dtr_state(self):
+        pass
+
+
+    @property
+    def cts(self) -> bool:
+        return True
+
+
+    @property
+    def dsr(self) -> bool:
+        return True
+
+
+    @property
+    def ri(self) -> bool:
+        return False
+
+
+    @property
+    def cd(self) -> bool:
+        return True
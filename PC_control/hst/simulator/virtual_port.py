@@ -0,0 +1,106 @@
+import os
+import threading
+import tty
+import select
+import logging
+from .link import SimulatedLink
+""" Simulated turret exposed as a pseudo-terminal (POSIX only).
+
+    Unlike the in-process 'hstsim://' port, the pseudo-terminal can be
+    opened by any process, e.g. the Qt application or a second Python
+    interpreter, exactly like /dev/ttyACM0:
+
+        port = VirtualSerialPort(baudrate=115200)
+        turret = HST(port.name, 115200)
+
+    or from a shell:
+
+        python -m hst.simulator --latency 0.001
+
+Public classes:
+    VirtualSerialPort
+"""
+
+
+class VirtualSerialPort():
+    """ Simulated turret behind a pseudo-terminal.
+
+        A daemon thread forwards the bytes written to the terminal to the
+        simulated firmware and writes the replies back when they arrive.
+
+        Public methods:
+
+            close()
+
+        Public attributes:
+
+            name                        - path of the terminal to be opened by the host
+            firmware                    - the simulated Firmware
+    """
+    def __init__(self, baudrate:int=115200, pacing:bool=True, latency_seconds:float=0.0, loop_period_seconds:float=0.0, firmware=None):
+        """
+        Opens the pseudo-terminal and starts the simulation.
+
+        :param baudrate: The simulated baudrate (the pseudo-terminal itself ignores it), defaults to 115200.
+        :type baudrate: int, optional
+        :param pacing: Delay bytes by their transmission time at the baudrate, defaults to True.
+        :type pacing: bool, optional
+        :param latency_seconds: Latency added to every reply, defaults to 0.0.
+        :type latency_seconds: float, optional
+        :param loop_period_seconds: Shortest time the firmware main loop spends on a byte, defaults to 0.0.
+        :type loop_period_seconds: float, optional
+        :param firmware: The simulated firmware, defaults to a new Firmware.
+        :type firmware: hst.simulator.firmware.Firmware, optional
+        """
+        self._logger = logging.getLogger(__name__)
+        self._link = SimulatedLink(baudrate=baudrate, pacing=pacing, latency_seconds=latency_seconds,
+                                   loop_period_seconds=loop_period_seconds, firmware=firmware)
+        self.firmware = self._link.firmware
+        self._master_fd, self._slave_fd = os.openpty()
+        # no echo, no line discipline
+        tty.setraw(self._slave_fd)
+        self.name = os.ttyname(self._slave_fd)
+        self._running = True
+        self._threads = [threading.Thread(target=self._forward_requests, name='hst-simulator-rx', daemon=True),
+                         threading.Thread(target=self._forward_replies, name='hst-simulator-tx', daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        self._logger.info("VirtualSerialPort.__init__() -> name=%s", self.name)
+
+
+    def _forward_requests(self):
+        """ Passes bytes written by the host to the firmware. """
+        while self._running:
+            readable, _, _ = select.select([self._master_fd], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                data = os.read(self._master_fd, 4096)
+            except OSError:
+                break
+            self._link.write(data)
+
+
+    def _forward_replies(self):
+        """ Writes replies of the firmware to the host. """
+        while self._running:
+            data = self._link.read(4096, timeout_seconds=0.1)
+            if data:
+                os.write(self._master_fd, data)
+
+
+    def close(self):
+        """
+        Stops the simulation and closes the pseudo-terminal.
+        """
+        self._running = False
+        self._link.cancel_read()
+        for thread in self._threads:
+            thread.join()
+        os.close(self._master_fd)
+        os.close(self._slave_fd)
+
+
+    def __del__(self):
+        if getattr(self, '_running', False):
+            self.close()
@@ -4,6 +4,7 @@ import logging
 from PyQt5.QtWidgets import QApplication, QWidget, QTextEdit, QVBoxLayout, QHBoxLayout, QRadioButton, QPushButton
 from PyQt5 import QtGui
 from hst.interface import HST
+from hst.packet.pkt_defs import DEFAULT_BAUDRATE
 
 
 # Logger
@@ -22,7 +23,10 @@ logger.addHandler(console_handler)
 class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
-        self.turret = HST("/dev/ttyACM0", 115200)
+        self.turret = HST("/dev/ttyACM0", DEFAULT_BAUDRATE, backend='qt')
+        # move to the highest baudrate the line transmits without errors
+        link = self.turret.negotiate_baudrate()
+        logger.info("baudrate %d Bd, %.0f bytes/s", link['baudrate'], link['bytes_per_second'])
         # self.datalink = Datalink("/dev/ttyACM0", 115200)
         self.init_ui()
 
@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from hst.datalink.async_datalink import AsyncDatalink
+from hst.interface.async_interface import AsyncHST
+from hst.simulator.firmware import Firmware
+""" AsyncHST round trips against the simulated firmware.
+
+    The serial transport of pyserial-asyncio needs a file descriptor, so the
+    AsyncDatalink is connected to a transport passing the written bytes to
+    simulator.Firmware and its replies back to data_received() on the loop.
+"""
+
+
+class _FirmwareTransport(asyncio.Transport):
+    """ asyncio transport of the simulated firmware. """
+    def __init__(self, protocol:asyncio.Protocol):
+        super().__init__()
+        self._protocol = protocol
+        self._firmware = Firmware()
+        self._closing = False
+        # a silent firmware does not reply
+        self.silent = False
+        protocol.connection_made(self)
+
+    def write(self, data:bytes):
+        if self.silent:
+            return
+        loop = asyncio.get_running_loop()
+        for reply in self._firmware.receive(data):
+            loop.call_soon(self._protocol.data_received, reply)
+
+    def is_closing(self) -> bool:
+        return self._closing
+
+    def close(self):
+        if not self._closing:
+            self._closing = True
+            self._protocol.connection_lost(None)
+
+
+def _connect(**kwargs) -> AsyncHST:
+    datalink = AsyncDatalink(**kwargs)
+    _FirmwareTransport(datalink)
+    return AsyncHST(datalink)
+
+
+@pytest.mark.parametrize('framing, crc', [('start_end', False), ('start_end', True), ('cobs', False), ('cobs', True)])
+def test_round_trip(framing, crc):
+    async def main():
+        turret = _connect(crc=crc, framing=framing)
+        assert (await turret.cmd_set_delta_steps('x', -5))['ACK'] is True
+        response = await turret.cmd_get_delta_steps('x')
+        turret.close()
+        return response
+    response = asyncio.run(main())
+    assert response['received']
+    assert response['DELTA'] == -5
+    assert response['CMD'] == 'CMD_GET_DELTA_STEPS'
+
+
+def test_concurrent_commands():
+    async def main():
+        turret = _connect()
+        responses = await asyncio.gather(turret.cmd_ping(), turret.cmd_get_isr_freq(), turret.cmd_ping())
+        turret.close()
+        return responses
+    responses = asyncio.run(main())
+    assert [response['CMD'] for response in responses] == ['CMD_PING', 'CMD_GET_ISR_FREQ', 'CMD_PING']
+
+
+def test_timeout():
+    async def main():
+        turret = _connect()
+        turret._datalink._transport.silent = True
+        response = await turret.cmd_ping(timeout_seconds=0.05)
+        turret._datalink._transport.silent = False
+        # the expired request no longer waits for a reply
+        assert (await turret.cmd_ping())['received']
+        turret.close()
+        return response
+    assert asyncio.run(main()) == {'received':False}
+
+
+@pytest.mark.parametrize('method', ['sync_clock', 'check_link', 'negotiate_baudrate', 'enable_metrics', 'disable_metrics'])
+def test_blocking_helpers_not_supported(method):
+    turret = AsyncHST(AsyncDatalink())
+    with pytest.raises(RuntimeError, match='not supported on AsyncHST'):
+        getattr(turret, method)()
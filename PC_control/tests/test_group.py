@@ -0,0 +1,29 @@
+import pytest
+from hst.interface import TurretPool
+""" TurretGroup bursts over simulated turrets ('hstsim://'). """
+
+
+@pytest.fixture
+def pool():
+    pool = TurretPool({'a': 'hstsim://?pacing=0', 'b': 'hstsim://?pacing=0'}, 115200)
+    yield pool
+    pool.close()
+
+
+def test_burst(pool):
+    report = pool.group().burst('cmd_set_delta_steps', {'a': ('x', 3), 'b': ('x', -3)})
+    assert all(response['ACK'] for response in report['responses'].values())
+    assert report['write_skew_seconds'] >= 0
+    assert pool['a'].cmd_get_delta_steps('x')['DELTA'] == 3
+    assert pool['b'].cmd_get_delta_steps('x')['DELTA'] == -3
+
+
+def test_invalid_argument_sends_nothing(pool):
+    with pytest.raises(ValueError):
+        pool.group().burst('cmd_set_delta_steps', {'a': ('x', 3), 'b': ('q', 3)})
+    # the request of 'a' was resolved without being written
+    assert pool['a']._pipeline.num_in_flight() == 0
+    assert pool['a'].cmd_get_delta_steps('x')['DELTA'] == 0
+    # the held packets are dropped, the following commands are written
+    assert pool['a'].cmd_ping()['received']
+    assert pool.group().burst('cmd_ping')['ack_skew_seconds'] is not None
@@ -0,0 +1,68 @@
+import threading
+import pytest
+from hst.interface import HST
+from hst.packet.pkt_defs import *
+""" HST over the simulated turret ('hstsim://'). """
+
+
+@pytest.fixture(params=[('start_end', False), ('start_end', True), ('cobs', False), ('cobs', True)], ids=lambda param: f'{param[0]}-crc{param[1]}')
+def turret(request):
+    framing, crc = request.param
+    turret = HST('hstsim://?pacing=0', 115200, framing=framing, crc=crc)
+    yield turret
+    turret.close()
+
+
+def test_delta_steps_round_trip(turret):
+    assert turret.cmd_set_delta_steps('x', -5)['ACK'] is True
+    response = turret.cmd_get_delta_steps('x')
+    assert response['received']
+    assert response['DELTA'] == -5
+
+
+def test_pipelined_commands(turret):
+    futures = [turret.cmd_set_delta_steps('y', delta_steps, pipelined=True) for delta_steps in range(4)]
+    futures.append(turret.cmd_get_delta_steps('y', pipelined=True))
+    futures.append(turret.cmd_get_isr_freq(pipelined=True))
+    responses = [future.result(timeout=2.0) for future in futures]
+    assert all(response['received'] for response in responses)
+    assert responses[4]['DELTA'] == 3
+    assert responses[5]['CMD'] == 'CMD_GET_ISR_FREQ'
+
+
+def test_replies_are_not_queued(turret):
+    turret.enable_metrics()
+    for _ in range(300):
+        turret.cmd_ping()
+    assert turret.stats()['queue']['put'] == 0
+
+
+def test_pushed_frames_reach_only_listeners(turret):
+    frames = threading.Semaphore(0)
+    turret.add_listener(lambda payload, receive_time: payload[0] == PKT_IMU_FRAME[0] and frames.release())
+    assert turret.cmd_subscribe_imu(1)['ACK'] is True
+    for _ in range(10):
+        assert frames.acquire(timeout=2.0)
+    assert turret.cmd_subscribe_imu(0)['ACK'] is True
+    assert turret._datalink.queue_stats()['put'] == 0
+
+
+@pytest.mark.parametrize('crc', [False, True])
+def test_framing_switch(crc):
+    turret = HST('hstsim://?pacing=0', 115200, crc=crc)
+    # delta 5 is encoded with COBS_DELIMITER, delta 0xCCDD with END_BYTES
+    for framing in ['cobs', 'start_end', 'cobs', 'start_end']:
+        turret._datalink.set_framing(framing)
+        for delta in [5, 0xCCDD]:
+            assert turret.cmd_set_target_delta('x', 100, delta)['received'], (framing, delta)
+    turret.close()
+
+
+def test_close_stops_threads():
+    threads_before = set(threading.enumerate())
+    turret = HST('hstsim://?pacing=0', 115200)
+    assert turret.cmd_ping()['received']
+    turret.close()
+    turret.close()
+    assert set(threading.enumerate()) <= threads_before
+    assert not turret._datalink._receiver._running
@@ -0,0 +1,83 @@
+import threading
+import pytest
+from hst.datalink.receiver.message_queue import MessageQueue
+""" MessageQueue overflow policies, waiting and closing. """
+
+
+def _drain(queue:MessageQueue) -> list:
+    messages = []
+    while (message := queue.get_nowait()) is not None:
+        messages.append(message)
+    return messages
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        MessageQueue(capacity=0)
+    with pytest.raises(ValueError):
+        MessageQueue(overflow='drop_all')
+
+
+def test_fifo_order():
+    queue = MessageQueue(capacity=4)
+    for message in range(3):
+        assert queue.put(message)
+    assert len(queue) == 3
+    assert _drain(queue) == [0, 1, 2]
+    assert queue.get(timeout_seconds=0.01) is None
+
+
+def test_drop_oldest():
+    queue = MessageQueue(capacity=4, overflow='drop_oldest')
+    for message in range(10):
+        assert queue.put(message)
+    assert queue.dropped == 6
+    assert _drain(queue) == [6, 7, 8, 9]
+    assert queue.stats() == {'capacity':4, 'overflow':'drop_oldest', 'queued':0, 'put':10, 'dropped':6, 'high_water':4}
+
+
+def test_drop_newest():
+    queue = MessageQueue(capacity=4, overflow='drop_newest')
+    accepted = [queue.put(message) for message in range(10)]
+    assert accepted == [True]*4 + [False]*6
+    assert queue.dropped == 6
+    assert _drain(queue) == [0, 1, 2, 3]
+    assert queue.stats()['high_water'] == 4
+
+
+def test_block_waits_for_consumer():
+    queue = MessageQueue(capacity=2, overflow='block')
+    queue.put(0)
+    queue.put(1)
+    producer = threading.Thread(target=queue.put, args=(2,))
+    producer.start()
+    producer.join(timeout=0.1)
+    assert producer.is_alive()
+    assert queue.get(timeout_seconds=1.0) == 0
+    producer.join(timeout=1.0)
+    assert not producer.is_alive()
+    assert _drain(queue) == [1, 2]
+    assert queue.dropped == 0
+
+
+def test_close_releases_blocked_producer_and_consumer():
+    queue = MessageQueue(capacity=1, overflow='block')
+    queue.put(0)
+    results = []
+    producer = threading.Thread(target=lambda: results.append(queue.put(1)))
+    producer.start()
+    producer.join(timeout=0.1)
+    queue.close()
+    producer.join(timeout=1.0)
+    assert results == [False]
+    # queued messages can still be read
+    assert queue.get() == 0
+    assert queue.get() is None
+
+
+def test_get_waits_for_put():
+    queue = MessageQueue(capacity=4)
+    timer = threading.Timer(0.05, queue.put, args=('message',))
+    timer.start()
+    assert queue.get(timeout_seconds=2.0) == 'message'
+    timer.join()
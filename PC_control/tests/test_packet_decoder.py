@@ -0,0 +1,90 @@
+import pytest
+from hst.packet import encode_packet, PacketDecoder
+from hst.packet.pkt_defs import *
+""" PacketDecoder of all framings: packets split between chunks, noise and empty packets. """
+
+FRAMINGS = [('start_end', False), ('start_end', True), ('cobs', False), ('cobs', True)]
+
+PAYLOADS = [
+    CMD_SET_TARGET_FREQ + PKT_ACK + bytes(4),
+    CMD_GET_DELTA_STEPS + (-5).to_bytes(4, byteorder=BYTEORDER, signed=True) + bytes(4),
+    # data made of START_BYTES, END_BYTES and COBS_DELIMITER
+    CMD_GET_IMU_MEASUREMENT + (START_BYTES + END_BYTES + COBS_DELIMITER)*6 + bytes(4),
+]
+
+# neither START_BYTES nor a valid COBS packet, terminated by COBS_DELIMITER to resynchronise 'cobs'
+NOISE = b'\x13\x37\xcc' + COBS_DELIMITER
+
+
+def _stream(crc:bool, framing:str, payloads:list=PAYLOADS) -> bytes:
+    return b''.join(encode_packet(payload, crc, framing) for payload in payloads)
+
+
+def _feed(decoder:PacketDecoder, stream:bytes, chunk_size:int) -> list:
+    payloads = []
+    for idx in range(0, len(stream), chunk_size):
+        payloads.extend(decoder.feed(stream[idx:idx+chunk_size]))
+    return payloads
+
+
+@pytest.mark.parametrize('framing, crc', FRAMINGS)
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 4096])
+def test_split_packets(framing, crc, chunk_size):
+    decoder = PacketDecoder(crc=crc, framing=framing)
+    assert _feed(decoder, _stream(crc, framing)*3, chunk_size) == PAYLOADS*3
+    assert decoder.discarded_bytes == 0
+
+
+@pytest.mark.parametrize('framing, crc', FRAMINGS)
+def test_noise_between_packets(framing, crc):
+    decoder = PacketDecoder(crc=crc, framing=framing)
+    stream = NOISE + b''.join(encode_packet(payload, crc, framing) + NOISE for payload in PAYLOADS)
+    assert _feed(decoder, stream, 5) == PAYLOADS
+    assert decoder.discarded_bytes == len(NOISE)*(len(PAYLOADS) + 1)
+
+
+@pytest.mark.parametrize('framing', ['start_end', 'cobs'])
+def test_corrupted_packet_with_crc_is_discarded(framing):
+    packet = bytearray(encode_packet(PAYLOADS[1], True, framing))
+    packet[4] ^= 0x01
+    decoder = PacketDecoder(crc=True, framing=framing)
+    assert decoder.feed(bytes(packet) + _stream(True, framing)) == PAYLOADS
+    assert decoder.discarded_bytes == len(packet)
+
+
+@pytest.mark.parametrize('framing, crc', FRAMINGS)
+def test_empty_packet_is_discarded(framing, crc):
+    empty = encode_packet(b'', crc, framing)
+    decoder = PacketDecoder(crc=crc, framing=framing)
+    assert _feed(decoder, empty + _stream(crc, framing) + empty, 1) == PAYLOADS
+    assert decoder.discarded_bytes == 2*len(empty)
+
+
+def test_empty_packet_in_noise():
+    decoder = PacketDecoder()
+    assert decoder.feed(START_BYTES + b'\x00' + END_BYTES) == []
+    assert decoder.feed(_stream(False, 'start_end')) == PAYLOADS
+    assert decoder.discarded_bytes == len(START_BYTES) + 1 + len(END_BYTES)
+
+
+@pytest.mark.parametrize('crc', [False, True])
+def test_cobs_overlong_tail_is_discarded(crc):
+    decoder = PacketDecoder(crc=crc, framing='cobs')
+    overlong = b'\x01'*1000
+    # the packet following the overlong data within the same COBS packet is lost
+    stream = overlong + encode_packet(PAYLOADS[0], crc, 'cobs') + _stream(crc, 'cobs')
+    assert _feed(decoder, stream, 16) == PAYLOADS
+    assert decoder.discarded_bytes == len(overlong) + len(encode_packet(PAYLOADS[0], crc, 'cobs'))
+    # the tail is bounded by the longest COBS packet
+    decoder.feed(overlong)
+    assert len(decoder._buffer) == 0
+
+
+@pytest.mark.parametrize('framing, crc', FRAMINGS)
+def test_set_framing_discards_buffer(framing, crc):
+    decoder = PacketDecoder()
+    decoder.feed(encode_packet(PAYLOADS[0])[:5])
+    decoder.set_framing(framing)
+    decoder.set_crc(crc)
+    assert decoder.feed(_stream(crc, framing)) == PAYLOADS
+    assert decoder.discarded_bytes == 5
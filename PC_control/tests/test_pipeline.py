@@ -0,0 +1,129 @@
+import threading
+import time
+import pytest
+from hst.datalink import Datalink
+from hst.interface.pipeline import Pipeline
+from hst.packet import encode_packet
+from hst.packet.pkt_defs import *
+""" Pipeline matching of replies to requests and timeouts over 'loop://' (every request is echoed as its reply). """
+
+
+def _decode(payload:bytearray) -> dict:
+    return {'payload':bytes(payload), 'received':True}
+
+
+@pytest.fixture
+def datalink():
+    datalink = Datalink('loop://', 115200)
+    yield datalink
+    datalink.close()
+
+
+@pytest.fixture
+def pipeline(datalink):
+    pipeline = Pipeline(datalink, decode=_decode, window=4)
+    yield pipeline
+    pipeline.close()
+
+
+def _reply(datalink:Datalink, payload:bytes):
+    """ Writes a reply to the loop, bypassing hold(). """
+    datalink._serial.write(encode_packet(payload))
+
+
+def test_invalid_window(datalink):
+    with pytest.raises(ValueError):
+        Pipeline(datalink, decode=_decode, window=0)
+
+
+def test_round_trip(pipeline):
+    response = pipeline.submit(CMD_PING + b'\x01').result(timeout=2.0)
+    assert response['payload'] == CMD_PING + b'\x01'
+    assert response['receive_ns'] >= response['send_ns']
+    assert pipeline.num_in_flight() == 0
+
+
+def test_replies_matched_by_command_in_order(datalink, pipeline):
+    # requests are held back, the replies arrive in a different order of commands
+    datalink.hold()
+    first = pipeline.submit(CMD_GET_DELTA_STEPS + b'\x01')
+    other = pipeline.submit(CMD_GET_ISR_FREQ)
+    second = pipeline.submit(CMD_GET_DELTA_STEPS + b'\x02')
+    assert pipeline.num_in_flight() == 3
+    _reply(datalink, CMD_GET_ISR_FREQ + b'\x10')
+    _reply(datalink, CMD_GET_DELTA_STEPS + b'\x20')
+    _reply(datalink, CMD_GET_DELTA_STEPS + b'\x30')
+    assert first.result(timeout=2.0)['payload'] == CMD_GET_DELTA_STEPS + b'\x20'
+    assert other.result(timeout=2.0)['payload'] == CMD_GET_ISR_FREQ + b'\x10'
+    assert second.result(timeout=2.0)['payload'] == CMD_GET_DELTA_STEPS + b'\x30'
+    assert pipeline.num_in_flight() == 0
+
+
+def test_matched_replies_are_not_queued(datalink, pipeline):
+    for _ in range(10):
+        pipeline.submit(CMD_PING).result(timeout=2.0)
+    assert datalink.queue_stats()['put'] == 0
+    # a reply without a request is left to receive()
+    since_time = time.time()
+    _reply(datalink, CMD_GET_ISR_FREQ + b'\x10')
+    assert datalink.receive(since_time, timeout_seconds=2.0) == (True, CMD_GET_ISR_FREQ + b'\x10')
+
+
+def test_timeout(datalink, pipeline):
+    datalink.hold()
+    time_start = time.monotonic()
+    response = pipeline.submit(CMD_PING, timeout_seconds=0.05).result(timeout=2.0)
+    assert response == {'received':False}
+    assert 0.05 <= time.monotonic() - time_start < 1.0
+    assert pipeline.num_in_flight() == 0
+
+
+def test_timeout_releases_window(datalink):
+    pipeline = Pipeline(datalink, decode=_decode, window=1)
+    datalink.hold()
+    assert pipeline.submit(CMD_PING, timeout_seconds=0.05).result(timeout=2.0) == {'received':False}
+    datalink.release()
+    # the echo of the expired request is matched to the next request with the same command
+    assert pipeline.submit(CMD_PING, timeout_seconds=2.0).result(timeout=2.0)['received']
+    pipeline.close()
+
+
+def test_window_full(datalink):
+    pipeline = Pipeline(datalink, decode=_decode, window=1)
+    datalink.hold()
+    pending = pipeline.submit(CMD_PING, timeout_seconds=2.0)
+    assert pipeline.submit(CMD_GET_ISR_FREQ, timeout_seconds=0.05).result(timeout=2.0) == {'received':False}
+    assert not pending.done()
+    pipeline.close()
+    assert pending.result(timeout=2.0) == {'received':False}
+
+
+def test_empty_packet_does_not_stop_receiver(datalink, pipeline):
+    datalink._serial.write(START_BYTES + b'\x00' + END_BYTES)
+    assert pipeline.submit(CMD_PING).result(timeout=2.0)['received']
+    assert datalink.discarded_bytes == len(START_BYTES) + 1 + len(END_BYTES)
+
+
+def test_failing_listener_does_not_stop_receiver(datalink, pipeline):
+    datalink.add_listener(lambda payload, receive_time: 1/0)
+    for _ in range(3):
+        assert pipeline.submit(CMD_PING).result(timeout=2.0)['received']
+
+
+def test_timeout_callback_may_submit(datalink, pipeline):
+    # the future of an expired request is resolved without holding the lock of the pipeline
+    datalink.hold()
+    responses = []
+    blocked = []
+    def submit_from_other_thread(future):
+        datalink.release()
+        thread = threading.Thread(target=lambda: responses.append(pipeline.submit(CMD_PING).result(timeout=2.0)))
+        thread.start()
+        thread.join(timeout=1.0)
+        blocked.append(thread.is_alive())
+    future = pipeline.submit(CMD_PING, timeout_seconds=0.05)
+    future.add_done_callback(submit_from_other_thread)
+    assert future.result(timeout=2.0) == {'received':False}
+    time.sleep(0.2)
+    assert blocked == [False]
+    assert responses[0]['received']
@@ -73,6 +73,11 @@ void Pfm_cnc::init_memory(int32_t delta_steps_x, int32_t delta_steps_y, int32_t
             pfm[this_pfm]._bit_flag = PFM_Z_FLAG;
         }
     }
+    // empty motion queue
+    pfm_queue.head = 0;
+    pfm_queue.tail = 0;
+    pfm_queue.active = false;
+    pfm_queue.executed = 0;
 }
 
 void Pfm_cnc::init_memory(void)
@@ -213,6 +218,55 @@ bool Pfm_cnc::get_control(uint8_t this_pfm)
     return pfm[this_pfm].pfm_control_target_delta;
 }
 
+void Pfm_cnc::restart_counter(uint8_t this_pfm)
+{
+    // the next step is produced after full period of pfm_target_freq
+    pfm[this_pfm]._isr_pfm_counter=0;
+}
+
+bool Pfm_cnc::queue_segment(uint8_t bit_flags, uint16_t* pfm_target_freq, int32_t* pfm_target_delta)
+{
+    // queue is full
+    if(get_queue_free_slots() == 0){ return false; }
+    volatile pfm_segment* segment = &pfm_queue.segments[pfm_queue.head & (PFM_QUEUE_SIZE-1)];
+    segment->bit_flags = bit_flags;
+    for(uint8_t this_pfm=0; this_pfm<NUM_PFM; this_pfm++)
+    {
+        segment->pfm_target_freq[this_pfm] = pfm_target_freq[this_pfm];
+        segment->pfm_target_delta[this_pfm] = pfm_target_delta[this_pfm];
+    }
+    // publish the segment to the ISR (single byte write is atomic)
+    pfm_queue.head++;
+    return true;
+}
+
+uint8_t Pfm_cnc::get_queue_free_slots(void)
+{
+    return PFM_QUEUE_SIZE - uint8_t(pfm_queue.head - pfm_queue.tail);
+}
+
+bool Pfm_cnc::get_queue_active(void)
+{
+    return pfm_queue.active;
+}
+
+uint16_t Pfm_cnc::get_queue_executed(void)
+{
+    // 16-bit value written by the ISR
+    noInterrupts();
+    uint16_t executed = pfm_queue.executed;
+    interrupts();
+    return executed;
+}
+
+void Pfm_cnc::clear_queue(void)
+{
+    // drop segments not yet taken by the ISR
+    noInterrupts();
+    pfm_queue.head = pfm_queue.tail;
+    interrupts();
+}
+
 void Pfm_cnc::block_isr(bool ignore)
 {
     _isr_pfm_busy = ignore;
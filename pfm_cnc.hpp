@@ -28,6 +28,12 @@ public:
     void        set_target_freq(uint8_t this_pfm, uint16_t pfm_target_freq, bool pfm_direction);
     void        set_target_delta(uint8_t this_pfm, uint16_t pfm_target_freq, int32_t pfm_target_delta);
     bool        get_control(uint8_t this_pfm);
+    void        restart_counter(uint8_t this_pfm);
+    bool        queue_segment(uint8_t bit_flags, uint16_t* pfm_target_freq, int32_t* pfm_target_delta);
+    uint8_t     get_queue_free_slots(void);
+    bool        get_queue_active(void);
+    uint16_t    get_queue_executed(void);
+    void        clear_queue(void);
     void        block_isr(bool ignore);
     uint8_t     get_bit_flag(uint8_t this_pfm);
     uint8_t     get_num_pfms(void);
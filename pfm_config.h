@@ -1,3 +1,4 @@
+// AUTO-GENERATED by protocol/generate.py from protocol/pkt_schema.py, DO NOT EDIT.
 // There are 3 axis: X, Y, Z
 #define NUM_PFM                 3
 #define PFM_X                   0
@@ -10,5 +11,7 @@
 #define INACTIVE_FREQ           65535
 // default PFM frequency (can be changed in software)
 #define DEFAULT_PFM_FREQ        6400
+// number of segments of the motion queue (power of 2, at most 128)
+#define PFM_QUEUE_SIZE          16
 // derive balue of interrupt counter with prescaler 1:1
-#define INTERRUPT_COUNTER       F_CPU/2/DEFAULT_PFM_FREQ
\ No newline at end of file
+#define INTERRUPT_COUNTER       F_CPU/2/DEFAULT_PFM_FREQ
@@ -41,6 +41,8 @@ volatile pfm_regs pfm[NUM_PFM];
 
 volatile uint8_t _isr_pfm_busy = false;
 
+volatile pfm_queue_regs pfm_queue;
+
 
 // Pulse-Frequency-Modulation Interrupt Service Routine (PFM ISR)
 ISR(TIMER1_COMPA_vect)
@@ -107,6 +109,46 @@ ISR(TIMER1_COMPA_vect)
         }
     }
 
+    // motion queue: the segment is finished when no PFM is controlled by target delta
+    bool segment_running = false;
+    for(uint8_t this_pfm=0; this_pfm<NUM_PFM; this_pfm++)
+    {
+        segment_running |= pfm[this_pfm].pfm_control_target_delta;
+    }
+    if(!segment_running)
+    {
+        if(pfm_queue.active)
+        {
+            pfm_queue.active = false;
+            pfm_queue.executed++;
+        }
+        // start the next segment (takes effect in the next ISR)
+        if(pfm_queue.tail != pfm_queue.head)
+        {
+            volatile pfm_segment* segment = &pfm_queue.segments[pfm_queue.tail & (PFM_QUEUE_SIZE-1)];
+            for(uint8_t this_pfm=0; this_pfm<NUM_PFM; this_pfm++)
+            {
+                if(!(segment->bit_flags & pfm[this_pfm]._bit_flag)){ continue; }
+                // same as Pfm_cnc::set_target_delta()
+                if(pfm[this_pfm].pfm_delta_steps == segment->pfm_target_delta[this_pfm])
+                {
+                    pfm[this_pfm].pfm_target_freq = INACTIVE_FREQ;
+                    pfm[this_pfm].pfm_control_target_delta = false;
+                }
+                else
+                {
+                    pfm[this_pfm].pfm_control_target_delta = true;
+                    pfm[this_pfm].pfm_target_delta = segment->pfm_target_delta[this_pfm];
+                    pfm[this_pfm].pfm_target_freq = segment->pfm_target_freq[this_pfm];
+                    pfm[this_pfm].pfm_direction = pfm[this_pfm].pfm_delta_steps < segment->pfm_target_delta[this_pfm];
+                    pfm[this_pfm]._isr_pfm_counter = 0;
+                }
+            }
+            pfm_queue.active = true;
+            pfm_queue.tail++;
+        }
+    }
+
     // reset busy flag
     _isr_pfm_busy = false;
 
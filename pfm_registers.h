@@ -35,4 +35,31 @@ typedef struct {
 
 extern volatile pfm_regs pfm[NUM_PFM];
 
-extern volatile uint8_t _isr_pfm_busy;
\ No newline at end of file
+extern volatile uint8_t _isr_pfm_busy;
+
+// declare structure representing single segment of the motion queue
+typedef struct {
+    // PFMs moved by the segment (bit flags)
+    uint8_t  bit_flags;
+    // target frequency of every PFM
+    uint16_t pfm_target_freq[NUM_PFM];
+    // target delta of every PFM
+    int32_t  pfm_target_delta[NUM_PFM];
+} pfm_segment;
+
+// declare ring buffer of segments, written by the main loop and drained by the ISR
+typedef struct {
+    pfm_segment segments[PFM_QUEUE_SIZE];
+    // free-running indexes (position = index & (PFM_QUEUE_SIZE-1))
+    // written only by the main loop
+    volatile uint8_t head;
+    // written only by the ISR
+    volatile uint8_t tail;
+    // true while a segment taken from the queue is executed
+    volatile bool active;
+    // number of finished segments (wraps around)
+    volatile uint16_t executed;
+} pfm_queue_regs;
+
+extern volatile pfm_queue_regs pfm_queue;
+
@@ -1,7 +1,14 @@
+// AUTO-GENERATED by protocol/generate.py from protocol/pkt_schema.py, DO NOT EDIT.
 #include <stdio.h>
 // start & end bytes marking the beginning and end of a packet
 #define START_BYTES (int[]){0xAA, 0xBB}
 #define END_BYTES  (int[]){0xCC, 0xDD}
+// bit of PAYLOAD_SIZE flagging a frame with CRC (CRC-16/CCITT-FALSE of PAYLOAD_SIZE and PAYLOAD, high byte first)
+#define FRAME_CRC_FLAG          0x80
+#define CRC_INIT                0xFFFF
+#define CRC_SIZE                2
+// byte terminating a COBS frame (COBS(PAYLOAD_SIZE | PAYLOAD [| CRC]) | COBS_DELIMITER)
+#define COBS_DELIMITER          0x00
 // definition of command bytes (in order of expected frequency of execution)
 #define CMD_SET_TARGET_FREQ     0x01 // set_target_freq(uint8_t this_pfm, uint16_t pfm_target_freq, bool pfm_direction)
 #define CMD_SET_TARGET_DELTA    0x02 // set_target_delta(uint8_t this_pfm, uint16_t pfm_target_freq, int32_t pfm_target_delta)
@@ -13,6 +20,57 @@
 #define CMD_SET_DELTA_STEPS     0x08 // set_delta_steps(uint8_t this_pfm, int32_t delta_steps)
 #define CMD_STOP                0x09 // halts execution and resets memory
 #define CMD_GET_ISR_FREQ        0x0A // uint32_t get_isr_freq(void)
+#define CMD_SET_TARGETS_FREQ    0x0B // set_target_freq() of several PFMs under a single block_isr()
+#define CMD_SET_TARGETS_DELTA   0x0C // set_target_delta() of several PFMs under a single block_isr()
+#define CMD_QUEUE_SEGMENT       0x0D // queue_segment() appends a segment of target deltas to the motion queue, NACK if full
+#define CMD_GET_QUEUE_STATUS    0x0E // get_queue_status(void)
+#define CMD_CLEAR_QUEUE         0x0F // clear_queue(void) drops the queued segments (the running segment is finished)
+#define CMD_SUBSCRIBE_IMU       0x10 // subscribe_imu(uint16_t period_ms) pushes PKT_IMU_FRAME every period, 0 unsubscribes
+#define CMD_ARM_TARGETS         0x12 // arm_targets() stores target frequencies of several PFMs applied by CMD_TRIGGER
+#define CMD_TRIGGER             0x13 // trigger(void) applies the armed targets under a single block_isr(), NACK if nothing is armed
+#define CMD_PING                0x14 // ping(void) returns ACK (and REPLY_TIMESTAMP) for clock synchronisation
+#define CMD_SET_BAUDRATE        0x15 // set_baudrate(uint32_t baudrate) switches the serial line after the ACK, confirmed by repeating it
+// size of request DATA (payload without the command byte)
+#define CMD_SET_TARGET_FREQ_SIZE            4
+#define CMD_SET_TARGET_DELTA_SIZE           7
+#define CMD_GET_DELTA_STEPS_SIZE            1
+#define CMD_GET_IMU_MEASUREMENT_SIZE        0
+#define CMD_SET_ISR_FREQ_SIZE               2
+#define CMD_ENABLE_CNC_SIZE                 0
+#define CMD_DISABLE_CNC_SIZE                0
+#define CMD_SET_DELTA_STEPS_SIZE            5
+#define CMD_GET_ISR_FREQ_SIZE               0
+#define CMD_GET_QUEUE_STATUS_SIZE           0
+#define CMD_CLEAR_QUEUE_SIZE                0
+#define CMD_SUBSCRIBE_IMU_SIZE              2
+#define CMD_TRIGGER_SIZE                    0
+#define CMD_PING_SIZE                       0
+#define CMD_SET_BAUDRATE_SIZE               4
+// size of a record and maximal number of records of commands with repeated request DATA
+#define CMD_SET_TARGETS_FREQ_RECORD_SIZE    4
+#define CMD_SET_TARGETS_FREQ_MAX_RECORDS    3
+#define CMD_SET_TARGETS_DELTA_RECORD_SIZE   7
+#define CMD_SET_TARGETS_DELTA_MAX_RECORDS   3
+#define CMD_QUEUE_SEGMENT_RECORD_SIZE       7
+#define CMD_QUEUE_SEGMENT_MAX_RECORDS       3
+#define CMD_ARM_TARGETS_RECORD_SIZE         4
+#define CMD_ARM_TARGETS_MAX_RECORDS         3
+// size of reply DATA (commands returning data instead of ACK/NACK)
+#define CMD_GET_DELTA_STEPS_REPLY_SIZE      4
+#define CMD_GET_IMU_MEASUREMENT_REPLY_SIZE  18
+#define CMD_GET_ISR_FREQ_REPLY_SIZE         4
+#define CMD_QUEUE_SEGMENT_REPLY_SIZE        4
+#define CMD_GET_QUEUE_STATUS_REPLY_SIZE     4
+// size of the device time appended to every reply and pushed packet
+#define REPLY_TIMESTAMP_SIZE                4
+// baudrate after setup(), baudrates accepted by CMD_SET_BAUDRATE and the time of their confirmation
+#define DEFAULT_BAUDRATE        115200
+#define BAUDRATES (uint32_t[]){115200, 250000, 500000, 1000000, 2000000}
+#define NUM_BAUDRATES           5
+#define BAUDRATE_CONFIRM_MS     1000
 // definition of response
 #define PKT_ACK                 0xAA // acknowledgement sequence
-#define PKT_NACK                0xAB // not-acknowledgement sequence
\ No newline at end of file
+#define PKT_NACK                0xAB // not-acknowledgement sequence
+// definition of packets pushed without a request and the size of their DATA
+#define PKT_IMU_FRAME           0x11 // Pkt_pfm::push_telemetry() every period of subscribe_imu()
+#define PKT_IMU_FRAME_SIZE                  20
@@ -14,6 +14,18 @@ Pkt_pfm::Pkt_pfm(Pfm_cnc *pfm_cnc, Imu *imu){
     this->_pfm_cnc = pfm_cnc;
     this->_imu = imu;
     // imu_regs _imu_meas;
+    // no telemetry is pushed until subscribed
+    this->_imu_period_ms = 0;
+    this->_imu_push_time_ms = 0;
+    this->_imu_sequence = 0;
+    // nothing is armed until cmd_arm_targets()
+    this->_armed_bit_flags = 0;
+    // Serial.begin(DEFAULT_BAUDRATE) in setup()
+    this->_baudrate = DEFAULT_BAUDRATE;
+    this->_next_baudrate = 0;
+    this->_fallback_baudrate = DEFAULT_BAUDRATE;
+    this->_baudrate_switch_time_ms = 0;
+    this->_baudrate_confirmed = true;
 };
 
 
@@ -71,7 +83,7 @@ void Pkt_pfm::uint32_t_to_arr(uint32_t val,
 
 
 bool Pkt_pfm::cmd_set_target_freq(uint8_t payload_size, uint8_t* payload){
-    if(payload_size == 4){
+    if(payload_size == CMD_SET_TARGET_FREQ_SIZE){
         // locate value in payload
         uint8_t bit_flags_target_pfm = payload[0];
         // translate array[2] of uint8_t into uint16_t
@@ -102,7 +114,7 @@ bool Pkt_pfm::cmd_set_target_freq(uint8_t payload_size, uint8_t* payload){
 
 bool Pkt_pfm::cmd_set_target_delta(uint8_t payload_size, uint8_t* payload){
     // check payload is correct size
-    if(payload_size == 7){
+    if(payload_size == CMD_SET_TARGET_DELTA_SIZE){
         // locate value in payload
         uint8_t bit_flags_target_pfm = payload[0];
         // translate array[2] of uint8_t into uint16_t
@@ -134,7 +146,7 @@ bool Pkt_pfm::cmd_set_target_delta(uint8_t payload_size, uint8_t* payload){
 
 bool Pkt_pfm::cmd_get_delta_steps(uint8_t payload_size, uint8_t* payload, uint16_t* return_array_size, uint8_t* return_array){
     // check payload is correct size
-    if(payload_size == 1){
+    if(payload_size == CMD_GET_DELTA_STEPS_SIZE){
         // locate value in payload
         uint8_t bit_flags_target_pfm = payload[0];
         for(uint8_t this_pfm=0; this_pfm<NUM_PFM; this_pfm++)
@@ -146,7 +158,7 @@ bool Pkt_pfm::cmd_get_delta_steps(uint8_t payload_size, uint8_t* payload, uint16
             }
         }
         // retrun true on success
-        *return_array_size = 4;
+        *return_array_size = CMD_GET_DELTA_STEPS_REPLY_SIZE;
         return true;
     }else{
         // retrun false when something is wrong
@@ -158,7 +170,7 @@ bool Pkt_pfm::cmd_get_delta_steps(uint8_t payload_size, uint8_t* payload, uint16
 
 bool Pkt_pfm::cmd_get_imu_measurement(uint8_t payload_size, uint16_t* return_array_size, uint8_t* return_array){
     // check payload is correct size
-    if(payload_size == 0){
+    if(payload_size == CMD_GET_IMU_MEASUREMENT_SIZE){
         // locate value in payload
         _imu->get_measured_data(&this->_imu_meas);
         // fit measured data into return_array
@@ -172,7 +184,7 @@ bool Pkt_pfm::cmd_get_imu_measurement(uint8_t payload_size, uint16_t* return_arr
         uint16_t_to_arr(uint16_t(_imu_meas.my), return_array+14);
         uint16_t_to_arr(uint16_t(_imu_meas.mz), return_array+16);
         // retrun true on success
-        *return_array_size = 18;
+        *return_array_size = CMD_GET_IMU_MEASUREMENT_REPLY_SIZE;
         return true;
     }else{
         // retrun false when something is wrong
@@ -184,7 +196,7 @@ bool Pkt_pfm::cmd_get_imu_measurement(uint8_t payload_size, uint16_t* return_arr
 
 bool Pkt_pfm::cmd_set_isr_freq(uint8_t payload_size, uint8_t* payload){
     // check payload is correct size
-    if(payload_size == 2){
+    if(payload_size == CMD_SET_ISR_FREQ_SIZE){
         // locate value in payload 
         // NOTICE: order of bytes in payload is from low to high
         uint16_t frequency = arr_to_uint16_t(payload[1], 
@@ -203,14 +215,14 @@ bool Pkt_pfm::cmd_set_isr_freq(uint8_t payload_size, uint8_t* payload){
 
 bool Pkt_pfm::cmd_get_isr_freq(uint8_t payload_size, uint16_t* return_array_size, uint8_t* return_array){
     // check payload is correct size
-    if(payload_size == 0){
+    if(payload_size == CMD_GET_ISR_FREQ_SIZE){
         //  
         return_array[3] = 0x00;
         return_array[2] = 0x00;
         uint16_t_to_arr(uint16_t(_pfm_cnc->get_isr_freq()), 
                                         return_array);
         // retrun true on success
-        *return_array_size = 4;
+        *return_array_size = CMD_GET_ISR_FREQ_REPLY_SIZE;
         return true;
     }else{
         // retrun false when something is wrong
@@ -222,7 +234,7 @@ bool Pkt_pfm::cmd_get_isr_freq(uint8_t payload_size, uint16_t* return_array_size
 
 bool Pkt_pfm::cmd_enable_cnc(uint8_t payload_size){
     // check payload is correct size
-    if(payload_size == 0){
+    if(payload_size == CMD_ENABLE_CNC_SIZE){
         // locate value in payload
         _pfm_cnc->enable_cnc();
         _pfm_cnc->block_isr(false);
@@ -237,7 +249,7 @@ bool Pkt_pfm::cmd_enable_cnc(uint8_t payload_size){
 
 bool Pkt_pfm::cmd_disable_cnc(uint8_t payload_size){
     // check payload is correct size
-    if(payload_size == 0){
+    if(payload_size == CMD_DISABLE_CNC_SIZE){
         // locate value in payload
         _pfm_cnc->block_isr(true);
         _pfm_cnc->disable_cnc();
@@ -251,7 +263,7 @@ bool Pkt_pfm::cmd_disable_cnc(uint8_t payload_size){
 
 
 bool Pkt_pfm::cmd_set_delta_steps(uint8_t payload_size, uint8_t* payload){
-    if(payload_size == 5){
+    if(payload_size == CMD_SET_DELTA_STEPS_SIZE){
         // locate value in payload
         uint8_t bit_flags_target_pfm = payload[0];
         // translate array[2] of uint8_t into uint16_t
@@ -280,6 +292,338 @@ bool Pkt_pfm::cmd_set_delta_steps(uint8_t payload_size, uint8_t* payload){
 }
 
 
+bool Pkt_pfm::cmd_set_targets_freq(uint8_t payload_size, uint8_t* payload){
+    // check payload consists of 1..MAX_RECORDS records
+    uint8_t num_records = payload_size/CMD_SET_TARGETS_FREQ_RECORD_SIZE;
+    if(payload_size%CMD_SET_TARGETS_FREQ_RECORD_SIZE == 0 && num_records > 0 && num_records <= CMD_SET_TARGETS_FREQ_MAX_RECORDS){
+        // execute all records at once
+        // NOTICE: ISR is ignored to assure synchronized execution among PFMs
+        _pfm_cnc->block_isr(true);
+        for(uint8_t record=0; record<num_records; record++)
+        {
+            uint8_t* record_payload = payload + record*CMD_SET_TARGETS_FREQ_RECORD_SIZE;
+            // locate value in payload
+            uint8_t bit_flags_target_pfm = record_payload[0];
+            // NOTICE: order of bytes in payload is from low to high
+            uint16_t pfm_target_freq = arr_to_uint16_t(record_payload[2], record_payload[1]);
+            bool pfm_direction = record_payload[3];
+            for(uint8_t this_pfm=0; this_pfm<NUM_PFM; this_pfm++)
+            {
+                // if flag==true, then execute command for this_pmf
+                if( (bit_flags_target_pfm & _pfm_cnc->get_bit_flag(this_pfm))){
+                    _pfm_cnc->set_target_freq(this_pfm, pfm_target_freq, pfm_direction);
+                    // start all targeted PFMs in phase
+                    _pfm_cnc->restart_counter(this_pfm);
+                }
+            }
+        }
+        // retrun true on success
+        _pfm_cnc->block_isr(false);
+        return true;
+    }else{
+        // retrun false when something is wrong
+        return false;
+    }
+}
+
+
+bool Pkt_pfm::cmd_set_targets_delta(uint8_t payload_size, uint8_t* payload){
+    // check payload consists of 1..MAX_RECORDS records
+    uint8_t num_records = payload_size/CMD_SET_TARGETS_DELTA_RECORD_SIZE;
+    if(payload_size%CMD_SET_TARGETS_DELTA_RECORD_SIZE == 0 && num_records > 0 && num_records <= CMD_SET_TARGETS_DELTA_MAX_RECORDS){
+        // execute all records at once
+        // NOTICE: ISR is ignored to assure synchronized execution among PFMs
+        _pfm_cnc->block_isr(true);
+        for(uint8_t record=0; record<num_records; record++)
+        {
+            uint8_t* record_payload = payload + record*CMD_SET_TARGETS_DELTA_RECORD_SIZE;
+            // locate value in payload
+            uint8_t bit_flags_target_pfm = record_payload[0];
+            // NOTICE: order of bytes in payload is from low to high
+            uint16_t pfm_target_freq = arr_to_uint16_t(record_payload[2], record_payload[1]);
+            int32_t pfm_target_delta = arr_to_uint32_t(record_payload[6], record_payload[5], record_payload[4], record_payload[3]);
+            for(uint8_t this_pfm=0; this_pfm<NUM_PFM; this_pfm++)
+            {
+                // if flag==true, then execute command for this_pmf
+                if( (bit_flags_target_pfm & _pfm_cnc->get_bit_flag(this_pfm))){
+                    _pfm_cnc->set_target_delta(this_pfm, pfm_target_freq, pfm_target_delta);
+                }
+            }
+        }
+        // retrun true on success
+        _pfm_cnc->block_isr(false);
+        return true;
+    }else{
+        // retrun false when something is wrong
+        return false;
+    }
+}
+
+
+void Pkt_pfm::queue_status_to_arr(uint8_t* arr){
+    // FREE_SLOTS, ACTIVE, EXECUTED
+    arr[0] = _pfm_cnc->get_queue_free_slots();
+    arr[1] = _pfm_cnc->get_queue_active();
+    uint16_t_to_arr(_pfm_cnc->get_queue_executed(), arr+2);
+}
+
+
+bool Pkt_pfm::cmd_queue_segment(uint8_t payload_size, uint8_t* payload, uint16_t* return_array_size, uint8_t* return_array){
+    // check payload consists of 1..MAX_RECORDS records
+    uint8_t num_records = payload_size/CMD_QUEUE_SEGMENT_RECORD_SIZE;
+    if(payload_size%CMD_QUEUE_SEGMENT_RECORD_SIZE == 0 && num_records > 0 && num_records <= CMD_QUEUE_SEGMENT_MAX_RECORDS){
+        // collect records into a single segment
+        uint8_t bit_flags = 0;
+        uint16_t pfm_target_freq[NUM_PFM];
+        int32_t pfm_target_delta[NUM_PFM];
+        for(uint8_t record=0; record<num_records; record++)
+        {
+            uint8_t* record_payload = payload + record*CMD_QUEUE_SEGMENT_RECORD_SIZE;
+            // locate value in payload
+            uint8_t bit_flags_target_pfm = record_payload[0];
+            // NOTICE: order of bytes in payload is from low to high
+            uint16_t freq = arr_to_uint16_t(record_payload[2], record_payload[1]);
+            int32_t delta = arr_to_uint32_t(record_payload[6], record_payload[5], record_payload[4], record_payload[3]);
+            for(uint8_t this_pfm=0; this_pfm<NUM_PFM; this_pfm++)
+            {
+                // if flag==true, then the segment moves this_pmf
+                if( (bit_flags_target_pfm & _pfm_cnc->get_bit_flag(this_pfm))){
+                    bit_flags |= _pfm_cnc->get_bit_flag(this_pfm);
+                    pfm_target_freq[this_pfm] = freq;
+                    pfm_target_delta[this_pfm] = delta;
+                }
+            }
+        }
+        // retrun false when the queue is full
+        if(!_pfm_cnc->queue_segment(bit_flags, pfm_target_freq, pfm_target_delta)){
+            *return_array_size = 0;
+            return false;
+        }
+        // retrun queue status on success
+        queue_status_to_arr(return_array);
+        *return_array_size = CMD_QUEUE_SEGMENT_REPLY_SIZE;
+        return true;
+    }else{
+        // retrun false when something is wrong
+        *return_array_size = 0;
+        return false;
+    }
+}
+
+
+bool Pkt_pfm::cmd_get_queue_status(uint8_t payload_size, uint16_t* return_array_size, uint8_t* return_array){
+    // check payload is correct size
+    if(payload_size == CMD_GET_QUEUE_STATUS_SIZE){
+        queue_status_to_arr(return_array);
+        // retrun true on success
+        *return_array_size = CMD_GET_QUEUE_STATUS_REPLY_SIZE;
+        return true;
+    }else{
+        // retrun false when something is wrong
+        *return_array_size = 0;
+        return false;
+    }
+}
+
+
+bool Pkt_pfm::cmd_clear_queue(uint8_t payload_size){
+    // check payload is correct size
+    if(payload_size == CMD_CLEAR_QUEUE_SIZE){
+        _pfm_cnc->clear_queue();
+        // retrun true on success
+        return true;
+    }else{
+        // retrun false when something is wrong
+        return false;
+    }
+}
+
+
+bool Pkt_pfm::cmd_subscribe_imu(uint8_t payload_size, uint8_t* payload){
+    // check payload is correct size
+    if(payload_size == CMD_SUBSCRIBE_IMU_SIZE){
+        // translate array[2] of uint8_t into uint16_t
+        // NOTICE: order of bytes in payload is from low to high
+        _imu_period_ms = arr_to_uint16_t(payload[1], payload[0]);
+        // the first frame is pushed in the next loop()
+        _imu_push_time_ms = millis() - _imu_period_ms;
+        _imu_sequence = 0;
+        // retrun true on success
+        return true;
+    }else{
+        // retrun false when something is wrong
+        return false;
+    }
+}
+
+
+bool Pkt_pfm::cmd_arm_targets(uint8_t payload_size, uint8_t* payload){
+    // check payload consists of 1..MAX_RECORDS records
+    uint8_t num_records = payload_size/CMD_ARM_TARGETS_RECORD_SIZE;
+    if(payload_size%CMD_ARM_TARGETS_RECORD_SIZE == 0 && num_records > 0 && num_records <= CMD_ARM_TARGETS_MAX_RECORDS){
+        // store the targets, the PFMs are not changed until cmd_trigger()
+        _armed_bit_flags = 0;
+        for(uint8_t record=0; record<num_records; record++)
+        {
+            uint8_t* record_payload = payload + record*CMD_ARM_TARGETS_RECORD_SIZE;
+            // locate value in payload
+            uint8_t bit_flags_target_pfm = record_payload[0];
+            // NOTICE: order of bytes in payload is from low to high
+            uint16_t pfm_target_freq = arr_to_uint16_t(record_payload[2], record_payload[1]);
+            bool pfm_direction = record_payload[3];
+            for(uint8_t this_pfm=0; this_pfm<NUM_PFM; this_pfm++)
+            {
+                // if flag==true, then arm this_pmf
+                if( (bit_flags_target_pfm & _pfm_cnc->get_bit_flag(this_pfm))){
+                    _armed_bit_flags |= _pfm_cnc->get_bit_flag(this_pfm);
+                    _armed_target_freq[this_pfm] = pfm_target_freq;
+                    _armed_direction[this_pfm] = pfm_direction;
+                }
+            }
+        }
+        // retrun true on success
+        return true;
+    }else{
+        // retrun false when something is wrong
+        return false;
+    }
+}
+
+
+bool Pkt_pfm::cmd_trigger(uint8_t payload_size){
+    // check payload is correct size and targets are armed
+    if(payload_size == CMD_TRIGGER_SIZE && _armed_bit_flags != 0){
+        // the request is the shortest possible packet, the targets are
+        // applied as soon as it is parsed, so turrets receiving the trigger
+        // at the same time start within one ISR tick
+        // NOTICE: ISR is ignored to assure synchronized execution among PFMs
+        _pfm_cnc->block_isr(true);
+        for(uint8_t this_pfm=0; this_pfm<NUM_PFM; this_pfm++)
+        {
+            // if flag==true, then execute command for this_pmf
+            if( (_armed_bit_flags & _pfm_cnc->get_bit_flag(this_pfm))){
+                _pfm_cnc->set_target_freq(this_pfm, _armed_target_freq[this_pfm], _armed_direction[this_pfm]);
+                // start all targeted PFMs in phase
+                _pfm_cnc->restart_counter(this_pfm);
+            }
+        }
+        // targets are applied once
+        _armed_bit_flags = 0;
+        // retrun true on success
+        _pfm_cnc->block_isr(false);
+        return true;
+    }else{
+        // retrun false when something is wrong
+        return false;
+    }
+}
+
+
+uint16_t Pkt_pfm::push_telemetry(uint8_t* return_array){
+    /*
+    * Function: push_telemetry
+    * ----------------------------
+    *   Fills return_array with PKT_IMU_FRAME (command byte + DATA) when the
+    *   period of cmd_subscribe_imu() elapsed, to be sent by loop() without 
+    *   a request.
+    *
+    *   returns: size of the frame, 0 if no frame is due
+    */
+    if(_imu_period_ms == 0 || (uint32_t)(millis() - _imu_push_time_ms) < _imu_period_ms){
+        return 0;
+    }
+    // keep the period, frames delayed by a long loop() are not accumulated
+    _imu_push_time_ms += _imu_period_ms;
+    if((uint32_t)(millis() - _imu_push_time_ms) >= _imu_period_ms){
+        _imu_push_time_ms = millis();
+    }
+    _imu->get_measured_data(&this->_imu_meas);
+    return_array[0] = PKT_IMU_FRAME;
+    uint16_t_to_arr(_imu_sequence++, return_array+ 1);
+    uint16_t_to_arr(uint16_t(_imu_meas.ax), return_array+ 3);
+    uint16_t_to_arr(uint16_t(_imu_meas.ay), return_array+ 5);
+    uint16_t_to_arr(uint16_t(_imu_meas.az), return_array+ 7);
+    uint16_t_to_arr(uint16_t(_imu_meas.gx), return_array+ 9);
+    uint16_t_to_arr(uint16_t(_imu_meas.gy), return_array+11);
+    uint16_t_to_arr(uint16_t(_imu_meas.gz), return_array+13);
+    uint16_t_to_arr(uint16_t(_imu_meas.mx), return_array+15);
+    uint16_t_to_arr(uint16_t(_imu_meas.my), return_array+17);
+    uint16_t_to_arr(uint16_t(_imu_meas.mz), return_array+19);
+    return 1 + PKT_IMU_FRAME_SIZE;
+}
+
+
+bool Pkt_pfm::cmd_ping(uint8_t payload_size){
+    // check payload is correct size
+    if(payload_size == CMD_PING_SIZE){
+        // only ACK is returned, the host reads the device time appended
+        // to every reply (REPLY_TIMESTAMP) to synchronise its clock
+        return true;
+    }else{
+        // retrun false when something is wrong
+        return false;
+    }
+}
+
+
+bool Pkt_pfm::cmd_set_baudrate(uint8_t payload_size, uint8_t* payload){
+    // check payload is correct size
+    if(payload_size != CMD_SET_BAUDRATE_SIZE){
+        // retrun false when something is wrong
+        return false;
+    }
+    // NOTICE: order of bytes in payload is from low to high
+    uint32_t baudrate = arr_to_uint32_t(payload[3], payload[2], payload[1], payload[0]);
+    bool valid_baudrate = false;
+    for(uint8_t i=0; i<NUM_BAUDRATES; i++)
+    {
+        valid_baudrate |= (BAUDRATES[i] == baudrate);
+    }
+    if(!valid_baudrate){
+        return false;
+    }
+    if(baudrate == _baudrate){
+        // repeated at the new baudrate, the host received its replies, keep it
+        _baudrate_confirmed = true;
+        return true;
+    }
+    // the ACK is sent at the current baudrate, loop() switches afterwards (see baudrate_switch())
+    if(_baudrate_confirmed){
+        _fallback_baudrate = _baudrate;
+    }
+    _next_baudrate = baudrate;
+    // retrun true on success
+    return true;
+}
+
+
+uint32_t Pkt_pfm::baudrate_switch(void){
+    /*
+    * Function: baudrate_switch
+    * ----------------------------
+    *   Called by loop() after the replies are written. Applies the baudrate
+    *   of cmd_set_baudrate() and falls back to the previous baudrate when
+    *   the new one is not confirmed within BAUDRATE_CONFIRM_MS (the host
+    *   cannot read the replies at the new baudrate).
+    *
+    *   returns: baudrate loop() has to restart Serial with, 0 if unchanged
+    */
+    if(_next_baudrate != 0){
+        _baudrate = _next_baudrate;
+        _next_baudrate = 0;
+        _baudrate_confirmed = false;
+        _baudrate_switch_time_ms = millis();
+        return _baudrate;
+    }
+    if(!_baudrate_confirmed && (uint32_t)(millis() - _baudrate_switch_time_ms) >= BAUDRATE_CONFIRM_MS){
+        _baudrate = _fallback_baudrate;
+        _baudrate_confirmed = true;
+        return _baudrate;
+    }
+    return 0;
+}
+
+
 bool Pkt_pfm::process_command(uint8_t command, uint8_t payload_size, uint8_t* payload, uint16_t* return_array_size, uint8_t* return_array){
     switch (command)
     {
@@ -316,6 +660,44 @@ bool Pkt_pfm::process_command(uint8_t command, uint8_t payload_size, uint8_t* pa
         case CMD_GET_ISR_FREQ:
             return cmd_get_isr_freq(payload_size, return_array_size, return_array);
             break;
+        case CMD_SET_TARGETS_FREQ:
+            *return_array_size = 0;
+            return cmd_set_targets_freq(payload_size, payload);
+            break;
+        case CMD_SET_TARGETS_DELTA:
+            *return_array_size = 0;
+            return cmd_set_targets_delta(payload_size, payload);
+            break;
+        case CMD_QUEUE_SEGMENT:
+            return cmd_queue_segment(payload_size, payload, return_array_size, return_array);
+            break;
+        case CMD_GET_QUEUE_STATUS:
+            return cmd_get_queue_status(payload_size, return_array_size, return_array);
+            break;
+        case CMD_CLEAR_QUEUE:
+            *return_array_size = 0;
+            return cmd_clear_queue(payload_size);
+            break;
+        case CMD_SUBSCRIBE_IMU:
+            *return_array_size = 0;
+            return cmd_subscribe_imu(payload_size, payload);
+            break;
+        case CMD_ARM_TARGETS:
+            *return_array_size = 0;
+            return cmd_arm_targets(payload_size, payload);
+            break;
+        case CMD_TRIGGER:
+            *return_array_size = 0;
+            return cmd_trigger(payload_size);
+            break;
+        case CMD_PING:
+            *return_array_size = 0;
+            return cmd_ping(payload_size);
+            break;
+        case CMD_SET_BAUDRATE:
+            *return_array_size = 0;
+            return cmd_set_baudrate(payload_size, payload);
+            break;
         // case CMD_STOP:
         //     // command action here
         //     return false;
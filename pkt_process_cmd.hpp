@@ -9,6 +9,17 @@ private:
     Pfm_cnc*    _pfm_cnc;
     Imu*        _imu;
     imu_regs    _imu_meas;
+    uint16_t    _imu_period_ms;
+    uint32_t    _imu_push_time_ms;
+    uint16_t    _imu_sequence;
+    uint8_t     _armed_bit_flags;
+    uint16_t    _armed_target_freq[NUM_PFM];
+    bool        _armed_direction[NUM_PFM];
+    uint32_t    _baudrate;
+    uint32_t    _next_baudrate;
+    uint32_t    _fallback_baudrate;
+    uint32_t    _baudrate_switch_time_ms;
+    bool        _baudrate_confirmed;
     bool        cmd_set_target_freq(    uint8_t payload_size,   uint8_t* payload                            );
     bool        cmd_set_target_delta(   uint8_t payload_size,   uint8_t* payload                            );
     bool        cmd_get_delta_steps(    uint8_t payload_size,   uint8_t* payload,   uint16_t* return_array_size,    uint8_t* return_array   );
@@ -18,6 +29,17 @@ private:
     bool        cmd_enable_cnc(         uint8_t payload_size                                                );
     bool        cmd_disable_cnc(        uint8_t payload_size                                                );
     bool        cmd_set_delta_steps(    uint8_t payload_size,   uint8_t* payload                            );
+    bool        cmd_set_targets_freq(   uint8_t payload_size,   uint8_t* payload                            );
+    bool        cmd_set_targets_delta(  uint8_t payload_size,   uint8_t* payload                            );
+    bool        cmd_queue_segment(      uint8_t payload_size,   uint8_t* payload,   uint16_t* return_array_size,    uint8_t* return_array   );
+    bool        cmd_get_queue_status(   uint8_t payload_size,                       uint16_t* return_array_size,    uint8_t* return_array   );
+    bool        cmd_clear_queue(        uint8_t payload_size                                                );
+    bool        cmd_subscribe_imu(      uint8_t payload_size,   uint8_t* payload                            );
+    bool        cmd_arm_targets(        uint8_t payload_size,   uint8_t* payload                            );
+    bool        cmd_trigger(            uint8_t payload_size                                                );
+    bool        cmd_ping(               uint8_t payload_size                                                );
+    bool        cmd_set_baudrate(       uint8_t payload_size,   uint8_t* payload                            );
+    void        queue_status_to_arr(    uint8_t* arr                    );
     uint16_t    arr_to_uint16_t(        uint8_t val_0, uint8_t val_1    );
     uint32_t    arr_to_uint32_t(        uint8_t val_0, uint8_t val_1, 
                                         uint8_t val_2, uint8_t val_3    );
@@ -26,4 +48,6 @@ private:
 public:
     Pkt_pfm(Pfm_cnc* pfm_cnc, Imu* imu);
     bool        process_command(uint8_t command, uint8_t payload_size, uint8_t* payload, uint16_t* return_array_size, uint8_t* return_array);
+    uint16_t    push_telemetry(uint8_t* return_array);
+    uint32_t    baudrate_switch(void);
 };
\ No newline at end of file
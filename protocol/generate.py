@@ -0,0 +1,299 @@
+import argparse
+import itertools
+import os
+import sys
+import pkt_schema as schema
+""" Generates the protocol definitions of the firmware and the host from pkt_schema.py.
+
+    Usage (from the repository root):
+
+        python protocol/generate.py             # (re)write the generated files
+        python protocol/generate.py --check     # exit with 1 if any generated file is stale
+
+    The generated files contain only literals (constants and struct format
+    strings), the schema is never interpreted at runtime.
+
+Public functions:
+    generate()
+"""
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADER_C = "// AUTO-GENERATED by protocol/generate.py from protocol/pkt_schema.py, DO NOT EDIT.\n"
+HEADER_PY = "# AUTO-GENERATED by protocol/generate.py from protocol/pkt_schema.py, DO NOT EDIT.\n"
+
+# field type: (struct format character, size in bytes)
+FIELD_TYPES = {
+    'bool':     ('B', 1),
+    'uint8':    ('B', 1),
+    'int8':     ('b', 1),
+    'uint16':   ('H', 2),
+    'int16':    ('h', 2),
+    'uint32':   ('I', 4),
+    'int32':    ('i', 4),
+}
+
+_BYTEORDER_TO_STRUCT = {'big':'>', 'little':'<'}
+
+
+def _data_size(fields:list) -> int:
+    """ Size of DATA in bytes. """
+    return sum(FIELD_TYPES[field_type][1] for _, field_type in fields)
+
+
+def _struct_format(byteorder:str, fields:list, command:bool=False) -> str:
+    """ Struct format of the fields, runs of the same type are collapsed (e.g. '<9H'). """
+    codes = (['B'] if command else []) + [FIELD_TYPES[field_type][0] for _, field_type in fields]
+    fmt = _BYTEORDER_TO_STRUCT[byteorder]
+    for code, run in itertools.groupby(codes):
+        count = len(list(run))
+        fmt += f"{count}{code}" if count > 2 else code*count
+    return fmt
+
+
+def _implemented_commands() -> list:
+    """ Commands with a defined request. """
+    return [command for command in schema.COMMANDS if command['request'] is not None]
+
+
+def _record_commands() -> list:
+    """ Commands whose request is a repeated record. """
+    return [command for command in _implemented_commands() if command.get('records')]
+
+
+def _c_cmd_defs() -> str:
+    """ Content of pkt_cmd_defs.h """
+    lines = [HEADER_C, "#include <stdio.h>\n"]
+    lines.append("// start & end bytes marking the beginning and end of a packet\n")
+    lines.append("#define START_BYTES (int[]){" + ", ".join(f"0x{b:02X}" for b in schema.START_BYTES) + "}\n")
+    lines.append("#define END_BYTES  (int[]){" + ", ".join(f"0x{b:02X}" for b in schema.END_BYTES) + "}\n")
+    lines.append("// bit of PAYLOAD_SIZE flagging a frame with CRC (CRC-16/CCITT-FALSE of PAYLOAD_SIZE and PAYLOAD, high byte first)\n")
+    lines.append(f"#define {'FRAME_CRC_FLAG':<23} 0x{schema.FRAME_CRC_FLAG:02X}\n")
+    lines.append(f"#define {'CRC_INIT':<23} 0x{schema.CRC_INIT:04X}\n")
+    lines.append(f"#define {'CRC_SIZE':<23} {schema.CRC_SIZE}\n")
+    lines.append("// byte terminating a COBS frame (COBS(PAYLOAD_SIZE | PAYLOAD [| CRC]) | COBS_DELIMITER)\n")
+    lines.append(f"#define {'COBS_DELIMITER':<23} 0x{schema.COBS_DELIMITER:02X}\n")
+    lines.append("// definition of command bytes (in order of expected frequency of execution)\n")
+    for command in schema.COMMANDS:
+        lines.append(f"#define {'CMD_'+command['name']:<23} 0x{command['id']:02X} // {command['doc']}\n")
+    lines.append("// size of request DATA (payload without the command byte)\n")
+    for command in _implemented_commands():
+        if command.get('records'):
+            continue
+        lines.append(f"#define {'CMD_'+command['name']+'_SIZE':<35} {_data_size(command['request'])}\n")
+    lines.append("// size of a record and maximal number of records of commands with repeated request DATA\n")
+    for command in _record_commands():
+        lines.append(f"#define {'CMD_'+command['name']+'_RECORD_SIZE':<35} {_data_size(command['request'])}\n")
+        lines.append(f"#define {'CMD_'+command['name']+'_MAX_RECORDS':<35} {command['records']}\n")
+    lines.append("// size of reply DATA (commands returning data instead of ACK/NACK)\n")
+    for command in _implemented_commands():
+        if command['reply']:
+            lines.append(f"#define {'CMD_'+command['name']+'_REPLY_SIZE':<35} {_data_size(command['reply'])}\n")
+    lines.append("// size of the device time appended to every reply and pushed packet\n")
+    lines.append(f"#define {'REPLY_TIMESTAMP_SIZE':<35} {_data_size([schema.REPLY_TIMESTAMP])}\n")
+    lines.append("// baudrate after setup(), baudrates accepted by CMD_SET_BAUDRATE and the time of their confirmation\n")
+    lines.append(f"#define {'DEFAULT_BAUDRATE':<23} {schema.DEFAULT_BAUDRATE}\n")
+    lines.append("#define BAUDRATES (uint32_t[]){" + ", ".join(str(baudrate) for baudrate in schema.BAUDRATES) + "}\n")
+    lines.append(f"#define {'NUM_BAUDRATES':<23} {len(schema.BAUDRATES)}\n")
+    lines.append(f"#define {'BAUDRATE_CONFIRM_MS':<23} {schema.BAUDRATE_CONFIRM_MS}\n")
+    lines.append("// definition of response\n")
+    lines.append(f"#define {'PKT_ACK':<23} 0x{schema.PKT_ACK:02X} // acknowledgement sequence\n")
+    lines.append(f"#define {'PKT_NACK':<23} 0x{schema.PKT_NACK:02X} // not-acknowledgement sequence\n")
+    lines.append("// definition of packets pushed without a request and the size of their DATA\n")
+    for push in schema.PUSHES:
+        lines.append(f"#define {'PKT_'+push['name']:<23} 0x{push['id']:02X} // {push['doc']}\n")
+        lines.append(f"#define {'PKT_'+push['name']+'_SIZE':<35} {_data_size(push['reply'])}\n")
+    return "".join(lines)
+
+
+def _c_pfm_config() -> str:
+    """ Content of pfm_config.h """
+    lines = [HEADER_C]
+    lines.append(f"// There are {len(schema.PFMS)} axis: {', '.join(name for name, _, _ in schema.PFMS)}\n")
+    lines.append(f"#define {'NUM_PFM':<23} {len(schema.PFMS)}\n")
+    for name, index, flag in schema.PFMS:
+        lines.append(f"#define {'PFM_'+name:<23} {index}\n")
+        lines.append(f"#define {'PFM_'+name+'_FLAG':<23} 0x{flag:02X}\n")
+    lines.append("// frequency value considered as STOP\n")
+    lines.append(f"#define {'INACTIVE_FREQ':<23} {schema.INACTIVE_FREQ}\n")
+    lines.append("// default PFM frequency (can be changed in software)\n")
+    lines.append(f"#define {'DEFAULT_PFM_FREQ':<23} {schema.DEFAULT_PFM_FREQ}\n")
+    lines.append("// number of segments of the motion queue (power of 2, at most 128)\n")
+    lines.append(f"#define {'PFM_QUEUE_SIZE':<23} {schema.PFM_QUEUE_SIZE}\n")
+    lines.append("// derive balue of interrupt counter with prescaler 1:1\n")
+    lines.append(f"#define {'INTERRUPT_COUNTER':<23} F_CPU/2/DEFAULT_PFM_FREQ\n")
+    return "".join(lines)
+
+
+def _py_cmd_defs() -> list:
+    """ Lines of the packet constants shared by pkt_defs.py and PC_UI/pkt_cmd_defs.py """
+    lines = ["# start & end bytes marking the beginning and end of a packet\n"]
+    lines.append("START_BYTES = b'" + "".join(f"\\x{b:02X}" for b in schema.START_BYTES) + "'\n")
+    lines.append("END_BYTES = b'" + "".join(f"\\x{b:02X}" for b in schema.END_BYTES) + "'\n")
+    lines.append("# definition of command bytes (in order of expected frequency of execution)\n")
+    for command in schema.COMMANDS:
+        lines.append(f"{'CMD_'+command['name']:<23} = bytes.fromhex('{command['id']:02X}') # {command['doc']}\n")
+    lines.append("# definition of response\n")
+    lines.append(f"{'PKT_ACK':<23} = bytes.fromhex('{schema.PKT_ACK:02X}') # acknowledgement sequence\n")
+    lines.append(f"{'PKT_NACK':<23} = bytes.fromhex('{schema.PKT_NACK:02X}') # not-acknowledgement sequence\n")
+    lines.append("# definition of packets pushed without a request\n")
+    for push in schema.PUSHES:
+        lines.append(f"{'PKT_'+push['name']:<23} = bytes.fromhex('{push['id']:02X}') # {push['doc']}\n")
+    lines.append("\n")
+    lines.append(f"BYTEORDER = '{schema.REPLY_BYTEORDER}'\n")
+    lines.append(f"PAYLOAD_BYTE_SIZE = {schema.PAYLOAD_BYTE_SIZE}\n")
+    lines.append(f"COMMAND_BYTE_SIZE = {schema.COMMAND_BYTE_SIZE}\n")
+    return lines
+
+
+def _py_frame_defs() -> list:
+    """ Lines of the frame CRC and COBS constants of pkt_defs.py """
+    lines = ["# bit of PAYLOAD_SIZE flagging a frame with CRC (CRC-16/CCITT-FALSE of PAYLOAD_SIZE and PAYLOAD, high byte first)\n"]
+    lines.append(f"FRAME_CRC_FLAG = 0x{schema.FRAME_CRC_FLAG:02X}\n")
+    lines.append(f"CRC_INIT = 0x{schema.CRC_INIT:04X}\n")
+    lines.append(f"CRC_SIZE = {schema.CRC_SIZE}\n")
+    lines.append("# byte terminating a COBS frame (COBS(PAYLOAD_SIZE | PAYLOAD [| CRC]) | COBS_DELIMITER)\n")
+    lines.append(f"COBS_DELIMITER = b'\\x{schema.COBS_DELIMITER:02X}'\n")
+    return lines
+
+
+def _py_pkt_defs() -> str:
+    """ Content of PC_control/hst/packet/pkt_defs.py """
+    lines = [HEADER_PY] + _py_cmd_defs() + _py_frame_defs()
+    lines.append("\n")
+    lines.append("# frequency value considered as STOP\n")
+    lines.append(f"{'INACTIVE_FREQ':<23} = ({schema.INACTIVE_FREQ}).to_bytes(length=4, byteorder=BYTEORDER)\n")
+    lines.append("# default PFM frequency (can be changed in software)\n")
+    lines.append(f"{'DEFAULT_PFM_FREQ':<23} = ({schema.DEFAULT_PFM_FREQ}).to_bytes(length=4, byteorder=BYTEORDER)\n")
+    lines.append("\n")
+    lines.append(f"# There are {len(schema.PFMS)} axis: {', '.join(name for name, _, _ in schema.PFMS)} (bit flags)\n")
+    lines.append(f"{'NUM_PFM':<18} = {len(schema.PFMS)}\n")
+    for name, _, flag in schema.PFMS:
+        lines.append(f"{'PFM_'+name:<18} = {flag}\n")
+    lines.append("# number of segments of the motion queue\n")
+    lines.append(f"{'PFM_QUEUE_SIZE':<18} = {schema.PFM_QUEUE_SIZE}\n")
+    lines.append("\n")
+    lines.append("# baudrate after setup(), baudrates accepted by CMD_SET_BAUDRATE and the time of their confirmation\n")
+    lines.append(f"{'DEFAULT_BAUDRATE':<23} = {schema.DEFAULT_BAUDRATE}\n")
+    lines.append(f"{'BAUDRATES':<23} = {schema.BAUDRATES!r}\n")
+    lines.append(f"{'BAUDRATE_CONFIRM_MS':<23} = {schema.BAUDRATE_CONFIRM_MS}\n")
+    return "".join(lines)
+
+
+def _py_pkt_formats() -> str:
+    """ Content of PC_control/hst/packet/pkt_formats.py """
+    lines = [HEADER_PY]
+    lines.append('""" Struct formats of request payloads and reply data, keyed by the command byte.\n')
+    lines.append(f"    Requests are {schema.REQUEST_BYTEORDER}-endian, replies are {schema.REPLY_BYTEORDER}-endian.\n")
+    lines.append('"""\n\n')
+    lines.append("# request payload format: | COMMAND | DATA |\n")
+    lines.append("REQUEST_FORMATS = {\n")
+    for command in _implemented_commands():
+        if command.get('records'):
+            continue
+        fmt = _struct_format(schema.REQUEST_BYTEORDER, command['request'], command=True)
+        names = ", ".join(['command'] + [name for name, _ in command['request']])
+        lines.append(f"    0x{command['id']:02X}: {repr(fmt)+',':<10} # {'CMD_'+command['name']}: {names}\n")
+    lines.append("}\n\n")
+    lines.append("# request record format: (format of one record, maximal number of records), payload: | COMMAND | RECORD | RECORD | ... |\n")
+    lines.append("RECORD_FORMATS = {\n")
+    for command in _record_commands():
+        fmt = _struct_format(schema.REQUEST_BYTEORDER, command['request'])
+        names = ", ".join(name for name, _ in command['request'])
+        lines.append(f"    0x{command['id']:02X}: ({repr(fmt)+',':<8} {command['records']}), # {'CMD_'+command['name']}: {names}\n")
+    lines.append("}\n\n")
+    lines.append("# reply timestamp appended to every reply and pushed packet: (format, name)\n")
+    lines.append(f"REPLY_TIMESTAMP_FORMAT = {repr(_struct_format(schema.REPLY_BYTEORDER, [schema.REPLY_TIMESTAMP]))}\n")
+    lines.append(f"REPLY_TIMESTAMP_NAME = {repr(schema.REPLY_TIMESTAMP[0])}\n\n")
+    lines.append("# reply DATA format including the timestamp: (name, format or None if only ACK/NACK is returned, names of values)\n")
+    lines.append("REPLY_FORMATS = {\n")
+    for command in _implemented_commands():
+        name = 'CMD_' + command['name']
+        if command['reply']:
+            fields = command['reply'] + [schema.REPLY_TIMESTAMP]
+            fmt = repr(_struct_format(schema.REPLY_BYTEORDER, fields))
+            value_names = repr(tuple(value_name for value_name, _ in fields))
+        else:
+            fmt, value_names = 'None', '()'
+        lines.append(f"    0x{command['id']:02X}: ({repr(name)+',':<26} {fmt}, {value_names}),\n")
+    lines.append("}\n\n")
+    lines.append("# pushed packet DATA format including the timestamp: (name, format, names of values)\n")
+    lines.append("PUSH_FORMATS = {\n")
+    for push in schema.PUSHES:
+        fields = push['reply'] + [schema.REPLY_TIMESTAMP]
+        fmt = repr(_struct_format(schema.REPLY_BYTEORDER, fields))
+        value_names = repr(tuple(value_name for value_name, _ in fields))
+        lines.append(f"    0x{push['id']:02X}: ({repr('PKT_'+push['name'])+',':<26} {fmt}, {value_names}),\n")
+    lines.append("}\n")
+    return "".join(lines)
+
+
+def _py_ui_cmd_defs() -> str:
+    """ Content of PC_UI/pkt_cmd_defs.py """
+    return "".join([HEADER_PY] + _py_cmd_defs())
+
+
+def _py_ui_pfm_config() -> str:
+    """ Content of PC_UI/pfm_config.py """
+    lines = [HEADER_PY]
+    lines.append(f"# There are {len(schema.PFMS)} axis: {', '.join(name for name, _, _ in schema.PFMS)}\n")
+    lines.append(f"{'NUM_PFM':<23} = ({len(schema.PFMS)}).to_bytes(length=1, byteorder='big')\n")
+    for name, index, flag in schema.PFMS:
+        lines.append(f"{'PFM_'+name:<23} = ({index}).to_bytes(length=1, byteorder='big')\n")
+        lines.append(f"{'PFM_'+name+'_FLAG':<23} = bytes.fromhex('{flag:02X}')\n")
+    lines.append("# frequency value considered as STOP\n")
+    lines.append(f"{'INACTIVE_FREQ':<23} = ({schema.INACTIVE_FREQ}).to_bytes(length=4, byteorder='big')\n")
+    lines.append("# default PFM frequency (can be changed in software)\n")
+    lines.append(f"{'DEFAULT_PFM_FREQ':<23} = ({schema.DEFAULT_PFM_FREQ}).to_bytes(length=4, byteorder='big')\n")
+    lines.append("# derive balue of interrupt counter with prescaler 1:1\n")
+    lines.append("#INTERRUPT_COUNTER       = hex(F_CPU/2/DEFAULT_PFM_FREQ)\n")
+    return "".join(lines)
+
+
+# generated file (relative to the repository root): content generator
+GENERATED_FILES = {
+    'pkt_cmd_defs.h':                       _c_cmd_defs,
+    'pfm_config.h':                         _c_pfm_config,
+    'PC_control/hst/packet/pkt_defs.py':    _py_pkt_defs,
+    'PC_control/hst/packet/pkt_formats.py': _py_pkt_formats,
+    'PC_UI/pkt_cmd_defs.py':                _py_ui_cmd_defs,
+    'PC_UI/pfm_config.py':                  _py_ui_pfm_config,
+}
+
+
+def generate(check:bool=False) -> list:
+    """ Generates (or checks) all files of GENERATED_FILES.
+
+    :param check: Only compare the files with the schema, defaults to False.
+    :type check: bool, optional
+    :return: Relative paths of the files which were stale (and rewritten if check is False).
+    :rtype: list
+    """
+    stale = []
+    for path, content_generator in GENERATED_FILES.items():
+        full_path = os.path.join(REPO_ROOT, path)
+        content = content_generator()
+        try:
+            with open(full_path, 'r') as file:
+                current = file.read()
+        except FileNotFoundError:
+            current = None
+        if current == content:
+            continue
+        stale.append(path)
+        if not check:
+            with open(full_path, 'w') as file:
+                file.write(content)
+    return stale
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate the protocol definitions from pkt_schema.py")
+    parser.add_argument('--check', action='store_true', help="only check that the generated files are up to date")
+    args = parser.parse_args()
+
+    stale = generate(check=args.check)
+    for path in stale:
+        print(f"{'stale' if args.check else 'generated'}: {path}")
+    if args.check and stale:
+        sys.exit(1)
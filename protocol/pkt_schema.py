@@ -0,0 +1,270 @@
+""" Packet protocol schema - the single source of truth of the protocol.
+
+    The definitions below are turned into source files by generate.py:
+
+        pkt_cmd_defs.h                          - firmware command table
+        pfm_config.h                            - firmware PFM configuration
+        PC_control/hst/packet/pkt_defs.py       - host constants
+        PC_control/hst/packet/pkt_formats.py    - host struct formats of every command
+        PC_UI/pkt_cmd_defs.py                   - legacy UI constants
+        PC_UI/pfm_config.py                     - legacy UI PFM configuration
+
+    Do not edit the generated files, edit this schema and run:
+
+        python protocol/generate.py
+
+    Field types:
+        'bool', 'uint8', 'int8', 'uint16', 'int16', 'uint32', 'int32'
+
+    Reply timestamp:
+        every reply and pushed packet ends with REPLY_TIMESTAMP, it is not
+        listed in the 'reply' fields below but the generated host formats
+        include it (the firmware appends it in loop(), see Turret4.ino)
+
+    Frame CRC:
+        a frame may carry a CRC-16 of its PAYLOAD_SIZE and PAYLOAD:
+            | START_BYTES | PAYLOAD_SIZE | PAYLOAD | CRC | END_BYTES |
+        flagged by FRAME_CRC_FLAG in PAYLOAD_SIZE (payloads are shorter than
+        128 bytes), the CRC is CRC-16/CCITT-FALSE (polynomial 0x1021, initial
+        value CRC_INIT, binascii.crc_hqx() on the host, _crc_xmodem_update()
+        of avr-libc on the firmware) sent from the high to the low byte; the
+        firmware accepts both frames and replies in the frame of the request
+
+    COBS framing:
+        alternatively the frame is byte-stuffed by COBS (Consistent Overhead
+        Byte Stuffing), which removes every COBS_DELIMITER from it, and is
+        terminated by COBS_DELIMITER:
+            | COBS(PAYLOAD_SIZE | PAYLOAD [| CRC]) | COBS_DELIMITER |
+        the boundary of a frame is the next COBS_DELIMITER, START_BYTES and
+        END_BYTES are not used; the firmware accepts both framings and
+        replies in the framing of the request
+
+    Baud rate:
+        the firmware starts at DEFAULT_BAUDRATE, CMD_SET_BAUDRATE moves it to
+        one of BAUDRATES after its ACK; the new baudrate is kept only if it
+        is confirmed by a second CMD_SET_BAUDRATE of the same baudrate within
+        BAUDRATE_CONFIRM_MS, otherwise the firmware falls back to the previous
+        one (see HST.negotiate_baudrate())
+
+    Byte order:
+        requests - multi-byte values are sent from the high to the low byte
+                   (rebuilt by Pkt_pfm::arr_to_uint*_t() in pkt_process_cmd.cpp)
+        replies  - multi-byte values are sent from the low to the high byte
+                   (copied from AVR memory by Pkt_pfm::uint*_t_to_arr())
+"""
+
+# start & end bytes marking the beginning and end of a packet
+START_BYTES = (0xAA, 0xBB)
+END_BYTES = (0xCC, 0xDD)
+# size of the PAYLOAD_SIZE and COMMAND fields
+PAYLOAD_BYTE_SIZE = 1
+COMMAND_BYTE_SIZE = 1
+# bit of PAYLOAD_SIZE flagging a frame with CRC, CRC-16/CCITT-FALSE initial value and size of the CRC
+FRAME_CRC_FLAG = 0x80
+CRC_INIT = 0xFFFF
+CRC_SIZE = 2
+# byte terminating a COBS frame, never present inside a COBS frame
+COBS_DELIMITER = 0x00
+# definition of response
+PKT_ACK = 0xAA
+PKT_NACK = 0xAB
+
+REQUEST_BYTEORDER = 'big'
+REPLY_BYTEORDER = 'little'
+# device time (micros() of the firmware, wraps after ~71.6 min) appended to
+# every reply (after the DATA or ACK/NACK) and every pushed packet
+REPLY_TIMESTAMP = ('MICROS', 'uint32')
+
+# baudrate of the serial line after setup()
+DEFAULT_BAUDRATE = 115200
+# baudrates accepted by CMD_SET_BAUDRATE (error of the UART clock of a 16 MHz AVR below 2.5 %)
+BAUDRATES = (115200, 250000, 500000, 1000000, 2000000)
+# time the firmware waits at a new baudrate for its confirmation before falling back
+BAUDRATE_CONFIRM_MS = 1000
+
+# pulse-frequency-modulators (axes): (name, index, bit flag)
+PFMS = [
+    ('X', 0, 0x01),
+    ('Y', 1, 0x02),
+    ('Z', 2, 0x04),
+]
+# frequency value considered as STOP
+INACTIVE_FREQ = 65535
+# default PFM frequency (can be changed in software)
+DEFAULT_PFM_FREQ = 6400
+# number of segments of the motion queue (power of 2, at most 128)
+PFM_QUEUE_SIZE = 16
+
+# definition of commands (in order of expected frequency of execution)
+#   name        - command name (without the CMD_ prefix)
+#   id          - command byte
+#   doc         - firmware function executing the command
+#   request     - request DATA fields [(name, type), ...], None if the command is not implemented
+#   records     - (optional) the request DATA is a record of the request fields repeated 1..records times
+#   reply       - reply DATA fields [(name, type), ...], empty if only ACK/NACK is returned
+COMMANDS = [
+    {
+        'name': 'SET_TARGET_FREQ',
+        'id': 0x01,
+        'doc': 'set_target_freq(uint8_t this_pfm, uint16_t pfm_target_freq, bool pfm_direction)',
+        'request': [('which_pfm', 'uint8'), ('freq', 'uint16'), ('direction', 'bool')],
+        'reply': [],
+    },
+    {
+        'name': 'SET_TARGET_DELTA',
+        'id': 0x02,
+        'doc': 'set_target_delta(uint8_t this_pfm, uint16_t pfm_target_freq, int32_t pfm_target_delta)',
+        'request': [('which_pfm', 'uint8'), ('freq', 'uint16'), ('delta', 'int32')],
+        'reply': [],
+    },
+    {
+        'name': 'GET_DELTA_STEPS',
+        'id': 0x03,
+        'doc': 'get_delta_steps(uint8_t this_pfm)',
+        'request': [('which_pfm', 'uint8')],
+        'reply': [('DELTA', 'int32')],
+    },
+    {
+        'name': 'GET_IMU_MEASUREMENT',
+        'id': 0x04,
+        'doc': 'imu.get_measurement()',
+        'request': [],
+        # imu_regs of imu.hpp are int16
+        'reply': [('AX', 'int16'), ('AY', 'int16'), ('AZ', 'int16'),
+                  ('GX', 'int16'), ('GY', 'int16'), ('GZ', 'int16'),
+                  ('MX', 'int16'), ('MY', 'int16'), ('MZ', 'int16')],
+    },
+    {
+        'name': 'SET_ISR_FREQ',
+        'id': 0x05,
+        'doc': 'set_isr_freq(uint32_t freq)',
+        'request': [('isr_freq', 'uint16')],
+        'reply': [],
+    },
+    {
+        'name': 'ENABLE_CNC',
+        'id': 0x06,
+        'doc': 'enable_cnc(void)',
+        'request': [],
+        'reply': [],
+    },
+    {
+        'name': 'DISABLE_CNC',
+        'id': 0x07,
+        'doc': 'disable_cnc(void)',
+        'request': [],
+        'reply': [],
+    },
+    {
+        'name': 'SET_DELTA_STEPS',
+        'id': 0x08,
+        'doc': 'set_delta_steps(uint8_t this_pfm, int32_t delta_steps)',
+        'request': [('which_pfm', 'uint8'), ('delta_steps', 'int32')],
+        'reply': [],
+    },
+    {
+        'name': 'STOP',
+        'id': 0x09,
+        'doc': 'halts execution and resets memory',
+        'request': None,
+        'reply': None,
+    },
+    {
+        'name': 'GET_ISR_FREQ',
+        'id': 0x0A,
+        'doc': 'uint32_t get_isr_freq(void)',
+        'request': [],
+        'reply': [('ISR_FREQ', 'uint32')],
+    },
+    {
+        'name': 'SET_TARGETS_FREQ',
+        'id': 0x0B,
+        'doc': 'set_target_freq() of several PFMs under a single block_isr()',
+        'request': [('which_pfm', 'uint8'), ('freq', 'uint16'), ('direction', 'bool')],
+        'records': len(PFMS),
+        'reply': [],
+    },
+    {
+        'name': 'SET_TARGETS_DELTA',
+        'id': 0x0C,
+        'doc': 'set_target_delta() of several PFMs under a single block_isr()',
+        'request': [('which_pfm', 'uint8'), ('freq', 'uint16'), ('delta', 'int32')],
+        'records': len(PFMS),
+        'reply': [],
+    },
+    {
+        'name': 'QUEUE_SEGMENT',
+        'id': 0x0D,
+        'doc': 'queue_segment() appends a segment of target deltas to the motion queue, NACK if full',
+        'request': [('which_pfm', 'uint8'), ('freq', 'uint16'), ('delta', 'int32')],
+        'records': len(PFMS),
+        'reply': [('FREE_SLOTS', 'uint8'), ('ACTIVE', 'uint8'), ('EXECUTED', 'uint16')],
+    },
+    {
+        'name': 'GET_QUEUE_STATUS',
+        'id': 0x0E,
+        'doc': 'get_queue_status(void)',
+        'request': [],
+        'reply': [('FREE_SLOTS', 'uint8'), ('ACTIVE', 'uint8'), ('EXECUTED', 'uint16')],
+    },
+    {
+        'name': 'CLEAR_QUEUE',
+        'id': 0x0F,
+        'doc': 'clear_queue(void) drops the queued segments (the running segment is finished)',
+        'request': [],
+        'reply': [],
+    },
+    {
+        'name': 'SUBSCRIBE_IMU',
+        'id': 0x10,
+        'doc': 'subscribe_imu(uint16_t period_ms) pushes PKT_IMU_FRAME every period, 0 unsubscribes',
+        'request': [('period_ms', 'uint16')],
+        'reply': [],
+    },
+    {
+        'name': 'ARM_TARGETS',
+        'id': 0x12,
+        'doc': 'arm_targets() stores target frequencies of several PFMs applied by CMD_TRIGGER',
+        'request': [('which_pfm', 'uint8'), ('freq', 'uint16'), ('direction', 'bool')],
+        'records': len(PFMS),
+        'reply': [],
+    },
+    {
+        'name': 'TRIGGER',
+        'id': 0x13,
+        'doc': 'trigger(void) applies the armed targets under a single block_isr(), NACK if nothing is armed',
+        'request': [],
+        'reply': [],
+    },
+    {
+        'name': 'PING',
+        'id': 0x14,
+        'doc': 'ping(void) returns ACK (and REPLY_TIMESTAMP) for clock synchronisation',
+        'request': [],
+        'reply': [],
+    },
+    {
+        'name': 'SET_BAUDRATE',
+        'id': 0x15,
+        'doc': 'set_baudrate(uint32_t baudrate) switches the serial line after the ACK, confirmed by repeating it',
+        'request': [('baudrate', 'uint32')],
+        'reply': [],
+    },
+]
+
+# definition of packets pushed by the firmware without a request
+#   name        - packet name (without the PKT_ prefix)
+#   id          - command byte (distinct from the command bytes of COMMANDS)
+#   doc         - firmware function pushing the packet
+#   reply       - DATA fields [(name, type), ...]
+PUSHES = [
+    {
+        'name': 'IMU_FRAME',
+        'id': 0x11,
+        'doc': 'Pkt_pfm::push_telemetry() every period of subscribe_imu()',
+        'reply': [('SEQUENCE', 'uint16'),
+                  ('AX', 'int16'), ('AY', 'int16'), ('AZ', 'int16'),
+                  ('GX', 'int16'), ('GY', 'int16'), ('GZ', 'int16'),
+                  ('MX', 'int16'), ('MY', 'int16'), ('MZ', 'int16')],
+    },
+]